@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# shared/ sits next to app/ in images and Lambda bundles, at the repository root in a checkout
+_CHECKOUT = Path(__file__).resolve().parents[2]
+if (_CHECKOUT / "shared").is_dir() and str(_CHECKOUT) not in sys.path:
+    sys.path.append(str(_CHECKOUT))
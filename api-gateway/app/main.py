@@ -5,19 +5,47 @@ Routes requests and enforces authentication
 """
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+import asyncio
 import httpx
+import json
 import uvicorn
+import uuid
 import os
 
-from .middleware.auth import validate_jwt_token
+from shared.metrics import MetricsMiddleware, metrics_response
+from shared.product_feed import ProductFeedSubscriber
+from shared.tracing import TracingMiddleware
+
+from .middleware.auth import decode_jwt_claims, validate_jwt_token
+from .middleware.compression import CompressionMiddleware, negotiate
+from .middleware.rate_limit import RateLimitMiddleware
+from .response_cache import CachedResponse, ResponseCache
+from .upstream import UpstreamClient, load_route_policies_from_env
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Follow the product change feed while product responses are cached"""
+    if product_feed is not None:
+        product_feed.start()
+    yield
+    if product_feed is not None:
+        await product_feed.stop()
+
 
 app = FastAPI(
     title="E-Commerce API Gateway",
     description="Unified API Gateway for microservices",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Per-client token buckets (GATEWAY_RATE_LIMITS); inside CORS so 429s stay readable by browsers
+app.add_middleware(RateLimitMiddleware)
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -27,11 +55,81 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli for bodies over GATEWAY_COMPRESS_MIN_SIZE (cache hits arrive pre-compressed)
+app.add_middleware(CompressionMiddleware)
+
+# Per-route request counts and latency histograms, exposed at /metrics
+app.add_middleware(MetricsMiddleware)
+
+# W3C traceparent generation; sampled spans go to TRACE_EXPORT_FILE
+app.add_middleware(TracingMiddleware, service_name="api-gateway")
+
 # Service URLs (configured via environment variables)
 PRODUCT_SERVICE_URL = os.getenv("PRODUCT_SERVICE_URL", "http://localhost:8001")
 CART_SERVICE_URL = os.getenv("CART_SERVICE_URL", "http://localhost:8002")
 AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://localhost:8003")
 
+# Retry / hedging policies for idempotent upstream calls, per route name
+# (defaults in app.upstream; GATEWAY_RETRY_POLICIES and GATEWAY_HEDGE_ROUTES adjust them).
+# POST routes are only retried with an Idempotency-Key (see idempotency_headers)
+ROUTE_POLICIES = load_route_policies_from_env()
+
+
+def idempotency_headers(request: Request) -> Dict[str, str]:
+    """The client's Idempotency-Key, or a fresh one so the gateway's own retries are applied once"""
+    return {"idempotency-key": request.headers.get("idempotency-key") or uuid.uuid4().hex}
+
+
+upstream = UpstreamClient(policies=ROUTE_POLICIES)
+
+# Public product GETs are cached for GATEWAY_CACHE_TTL seconds, stored with
+# their compressed variants; catalog changes drop affected entries early
+response_cache = ResponseCache()
+
+
+def drop_changed_products(events):
+    """Drop cached listings and searches, and the detail of each changed product"""
+    changed = {f"{PRODUCT_SERVICE_URL}/products/{event['product_id']}" for event in events}
+    response_cache.discard_where(lambda key: key[0] != "products.get" or key[1] in changed)
+
+
+async def drop_all_products(client):
+    response_cache.clear()
+
+
+product_feed = (
+    ProductFeedSubscriber(PRODUCT_SERVICE_URL, drop_changed_products, drop_all_products)
+    if response_cache.enabled and os.getenv("GATEWAY_CACHE_FOLLOW_CHANGES", "1") == "1" else None
+)
+
+
+async def fetch_cached(route: str, url: str, params: Optional[dict] = None) -> CachedResponse:
+    """
+    Upstream GET through the response cache
+    Upstream errors propagate from raise_for_status() as before.
+    """
+    key = (route, url, tuple(sorted(params.items())) if params else ())
+    entry = response_cache.get(key)
+    if entry is None:
+        response = await upstream.get(route, url, params=params)
+        response.raise_for_status()
+        media_type = response.headers.get("content-type", "application/json")
+        entry = response_cache.put(key, response.content, media_type)
+    return entry
+
+
+async def cached_get(request: Request, route: str, url: str, params: Optional[dict] = None) -> Response:
+    """
+    Cached upstream GET as a response
+    The body is passed through as received (no JSON decode/re-encode);
+    hits come back already compressed for the client's Accept-Encoding.
+    """
+    entry = await fetch_cached(route, url, params)
+    if not response_cache.enabled:
+        # CompressionMiddleware compresses per response instead
+        return Response(entry.body, media_type=entry.media_type)
+    return entry.response(negotiate(request.headers.get("accept-encoding")))
+
 
 @app.get("/")
 def root():
@@ -48,6 +146,12 @@ def root():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics for the gateway and its upstream calls"""
+    return metrics_response()
+
+
 # ============================================================================
 # PRODUCT SERVICE ROUTES (PUBLIC - No Authentication Required)
 # ============================================================================
@@ -58,197 +162,308 @@ async def get_products(request: Request):
     Get all products (ranked)
     PUBLIC ENDPOINT - No authentication required
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            # Forward query parameters
-            params = dict(request.query_params)
-            response = await client.get(
-                f"{PRODUCT_SERVICE_URL}/products",
-                params=params,
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPError as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Product service error: {str(e)}"
-            )
+    try:
+        # Forward query parameters
+        params = dict(request.query_params)
+        return await cached_get(
+            request,
+            "products.list",
+            f"{PRODUCT_SERVICE_URL}/products",
+            params=params
+        )
+    except httpx.HTTPError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Product service error: {str(e)}"
+        )
 
 
 @app.get("/products/{product_id}")
-async def get_product(product_id: str):
+async def get_product(product_id: str, request: Request):
     """
     Get specific product by ID
     PUBLIC ENDPOINT - No authentication required
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                f"{PRODUCT_SERVICE_URL}/products/{product_id}",
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            if e.response.status_code == 404:
-                raise HTTPException(status_code=404, detail="Product not found")
-            raise HTTPException(status_code=500, detail="Product service error")
+    try:
+        return await cached_get(
+            request,
+            "products.get",
+            f"{PRODUCT_SERVICE_URL}/products/{product_id}"
+        )
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404:
+            raise HTTPException(status_code=404, detail="Product not found")
+        raise HTTPException(status_code=500, detail="Product service error")
 
 
 @app.get("/products/search/{query}")
-async def search_products(query: str):
+async def search_products(query: str, request: Request):
     """
     Search products
     PUBLIC ENDPOINT - No authentication required
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                f"{PRODUCT_SERVICE_URL}/products/search/{query}",
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPError as e:
-            raise HTTPException(status_code=500, detail="Product service error")
+    try:
+        # Forward pagination (limit/offset)
+        return await cached_get(
+            request,
+            "products.search",
+            f"{PRODUCT_SERVICE_URL}/products/search/{query}",
+            params=dict(request.query_params)
+        )
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=500, detail="Product service error")
 
 
 # ============================================================================
 # CART SERVICE ROUTES (PROTECTED - JWT Authentication Required)
 # ============================================================================
 
+# Current product data attached to each cart line by GET /cart?enrich=true
+CART_PRODUCT_FIELDS = ["id", "name", "price", "image_url", "available"]
+
+# Ids per POST /products/batch call (the product service's MAX_BATCH_IDS)
+PRODUCT_BATCH_SIZE = 500
+
+
+async def enrich_cart(cart: dict) -> dict:
+    """
+    Attach current product data to every cart item with batch lookups
+    Distinct ids go out in concurrent calls of up to 500. Items whose
+    product is gone get "product": null. If the product service fails the
+    cart is returned as-is with "enriched": false.
+    """
+    items = cart.get("items") or []
+    product_ids = list(dict.fromkeys(item["product_id"] for item in items))
+    try:
+        responses = await asyncio.gather(*(
+            upstream.request(
+                "products.batch",
+                "POST",
+                f"{PRODUCT_SERVICE_URL}/products/batch",
+                json={"ids": product_ids[start:start + PRODUCT_BATCH_SIZE], "fields": CART_PRODUCT_FIELDS}
+            )
+            for start in range(0, len(product_ids), PRODUCT_BATCH_SIZE)
+        ))
+        for response in responses:
+            response.raise_for_status()
+    except httpx.HTTPError:
+        cart["enriched"] = False
+        return cart
+    products = {product["id"]: product for response in responses for product in response.json()["products"]}
+    for item in items:
+        item["product"] = products.get(item["product_id"])
+    cart["enriched"] = True
+    return cart
+
+
+async def authorize_cart(request: Request) -> Optional[str]:
+    """
+    The JWT's user_id, or None for a guest (X-Guest-Session and no Authorization)
+    Guest sessions are signed by the cart service, which verifies them
+    """
+    if not request.headers.get("authorization") and request.headers.get("x-guest-session"):
+        return None
+    return await validate_jwt_token(request)
+
+
+def cart_headers(request: Request) -> Dict[str, str]:
+    """
+    Authorization or guest session, plus the client's If-Match (which the
+    cart service checks against the cart version)
+    """
+    headers = {}
+    for name in ("authorization", "x-guest-session", "if-match"):
+        if request.headers.get(name):
+            headers[name] = request.headers[name]
+    return headers
+
+
+def cart_reply(upstream_response: httpx.Response, response: Response) -> dict:
+    """The cart service's JSON body, passing its ETag (the cart version) on to the client"""
+    if "etag" in upstream_response.headers:
+        response.headers["ETag"] = upstream_response.headers["etag"]
+    return upstream_response.json()
+
+
+def raise_for_version_conflict(error: httpx.HTTPError) -> None:
+    """Pass a stale If-Match (412) through with the current ETag instead of a generic error"""
+    if isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 412:
+        raise HTTPException(
+            status_code=412,
+            detail=error.response.json().get("detail", "Cart was modified by another request"),
+            headers={"ETag": error.response.headers.get("etag", "")}
+        )
+
+
+@app.post("/cart/guest")
+async def create_guest_session():
+    """
+    Start a guest cart
+    PUBLIC ENDPOINT - send the returned guest_session as X-Guest-Session on
+    /cart requests, and on /auth/login to merge the cart into the user's
+    """
+    try:
+        response = await upstream.request("cart.guest", "POST", f"{CART_SERVICE_URL}/cart/guest")
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=500, detail="Cart service error")
+
+
 @app.get("/cart")
-async def get_cart(request: Request):
+async def get_cart(request: Request, response: Response, enrich: bool = False):
     """
     Get user's cart
     PROTECTED ENDPOINT - Requires JWT authentication
+    enrich=true adds each item's current price, image and availability
     """
     # Validate JWT and extract user_id
-    user_id = await validate_jwt_token(request)
+    user_id = await authorize_cart(request)
     
-    async with httpx.AsyncClient() as client:
-        try:
-            # Forward request with Authorization header
-            auth_header = request.headers.get("authorization")
-            headers = {"authorization": auth_header}
-            
-            response = await client.get(
-                f"{CART_SERVICE_URL}/cart",
-                headers=headers,
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPError as e:
-            raise HTTPException(status_code=500, detail="Cart service error")
+    try:
+        cart_response = await upstream.get(
+            "cart.get",
+            f"{CART_SERVICE_URL}/cart",
+            headers=cart_headers(request)
+        )
+        cart_response.raise_for_status()
+        cart = cart_reply(cart_response, response)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=500, detail="Cart service error")
+    if enrich and cart.get("items"):
+        cart = await enrich_cart(cart)
+    return cart
 
 
 @app.post("/cart/add")
-async def add_to_cart(request: Request):
+async def add_to_cart(request: Request, response: Response):
     """
     Add item to cart
     PROTECTED ENDPOINT - Requires JWT authentication
+    If-Match is forwarded; 412 when the cart changed since that version
     """
     # Validate JWT
-    user_id = await validate_jwt_token(request)
+    user_id = await authorize_cart(request)
     
     # Get request body
     body = await request.json()
     
-    async with httpx.AsyncClient() as client:
-        try:
-            auth_header = request.headers.get("authorization")
-            headers = {"authorization": auth_header}
-            
-            response = await client.post(
-                f"{CART_SERVICE_URL}/cart/add",
-                json=body,
-                headers=headers,
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=e.response.json().get("detail", "Cart service error")
-            )
+    try:
+        headers = {**cart_headers(request), **idempotency_headers(request)}
+        
+        cart_response = await upstream.request(
+            "cart.add",
+            "POST",
+            f"{CART_SERVICE_URL}/cart/add",
+            json=body,
+            headers=headers
+        )
+        cart_response.raise_for_status()
+        return cart_reply(cart_response, response)
+    except httpx.HTTPStatusError as e:
+        raise_for_version_conflict(e)
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=e.response.json().get("detail", "Cart service error")
+        )
 
 
 @app.put("/cart/update/{product_id}")
-async def update_cart_item(product_id: str, request: Request):
+async def update_cart_item(product_id: str, request: Request, response: Response):
     """
     Update cart item quantity
     PROTECTED ENDPOINT - Requires JWT authentication
+    If-Match is forwarded; 412 when the cart changed since that version
     """
-    user_id = await validate_jwt_token(request)
+    user_id = await authorize_cart(request)
     
     params = dict(request.query_params)
     
-    async with httpx.AsyncClient() as client:
-        try:
-            auth_header = request.headers.get("authorization")
-            headers = {"authorization": auth_header}
-            
-            response = await client.put(
-                f"{CART_SERVICE_URL}/cart/update/{product_id}",
-                params=params,
-                headers=headers,
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail="Cart service error")
+    try:
+        cart_response = await upstream.request(
+            "cart.update",
+            "PUT",
+            f"{CART_SERVICE_URL}/cart/update/{product_id}",
+            params=params,
+            headers=cart_headers(request)
+        )
+        cart_response.raise_for_status()
+        return cart_reply(cart_response, response)
+    except httpx.HTTPStatusError as e:
+        raise_for_version_conflict(e)
+        raise HTTPException(status_code=e.response.status_code, detail="Cart service error")
 
 
 @app.delete("/cart/remove/{product_id}")
-async def remove_from_cart(product_id: str, request: Request):
+async def remove_from_cart(product_id: str, request: Request, response: Response):
     """
     Remove item from cart
     PROTECTED ENDPOINT - Requires JWT authentication
+    If-Match is forwarded; 412 when the cart changed since that version
     """
-    user_id = await validate_jwt_token(request)
+    user_id = await authorize_cart(request)
     
-    async with httpx.AsyncClient() as client:
-        try:
-            auth_header = request.headers.get("authorization")
-            headers = {"authorization": auth_header}
-            
-            response = await client.delete(
-                f"{CART_SERVICE_URL}/cart/remove/{product_id}",
-                headers=headers,
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPError as e:
-            raise HTTPException(status_code=500, detail="Cart service error")
+    try:
+        cart_response = await upstream.request(
+            "cart.remove",
+            "DELETE",
+            f"{CART_SERVICE_URL}/cart/remove/{product_id}",
+            headers=cart_headers(request)
+        )
+        cart_response.raise_for_status()
+        return cart_reply(cart_response, response)
+    except httpx.HTTPError as e:
+        raise_for_version_conflict(e)
+        raise HTTPException(status_code=500, detail="Cart service error")
 
 
 @app.delete("/cart/clear")
-async def clear_cart(request: Request):
+async def clear_cart(request: Request, response: Response):
     """
     Clear entire cart
     PROTECTED ENDPOINT - Requires JWT authentication
+    If-Match is forwarded; 412 when the cart changed since that version
+    """
+    user_id = await authorize_cart(request)
+    
+    try:
+        cart_response = await upstream.request(
+            "cart.clear",
+            "DELETE",
+            f"{CART_SERVICE_URL}/cart/clear",
+            headers=cart_headers(request)
+        )
+        cart_response.raise_for_status()
+        return cart_reply(cart_response, response)
+    except httpx.HTTPError as e:
+        raise_for_version_conflict(e)
+        raise HTTPException(status_code=500, detail="Cart service error")
+
+
+@app.post("/cart/merge")
+async def merge_cart(request: Request, response: Response):
+    """
+    Merge the X-Guest-Session cart into the user's cart
+    PROTECTED ENDPOINT - Requires JWT authentication (done by /auth/login
+    automatically; call this to retry or to merge later)
     """
     user_id = await validate_jwt_token(request)
     
-    async with httpx.AsyncClient() as client:
-        try:
-            auth_header = request.headers.get("authorization")
-            headers = {"authorization": auth_header}
-            
-            response = await client.delete(
-                f"{CART_SERVICE_URL}/cart/clear",
-                headers=headers,
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPError as e:
-            raise HTTPException(status_code=500, detail="Cart service error")
+    try:
+        cart_response = await upstream.request(
+            "cart.merge",
+            "POST",
+            f"{CART_SERVICE_URL}/cart/merge",
+            headers=cart_headers(request)
+        )
+        cart_response.raise_for_status()
+        return cart_reply(cart_response, response)
+    except httpx.HTTPStatusError as e:
+        raise_for_version_conflict(e)
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=e.response.json().get("detail", "Cart service error")
+        )
 
 
 @app.get("/cart/count")
@@ -257,22 +472,18 @@ async def get_cart_count(request: Request):
     Get cart item count
     PROTECTED ENDPOINT - Requires JWT authentication
     """
-    user_id = await validate_jwt_token(request)
+    user_id = await authorize_cart(request)
     
-    async with httpx.AsyncClient() as client:
-        try:
-            auth_header = request.headers.get("authorization")
-            headers = {"authorization": auth_header}
-            
-            response = await client.get(
-                f"{CART_SERVICE_URL}/cart/count",
-                headers=headers,
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPError as e:
-            raise HTTPException(status_code=500, detail="Cart service error")
+    try:
+        response = await upstream.get(
+            "cart.count",
+            f"{CART_SERVICE_URL}/cart/count",
+            headers=cart_headers(request)
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=500, detail="Cart service error")
 
 
 # ============================================================================
@@ -284,23 +495,55 @@ async def login(request: Request):
     """
     User login
     PUBLIC ENDPOINT - Returns JWT token
+    With X-Guest-Session, the guest cart is merged into the user's cart
     """
     body = await request.json()
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"{AUTH_SERVICE_URL}/auth/login",
-                json=body,
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=e.response.json().get("detail", "Authentication failed")
-            )
+    try:
+        response = await upstream.request(
+            "auth.login",
+            "POST",
+            f"{AUTH_SERVICE_URL}/auth/login",
+            json=body,
+            headers=idempotency_headers(request)
+        )
+        response.raise_for_status()
+        result = response.json()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=e.response.json().get("detail", "Authentication failed")
+        )
+    
+    guest_session = request.headers.get("x-guest-session")
+    if guest_session:
+        result["guest_cart"] = await merge_guest_cart(result["access_token"], guest_session)
+    return result
+
+
+async def merge_guest_cart(access_token: str, guest_session: str) -> dict:
+    """
+    Fold a guest cart into the user's cart with one cart service call
+    A failed merge does not fail the login: the guest session stays valid
+    and the client can retry with POST /cart/merge
+    """
+    try:
+        response = await upstream.request(
+            "cart.merge",
+            "POST",
+            f"{CART_SERVICE_URL}/cart/merge",
+            headers={"authorization": f"Bearer {access_token}", "x-guest-session": guest_session}
+        )
+        response.raise_for_status()
+    except httpx.HTTPError:
+        return {"merged": False}
+    merge = response.json()
+    return {
+        "merged": True,
+        "merged_items": merge["merged_items"],
+        "version": merge["version"],
+        "holds_transferred": merge.get("holds_transferred", True)
+    }
 
 
 @app.post("/auth/verify")
@@ -311,17 +554,17 @@ async def verify_token(request: Request):
     """
     body = await request.json()
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"{AUTH_SERVICE_URL}/auth/verify",
-                json=body,
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=401, detail="Invalid token")
+    try:
+        response = await upstream.request(
+            "auth.verify",
+            "POST",
+            f"{AUTH_SERVICE_URL}/auth/verify",
+            json=body
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=401, detail="Invalid token")
 
 
 @app.get("/auth/users")
@@ -330,16 +573,87 @@ async def list_demo_users():
     List demo users (for testing)
     Remove in production!
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                f"{AUTH_SERVICE_URL}/auth/users",
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPError as e:
-            raise HTTPException(status_code=500, detail="Auth service error")
+    try:
+        response = await upstream.request(
+            "auth.users",
+            "GET",
+            f"{AUTH_SERVICE_URL}/auth/users"
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=500, detail="Auth service error")
+
+
+# ============================================================================
+# STOREFRONT (COMPOSITE - JWT optional)
+# ============================================================================
+
+# Listing size when the page does not ask for one
+STOREFRONT_PAGE_SIZE = int(os.getenv("GATEWAY_STOREFRONT_PAGE_SIZE", "24"))
+
+# A part slower than this is reported as failed instead of holding the page
+STOREFRONT_PART_TIMEOUT = float(os.getenv("GATEWAY_STOREFRONT_TIMEOUT", "2.0"))
+
+
+async def storefront_cart_count(auth_header: str) -> bytes:
+    response = await upstream.get(
+        "cart.count",
+        f"{CART_SERVICE_URL}/cart/count",
+        headers={"authorization": auth_header}
+    )
+    response.raise_for_status()
+    return response.content
+
+
+@app.get("/storefront")
+async def storefront(request: Request):
+    """
+    Products, cart count and user in one round-trip
+    PUBLIC ENDPOINT - cart count and user are included when a JWT is sent
+
+    The token is verified once here and the upstream calls run
+    concurrently, so the page waits for the slowest dependency rather than
+    the sum. A part that fails or times out comes back as null with its
+    error under "errors"; only a page where every part failed is a 502.
+    Upstream JSON bodies are spliced in verbatim, not decoded and re-encoded.
+    """
+    claims = None
+    if request.headers.get("authorization"):
+        claims = await decode_jwt_claims(request)
+
+    params = dict(request.query_params)
+    params.setdefault("limit", str(STOREFRONT_PAGE_SIZE))
+    parts = {"products": fetch_cached("products.list", f"{PRODUCT_SERVICE_URL}/products", params)}
+    if claims is not None:
+        parts["cart_count"] = storefront_cart_count(request.headers["authorization"])
+
+    results = await asyncio.gather(
+        *(asyncio.wait_for(part, STOREFRONT_PART_TIMEOUT) for part in parts.values()),
+        return_exceptions=True
+    )
+
+    bodies: Dict[str, bytes] = {}
+    errors: Dict[str, str] = {}
+    for name, result in zip(parts, results):
+        if isinstance(result, asyncio.TimeoutError):
+            errors[name] = "timed out"
+        elif isinstance(result, httpx.HTTPStatusError):
+            errors[name] = f"upstream returned {result.response.status_code}"
+        elif isinstance(result, Exception):
+            errors[name] = "upstream unavailable"
+        else:
+            bodies[name] = result.body if isinstance(result, CachedResponse) else result
+    if not bodies:
+        raise HTTPException(status_code=502, detail={"errors": errors})
+
+    if claims is not None:
+        user = {key: claims.get(key) for key in ("user_id", "email", "name")}
+        bodies["user"] = json.dumps(user).encode()
+    payload = b",".join(
+        b'"%s":%s' % (name.encode(), bodies.get(name, b"null")) for name in ("products", "cart_count", "user")
+    )
+    return Response(b"{" + payload + b',"errors":' + json.dumps(errors).encode() + b"}", media_type="application/json")
 
 
 if __name__ == "__main__":
@@ -6,6 +6,8 @@ from fastapi import Request, HTTPException
 import jwt
 import os
 
+from shared.tracing import tracer
+
 
 JWT_SECRET = os.getenv("JWT_SECRET", "your-secret-key-change-in-production")
 JWT_ALGORITHM = "HS256"
@@ -24,6 +26,15 @@ async def validate_jwt_token(request: Request) -> str:
     Raises:
         HTTPException: If token is missing, invalid, or expired
     """
+    claims = await decode_jwt_claims(request)
+    return claims["user_id"]
+
+
+async def decode_jwt_claims(request: Request) -> dict:
+    """
+    Validate the JWT from the Authorization header and return all its claims
+    (user_id, email, name, exp); same errors as validate_jwt_token
+    """
     # Get Authorization header
     auth_header = request.headers.get("authorization")
     
@@ -48,7 +59,8 @@ async def validate_jwt_token(request: Request) -> str:
     
     # Verify and decode token
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        with tracer.span("auth.jwt_decode"):
+            payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
         user_id = payload.get("user_id")
         
         if not user_id:
@@ -57,7 +69,7 @@ async def validate_jwt_token(request: Request) -> str:
                 detail="Invalid token: user_id missing"
             )
         
-        return user_id
+        return payload
     
     except jwt.ExpiredSignatureError:
         raise HTTPException(
@@ -0,0 +1,134 @@
+"""
+Response compression
+Accept-Encoding negotiation (brotli when installed, gzip) with a minimum
+body size, applied on the fly to responses that are not already encoded
+"""
+import gzip
+import os
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - Brotli is in requirements.txt; gzip only without it
+    brotli = None
+
+
+# Bodies below this are sent as-is: the saving is a few hundred bytes at most
+COMPRESS_MIN_SIZE = int(os.getenv("GATEWAY_COMPRESS_MIN_SIZE", "1024"))
+
+# Per-response levels; most of the size reduction for a fraction of the
+# CPU of the maximum (see benchmarks/bench_compression.py)
+GZIP_LEVEL = int(os.getenv("GATEWAY_GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.getenv("GATEWAY_BROTLI_QUALITY", "4"))
+
+# Server preference order
+ENCODINGS: Tuple[str, ...] = ("br", "gzip") if brotli is not None else ("gzip",)
+
+_COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+
+
+@lru_cache(maxsize=256)
+def negotiate(accept_encoding: Optional[str], available: Tuple[str, ...] = ENCODINGS) -> Optional[str]:
+    """
+    Pick the response encoding for an Accept-Encoding header
+
+    Honours q-values (q=0 refuses) and "*"; ties go to the server's order.
+    Returns None for identity. Clients send a handful of distinct headers,
+    so results are memoised.
+    """
+    if not accept_encoding:
+        return None
+    preferences = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        preferences[name.strip().lower()] = quality
+
+    chosen, best = None, 0.0
+    for encoding in available:
+        quality = preferences.get(encoding, preferences.get("*", 0.0))
+        if quality > best:
+            chosen, best = encoding, quality
+    return chosen
+
+
+def compress(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """Encode a body; level defaults to the per-response setting for the encoding"""
+    if encoding == "gzip":
+        # mtime=0 keeps the output byte-identical for identical input
+        return gzip.compress(body, compresslevel=GZIP_LEVEL if level is None else level, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=BROTLI_QUALITY if level is None else level)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    return bool(content_type) and content_type.startswith(_COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware compressing complete response bodies
+
+    The response start is held back until the first body message: a body
+    of at least `minimum_size` with a compressible content type and no
+    Content-Encoding is compressed and Content-Length rewritten. Streamed
+    responses (more_body) and bodies already encoded - such as the
+    gateway's pre-compressed cache hits - pass through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_SIZE, available: Tuple[str, ...] = ENCODINGS):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.available = available
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"), self.available)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            if (
+                message.get("more_body")
+                or len(body) < self.minimum_size
+                or "content-encoding" in headers
+                or not is_compressible(headers.get("content-type"))
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            body = compress(body, encoding)
+            headers["content-encoding"] = encoding
+            headers["content-length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
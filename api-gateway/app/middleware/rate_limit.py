@@ -0,0 +1,256 @@
+"""
+Rate limiting
+Per-client, per-route token buckets answered with 429 + Retry-After,
+kept in process or in a store shared by all gateway replicas
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional, Protocol, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """
+    Token bucket: `burst` requests at once, refilled at `rate` per second
+
+    Buckets are kept in their single-number form (GCRA): the time at which
+    the bucket would be full again. A request costing one token moves that
+    time forward by 1/rate and is refused if it would land more than
+    burst/rate seconds ahead of now; the overshoot is the Retry-After.
+    """
+    rate: float
+    burst: int = 1
+
+    def apply(self, full_at: Optional[float], now: float) -> Tuple[float, float]:
+        """(new full_at, 0.0) if allowed, else (full_at unchanged, seconds to wait)"""
+        start = now if full_at is None or full_at < now else full_at
+        new_full_at = start + 1.0 / self.rate
+        excess = new_full_at - now - self.burst / self.rate
+        if excess > 0:
+            return full_at, excess
+        return new_full_at, 0.0
+
+
+# Path prefix -> limit per client; "*" covers everything else
+DEFAULT_RATE_LIMITS: Dict[str, RateLimit] = {
+    # Brute-force target: 5 attempts, then one every 12 seconds
+    "/auth/login": RateLimit(rate=5 / 60, burst=5),
+    # Unauthenticated and each call starts a cart: 10, then one every 6 seconds
+    "/cart/guest": RateLimit(rate=10 / 60, burst=10),
+    "/products/search/": RateLimit(rate=10, burst=20),
+    "*": RateLimit(rate=50, burst=100),
+}
+
+# Never limited (health checks and scrapes)
+EXEMPT_PATHS = frozenset({"/", "/metrics"})
+
+# Behind a load balancer every request comes from its address; key on X-Forwarded-For
+# instead, counting this many proxies (each appends one hop) in from the right
+TRUSTED_PROXIES = int(os.getenv("GATEWAY_TRUST_FORWARDED", "0"))
+
+
+def load_rate_limits_from_env() -> Dict[str, RateLimit]:
+    """
+    Defaults plus GATEWAY_RATE_LIMITS, a JSON object of prefix -> {"rate", "burst"}
+    e.g. GATEWAY_RATE_LIMITS='{"/auth/login": {"rate": 0.05, "burst": 3}}'
+    """
+    limits = dict(DEFAULT_RATE_LIMITS)
+    raw = os.getenv("GATEWAY_RATE_LIMITS")
+    if raw:
+        for prefix, spec in json.loads(raw).items():
+            limits[prefix] = RateLimit(rate=float(spec["rate"]), burst=int(spec.get("burst", 1)))
+    return limits
+
+
+def client_address(scope, trusted_proxies: int = 0) -> str:
+    """
+    Client IP; behind `trusted_proxies` proxies, the X-Forwarded-For hop the outermost one added
+    Hops left of that are whatever the client sent and are never trusted.
+    """
+    if trusted_proxies > 0:
+        forwarded = Headers(scope=scope).get("x-forwarded-for")
+        if forwarded:
+            hops = [hop.strip() for hop in forwarded.split(",")]
+            return hops[-min(trusted_proxies, len(hops))]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+# ----------------------------------------------------------------------
+# Bucket backends
+# ----------------------------------------------------------------------
+
+class LocalBuckets:
+    """
+    In-process buckets: one float per (route, client)
+
+    The gateway serves requests on a single event loop and acquire() never
+    awaits, so each read-modify-write is atomic without a lock. Full
+    buckets carry no information; they are swept out once the table
+    passes `max_keys`.
+    """
+
+    def __init__(self, max_keys: int = 100_000, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._full_at: Dict[Tuple[str, str], float] = {}
+        self._sweep_at = max_keys
+
+    async def acquire(self, key: Tuple[str, str], limit: RateLimit) -> float:
+        """Take a token; returns 0.0 if allowed, else seconds until one is available"""
+        now = self._clock()
+        full_at, wait = limit.apply(self._full_at.get(key), now)
+        if not wait:
+            self._full_at[key] = full_at
+            if len(self._full_at) > self._sweep_at:
+                self._sweep(now)
+        return wait
+
+    def _sweep(self, now: float) -> None:
+        self._full_at = {key: full_at for key, full_at in self._full_at.items() if full_at > now}
+        # Sweep again only once the table has doubled, so the cost stays amortised
+        self._sweep_at = max(self.max_keys, 2 * len(self._full_at))
+
+    def __len__(self) -> int:
+        return len(self._full_at)
+
+
+class BucketStore(Protocol):
+    """
+    Key-value store shared by gateway replicas (e.g. Redis via WATCH/MULTI
+    or a Lua script, memcached gets/cas)
+    """
+
+    async def get(self, key: str) -> Optional[float]:
+        ...
+
+    async def compare_and_set(self, key: str, expected: Optional[float], value: float, ttl: float) -> bool:
+        ...
+
+
+class MemoryBucketStore:
+    """
+    Local stand-in for a shared BucketStore (tests, benchmarks, single host)
+    `latency` simulates the network round trip of a real store.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self._values: Dict[str, Tuple[float, float]] = {}
+
+    async def _round_trip(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def get(self, key: str) -> Optional[float]:
+        await self._round_trip()
+        entry = self._values.get(key)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0]
+
+    async def compare_and_set(self, key: str, expected: Optional[float], value: float, ttl: float) -> bool:
+        await self._round_trip()
+        entry = self._values.get(key)
+        current = entry[0] if entry is not None and entry[1] > time.time() else None
+        if current != expected:
+            return False
+        self._values[key] = (value, time.time() + ttl)
+        return True
+
+
+class SharedBuckets:
+    """
+    Buckets held in a BucketStore so all replicas share one limit
+
+    Same GCRA state as LocalBuckets, updated with optimistic
+    compare-and-set; keys expire once their bucket would be full. Uses the
+    wall clock, which replicas share. If the store fails or stays
+    contended the request is let through: a limiter outage should not
+    take the gateway down with it.
+    """
+
+    def __init__(self, store: BucketStore, prefix: str = "ratelimit:", max_attempts: int = 3):
+        self.store = store
+        self.prefix = prefix
+        self.max_attempts = max_attempts
+
+    async def acquire(self, key: Tuple[str, str], limit: RateLimit) -> float:
+        store_key = f"{self.prefix}{key[0]}:{key[1]}"
+        try:
+            for _ in range(self.max_attempts):
+                now = time.time()
+                current = await self.store.get(store_key)
+                full_at, wait = limit.apply(current, now)
+                if wait:
+                    return wait
+                if await self.store.compare_and_set(store_key, current, full_at, ttl=full_at - now):
+                    return 0.0
+        except Exception as exc:
+            logger.warning("rate limit store unavailable, allowing request: %s", exc)
+        return 0.0
+
+
+# ----------------------------------------------------------------------
+# Middleware
+# ----------------------------------------------------------------------
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI middleware enforcing per-client limits by path prefix
+
+    The longest matching prefix picks the limit (and the bucket), falling
+    back to "*". Refused requests get 429 with Retry-After before routing,
+    body parsing or any upstream call.
+    """
+
+    def __init__(
+        self,
+        app,
+        limits: Optional[Dict[str, RateLimit]] = None,
+        backend=None,
+        exempt: Iterable[str] = EXEMPT_PATHS,
+        trusted_proxies: int = TRUSTED_PROXIES
+    ):
+        self.app = app
+        limits = load_rate_limits_from_env() if limits is None else dict(limits)
+        self.default = limits.pop("*", None)
+        # Longest prefix first
+        self.rules = sorted(limits.items(), key=lambda item: len(item[0]), reverse=True)
+        self.backend = backend or LocalBuckets()
+        self.exempt = frozenset(exempt)
+        self.trusted_proxies = trusted_proxies
+
+    def match(self, path: str) -> Tuple[str, Optional[RateLimit]]:
+        for prefix, limit in self.rules:
+            if path.startswith(prefix):
+                return prefix, limit
+        return "*", self.default
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt:
+            await self.app(scope, receive, send)
+            return
+        prefix, limit = self.match(scope["path"])
+        if limit is not None:
+            wait = await self.backend.acquire((prefix, client_address(scope, self.trusted_proxies)), limit)
+            if wait:
+                response = JSONResponse(
+                    {"detail": "Too many requests"},
+                    status_code=429,
+                    headers={"Retry-After": str(max(1, math.ceil(wait)))}
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
@@ -0,0 +1,111 @@
+"""
+Gateway response cache
+Short-lived LRU of upstream GET responses, each kept with its compressed
+variants so a popular listing is compressed once rather than per request
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+from starlette.responses import Response
+
+from .middleware.compression import COMPRESS_MIN_SIZE, compress
+
+
+GATEWAY_CACHE_SIZE = int(os.getenv("GATEWAY_CACHE_SIZE", "512"))
+GATEWAY_CACHE_TTL = float(os.getenv("GATEWAY_CACHE_TTL", "10"))
+
+# Cached bodies are compressed once, so they can afford the top levels
+CACHE_LEVELS: Dict[str, int] = {
+    "gzip": int(os.getenv("GATEWAY_CACHE_GZIP_LEVEL", "9")),
+    "br": int(os.getenv("GATEWAY_CACHE_BROTLI_QUALITY", "9")),
+}
+
+
+class CachedResponse:
+    """An upstream body plus its lazily built compressed variants"""
+
+    __slots__ = ("body", "media_type", "expires", "_encoded")
+
+    def __init__(self, body: bytes, media_type: str, expires: float):
+        self.body = body
+        self.media_type = media_type
+        self.expires = expires
+        self._encoded: Dict[str, bytes] = {}
+
+    def encoded(self, encoding: str) -> bytes:
+        body = self._encoded.get(encoding)
+        if body is None:
+            body = self._encoded[encoding] = compress(self.body, encoding, CACHE_LEVELS.get(encoding))
+        return body
+
+    def response(self, encoding: Optional[str], minimum_size: int = COMPRESS_MIN_SIZE) -> Response:
+        """Response in the negotiated encoding (None or a small body: identity)"""
+        headers = {"vary": "Accept-Encoding"}
+        if encoding is None or len(self.body) < minimum_size:
+            return Response(self.body, media_type=self.media_type, headers=headers)
+        headers["content-encoding"] = encoding
+        return Response(self.encoded(encoding), media_type=self.media_type, headers=headers)
+
+
+class ResponseCache:
+    """
+    LRU of CachedResponse keyed by (route, url, params)
+
+    Entries expire after `ttl` seconds; the product change feed can drop
+    them sooner (discard_where). size=0 disables caching. The gateway runs
+    on a single event loop, so no locking is needed.
+    """
+
+    def __init__(
+        self,
+        size: int = GATEWAY_CACHE_SIZE,
+        ttl: float = GATEWAY_CACHE_TTL,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.size = size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0 and self.ttl > 0
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires > self._clock():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        if entry is not None:
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, body: bytes, media_type: str) -> CachedResponse:
+        """Store a body and return its entry (not stored when caching is disabled)"""
+        entry = CachedResponse(body, media_type, self._clock() + self.ttl)
+        if not self.enabled:
+            return entry
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+        return entry
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches; returns how many were dropped"""
+        stale = [key for key in self._entries if predicate(key)]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
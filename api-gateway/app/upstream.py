@@ -0,0 +1,322 @@
+"""
+Upstream client for API Gateway
+Retries idempotent calls with jittered backoff and optional hedged requests
+"""
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Deque, Dict, Mapping, Optional
+
+import httpx
+
+from shared.metrics import REGISTRY
+from shared.tracing import tracer
+
+
+# Only these methods are safe to send more than once
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Other methods may be resent when they carry this header (the service dedupes them)
+IDEMPOTENCY_HEADER = "idempotency-key"
+
+# Upstream statuses that usually clear up on their own
+RETRYABLE_STATUS_CODES = frozenset({502, 503, 504})
+
+UPSTREAM_LATENCY = REGISTRY.histogram(
+    "upstream_request_duration_seconds",
+    "Latency of each attempt from the gateway to a backend service",
+    ("route", "status")
+)
+
+
+def _connection_events(span):
+    """httpcore trace hook recording connection setup and I/O phases on a span"""
+    async def hook(event_name: str, info: dict) -> None:
+        span.add_event(event_name)
+    return hook
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Retry and hedging settings for a single gateway route
+
+    max_attempts counts the first try, so 1 disables retries.
+    Hedging sends a second copy of a slow request once it has been
+    outstanding for longer than the route's observed hedge_quantile latency.
+    """
+    max_attempts: int = 3
+    base_delay: float = 0.05
+    max_delay: float = 1.0
+    timeout: float = 10.0
+    hedge: bool = False
+    hedge_quantile: float = 0.95
+    hedge_min_delay: float = 0.005
+    hedge_default_delay: float = 0.25
+
+    def backoff(self, retry_number: int) -> float:
+        """Full-jitter exponential backoff before the given retry (1-based)"""
+        cap = min(self.max_delay, self.base_delay * (2 ** (retry_number - 1)))
+        return random.uniform(0, cap)
+
+
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+# Route name -> policy. Catalog reads are cheap and retried quickly; cart
+# writes and login (POSTs, only retried with an Idempotency-Key) get one
+# retry after a longer pause, since a failure there is often the service
+# itself struggling rather than one bad connection
+DEFAULT_ROUTE_POLICIES: Dict[str, RetryPolicy] = {
+    "products.list": RetryPolicy(max_attempts=3, base_delay=0.02, max_delay=0.5),
+    "products.get": RetryPolicy(max_attempts=3, base_delay=0.02, max_delay=0.5),
+    "products.search": RetryPolicy(max_attempts=3, base_delay=0.05, max_delay=0.5),
+    "cart.get": RetryPolicy(max_attempts=3, base_delay=0.05, max_delay=1.0),
+    "cart.count": RetryPolicy(max_attempts=2, base_delay=0.05, max_delay=0.5),
+    "cart.add": RetryPolicy(max_attempts=2, base_delay=0.1, max_delay=1.0),
+    "auth.login": RetryPolicy(max_attempts=2, base_delay=0.25, max_delay=1.0),
+}
+
+
+def load_route_policies_from_env() -> Dict[str, RetryPolicy]:
+    """
+    Defaults plus GATEWAY_RETRY_POLICIES, a JSON object of route -> RetryPolicy fields
+    e.g. GATEWAY_RETRY_POLICIES='{"cart.add": {"max_attempts": 3, "base_delay": 0.2}}'
+    GATEWAY_RETRY_ATTEMPTS, if set, replaces max_attempts of every default
+    first; GATEWAY_HEDGE_ROUTES=products.list,products.get turns on hedging.
+    """
+    policies = dict(DEFAULT_ROUTE_POLICIES)
+    attempts = os.getenv("GATEWAY_RETRY_ATTEMPTS")
+    if attempts:
+        policies = {name: replace(policy, max_attempts=int(attempts)) for name, policy in policies.items()}
+    raw = os.getenv("GATEWAY_RETRY_POLICIES")
+    if raw:
+        for name, spec in json.loads(raw).items():
+            policies[name] = replace(policies.get(name, RetryPolicy()), **spec)
+    for name in os.getenv("GATEWAY_HEDGE_ROUTES", "").split(","):
+        if name.strip():
+            policies[name.strip()] = replace(policies.get(name.strip(), RetryPolicy()), hedge=True)
+    return policies
+
+
+class RetryBudget:
+    """
+    Caps retries and hedges to a fraction of recent traffic
+
+    Every request deposits `ratio` tokens and every extra attempt withdraws
+    one, so during an outage retries add at most `ratio` extra load.
+    A small time-based refill keeps retries available at low traffic.
+    """
+
+    def __init__(
+        self,
+        ratio: float = 0.2,
+        min_per_second: float = 5.0,
+        max_tokens: float = 50.0
+    ):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.max_tokens, self._tokens + elapsed * self.min_per_second)
+
+    def deposit(self) -> None:
+        """Credit the budget for one original request"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        """Spend one token for a retry or hedge; False if the budget is exhausted"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def tokens(self) -> float:
+        return self._tokens
+
+
+class LatencyWindow:
+    """
+    Sliding window of recent successful latencies for one route
+    Quantiles are recomputed every `refresh_every` samples, not per request
+    """
+
+    def __init__(self, size: int = 256, refresh_every: int = 32):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._refresh_every = refresh_every
+        self._since_refresh = 0
+        self._cached: Dict[float, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self._since_refresh += 1
+        if self._since_refresh >= self._refresh_every:
+            self._since_refresh = 0
+            self._cached.clear()
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Return the q-quantile of the window, or None while it is empty"""
+        if not self._samples:
+            return None
+        if q not in self._cached:
+            ordered = sorted(self._samples)
+            index = min(len(ordered) - 1, int(q * len(ordered)))
+            self._cached[q] = ordered[index]
+        return self._cached[q]
+
+
+class UpstreamClient:
+    """
+    Sends proxied requests to backend services
+
+    Routes are looked up by name in `policies`; unknown routes and
+    non-idempotent methods without an Idempotency-Key are sent exactly once.
+    """
+
+    def __init__(
+        self,
+        policies: Optional[Dict[str, RetryPolicy]] = None,
+        budget: Optional[RetryBudget] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        min_hedge_samples: int = 20
+    ):
+        self.policies = policies or {}
+        self.budget = budget or RetryBudget()
+        self.transport = transport
+        self.min_hedge_samples = min_hedge_samples
+        self._latency: Dict[str, LatencyWindow] = {}
+        # Building an SSL context costs ~30ms; share one across per-request clients
+        self._ssl_context = httpx.create_ssl_context()
+
+    def policy_for(self, route: str, method: str, headers: Optional[Mapping[str, str]] = None) -> RetryPolicy:
+        if method.upper() not in IDEMPOTENT_METHODS and not any(
+            name.lower() == IDEMPOTENCY_HEADER for name in headers or ()
+        ):
+            return NO_RETRY
+        return self.policies.get(route, NO_RETRY)
+
+    def latency(self, route: str) -> LatencyWindow:
+        window = self._latency.get(route)
+        if window is None:
+            window = self._latency[route] = LatencyWindow()
+        return window
+
+    def hedge_delay(self, route: str, policy: RetryPolicy) -> float:
+        """Delay before hedging: the route's observed quantile once warmed up"""
+        window = self.latency(route)
+        if len(window) < self.min_hedge_samples:
+            return policy.hedge_default_delay
+        return max(policy.hedge_min_delay, window.quantile(policy.hedge_quantile))
+
+    async def get(self, route: str, url: str, **kwargs) -> httpx.Response:
+        return await self.request(route, "GET", url, **kwargs)
+
+    async def request(self, route: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Send a request, retrying transient failures according to the route policy
+
+        Returns the last upstream response (which may still be a 5xx) so
+        callers keep their existing raise_for_status() handling.
+        Raises httpx.TransportError if the final attempt could not connect.
+        """
+        policy = self.policy_for(route, method, kwargs.get("headers"))
+        kwargs.setdefault("timeout", policy.timeout)
+        self.budget.deposit()
+
+        async with httpx.AsyncClient(transport=self.transport, verify=self._ssl_context) as client:
+            attempt = 1
+            while True:
+                try:
+                    response = await self._send(client, route, policy, method, url, kwargs)
+                except httpx.TransportError:
+                    if attempt >= policy.max_attempts or not self.budget.try_withdraw():
+                        raise
+                else:
+                    if (
+                        response.status_code not in RETRYABLE_STATUS_CODES
+                        or attempt >= policy.max_attempts
+                        or not self.budget.try_withdraw()
+                    ):
+                        return response
+
+                await asyncio.sleep(policy.backoff(attempt))
+                attempt += 1
+
+    async def _send_once(
+        self,
+        client: httpx.AsyncClient,
+        route: str,
+        method: str,
+        url: str,
+        kwargs: dict
+    ) -> httpx.Response:
+        with tracer.span(f"upstream {route}", http_method=method) as span:
+            # Each attempt (and hedge) carries its own span id downstream
+            send_kwargs = dict(kwargs)
+            send_kwargs["headers"] = tracer.inject(dict(kwargs.get("headers") or {}))
+            if span.sampled:
+                send_kwargs["extensions"] = {"trace": _connection_events(span)}
+
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **send_kwargs)
+            except httpx.TransportError:
+                UPSTREAM_LATENCY.observe(time.perf_counter() - started, route, "error")
+                raise
+            elapsed = time.perf_counter() - started
+            UPSTREAM_LATENCY.observe(elapsed, route, str(response.status_code))
+            span.set_attribute("http.status_code", response.status_code)
+            if response.status_code < 500:
+                self.latency(route).record(elapsed)
+            return response
+
+    async def _send(
+        self,
+        client: httpx.AsyncClient,
+        route: str,
+        policy: RetryPolicy,
+        method: str,
+        url: str,
+        kwargs: dict
+    ) -> httpx.Response:
+        """Send one logical attempt, hedging it if the policy allows"""
+        if not policy.hedge:
+            return await self._send_once(client, route, method, url, kwargs)
+
+        primary = asyncio.ensure_future(self._send_once(client, route, method, url, kwargs))
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay(route, policy))
+        if done or not self.budget.try_withdraw():
+            return await primary
+
+        hedge = asyncio.ensure_future(self._send_once(client, route, method, url, kwargs))
+        pending = {primary, hedge}
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result().status_code not in RETRYABLE_STATUS_CODES:
+                        return task.result()
+                if not pending:
+                    # Both copies failed; surface the last one to the retry loop
+                    return done.pop().result()
+        finally:
+            for task in pending:
+                task.cancel()
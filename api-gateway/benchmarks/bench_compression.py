@@ -0,0 +1,131 @@
+"""
+Response compression benchmark
+Bytes and CPU per encoding/level for a product listing body, and the
+per-request cost of compressing on the fly vs serving a cached
+pre-compressed entry (bare ASGI app, no network)
+
+Run from api-gateway/:  python -m benchmarks.bench_compression --products 100
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import List
+
+from app.middleware.compression import ENCODINGS, CompressionMiddleware, compress
+from app.response_cache import ResponseCache
+
+LEVELS = {"gzip": (1, 3, 5, 6, 9), "br": (1, 4, 6, 9, 11)}
+
+
+def listing(count: int) -> bytes:
+    """A /products page shaped like the product service's rows"""
+    rng = random.Random(7)
+    words = "durable lightweight premium wireless compact ergonomic stainless waterproof".split()
+    rows = [
+        {
+            "id": f"prod_{i:06d}",
+            "name": f"{rng.choice(words).title()} Product {i}",
+            "description": " ".join(rng.choice(words) for _ in range(60)),
+            "price": round(rng.uniform(5, 500), 2),
+            "category": rng.choice(["Electronics", "Home", "Sports", "Books"]),
+            "image_url": f"https://cdn.example.com/images/products/{i:06d}/main-800x800.jpg",
+            "rating": round(rng.uniform(1, 5), 1),
+            "stock": rng.randint(0, 500),
+            "rank": i + 1,
+            "ranking_score": round(rng.random(), 6),
+        }
+        for i in range(count)
+    ]
+    return json.dumps(rows, separators=(",", ":")).encode()
+
+
+def best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+async def _receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def _send(message):
+    pass
+
+
+async def _drive(app, iterations: int) -> float:
+    scope = {
+        "type": "http", "method": "GET", "path": "/products",
+        "headers": [(b"accept-encoding", b"gzip, deflate, br")],
+    }
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await app(dict(scope), _receive, _send)
+    return time.perf_counter() - started
+
+
+def per_request(body: bytes, iterations: int) -> dict:
+    async def endpoint(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": body})
+
+    cache = ResponseCache(size=1, ttl=3600)
+    cache.put("listing", body, "application/json")
+    encoding = ENCODINGS[0]
+
+    async def cached(scope, receive, send):
+        await cache.get("listing").response(encoding)(scope, receive, send)
+
+    async def measure():
+        results = {}
+        for name, app in (("identity", endpoint), ("compress_per_request", CompressionMiddleware(endpoint)),
+                          ("precompressed_cache_hit", CompressionMiddleware(cached))):
+            await _drive(app, 10)
+            results[name] = round(min([await _drive(app, iterations) for _ in range(3)]) / iterations * 1e6, 1)
+        return results
+
+    return asyncio.run(measure())
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=100, help="rows in the listing body")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    body = listing(args.products)
+    encodings = {}
+    for encoding in ENCODINGS:
+        for level in LEVELS[encoding]:
+            encoded = compress(body, encoding, level)
+            seconds = best_of(lambda: compress(body, encoding, level), args.repeat)
+            encodings[f"{encoding}-{level}"] = {
+                "bytes": len(encoded),
+                "ratio": round(len(body) / len(encoded), 2),
+                "compress_ms": round(seconds * 1000, 3),
+                "mb_per_second": round(len(body) / seconds / 1e6, 1),
+            }
+
+    report = json.dumps({
+        "benchmark": "compression",
+        "products": args.products,
+        "identity_bytes": len(body),
+        "encodings": encodings,
+        "us_per_request": per_request(body, args.iterations),
+    }, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Metrics middleware overhead benchmark
+Drives a bare ASGI app with and without MetricsMiddleware, no network involved
+
+Run from api-gateway/:  python -m benchmarks.bench_metrics
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import app  # noqa: F401  (puts shared/ on sys.path)
+from shared.metrics import MetricsMiddleware, MetricsRegistry
+
+
+class _Route:
+    path = "/products/{product_id}"
+
+
+async def _endpoint(scope, receive, send):
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def _receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def _send(message):
+    pass
+
+
+async def _drive(app, iterations: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/products/prod_001"}
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await app(dict(scope), _receive, _send)
+    return time.perf_counter() - started
+
+
+def run(iterations: int) -> dict:
+    instrumented = MetricsMiddleware(_endpoint, registry=MetricsRegistry())
+
+    async def measure():
+        # Warm up both paths before timing
+        await _drive(_endpoint, 1000)
+        await _drive(instrumented, 1000)
+        bare = min([await _drive(_endpoint, iterations) for _ in range(5)])
+        wrapped = min([await _drive(instrumented, iterations) for _ in range(5)])
+        return bare, wrapped
+
+    bare, wrapped = asyncio.run(measure())
+    return {
+        "iterations": iterations,
+        "bare_us_per_request": bare / iterations * 1e6,
+        "instrumented_us_per_request": wrapped / iterations * 1e6,
+        "overhead_us_per_request": (wrapped - bare) / iterations * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=100_000)
+    parser.add_argument("--max-overhead-us", type=float, default=5.0)
+    args = parser.parse_args()
+
+    result = run(args.iterations)
+    print(json.dumps(result, indent=2))
+    if result["overhead_us_per_request"] > args.max_overhead_us:
+        raise SystemExit(f"metrics overhead above {args.max_overhead_us}us per request")
+
+
+if __name__ == "__main__":
+    main()
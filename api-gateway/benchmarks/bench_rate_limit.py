@@ -0,0 +1,86 @@
+"""
+Rate limiter overhead benchmark
+Drives a bare ASGI app with and without RateLimitMiddleware (local buckets,
+and shared buckets on the in-memory store stand-in), no network involved
+
+Run from api-gateway/:  python -m benchmarks.bench_rate_limit
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+
+from app.middleware.rate_limit import (
+    DEFAULT_RATE_LIMITS, LocalBuckets, MemoryBucketStore, RateLimit, RateLimitMiddleware, SharedBuckets
+)
+
+
+async def _endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def _receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def _send(message):
+    pass
+
+
+async def _drive(app, iterations: int, clients: int) -> float:
+    scopes = [
+        {"type": "http", "method": "GET", "path": "/products/search/usb", "headers": [],
+         "client": (f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", 50000)}
+        for i in range(clients)
+    ]
+    started = time.perf_counter()
+    for i in range(iterations):
+        await app(dict(scopes[i % clients]), _receive, _send)
+    return time.perf_counter() - started
+
+
+def run(iterations: int, clients: int) -> dict:
+    # Generous limits: measure the bookkeeping, not the 429 path
+    limits = {prefix: RateLimit(rate=1e9, burst=10 ** 9) for prefix in DEFAULT_RATE_LIMITS}
+    apps = {
+        "bare": _endpoint,
+        "local": RateLimitMiddleware(_endpoint, limits, backend=LocalBuckets()),
+        "shared_stand_in": RateLimitMiddleware(_endpoint, limits, backend=SharedBuckets(MemoryBucketStore())),
+    }
+
+    async def measure():
+        results = {}
+        for name, app in apps.items():
+            await _drive(app, 1000, clients)
+            results[name] = min([await _drive(app, iterations, clients) for _ in range(5)]) / iterations * 1e6
+        return results
+
+    us = asyncio.run(measure())
+    return {
+        "iterations": iterations,
+        "clients": clients,
+        "us_per_request": {name: round(value, 3) for name, value in us.items()},
+        "overhead_us_per_request": {
+            name: round(value - us["bare"], 3) for name, value in us.items() if name != "bare"
+        },
+    }
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=100_000)
+    parser.add_argument("--clients", type=int, default=10_000, help="distinct client addresses")
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    report = json.dumps(run(args.iterations, args.clients), indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Storefront composite benchmark
+Page-load time of the separate calls a page used to make (/products,
+/cart/count, /auth/verify, one after another) vs one /storefront call,
+against in-process service stand-ins with fixed latencies
+
+Run from api-gateway/:  python -m benchmarks.bench_storefront --products-ms 40 --cart-ms 25 --auth-ms 15
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import List
+
+import httpx
+import jwt
+from fastapi import FastAPI
+
+from app import main as gateway
+from app.middleware.auth import JWT_ALGORITHM, JWT_SECRET
+from app.middleware.rate_limit import RateLimitMiddleware
+from app.response_cache import ResponseCache
+from app.upstream import UpstreamClient
+
+
+def stand_in(products_ms: float, cart_ms: float, auth_ms: float) -> FastAPI:
+    service = FastAPI()
+
+    @service.get("/products")
+    async def products():
+        await asyncio.sleep(products_ms / 1000)
+        return [{"id": f"prod_{i:03d}"} for i in range(24)]
+
+    @service.get("/cart/count")
+    async def count():
+        await asyncio.sleep(cart_ms / 1000)
+        return {"count": 3}
+
+    @service.post("/auth/verify")
+    async def verify():
+        await asyncio.sleep(auth_ms / 1000)
+        return {"valid": True, "user_id": "user_001"}
+
+    return service
+
+
+async def measure(requests: int, token: str) -> dict:
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=gateway.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as client:
+        async def separate():
+            await client.get("/products", params={"limit": 24})
+            await client.get("/cart/count", headers=headers)
+            await client.post("/auth/verify", json={"token": token})
+
+        async def composite():
+            await client.get("/storefront", headers=headers)
+
+        results = {}
+        for name, page in (("separate_calls", separate), ("storefront", composite)):
+            await page()
+            timings = []
+            for _ in range(requests):
+                started = time.perf_counter()
+                await page()
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = {"median_ms": round(statistics.median(timings), 2), "max_ms": round(max(timings), 2)}
+        return results
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products-ms", type=float, default=40)
+    parser.add_argument("--cart-ms", type=float, default=25)
+    parser.add_argument("--auth-ms", type=float, default=15)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    gateway.upstream = UpstreamClient(
+        transport=httpx.ASGITransport(app=stand_in(args.products_ms, args.cart_ms, args.auth_ms))
+    )
+    # Measure the fan-out, not cache hits
+    gateway.response_cache = ResponseCache(size=0)
+    # Every request comes from one address; the per-client limit is not what is measured
+    gateway.app.user_middleware = [m for m in gateway.app.user_middleware if m.cls is not RateLimitMiddleware]
+    token = jwt.encode({"user_id": "user_001", "email": "demo@example.com", "name": "Demo"}, JWT_SECRET,
+                       algorithm=JWT_ALGORITHM)
+
+    report = json.dumps({
+        "benchmark": "storefront",
+        "dependency_ms": {"products": args.products_ms, "cart": args.cart_ms, "auth": args.auth_ms},
+        "page_load": asyncio.run(measure(args.requests, token)),
+    }, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import gzip
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+
+from app import main
+from app.middleware import compression
+from app.middleware.compression import CompressionMiddleware, negotiate
+from app.response_cache import ResponseCache
+from app.upstream import RetryPolicy, UpstreamClient
+
+
+LISTING = [{"id": f"prod_{i:03d}", "description": "Long product description " * 8} for i in range(50)]
+
+
+@pytest.mark.parametrize("header,expected", [
+    (None, None),
+    ("", None),
+    ("gzip, deflate", "gzip"),
+    ("gzip;q=0", None),
+    ("identity", None),
+    ("*", compression.ENCODINGS[0]),
+    ("br;q=0.2, gzip;q=0.8", "gzip"),
+])
+def test_negotiate(header, expected):
+    assert negotiate(header) == expected
+
+
+def make_app(body: str):
+    app = FastAPI()
+
+    @app.get("/text")
+    def text():
+        return PlainTextResponse(body)
+
+    return CompressionMiddleware(app, minimum_size=100, available=("gzip",))
+
+
+def test_middleware_compresses_large_bodies_only():
+    client = TestClient(make_app("x" * 1000))
+    large = client.get("/text", headers={"Accept-Encoding": "gzip"})
+    small = TestClient(make_app("x" * 10)).get("/text", headers={"Accept-Encoding": "gzip"})
+    plain = client.get("/text", headers={"Accept-Encoding": "identity"})
+
+    assert large.headers["content-encoding"] == "gzip"
+    assert large.headers["vary"] == "Accept-Encoding"
+    assert int(large.headers["content-length"]) < 100
+    assert large.text == "x" * 1000
+    assert "content-encoding" not in small.headers
+    assert "content-encoding" not in plain.headers
+
+
+@pytest.fixture
+def product_service(monkeypatch):
+    service = FastAPI()
+    service.state.calls = 0
+
+    @service.get("/products")
+    def products():
+        service.state.calls += 1
+        return LISTING
+
+    @service.get("/products/{product_id}")
+    def product(product_id: str):
+        service.state.calls += 1
+        return {"id": product_id}
+
+    monkeypatch.setattr(main, "upstream", UpstreamClient(
+        policies={"products.list": RetryPolicy()}, transport=httpx.ASGITransport(app=service)
+    ))
+    monkeypatch.setattr(main, "response_cache", ResponseCache(size=16, ttl=60))
+    return service
+
+
+def test_listing_is_cached_and_compressed_once(product_service, monkeypatch):
+    compressed = []
+    original = compression.compress
+    monkeypatch.setattr("app.response_cache.compress", lambda *args: compressed.append(args) or original(*args))
+    client = TestClient(main.app)
+
+    responses = [
+        client.get("/products", headers={"Accept-Encoding": "gzip"}) for _ in range(3)
+    ] + [client.get("/products", headers={"Accept-Encoding": "identity"})]
+
+    assert product_service.state.calls == 1
+    assert len(compressed) == 1
+    assert all(response.json() == LISTING for response in responses)
+    assert responses[0].headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in responses[-1].headers
+    # Pre-compressed at the cache level, not re-encoded by the middleware
+    entry = main.response_cache.get(("products.list", f"{main.PRODUCT_SERVICE_URL}/products", ()))
+    assert gzip.decompress(entry.encoded("gzip")) == entry.body
+
+
+def test_change_events_drop_affected_entries(product_service):
+    client = TestClient(main.app)
+    client.get("/products")
+    client.get("/products/prod_001")
+    client.get("/products/prod_002")
+
+    main.drop_changed_products([{"type": "upsert", "product_id": "prod_001", "changes": {}}])
+
+    assert [key[1].rsplit("/", 1)[-1] for key in main.response_cache._entries] == ["prod_002"]
+
+
+def test_entries_expire_after_ttl():
+    now = [0.0]
+    cache = ResponseCache(size=4, ttl=10, clock=lambda: now[0])
+    cache.put("key", b"{}", "application/json")
+
+    assert cache.get("key") is not None
+    now[0] = 10.0
+    assert cache.get("key") is None
+    assert len(cache) == 0
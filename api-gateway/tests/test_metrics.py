@@ -0,0 +1,58 @@
+import asyncio
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app import main
+from app.upstream import UPSTREAM_LATENCY, UpstreamClient
+from shared.metrics import Histogram, MetricsRegistry
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "test", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, "/x")
+
+    samples = histogram.samples()
+
+    assert 'latency_seconds_bucket{route="/x",le="0.1"} 2' in samples
+    assert 'latency_seconds_bucket{route="/x",le="1.0"} 3' in samples
+    assert 'latency_seconds_bucket{route="/x",le="+Inf"} 4' in samples
+    assert 'latency_seconds_count{route="/x"} 4' in samples
+
+
+def test_registry_renders_help_and_type():
+    registry = MetricsRegistry()
+    registry.counter("jobs_total", "Jobs processed").inc()
+
+    text = registry.render()
+
+    assert "# HELP jobs_total Jobs processed" in text
+    assert "# TYPE jobs_total counter" in text
+    assert "jobs_total 1" in text
+
+
+def test_metrics_endpoint_reports_route_templates():
+    client = TestClient(main.app)
+    client.get("/")
+    client.get("/does-not-exist")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_requests_total{method="GET",route="/",status="200"}' in response.text
+    assert 'route="unmatched",status="404"' in response.text
+    assert 'route="/metrics"' not in response.text
+
+
+def test_upstream_calls_are_timed():
+    async def handler(request):
+        return httpx.Response(200, json={})
+
+    upstream = UpstreamClient(transport=httpx.MockTransport(handler))
+    before = UPSTREAM_LATENCY.count("test.route", "200")
+
+    asyncio.run(upstream.get("test.route", "http://service/"))
+
+    assert UPSTREAM_LATENCY.count("test.route", "200") == before + 1
@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.middleware.rate_limit import (
+    DEFAULT_RATE_LIMITS, LocalBuckets, MemoryBucketStore, RateLimit, RateLimitMiddleware, SharedBuckets, client_address
+)
+
+
+def test_bucket_allows_burst_then_refills():
+    now = [0.0]
+    buckets = LocalBuckets(clock=lambda: now[0])
+    limit = RateLimit(rate=1, burst=3)
+
+    async def take():
+        return await buckets.acquire(("/x", "client"), limit)
+
+    waits = [asyncio.run(take()) for _ in range(4)]
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert waits[3] == pytest.approx(1.0)
+
+    now[0] = 1.0
+    assert asyncio.run(take()) == 0.0
+    assert asyncio.run(take()) > 0
+
+
+def test_full_buckets_are_swept():
+    now = [0.0]
+    buckets = LocalBuckets(max_keys=10, clock=lambda: now[0])
+    limit = RateLimit(rate=1, burst=1)
+
+    async def fill(count):
+        for i in range(count):
+            await buckets.acquire(("/x", f"client-{i}"), limit)
+
+    asyncio.run(fill(10))
+    now[0] = 5.0
+    asyncio.run(fill(1))
+    asyncio.run(buckets.acquire(("/x", "late"), limit))
+
+    assert len(buckets) == 2
+
+
+def make_client(backend=None, **kwargs):
+    app = FastAPI()
+
+    @app.post("/auth/login")
+    def login():
+        return {"token": "t"}
+
+    @app.get("/products/search/{query}")
+    def search(query: str):
+        return []
+
+    @app.get("/")
+    def root():
+        return {}
+
+    limits = {"/auth/login": RateLimit(rate=0.01, burst=2), "*": RateLimit(rate=1000, burst=1000)}
+    return TestClient(RateLimitMiddleware(app, limits, backend=backend, **kwargs))
+
+
+def test_login_is_limited_per_client_with_retry_after():
+    client = make_client()
+
+    statuses = [client.post("/auth/login").status_code for _ in range(3)]
+    refused = client.post("/auth/login")
+
+    assert statuses == [200, 200, 429]
+    assert refused.json() == {"detail": "Too many requests"}
+    assert int(refused.headers["retry-after"]) == 100
+    # Other routes and exempt paths have their own buckets
+    assert client.get("/products/search/usb").status_code == 200
+    assert client.get("/").status_code == 200
+
+
+def test_forwarded_clients_have_separate_buckets():
+    client = make_client(trusted_proxies=1)
+
+    for _ in range(2):
+        client.post("/auth/login", headers={"X-Forwarded-For": "10.0.0.1"})
+
+    assert client.post("/auth/login", headers={"X-Forwarded-For": "10.0.0.1"}).status_code == 429
+    assert client.post("/auth/login", headers={"X-Forwarded-For": "10.0.0.2"}).status_code == 200
+    # A client-supplied hop in front of the one our proxy appended changes nothing
+    assert client.post("/auth/login", headers={"X-Forwarded-For": "1.2.3.4, 10.0.0.1"}).status_code == 429
+
+
+def test_guest_sessions_are_limited_per_client_by_default():
+    app = FastAPI()
+
+    @app.post("/cart/guest")
+    def guest():
+        return {"guest_session": "s"}
+
+    client = TestClient(RateLimitMiddleware(app, DEFAULT_RATE_LIMITS))
+    burst = DEFAULT_RATE_LIMITS["/cart/guest"].burst
+
+    statuses = [client.post("/cart/guest").status_code for _ in range(burst + 1)]
+
+    assert statuses == [200] * burst + [429]
+
+
+def test_client_address_counts_trusted_proxies_from_the_right():
+    scope = {"client": ("192.168.0.9", 1234), "headers": [(b"x-forwarded-for", b"6.6.6.6, 203.0.113.7, 10.0.0.5")]}
+
+    assert client_address(scope) == "192.168.0.9"
+    assert client_address(scope, trusted_proxies=1) == "10.0.0.5"
+    assert client_address(scope, trusted_proxies=2) == "203.0.113.7"
+    assert client_address(scope, trusted_proxies=5) == "6.6.6.6"
+
+
+def test_shared_store_enforces_one_limit_across_replicas():
+    store = MemoryBucketStore()
+    replicas = [make_client(backend=SharedBuckets(store)) for _ in range(2)]
+
+    statuses = [replicas[i % 2].post("/auth/login").status_code for i in range(4)]
+
+    assert statuses == [200, 200, 429, 429]
+
+
+def test_shared_store_failure_lets_requests_through():
+    class BrokenStore:
+        async def get(self, key):
+            raise ConnectionError("store down")
+
+    client = make_client(backend=SharedBuckets(BrokenStore()))
+
+    assert [client.post("/auth/login").status_code for _ in range(3)] == [200, 200, 200]
@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import httpx
+import jwt
+import pytest
+from fastapi import FastAPI, Header
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from app import main
+from app.middleware.auth import JWT_ALGORITHM, JWT_SECRET
+from app.response_cache import ResponseCache
+from app.upstream import UpstreamClient
+
+TOKEN = jwt.encode(
+    {"user_id": "user_001", "email": "demo@example.com", "name": "Demo User"}, JWT_SECRET, algorithm=JWT_ALGORITHM
+)
+
+
+@pytest.fixture
+def services(monkeypatch):
+    """Product and cart stand-ins that each take 0.2s"""
+    service = FastAPI()
+    service.state.cart_status = 200
+    service.state.seen = {}
+
+    @service.get("/products")
+    async def products(limit: int):
+        service.state.seen["limit"] = limit
+        await asyncio.sleep(0.2)
+        return [{"id": "prod_001"}]
+
+    @service.get("/cart/count")
+    async def count(authorization: str = Header(None)):
+        service.state.seen["authorization"] = authorization
+        await asyncio.sleep(0.2)
+        if service.state.cart_status != 200:
+            return JSONResponse(status_code=service.state.cart_status, content={"detail": "down"})
+        return {"count": 3}
+
+    monkeypatch.setattr(main, "upstream", UpstreamClient(transport=httpx.ASGITransport(app=service)))
+    monkeypatch.setattr(main, "response_cache", ResponseCache(size=16, ttl=60))
+    return service
+
+
+def test_signed_in_page_fans_out_concurrently(services):
+    client = TestClient(main.app)
+
+    started = time.perf_counter()
+    response = client.get("/storefront", headers={"Authorization": f"Bearer {TOKEN}"})
+    elapsed = time.perf_counter() - started
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "products": [{"id": "prod_001"}],
+        "cart_count": {"count": 3},
+        "user": {"user_id": "user_001", "email": "demo@example.com", "name": "Demo User"},
+        "errors": {},
+    }
+    assert services.state.seen == {"limit": main.STOREFRONT_PAGE_SIZE, "authorization": f"Bearer {TOKEN}"}
+    # Both dependencies take 0.2s; sequential calls would take 0.4s
+    assert elapsed < 0.35
+
+
+def test_failed_part_is_reported_not_fatal(services):
+    services.state.cart_status = 500
+
+    response = TestClient(main.app).get("/storefront", headers={"Authorization": f"Bearer {TOKEN}"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["products"] == [{"id": "prod_001"}]
+    assert body["cart_count"] is None
+    assert body["errors"] == {"cart_count": "upstream returned 500"}
+
+
+def test_slow_part_times_out(services, monkeypatch):
+    monkeypatch.setattr(main, "STOREFRONT_PART_TIMEOUT", 0.05)
+
+    response = TestClient(main.app).get("/storefront")
+
+    assert response.status_code == 502
+    assert response.json()["detail"] == {"errors": {"products": "timed out"}}
+
+
+def test_anonymous_page_skips_cart(services):
+    response = TestClient(main.app).get("/storefront?limit=5")
+
+    assert response.json() == {"products": [{"id": "prod_001"}], "cart_count": None, "user": None, "errors": {}}
+    assert services.state.seen == {"limit": 5}
+
+
+def test_invalid_token_is_rejected(services):
+    response = TestClient(main.app).get("/storefront", headers={"Authorization": "Bearer nope"})
+
+    assert response.status_code == 401
@@ -0,0 +1,89 @@
+import httpx
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.middleware.auth import JWT_ALGORITHM, JWT_SECRET
+from app.upstream import UpstreamClient
+from shared.tracing import (
+    InMemoryExporter,
+    format_traceparent,
+    parse_traceparent,
+    tracer,
+)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    exporter = InMemoryExporter()
+    monkeypatch.setattr(tracer, "exporter", exporter)
+    return exporter
+
+
+@pytest.fixture
+def seen_headers(monkeypatch):
+    """Stand-in cart service that records the headers it receives"""
+    seen = []
+
+    async def handler(request):
+        seen.append(request.headers)
+        return httpx.Response(200, json={"message": "ok"})
+
+    monkeypatch.setattr(main, "upstream", UpstreamClient(transport=httpx.MockTransport(handler)))
+    return seen
+
+
+def auth_headers(**extra):
+    token = jwt.encode({"user_id": "user_001"}, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    return {"Authorization": f"Bearer {token}", **extra}
+
+
+def test_parse_traceparent_round_trip():
+    header = format_traceparent(TRACE_ID, PARENT_ID, True)
+    assert parse_traceparent(header) == (TRACE_ID, PARENT_ID, True)
+    assert parse_traceparent("00-" + "0" * 32 + "-" + PARENT_ID + "-01") is None
+    assert parse_traceparent("garbage") is None
+    assert parse_traceparent(None) is None
+
+
+def test_gateway_propagates_incoming_trace(exporter, seen_headers):
+    incoming = format_traceparent(TRACE_ID, PARENT_ID, True)
+
+    response = TestClient(main.app).post(
+        "/cart/add", json={"product_id": "prod_001"}, headers=auth_headers(traceparent=incoming)
+    )
+
+    assert response.status_code == 200
+    trace_id, upstream_parent, sampled = parse_traceparent(seen_headers[0]["traceparent"])
+    assert trace_id == TRACE_ID
+    assert sampled
+
+    spans = {span.name: span for span in exporter.spans}
+    assert set(spans) == {"auth.jwt_decode", "upstream cart.add", "POST /cart/add"}
+    assert spans["POST /cart/add"].parent_id == PARENT_ID
+    assert spans["upstream cart.add"].span_id == upstream_parent
+    assert spans["upstream cart.add"].parent_id == spans["POST /cart/add"].span_id
+
+
+def test_gateway_starts_new_trace_when_sampled(exporter, seen_headers, monkeypatch):
+    monkeypatch.setattr(tracer, "sample_rate", 1.0)
+
+    TestClient(main.app).get("/cart/count", headers=auth_headers())
+
+    trace_id, _, sampled = parse_traceparent(seen_headers[0]["traceparent"])
+    assert sampled
+    assert {span.trace_id for span in exporter.spans} == {trace_id}
+
+
+def test_unsampled_trace_propagates_without_recording(exporter, seen_headers, monkeypatch):
+    monkeypatch.setattr(tracer, "sample_rate", 0.0)
+
+    TestClient(main.app).get("/cart/count", headers=auth_headers())
+
+    _, _, sampled = parse_traceparent(seen_headers[0]["traceparent"])
+    assert not sampled
+    assert exporter.spans == []
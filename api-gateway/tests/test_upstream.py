@@ -0,0 +1,345 @@
+import asyncio
+
+import httpx
+import jwt
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from app import main
+from app.middleware.auth import JWT_ALGORITHM, JWT_SECRET
+from app.upstream import (
+    DEFAULT_ROUTE_POLICIES, RetryBudget, RetryPolicy, UpstreamClient, load_route_policies_from_env
+)
+
+
+def make_flaky_service(failures: int = 0, slow_first: float = 0.0):
+    """Local stand-in for a backend service that fails or stalls on demand"""
+    service = FastAPI()
+    service.state.calls = 0
+
+    @service.get("/products")
+    async def products():
+        service.state.calls += 1
+        call = service.state.calls
+        if call <= failures:
+            return JSONResponse(status_code=503, content={"detail": "unavailable"})
+        if call == 1 and slow_first:
+            await asyncio.sleep(slow_first)
+        return [{"id": "prod_001", "call": call}]
+
+    @service.get("/cart")
+    async def cart():
+        service.state.calls += 1
+        if service.state.calls <= failures:
+            return JSONResponse(status_code=502, content={"detail": "bad gateway"})
+        return {"user_id": "user_001", "items": []}
+
+    @service.post("/cart/add")
+    async def add():
+        service.state.calls += 1
+        return JSONResponse(status_code=503, content={"detail": "unavailable"})
+
+    return service
+
+
+def client_for(service, **policy):
+    return UpstreamClient(
+        policies={"products.list": RetryPolicy(base_delay=0.001, **policy)},
+        transport=httpx.ASGITransport(app=service),
+    )
+
+
+def test_retries_transient_errors():
+    service = make_flaky_service(failures=2)
+    upstream = client_for(service)
+
+    response = asyncio.run(upstream.get("products.list", "http://product/products"))
+
+    assert response.status_code == 200
+    assert response.json()[0]["call"] == 3
+    assert service.state.calls == 3
+
+
+def test_gives_up_after_max_attempts():
+    service = make_flaky_service(failures=10)
+    upstream = client_for(service, max_attempts=2)
+
+    response = asyncio.run(upstream.get("products.list", "http://product/products"))
+
+    assert response.status_code == 503
+    assert service.state.calls == 2
+
+
+def test_non_idempotent_methods_are_not_retried():
+    service = make_flaky_service()
+    upstream = client_for(service)
+
+    response = asyncio.run(
+        upstream.request("products.list", "POST", "http://cart/cart/add", json={})
+    )
+
+    assert response.status_code == 503
+    assert service.state.calls == 1
+
+
+def test_non_idempotent_methods_with_idempotency_key_are_retried():
+    service = make_flaky_service()
+    upstream = client_for(service, max_attempts=3)
+
+    response = asyncio.run(
+        upstream.request(
+            "products.list", "POST", "http://cart/cart/add", json={}, headers={"Idempotency-Key": "k1"}
+        )
+    )
+
+    assert response.status_code == 503
+    assert service.state.calls == 3
+
+
+def test_gateway_forwards_or_mints_idempotency_keys(monkeypatch):
+    seen = []
+    service = FastAPI()
+
+    @service.post("/cart/add")
+    async def add(request: Request):
+        seen.append(request.headers.get("idempotency-key"))
+        return {"ok": True}
+
+    monkeypatch.setattr(main, "upstream", UpstreamClient(transport=httpx.ASGITransport(app=service)))
+    token = jwt.encode({"user_id": "user_001"}, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    client = TestClient(main.app)
+    item = {"product_id": "prod_001", "product_name": "Headphones", "price": 10.0, "quantity": 1}
+
+    client.post("/cart/add", json=item, headers={"Authorization": f"Bearer {token}", "Idempotency-Key": "client-key"})
+    client.post("/cart/add", json=item, headers={"Authorization": f"Bearer {token}"})
+    client.post("/cart/add", json=item, headers={"Authorization": f"Bearer {token}"})
+
+    assert seen[0] == "client-key"
+    assert seen[1] and seen[2] and seen[1] != seen[2]
+
+
+def test_retry_budget_limits_amplification():
+    service = make_flaky_service(failures=100)
+    upstream = UpstreamClient(
+        policies={"products.list": RetryPolicy(max_attempts=5, base_delay=0.001)},
+        budget=RetryBudget(ratio=0.0, min_per_second=0.0, max_tokens=1),
+        transport=httpx.ASGITransport(app=service),
+    )
+
+    async def run():
+        for _ in range(3):
+            await upstream.get("products.list", "http://product/products")
+
+    asyncio.run(run())
+
+    # Three originals plus the single retry the budget allowed
+    assert service.state.calls == 4
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = RetryPolicy(base_delay=0.1, max_delay=0.3)
+    delays = [policy.backoff(5) for _ in range(200)]
+    assert all(0 <= d <= 0.3 for d in delays)
+    assert len(set(delays)) > 1
+
+
+def test_route_policies_are_set_per_route(monkeypatch):
+    monkeypatch.setenv("GATEWAY_RETRY_POLICIES", '{"cart.add": {"max_attempts": 4, "base_delay": 0.3}, "cart.merge": {}}')
+    monkeypatch.setenv("GATEWAY_HEDGE_ROUTES", "products.get")
+
+    policies = load_route_policies_from_env()
+
+    assert DEFAULT_ROUTE_POLICIES["auth.login"].max_attempts < DEFAULT_ROUTE_POLICIES["products.get"].max_attempts
+    assert (policies["cart.add"].max_attempts, policies["cart.add"].base_delay) == (4, 0.3)
+    assert policies["cart.add"].max_delay == DEFAULT_ROUTE_POLICIES["cart.add"].max_delay
+    assert policies["cart.merge"] == RetryPolicy()
+    assert policies["products.get"].hedge and not policies["products.list"].hedge
+    assert policies["auth.login"] == DEFAULT_ROUTE_POLICIES["auth.login"]
+
+
+def test_hedged_request_cuts_tail_latency():
+    service = make_flaky_service(slow_first=1.0)
+    upstream = client_for(service, hedge=True, hedge_default_delay=0.02)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        response = await upstream.get("products.list", "http://product/products")
+        return response, loop.time() - started
+
+    response, elapsed = asyncio.run(run())
+
+    assert response.status_code == 200
+    assert response.json()[0]["call"] == 2
+    assert elapsed < 0.5
+
+
+def test_hedge_delay_tracks_observed_quantile():
+    upstream = UpstreamClient(min_hedge_samples=10)
+    policy = RetryPolicy(hedge=True, hedge_min_delay=0.0)
+    window = upstream.latency("products.list")
+    for ms in range(1, 101):
+        window.record(ms / 1000)
+
+    assert upstream.hedge_delay("products.list", policy) == pytest.approx(0.096, abs=0.002)
+
+
+def test_gateway_routes_use_retry_policy(monkeypatch):
+    service = make_flaky_service(failures=1)
+    monkeypatch.setattr(
+        main,
+        "upstream",
+        UpstreamClient(
+            policies={"cart.get": RetryPolicy(base_delay=0.001)},
+            transport=httpx.ASGITransport(app=service),
+        ),
+    )
+    token = jwt.encode({"user_id": "user_001"}, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+    response = TestClient(main.app).get(
+        "/cart", headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["user_id"] == "user_001"
+    assert service.state.calls == 2
+
+
+def test_gateway_passes_cart_versions_through(monkeypatch):
+    service = FastAPI()
+    seen = []
+
+    @service.put("/cart/update/{product_id}")
+    async def update(product_id: str, request: Request):
+        seen.append(request.headers.get("if-match"))
+        if request.headers.get("if-match") != '"4"':
+            return JSONResponse(status_code=412, content={"detail": "stale"}, headers={"ETag": '"4"'})
+        return JSONResponse({"message": "ok", "version": 5}, headers={"ETag": '"5"'})
+
+    monkeypatch.setattr(main, "upstream", UpstreamClient(transport=httpx.ASGITransport(app=service)))
+    token = jwt.encode({"user_id": "user_001"}, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    client = TestClient(main.app)
+
+    stale = client.put("/cart/update/prod_001?quantity=2", headers={"Authorization": f"Bearer {token}", "If-Match": '"3"'})
+    fresh = client.put("/cart/update/prod_001?quantity=2", headers={"Authorization": f"Bearer {token}", "If-Match": '"4"'})
+
+    assert seen == ['"3"', '"4"']
+    assert stale.status_code == 412
+    assert stale.headers["etag"] == '"4"'
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] == '"5"'
+
+
+def test_login_merges_the_guest_cart(monkeypatch):
+    service = FastAPI()
+    merges = []
+
+    @service.post("/auth/login")
+    async def login():
+        return {"access_token": "token-1", "token_type": "bearer"}
+
+    @service.post("/cart/merge")
+    async def merge(request: Request):
+        merges.append((request.headers.get("authorization"), request.headers.get("x-guest-session")))
+        return {"message": "Guest cart merged", "merged_items": 3, "version": 7, "holds_transferred": True}
+
+    monkeypatch.setattr(main, "upstream", UpstreamClient(transport=httpx.ASGITransport(app=service)))
+    client = TestClient(main.app)
+    credentials = {"email": "a@example.com", "password": "pw"}
+
+    plain = client.post("/auth/login", json=credentials)
+    merged = client.post("/auth/login", json=credentials, headers={"X-Guest-Session": "g1.sig"})
+
+    assert "guest_cart" not in plain.json()
+    assert merged.json()["guest_cart"] == {
+        "merged": True, "merged_items": 3, "version": 7, "holds_transferred": True
+    }
+    assert merges == [("Bearer token-1", "g1.sig")]
+
+
+def test_guest_cart_flow_through_the_gateway(monkeypatch):
+    service = FastAPI()
+    carts = {}
+    seen = []
+
+    def owner(request: Request) -> str:
+        seen.append((request.url.path, request.headers.get("authorization"), request.headers.get("x-guest-session")))
+        return request.headers.get("authorization") or f"guest:{request.headers['x-guest-session']}"
+
+    @service.post("/cart/guest")
+    async def guest():
+        return {"guest_session": "g1.sig", "expires_in": 3600}
+
+    @service.post("/cart/add")
+    async def add(request: Request, body: dict):
+        carts.setdefault(owner(request), []).append(body)
+        return JSONResponse({"message": "Item added to cart", "version": 1}, headers={"ETag": '"1"'})
+
+    @service.get("/cart")
+    async def cart(request: Request):
+        user_id = owner(request)
+        return {"user_id": user_id, "items": carts.get(user_id, [])}
+
+    @service.get("/cart/count")
+    async def count(request: Request):
+        return {"count": len(carts.get(owner(request), []))}
+
+    @service.post("/auth/login")
+    async def login():
+        return {"access_token": "token-1", "token_type": "bearer"}
+
+    @service.post("/cart/merge")
+    async def merge(request: Request):
+        items = carts.pop(f"guest:{request.headers['x-guest-session']}", [])
+        carts.setdefault(owner(request), []).extend(items)
+        return {"message": "Guest cart merged", "merged_items": len(items), "version": 2, "holds_transferred": True}
+
+    monkeypatch.setattr(main, "upstream", UpstreamClient(transport=httpx.ASGITransport(app=service)))
+    client = TestClient(main.app)
+
+    session = client.post("/cart/guest").json()["guest_session"]
+    guest = {"X-Guest-Session": session}
+    added = client.post("/cart/add", json={"product_id": "prod_001", "quantity": 1}, headers=guest)
+    cart = client.get("/cart", headers=guest)
+    count = client.get("/cart/count", headers=guest)
+    login = client.post("/auth/login", json={"email": "a@example.com", "password": "pw"}, headers=guest)
+
+    assert added.status_code == 200 and added.headers["etag"] == '"1"'
+    assert cart.status_code == 200 and cart.json()["items"] == [{"product_id": "prod_001", "quantity": 1}]
+    assert count.json() == {"count": 1}
+    assert login.json()["guest_cart"]["merged_items"] == 1
+    assert carts == {"Bearer token-1": [{"product_id": "prod_001", "quantity": 1}]}
+    # Guest calls carry only the session; the merge carries both
+    assert [auth for path, auth, _ in seen if path != "/cart/merge"] == [None, None, None]
+    assert seen[-1] == ("/cart/merge", "Bearer token-1", session)
+
+
+def test_cart_enrichment_batches_distinct_ids(monkeypatch):
+    service = FastAPI()
+    batches = []
+    lines = [{"product_id": f"prod_{i:04d}", "product_name": "Item", "price": 1.0, "quantity": 1} for i in range(4)]
+    lines.append(dict(lines[0], quantity=2))
+
+    @service.get("/cart")
+    async def cart():
+        return {"user_id": "user_001", "items": lines}
+
+    @service.post("/products/batch")
+    async def batch(body: dict):
+        batches.append(body["ids"])
+        found = [{"id": pid, "price": 0.5, "available": 4} for pid in body["ids"] if pid != "prod_0003"]
+        return {"products": found, "missing": ["prod_0003"]}
+
+    monkeypatch.setattr(main, "upstream", UpstreamClient(transport=httpx.ASGITransport(app=service)))
+    monkeypatch.setattr(main, "PRODUCT_BATCH_SIZE", 2)
+    token = jwt.encode({"user_id": "user_001"}, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+    body = TestClient(main.app).get("/cart?enrich=true", headers={"Authorization": f"Bearer {token}"}).json()
+
+    assert sorted(batches) == [["prod_0000", "prod_0001"], ["prod_0002", "prod_0003"]]
+    assert body["enriched"] is True
+    assert body["items"][0]["product"] == {"id": "prod_0000", "price": 0.5, "available": 4}
+    assert body["items"][4]["product"] == body["items"][0]["product"]
+    assert body["items"][3]["product"] is None
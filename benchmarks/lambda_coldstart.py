@@ -0,0 +1,147 @@
+"""
+Lambda cold-start report
+For the product, cart and auth services: `python -X importtime` of
+app.main (total and the heaviest top-level packages), then the cost of
+the first and of warm invocations through lambda_handler with a REST API
+event, next to the old pattern of building Mangum(app) on every call.
+
+Usage (from the repository root):
+    python benchmarks/lambda_coldstart.py
+    python benchmarks/lambda_coldstart.py --services product-service --invocations 500
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SERVICES = {
+    "product-service": ROOT / "services" / "product-service",
+    "cart-service": ROOT / "services" / "cart-service",
+    "auth-service": ROOT / "services" / "auth-service",
+}
+
+# Already loaded by the interpreter (and its site hooks) before app.main runs
+PRELOADED = {"site", "encodings", "codecs", "io", "abc", "os", "stat", "posixpath", "genericpath",
+             "_collections_abc", "_sitebuiltins", "sitecustomize", "usercustomize"}
+
+INVOKE = """
+import json, sys, time
+from app import main
+from mangum import Mangum
+
+event = json.loads(sys.argv[1])
+started = time.perf_counter()
+main.lambda_handler(event, None)
+first = time.perf_counter() - started
+
+started = time.perf_counter()
+for _ in range({n}):
+    response = main.lambda_handler(event, None)
+warm = (time.perf_counter() - started) / {n}
+
+started = time.perf_counter()
+for _ in range({n}):
+    Mangum(main.app)(event, None)
+per_call_adapter = (time.perf_counter() - started) / {n}
+
+print(json.dumps({{
+    "status": response["statusCode"],
+    "first_invocation_ms": first * 1000,
+    "warm_invocation_us": warm * 1e6,
+    "adapter_per_call_us": per_call_adapter * 1e6,
+}}))
+"""
+
+
+def health_event() -> dict:
+    return {
+        "resource": "/{proxy+}", "path": "/", "httpMethod": "GET",
+        "headers": {"host": "localhost"}, "multiValueHeaders": {},
+        "queryStringParameters": None, "multiValueQueryStringParameters": None,
+        "pathParameters": None, "stageVariables": None,
+        "requestContext": {"resourcePath": "/{proxy+}", "httpMethod": "GET", "path": "/", "stage": "prod",
+                           "identity": {"sourceIp": "127.0.0.1"}},
+        "body": None, "isBase64Encoded": False,
+    }
+
+
+def parse_importtime(stderr: str) -> Tuple[int, Dict[str, int]]:
+    """`-X importtime` lines (microseconds: self | cumulative | indented module) -> app.main total, self time per package"""
+    by_package: Dict[str, int] = defaultdict(int)
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        module = name.strip()
+        if module == "app.main":
+            total = int(cumulative_us)
+        package = module.split(".")[0]
+        if package not in PRELOADED:
+            by_package[package] += int(self_us)
+    return total, by_package
+
+
+def import_report(directory: Path, env: Dict[str, str], top: int, watch: List[str], repeat: int) -> dict:
+    """Fastest of `repeat` fresh imports; `watch` packages are always listed (0 when not imported)"""
+    runs = []
+    for _ in range(repeat):
+        stderr = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import app.main"],
+            cwd=directory, env=env, capture_output=True, text=True, check=True
+        ).stderr
+        runs.append(parse_importtime(stderr))
+    total, by_package = min(runs, key=lambda run: run[0])
+    heaviest = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "app_main_ms": round(total / 1000, 1),
+        "heaviest_ms": {name: round(us / 1000, 1) for name, us in heaviest},
+        "watched_ms": {name: round(by_package.get(name, 0) / 1000, 1) for name in watch},
+    }
+
+
+def invocation_report(directory: Path, env: Dict[str, str], invocations: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", INVOKE.format(n=invocations), json.dumps(health_event())],
+        cwd=directory, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return {key: round(value, 1) for key, value in json.loads(output.strip().splitlines()[-1]).items()}
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--services", default=",".join(SERVICES))
+    parser.add_argument("--invocations", type=int, default=200)
+    parser.add_argument("--top", type=int, default=8, help="heaviest packages to list")
+    parser.add_argument("--watch", default="uvicorn,httpx,httpcore,jwt,mangum", help="packages always reported")
+    parser.add_argument("--repeat", type=int, default=5, help="imports per service (the fastest is kept)")
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        # Keep the per-call lifespan's sales checkpoint out of the working tree
+        env = dict(os.environ, SALES_CHECKPOINT_PATH=os.path.join(scratch, "sales_velocity.json"))
+        results = {}
+        for service in args.services.split(","):
+            directory = SERVICES[service]
+            results[service] = {
+                "imports": import_report(directory, env, args.top, args.watch.split(","), args.repeat),
+                "invocations": invocation_report(directory, env, args.invocations),
+            }
+
+    report = json.dumps({"benchmark": "lambda_coldstart", "services": results}, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""
+Platform load test
+Starts all four apps on localhost, drives a mixed workload through the
+API gateway at a fixed arrival rate and reports per-route latency.
+
+Usage (from the repository root):
+    python benchmarks/loadtest.py --rate 100 --duration 30
+    python benchmarks/loadtest.py --baseline benchmarks/baseline.json
+    python benchmarks/loadtest.py --write-baseline benchmarks/baseline.json
+    python benchmarks/loadtest.py --no-start --gateway-url http://localhost:8080
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SERVICES = {
+    "product": (ROOT / "services" / "product-service", 18001),
+    "cart": (ROOT / "services" / "cart-service", 18002),
+    "auth": (ROOT / "services" / "auth-service", 18003),
+    "gateway": (ROOT / "api-gateway", 18080),
+}
+
+DEMO_USERS = [
+    ("demo@example.com", "demo123"),
+    ("john@example.com", "password123"),
+    ("alice@example.com", "secure456"),
+]
+PRODUCT_IDS = [f"prod_{i:03d}" for i in range(1, 16)]
+SEARCH_TERMS = ["wireless", "webcam", "desk", "usb", "charging", "keyboard"]
+
+DEFAULT_MIX = {"browse": 50, "search": 20, "login": 10, "cart": 20}
+
+
+# ============================================================================
+# Process management
+# ============================================================================
+
+def start_platform(log_dir: Path) -> List[subprocess.Popen]:
+    """Start every service with uvicorn on localhost"""
+    env = dict(os.environ)
+    env.setdefault("JWT_SECRET", "loadtest-secret")
+    env.setdefault("TRACE_SAMPLE_RATE", "0")
+    # All load comes from one address; keep the gateway's per-client limits out of the way
+    env.setdefault("GATEWAY_RATE_LIMITS", json.dumps({
+        prefix: {"rate": 100_000, "burst": 100_000} for prefix in ("*", "/auth/login", "/products/search/")
+    }))
+    env["PRODUCT_SERVICE_URL"] = f"http://127.0.0.1:{SERVICES['product'][1]}"
+    env["CART_SERVICE_URL"] = f"http://127.0.0.1:{SERVICES['cart'][1]}"
+    env["AUTH_SERVICE_URL"] = f"http://127.0.0.1:{SERVICES['auth'][1]}"
+
+    log_dir.mkdir(parents=True, exist_ok=True)
+    processes = []
+    for name, (directory, port) in SERVICES.items():
+        log = open(log_dir / f"{name}.log", "w")
+        processes.append(subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "app.main:app",
+                "--host", "127.0.0.1", "--port", str(port),
+                "--log-level", "warning", "--no-access-log",
+            ],
+            cwd=directory,
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        ))
+    return processes
+
+
+def stop_platform(processes: List[subprocess.Popen]) -> None:
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def wait_until_healthy(urls: List[str], timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        for url in urls:
+            while True:
+                try:
+                    if (await client.get(url, timeout=1.0)).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{url} did not become healthy within {timeout}s")
+                await asyncio.sleep(0.2)
+
+
+# ============================================================================
+# Workload
+# ============================================================================
+
+class Recorder:
+    """Collects latency samples per route label"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.recording = False
+
+    async def call(self, client: httpx.AsyncClient, route: str, method: str, url: str, ok=(200,), **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            failed = response.status_code not in ok
+        except httpx.HTTPError:
+            response, failed = None, True
+        elapsed = time.perf_counter() - started
+        if self.recording:
+            self.latencies[route].append(elapsed)
+            if failed:
+                self.errors[route] += 1
+        return response
+
+
+class Workload:
+    """Browse, search, login and cart-churn scenarios against the gateway"""
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, tokens: List[str]):
+        self.client = client
+        self.recorder = recorder
+        self.tokens = tokens
+
+    async def browse(self):
+        await self.recorder.call(self.client, "GET /products", "GET", "/products")
+        await self.recorder.call(
+            self.client, "GET /products/{product_id}", "GET", f"/products/{random.choice(PRODUCT_IDS)}"
+        )
+
+    async def search(self):
+        await self.recorder.call(
+            self.client, "GET /products/search/{query}", "GET",
+            f"/products/search/{random.choice(SEARCH_TERMS)}"
+        )
+
+    async def login(self):
+        email, password = random.choice(DEMO_USERS)
+        await self.recorder.call(
+            self.client, "POST /auth/login", "POST", "/auth/login",
+            json={"email": email, "password": password}
+        )
+
+    async def cart(self):
+        headers = {"Authorization": f"Bearer {random.choice(self.tokens)}"}
+        product_id = random.choice(PRODUCT_IDS)
+        # 409 is the stock ledger refusing a sold-out product, not an error
+        await self.recorder.call(
+            self.client, "POST /cart/add", "POST", "/cart/add", headers=headers, ok=(200, 409),
+            json={"product_id": product_id, "product_name": product_id, "price": 9.99, "quantity": 1}
+        )
+        await self.recorder.call(self.client, "GET /cart", "GET", "/cart", headers=headers)
+        # Concurrent churn on the same cart can legitimately remove the line first
+        await self.recorder.call(
+            self.client, "DELETE /cart/remove/{product_id}", "DELETE", f"/cart/remove/{product_id}",
+            ok=(200, 404), headers=headers
+        )
+
+
+async def login_all(client: httpx.AsyncClient) -> List[str]:
+    tokens = []
+    for email, password in DEMO_USERS:
+        response = await client.post("/auth/login", json={"email": email, "password": password})
+        response.raise_for_status()
+        tokens.append(response.json()["access_token"])
+    return tokens
+
+
+async def drive(gateway_url: str, rate: float, duration: float, warmup: float, mix: Dict[str, int], concurrency: int):
+    """Open-loop arrivals at `rate` scenarios/sec; returns (recorder, measured seconds)"""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=gateway_url, limits=limits, timeout=30.0) as client:
+        recorder = Recorder()
+        workload = Workload(client, recorder, await login_all(client))
+        scenarios = list(mix)
+        weights = [mix[name] for name in scenarios]
+        in_flight = asyncio.Semaphore(concurrency)
+        tasks = set()
+
+        async def run_one(name: str):
+            async with in_flight:
+                await getattr(workload, name)()
+
+        interval = 1.0 / rate
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        measure_from = start + warmup
+        end = measure_from + duration
+        next_at = start
+        while next_at < end:
+            now = loop.time()
+            if now < next_at:
+                await asyncio.sleep(next_at - now)
+            recorder.recording = loop.time() >= measure_from
+            task = asyncio.ensure_future(run_one(random.choices(scenarios, weights)[0]))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            next_at += interval
+
+        await asyncio.gather(*tasks)
+        return recorder, loop.time() - measure_from
+
+
+# ============================================================================
+# Reporting
+# ============================================================================
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(recorder: Recorder, elapsed: float, config: dict) -> dict:
+    routes = {}
+    total = 0
+    for route, samples in sorted(recorder.latencies.items()):
+        ordered = sorted(samples)
+        total += len(ordered)
+        routes[route] = {
+            "requests": len(ordered),
+            "errors": recorder.errors.get(route, 0),
+            "throughput_rps": round(len(ordered) / elapsed, 2),
+            "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        }
+    return {
+        "config": config,
+        "elapsed_s": round(elapsed, 3),
+        "total_requests": total,
+        "throughput_rps": round(total / elapsed, 2),
+        "routes": routes,
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float, slack_ms: float = 0.0) -> List[str]:
+    """
+    Return a list of regressions against the stored baseline
+    A latency regresses when it exceeds baseline * (1 + tolerance) + slack_ms.
+    """
+    regressions = []
+    for route, expected in baseline["routes"].items():
+        actual = result["routes"].get(route)
+        if actual is None:
+            regressions.append(f"{route}: no samples recorded")
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            limit = expected[key] * (1 + tolerance) + slack_ms
+            if actual[key] > limit:
+                regressions.append(f"{route}: {key} {actual[key]} > {limit:.3f} (baseline {expected[key]})")
+        if actual["errors"] > expected["errors"]:
+            regressions.append(f"{route}: {actual['errors']} errors (baseline {expected['errors']})")
+    minimum = baseline["throughput_rps"] * (1 - tolerance)
+    if result["throughput_rps"] < minimum:
+        regressions.append(f"throughput {result['throughput_rps']} < {minimum:.2f} rps")
+    return regressions
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}")
+        mix[name] = int(weight)
+    return mix
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Mixed-workload load test for the platform")
+    parser.add_argument("--rate", type=float, default=100.0, help="scenarios started per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before measuring")
+    parser.add_argument("--concurrency", type=int, default=64, help="max scenarios in flight")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="e.g. browse=50,search=20,login=10,cart=20")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument("--baseline", type=Path, help="fail if results regress against this report")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed regression fraction")
+    parser.add_argument("--slack-ms", type=float, default=5.0, help="absolute latency slack per percentile")
+    parser.add_argument("--write-baseline", type=Path, help="store this run as the new baseline")
+    parser.add_argument("--no-start", action="store_true", help="target an already running platform")
+    parser.add_argument("--gateway-url", default=f"http://127.0.0.1:{SERVICES['gateway'][1]}")
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    processes = [] if args.no_start else start_platform(ROOT / "benchmarks" / "logs")
+    try:
+        health = [args.gateway_url + "/"]
+        if processes:
+            health = [f"http://127.0.0.1:{port}/" for _, port in SERVICES.values()]
+        asyncio.run(wait_until_healthy(health))
+        recorder, elapsed = asyncio.run(drive(
+            args.gateway_url, args.rate, args.duration, args.warmup, args.mix, args.concurrency
+        ))
+    finally:
+        stop_platform(processes)
+
+    config = {"rate": args.rate, "duration": args.duration, "mix": args.mix, "concurrency": args.concurrency}
+    result = summarize(recorder, elapsed, config)
+    report = json.dumps(result, indent=2)
+    print(report)
+    if args.output:
+        args.output.write_text(report + "\n")
+    if args.write_baseline:
+        args.write_baseline.write_text(report + "\n")
+
+    if args.baseline:
+        regressions = compare(
+            result, json.loads(args.baseline.read_text()), args.tolerance, args.slack_ms
+        )
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+#!/bin/bash
+
+# Build the Lambda bundles referenced by terraform/lambda.tf
+#
+#   infrastructure/package-lambdas.sh
+#   CATALOG_DB_PATH=/var/lib/ecommerce/catalog.db infrastructure/package-lambdas.sh
+#
+# The product bundle ships catalog.snap (CATALOG_SNAPSHOT_PATH), built from
+# CATALOG_DB_PATH when set, otherwise from the sample products. Re-run this
+# and `terraform apply` to publish catalog changes to Lambda.
+
+set -e
+
+ROOT="$(cd "$(dirname "$0")/.." && pwd)"
+OUT="$ROOT/infrastructure/terraform"
+BUILD="$ROOT/infrastructure/build"
+
+package() {
+    local service="$1"
+    local dir="$BUILD/$service"
+    echo "📦 Packaging $service"
+    rm -rf "$dir" && mkdir -p "$dir"
+    # Lambda runs Amazon Linux: fetch manylinux wheels (orjson is compiled)
+    pip install --quiet -r "$ROOT/services/$service/requirements.txt" --target "$dir" \
+        --platform manylinux2014_x86_64 --python-version 3.11 --only-binary=:all:
+    cp -r "$ROOT/services/$service/app" "$dir/app"
+    cp -r "$ROOT/shared" "$dir/shared"
+    find "$dir" -name "__pycache__" -type d -prune -exec rm -rf {} +
+}
+
+package product-service
+echo "🗂  Building catalog snapshot"
+(cd "$ROOT/services/product-service" && \
+    python -m app.snapshot "$BUILD/product-service/catalog.snap" ${CATALOG_DB_PATH:+--db "$CATALOG_DB_PATH"})
+
+package cart-service
+package auth-service
+
+for service in product-service cart-service auth-service; do
+    zip_name="${service%-service}_service.zip"
+    rm -f "$OUT/$zip_name"
+    (cd "$BUILD/$service" && zip -qr "$OUT/$zip_name" .)
+done
+
+echo "✅ Bundles written to $OUT"
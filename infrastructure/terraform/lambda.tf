@@ -12,6 +12,10 @@ resource "aws_lambda_function" "product_service" {
   environment {
     variables = {
       ENVIRONMENT = "production"
+      # Built into the zip by infrastructure/package-lambdas.sh; cold starts
+      # map it instead of rebuilding every Product. The catalog is read-only here
+      # (writes and stock commits answer 409), see aws/deployment-guide.md
+      CATALOG_SNAPSHOT_PATH = "catalog.snap"
     }
   }
 }
@@ -1,10 +1,12 @@
 """
 JWT token generation and verification
+PyJWT is imported on first use so it stays out of Lambda cold starts
 """
-import jwt
 from datetime import datetime, timedelta
 import os
 
+from shared.tracing import traced
+
 
 # JWT Configuration
 JWT_SECRET = os.getenv("JWT_SECRET", "your-secret-key-change-in-production")
@@ -12,6 +14,7 @@ JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24  # Token valid for 24 hours
 
 
+@traced("auth.create_access_token")
 def create_access_token(user_id: str, email: str, name: str) -> str:
     """
     Create a JWT access token
@@ -24,6 +27,8 @@ def create_access_token(user_id: str, email: str, name: str) -> str:
     Returns:
         JWT token string
     """
+    import jwt
+
     # Calculate expiration time
     expire = datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS)
     
@@ -42,6 +47,7 @@ def create_access_token(user_id: str, email: str, name: str) -> str:
     return token
 
 
+@traced("auth.verify_token")
 def verify_token(token: str) -> dict:
     """
     Verify and decode a JWT token
@@ -56,6 +62,8 @@ def verify_token(token: str) -> dict:
         jwt.ExpiredSignatureError: If token has expired
         jwt.InvalidTokenError: If token is invalid
     """
+    import jwt
+
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
         return payload
@@ -70,4 +78,6 @@ def decode_token_without_verification(token: str) -> dict:
     Decode token without verification (for debugging only)
     DO NOT USE IN PRODUCTION for authentication
     """
+    import jwt
+
     return jwt.decode(token, options={"verify_signature": False})
\ No newline at end of file
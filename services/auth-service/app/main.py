@@ -2,9 +2,13 @@
 Authentication Service
 Handles user login and JWT token generation
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
+from typing import Optional
+
+from shared.idempotency import IdempotencyStore
+from shared.metrics import MetricsMiddleware, metrics_response
+from shared.tracing import TracingMiddleware
 
 from .models import LoginRequest, LoginResponse, User
 from .jwt_handler import create_access_token, verify_token
@@ -24,6 +28,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route request counts and latency histograms, exposed at /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Continues traces started by the gateway (W3C traceparent)
+app.add_middleware(TracingMiddleware, service_name="auth-service")
+
 # Mock user database
 # In production: Replace with actual database (PostgreSQL, MongoDB, etc.)
 USERS_DB = {
@@ -54,16 +64,37 @@ def health_check():
     return {"status": "healthy", "service": "authentication"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics endpoint"""
+    return metrics_response()
+
+
+# Responses to recent Idempotency-Keys per login email, so a retried login mints one token
+idempotency = IdempotencyStore()
+
+
 @app.post("/auth/login", response_model=LoginResponse)
-def login(request: LoginRequest):
+def login(request: LoginRequest, idempotency_key: Optional[str] = Header(None)):
     """
     Authenticate user and return JWT token
+    With an Idempotency-Key header, a retried login returns the same token
     
     Demo credentials:
     - Email: demo@example.com, Password: demo123
     - Email: john@example.com, Password: password123
     - Email: alice@example.com, Password: secure456
     """
+    if idempotency_key is not None:
+        return idempotency.respond(
+            request.email.lower(), idempotency_key, request.model_dump(),
+            lambda: (authenticate(request).model_dump(), {})
+        )
+    return authenticate(request)
+
+
+def authenticate(request: LoginRequest) -> LoginResponse:
+    """Check credentials and mint a token"""
     # Find user
     user = USERS_DB.get(request.email)
     
@@ -135,13 +166,25 @@ def list_demo_users():
     }
 
 
-# Lambda handler for AWS deployment
+# Lambda entry point: the adapter is built on the first invocation and reused, so
+# module-level state (the user table) stays warm for the container's lifetime
+_lambda_adapter = None
+
+
 def lambda_handler(event, context):
     """AWS Lambda handler"""
-    from mangum import Mangum
-    handler = Mangum(app)
-    return handler(event, context)
+    global _lambda_adapter
+    if _lambda_adapter is None:
+        from mangum import Mangum
+        # Mangum would otherwise run startup and shutdown around every invocation
+        _lambda_adapter = Mangum(app, lifespan="off")
+    return _lambda_adapter(event, context)
+
+
+# Handler name configured in infrastructure/terraform/lambda.tf
+handler = lambda_handler
 
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8003)
\ No newline at end of file
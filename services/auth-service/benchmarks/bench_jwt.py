@@ -0,0 +1,49 @@
+"""
+JWT helper microbenchmark
+Times create_access_token and verify_token from app.jwt_handler
+
+Run from services/auth-service/:
+    python -m benchmarks.bench_jwt --iterations 20000
+"""
+import argparse
+import json
+import time
+from typing import List
+
+from app.jwt_handler import create_access_token, verify_token
+
+
+def per_call_us(func, iterations: int, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        best = min(best, time.perf_counter() - started)
+    return best / iterations * 1e6
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    token = create_access_token("user_001", "demo@example.com", "Demo User")
+    result = {
+        "benchmark": "jwt",
+        "iterations": args.iterations,
+        "encode_us": round(per_call_us(
+            lambda: create_access_token("user_001", "demo@example.com", "Demo User"), args.iterations
+        ), 3),
+        "decode_us": round(per_call_us(lambda: verify_token(token), args.iterations), 3),
+    }
+    report = json.dumps(result, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
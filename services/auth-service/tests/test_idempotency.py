@@ -0,0 +1,37 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from shared.idempotency import IdempotencyStore
+
+# The store itself is tested in the cart service
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "idempotency", IdempotencyStore())
+    return TestClient(main.app)
+
+
+def test_retried_login_replays_the_same_token(client):
+    credentials = {"email": "demo@example.com", "password": "demo123"}
+
+    first = client.post("/auth/login", json=credentials, headers={"Idempotency-Key": "login-1"})
+    retry = client.post("/auth/login", json=credentials, headers={"Idempotency-Key": "login-1"})
+    guessed = client.post(
+        "/auth/login", json=dict(credentials, password="wrong-password"), headers={"Idempotency-Key": "login-1"}
+    )
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json()["access_token"] == first.json()["access_token"]
+    assert retry.headers["idempotent-replayed"] == "true"
+    # The key alone does not unlock the remembered token
+    assert guessed.status_code == 422
+
+
+def test_failed_login_is_remembered_and_plain_login_unchanged(client):
+    bad = {"email": "demo@example.com", "password": "nope-nope"}
+
+    assert client.post("/auth/login", json=bad, headers={"Idempotency-Key": "k"}).status_code == 401
+    assert client.post("/auth/login", json=bad, headers={"Idempotency-Key": "k"}).headers["idempotent-replayed"] == "true"
+    assert client.post("/auth/login", json={"email": "demo@example.com", "password": "demo123"}).status_code == 200
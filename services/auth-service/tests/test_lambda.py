@@ -0,0 +1,21 @@
+import json
+import sys
+from pathlib import Path
+
+from app import main
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from lambda_events import api_gateway_event  # noqa: E402
+
+
+def test_login_through_cached_adapter(monkeypatch):
+    monkeypatch.setattr(main, "_lambda_adapter", None)
+    credentials = {"email": "demo@example.com", "password": "demo123"}
+
+    first = main.handler(api_gateway_event("POST", "/auth/login", credentials), None)
+    adapter = main._lambda_adapter
+    second = main.handler(api_gateway_event("POST", "/auth/login", credentials), None)
+
+    assert (first["statusCode"], second["statusCode"]) == (200, 200)
+    assert json.loads(second["body"])["access_token"]
+    assert main._lambda_adapter is adapter
@@ -0,0 +1,33 @@
+"""
+Guest sessions
+Signed session ids that let visitors build a cart before logging in
+"""
+import base64
+import hashlib
+import hmac
+import secrets
+from typing import Optional
+
+from .storage import GUEST_PREFIX
+
+
+def _signature(session_id: str, secret: str) -> str:
+    digest = hmac.new(secret.encode(), f"guest:{session_id}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:18]).decode()
+
+
+def new_guest_session(secret: str) -> str:
+    """A fresh '<id>.<signature>' token for the X-Guest-Session header"""
+    session_id = secrets.token_urlsafe(16)
+    return f"{session_id}.{_signature(session_id, secret)}"
+
+
+def guest_owner(token: str, secret: str) -> Optional[str]:
+    """The cart owner key for a validly signed guest session, or None"""
+    # Header values may hold any latin-1 character; compare_digest rejects non-ASCII str
+    if not token.isascii():
+        return None
+    session_id, _, signature = token.partition(".")
+    if not session_id or not hmac.compare_digest(signature, _signature(session_id, secret)):
+        return None
+    return GUEST_PREFIX + session_id
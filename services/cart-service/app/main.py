@@ -3,20 +3,41 @@ Cart Service
 Handles user shopping cart operations
 Requires JWT authentication
 """
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 from typing import Optional
-import uvicorn
-import jwt
 import os
 
+from shared.idempotency import IdempotencyStore
+from shared.metrics import MetricsMiddleware, metrics_response
+from shared.tracing import TracingMiddleware, traced
+
 from .models import CartItem, CartResponse, AddToCartRequest
-from .storage import CartStorage
+from .storage import GUEST_CART_TTL, CartStorage, QuantityChanged, VersionConflict
+from .guest import guest_owner, new_guest_session
+from .serialization import FastJSONResponse
+from .stock_client import InsufficientStock, StockClient, StockUnavailable
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Follow the product change feed while the service is running"""
+    if product_feed is not None:
+        product_feed.start()
+    yield
+    if product_feed is not None:
+        await product_feed.stop()
+    if stock_client is not None:
+        stock_client.close()
+
 
 app = FastAPI(
     title="Cart Service",
     description="E-commerce cart management service (JWT protected)",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS configuration
@@ -28,14 +49,140 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize cart storage
-cart_storage = CartStorage()
+# Per-route request counts and latency histograms, exposed at /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Continues traces started by the gateway (W3C traceparent)
+app.add_middleware(TracingMiddleware, service_name="cart-service")
+
+# Initialize cart storage; expired guest carts give their stock holds back
+cart_storage = CartStorage(on_guest_expired=lambda owner: release_stock(owner))
+
+
+def cart_etag(version: int) -> str:
+    """Strong ETag for a cart version"""
+    return f'"{version}"'
+
+
+def expected_version(user_id: str, if_match: Optional[str]) -> Optional[int]:
+    """
+    The cart version an If-Match header requires (None without one, or for "*")
+    Fails fast with 412 when no listed ETag is current; storage re-checks
+    the returned version as it writes, which catches a write in between.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    current = cart_storage.version(user_id)
+    if cart_etag(current) not in (tag.strip() for tag in if_match.split(",")):
+        raise VersionConflict(current)
+    return current
+
+
+@app.exception_handler(VersionConflict)
+async def version_conflict(request: Request, exc: VersionConflict):
+    """If-Match named a cart version that is no longer current"""
+    return FastJSONResponse(
+        {"detail": "Cart was modified by another request", "version": exc.current},
+        status_code=412,
+        headers={"ETag": cart_etag(exc.current)}
+    )
 
 # JWT secret (in production, use environment variable)
 JWT_SECRET = os.getenv("JWT_SECRET", "your-secret-key-change-in-production")
 JWT_ALGORITHM = "HS256"
 
+# Product service; when set, cart snapshots follow its change feed
+PRODUCT_SERVICE_URL = os.getenv("PRODUCT_SERVICE_URL")
+
+
+def apply_product_events(events):
+    """Refresh the name/price snapshots of exactly the products that changed"""
+    for event in events:
+        cart_storage.apply_product_change(event["type"], event["product_id"], event["changes"])
+
+
+# Ids per POST /products/batch call (the product service's MAX_BATCH_IDS)
+PRODUCT_BATCH_SIZE = 500
+
+
+async def refresh_cart_products(client):
+    """Reload every product held in a cart (the feed position was lost), one batch call per 500"""
+    product_ids = list(cart_storage.product_ids())
+    for start in range(0, len(product_ids), PRODUCT_BATCH_SIZE):
+        response = await client.post(
+            f"{PRODUCT_SERVICE_URL}/products/batch",
+            json={"ids": product_ids[start:start + PRODUCT_BATCH_SIZE], "fields": ["id", "name", "price"]}
+        )
+        response.raise_for_status()
+        batch = response.json()
+        for product in batch["products"]:
+            cart_storage.apply_product_change(
+                "upsert", product["id"], {"name": product["name"], "price": product["price"]}
+            )
+        for product_id in batch["missing"]:
+            cart_storage.apply_product_change("delete", product_id, {})
+
+
+product_feed = None
+if PRODUCT_SERVICE_URL:
+    # Imported only when used: httpx is most of this service's import time
+    from shared.product_feed import ProductFeedSubscriber
+    product_feed = ProductFeedSubscriber(PRODUCT_SERVICE_URL, apply_product_events, refresh_cart_products)
+
+# Reserve stock in the product service as items are added (prevents overselling)
+stock_client = StockClient(PRODUCT_SERVICE_URL) if PRODUCT_SERVICE_URL else None
+
+
+def reserve_stock(product_id: str, quantity: int, user_id: str) -> None:
+    """Hold stock for the user's cart; raises the HTTP error to return if refused"""
+    if stock_client is None:
+        return
+    try:
+        stock_client.reserve(product_id, quantity, owner=user_id)
+    except InsufficientStock as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Product not found")
+    except StockUnavailable:
+        raise HTTPException(status_code=503, detail="Stock service unavailable")
+
+
+def release_stock(user_id: str, product_id: Optional[str] = None, quantity: Optional[int] = None) -> None:
+    """Best-effort release; holds that cannot be released expire on their own"""
+    if stock_client is None:
+        return
+    try:
+        stock_client.release(user_id, product_id, quantity)
+    except StockUnavailable:
+        pass
+
+
+# Tries at handing a guest's holds to the user at merge before reporting them left behind
+TRANSFER_ATTEMPTS = 2
+
+
+def transfer_stock(from_owner: str, to_owner: str) -> bool:
+    """Move every stock hold between owners; False if the product service kept refusing"""
+    if stock_client is None:
+        return True
+    for _ in range(TRANSFER_ATTEMPTS):
+        try:
+            stock_client.transfer(from_owner, to_owner)
+            return True
+        except StockUnavailable:
+            continue
+    return False
+
+
+# Tries at a quantity update whose line another request changes in between
+UPDATE_ATTEMPTS = 3
 
+
+# Responses to recent Idempotency-Keys per user, so retried adds are applied once
+idempotency = IdempotencyStore()
+
+
+@traced("auth.verify_token")
 def verify_token(authorization: Optional[str] = Header(None)) -> str:
     """
     Verify JWT token and extract user_id
@@ -47,6 +194,9 @@ def verify_token(authorization: Optional[str] = Header(None)) -> str:
             detail="Authorization header missing"
         )
     
+    # Deferred to the first authenticated request (cold starts)
+    import jwt
+    
     try:
         # Extract token from "Bearer <token>" format
         if authorization.startswith("Bearer "):
@@ -78,107 +228,240 @@ def verify_token(authorization: Optional[str] = Header(None)) -> str:
         )
 
 
+def cart_owner(
+    authorization: Optional[str] = Header(None),
+    x_guest_session: Optional[str] = Header(None)
+) -> str:
+    """
+    Whose cart a request works on: the JWT's user, or else a guest session
+    Guest carts are keyed "guest:<session id>" in the same storage
+    """
+    if authorization or not x_guest_session:
+        return verify_token(authorization)
+    owner = guest_owner(x_guest_session, JWT_SECRET)
+    if owner is None:
+        raise HTTPException(status_code=401, detail="Invalid guest session")
+    return owner
+
+
 @app.get("/")
 def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "cart"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics endpoint"""
+    return metrics_response()
+
+
+@app.post("/cart/guest")
+def create_guest_session():
+    """
+    Start a guest cart
+    Send the returned session as X-Guest-Session on cart requests instead of
+    a JWT; the cart is dropped after guest_ttl seconds without changes
+    """
+    return {"guest_session": new_guest_session(JWT_SECRET), "expires_in": int(GUEST_CART_TTL)}
+
+
 @app.get("/cart", response_model=CartResponse)
-def get_cart(user_id: str = Depends(verify_token)):
+def get_cart(user_id: str = Depends(cart_owner)):
     """
     Get the current user's cart
     Requires valid JWT token
+    The ETag (and version) can be sent back as If-Match on changes
     """
+    # Version first: if a write lands in between, the ETag is stale and a
+    # conditional write fails safely instead of matching contents never seen
+    version = cart_storage.version(user_id)
     cart_items = cart_storage.get_cart(user_id)
     
     # Calculate totals
     total_items = sum(item.quantity for item in cart_items)
     total_price = sum(item.price * item.quantity for item in cart_items)
     
-    return CartResponse(
-        user_id=user_id,
-        items=cart_items,
-        total_items=total_items,
-        total_price=round(total_price, 2)
-    )
+    # Items are validated CartItem models; encode their fields directly
+    return FastJSONResponse({
+        "user_id": user_id,
+        "items": [dict(item.__dict__) for item in cart_items],
+        "total_items": total_items,
+        "total_price": round(total_price, 2),
+        "version": version
+    }, headers={"ETag": cart_etag(version)})
 
 
 @app.post("/cart/add")
 def add_to_cart(
     request: AddToCartRequest,
-    user_id: str = Depends(verify_token)
+    user_id: str = Depends(cart_owner),
+    idempotency_key: Optional[str] = Header(None),
+    if_match: Optional[str] = Header(None)
 ):
     """
     Add a product to the user's cart
     Requires valid JWT token
+    Stock is reserved first; 409 if the product is sold out
+    With an Idempotency-Key header, retries of the same add (and If-Match) are applied once
+    With If-Match, 412 if the cart changed since that version
     """
-    try:
-        cart_storage.add_item(
-            user_id=user_id,
-            product_id=request.product_id,
-            product_name=request.product_name,
-            price=request.price,
-            quantity=request.quantity
-        )
+    def add():
+        expected = expected_version(user_id, if_match)
+        reserve_stock(request.product_id, request.quantity, user_id)
+        try:
+            version = cart_storage.add_item(
+                user_id=user_id,
+                product_id=request.product_id,
+                product_name=request.product_name,
+                price=request.price,
+                quantity=request.quantity,
+                expected_version=expected
+            )
+            
+            return {
+                "message": "Product added to cart successfully",
+                "product_id": request.product_id,
+                "quantity": request.quantity,
+                "version": version
+            }, {"ETag": cart_etag(version)}
         
-        return {
-            "message": "Product added to cart successfully",
-            "product_id": request.product_id,
-            "quantity": request.quantity
-        }
+        except ValueError as e:
+            release_stock(user_id, request.product_id, request.quantity)
+            raise HTTPException(status_code=400, detail=str(e))
+        except VersionConflict:
+            release_stock(user_id, request.product_id, request.quantity)
+            raise
     
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    # A retry with another If-Match is a different request, not a replay
+    payload = {**request.model_dump(), "if_match": if_match}
+    return idempotency.respond(user_id, idempotency_key, payload, add, FastJSONResponse)
 
 
 @app.put("/cart/update/{product_id}")
 def update_cart_item(
     product_id: str,
     quantity: int,
-    user_id: str = Depends(verify_token)
+    response: Response,
+    user_id: str = Depends(cart_owner),
+    if_match: Optional[str] = Header(None)
 ):
     """
     Update quantity of a product in cart
     Set quantity to 0 to remove item
+    With If-Match, 412 if the cart changed since that version
     """
     if quantity < 0:
         raise HTTPException(status_code=400, detail="Quantity cannot be negative")
     
-    try:
-        if quantity == 0:
-            cart_storage.remove_item(user_id, product_id)
-            return {"message": "Product removed from cart"}
-        else:
-            cart_storage.update_quantity(user_id, product_id, quantity)
-            return {"message": "Cart updated successfully"}
+    expected = expected_version(user_id, if_match)
+    for _ in range(UPDATE_ATTEMPTS):
+        item = cart_storage.get_item(user_id, product_id)
+        if item is None:
+            raise HTTPException(status_code=404, detail=f"Product {product_id} not found in cart")
+        
+        # Adjust the stock hold by the difference before touching the cart; the
+        # write only applies if the line still has the quantity the delta came from
+        current = item.quantity
+        delta = quantity - current
+        if delta > 0:
+            reserve_stock(product_id, delta, user_id)
+        
+        try:
+            if quantity == 0:
+                version = cart_storage.remove_item(
+                    user_id, product_id, expected_version=expected, expected_quantity=current
+                )
+                message = "Product removed from cart"
+            else:
+                version = cart_storage.update_quantity(
+                    user_id, product_id, quantity, expected_version=expected, expected_quantity=current
+                )
+                message = "Cart updated successfully"
+            break
+        except (ValueError, VersionConflict, QuantityChanged) as e:
+            if delta > 0:
+                release_stock(user_id, product_id, delta)
+            if isinstance(e, ValueError):
+                raise HTTPException(status_code=404, detail=str(e))
+            if isinstance(e, VersionConflict):
+                raise
+    else:
+        raise HTTPException(status_code=409, detail="Cart item is being changed by another request")
     
-    except ValueError as e:
-        raise HTTPException(status_code=404, detail=str(e))
+    if delta < 0:
+        release_stock(user_id, product_id, -delta)
+    response.headers["ETag"] = cart_etag(version)
+    return {"message": message, "version": version}
 
 
 @app.delete("/cart/remove/{product_id}")
 def remove_from_cart(
     product_id: str,
-    user_id: str = Depends(verify_token)
+    response: Response,
+    user_id: str = Depends(cart_owner),
+    if_match: Optional[str] = Header(None)
 ):
-    """Remove a product from cart"""
+    """Remove a product from cart (412 with a stale If-Match)"""
     try:
-        cart_storage.remove_item(user_id, product_id)
-        return {"message": "Product removed from cart"}
+        version = cart_storage.remove_item(
+            user_id, product_id, expected_version=expected_version(user_id, if_match)
+        )
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    release_stock(user_id, product_id)
+    response.headers["ETag"] = cart_etag(version)
+    return {"message": "Product removed from cart", "version": version}
 
 
 @app.delete("/cart/clear")
-def clear_cart(user_id: str = Depends(verify_token)):
-    """Clear all items from cart"""
-    cart_storage.clear_cart(user_id)
-    return {"message": "Cart cleared successfully"}
+def clear_cart(
+    response: Response,
+    user_id: str = Depends(cart_owner),
+    if_match: Optional[str] = Header(None)
+):
+    """Clear all items from cart (412 with a stale If-Match)"""
+    version = cart_storage.clear_cart(user_id, expected_version=expected_version(user_id, if_match))
+    release_stock(user_id)
+    response.headers["ETag"] = cart_etag(version)
+    return {"message": "Cart cleared successfully", "version": version}
+
+
+@app.post("/cart/merge")
+def merge_guest_cart(
+    response: Response,
+    user_id: str = Depends(verify_token),
+    x_guest_session: Optional[str] = Header(None),
+    if_match: Optional[str] = Header(None)
+):
+    """
+    Fold a guest cart into the logged-in user's cart (called at login)
+    One storage write moves every line and one stock call hands the
+    guest's holds to the user. Merging again is a no-op. holds_transferred
+    is false if the holds stayed with the guest: the items are in the
+    cart, but their stock is not reserved for the user.
+    """
+    if not x_guest_session:
+        raise HTTPException(status_code=400, detail="X-Guest-Session header missing")
+    guest_id = guest_owner(x_guest_session, JWT_SECRET)
+    if guest_id is None:
+        raise HTTPException(status_code=401, detail="Invalid guest session")
+    
+    version, merged = cart_storage.merge_carts(
+        guest_id, user_id, expected_version=expected_version(user_id, if_match)
+    )
+    transferred = transfer_stock(guest_id, user_id) if merged else True
+    response.headers["ETag"] = cart_etag(version)
+    return {
+        "message": "Guest cart merged",
+        "merged_items": merged,
+        "version": version,
+        "holds_transferred": transferred
+    }
 
 
 @app.get("/cart/count")
-def get_cart_count(user_id: str = Depends(verify_token)):
+def get_cart_count(user_id: str = Depends(cart_owner)):
     """Get total number of items in cart (useful for navbar badge)"""
     cart_items = cart_storage.get_cart(user_id)
     total_items = sum(item.quantity for item in cart_items)
@@ -186,13 +469,25 @@ def get_cart_count(user_id: str = Depends(verify_token)):
     return {"count": total_items}
 
 
-# Lambda handler for AWS deployment
+# Lambda entry point: the adapter is built on the first invocation and reused, so
+# module-level state (cart storage and the stock client's connection pool) stays warm for the container's lifetime
+_lambda_adapter = None
+
+
 def lambda_handler(event, context):
     """AWS Lambda handler"""
-    from mangum import Mangum
-    handler = Mangum(app)
-    return handler(event, context)
+    global _lambda_adapter
+    if _lambda_adapter is None:
+        from mangum import Mangum
+        # Mangum would otherwise run startup and shutdown around every invocation
+        _lambda_adapter = Mangum(app, lifespan="off")
+    return _lambda_adapter(event, context)
+
+
+# Handler name configured in infrastructure/terraform/lambda.tf
+handler = lambda_handler
 
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8002)
\ No newline at end of file
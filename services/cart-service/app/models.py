@@ -29,6 +29,7 @@ class CartResponse(BaseModel):
     items: List[CartItem]
     total_items: int
     total_price: float
+    version: int = 0
     
     class Config:
         json_schema_extra = {
@@ -43,7 +44,8 @@ class CartResponse(BaseModel):
                     }
                 ],
                 "total_items": 2,
-                "total_price": 399.98
+                "total_price": 399.98,
+                "version": 3
             }
         }
 
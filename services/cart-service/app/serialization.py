@@ -0,0 +1,46 @@
+"""
+Fast JSON serialization
+Builds response bytes straight from model field dicts with orjson,
+skipping pydantic re-validation and the stdlib encoder
+"""
+import json
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, BaseModel):
+        return value.__dict__
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode to JSON bytes; output matches pydantic's JSON mode for our models"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with dumps()
+
+    Returning one of these from a route bypasses FastAPI's response_model
+    validation, so callers must only pass data that already came from
+    validated models.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
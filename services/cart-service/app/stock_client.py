@@ -0,0 +1,76 @@
+"""
+Stock reservation client
+Reserves product stock in the product service as items enter a cart
+"""
+from typing import TYPE_CHECKING, Optional
+
+from shared.tracing import tracer
+
+if TYPE_CHECKING:
+    import httpx
+
+
+class InsufficientStock(Exception):
+    """The product service refused the reservation (409)"""
+
+
+class StockUnavailable(Exception):
+    """The product service could not be reached or failed"""
+
+
+class StockClient:
+    """
+    Thin synchronous client for the product service's /stock endpoints
+    Used from the cart's sync route handlers; one pooled client per process.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: float = 2.0,
+        transport: Optional["httpx.BaseTransport"] = None
+    ):
+        # httpx is imported with the first client, keeping it off the cold-start path
+        import httpx
+
+        self.base_url = base_url.rstrip("/")
+        self._client = httpx.Client(timeout=timeout, transport=transport)
+
+    def _post(self, path: str, payload: dict) -> "httpx.Response":
+        import httpx
+
+        try:
+            return self._client.post(
+                f"{self.base_url}{path}", json=payload, headers=tracer.inject({})
+            )
+        except httpx.HTTPError as exc:
+            raise StockUnavailable(str(exc)) from exc
+
+    def reserve(self, product_id: str, quantity: int, owner: str) -> dict:
+        """Hold `quantity` more units for `owner` (raises InsufficientStock / KeyError)"""
+        response = self._post("/stock/reserve", {"product_id": product_id, "owner": owner, "quantity": quantity})
+        if response.status_code == 409:
+            raise InsufficientStock(response.json().get("detail", "Insufficient stock"))
+        if response.status_code == 404:
+            raise KeyError(product_id)
+        if response.status_code != 200:
+            raise StockUnavailable(f"reserve failed with {response.status_code}")
+        return response.json()
+
+    def release(self, owner: str, product_id: Optional[str] = None, quantity: Optional[int] = None) -> int:
+        """Release some or all of an owner's holds; returns units released"""
+        payload = {"owner": owner, "product_id": product_id, "quantity": quantity}
+        response = self._post("/stock/release", payload)
+        if response.status_code != 200:
+            raise StockUnavailable(f"release failed with {response.status_code}")
+        return response.json()["released"]
+
+    def transfer(self, from_owner: str, to_owner: str) -> int:
+        """Hand all of one owner's holds to another; returns units moved"""
+        response = self._post("/stock/transfer", {"from_owner": from_owner, "to_owner": to_owner})
+        if response.status_code != 200:
+            raise StockUnavailable(f"transfer failed with {response.status_code}")
+        return response.json()["transferred"]
+
+    def close(self) -> None:
+        self._client.close()
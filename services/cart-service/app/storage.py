@@ -3,10 +3,41 @@ Cart storage implementation
 Uses in-memory storage (dict) for local development
 In production: Replace with Redis, DynamoDB, or other persistent storage
 """
-from typing import List, Dict
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from shared.tracing import traced
+
 from .models import CartItem
 
 
+# Guest carts are stored under "guest:<session id>" and dropped this many
+# seconds after their last change
+GUEST_PREFIX = "guest:"
+GUEST_CART_TTL = float(os.getenv("GUEST_CART_TTL", "86400"))
+
+
+class VersionConflict(Exception):
+    """The cart changed since the version the client last read"""
+    
+    def __init__(self, current: int):
+        super().__init__(f"Cart is at version {current}")
+        self.current = current
+
+
+class QuantityChanged(Exception):
+    """A line's quantity is not the one the caller computed its stock hold from"""
+    
+    def __init__(self, product_id: str, current: int):
+        super().__init__(f"{product_id} is at quantity {current}")
+        self.product_id = product_id
+        self.current = current
+
+
 class CartStorage:
     """
     In-memory cart storage
@@ -16,77 +47,317 @@ class CartStorage:
     - Redis (for session-based carts)
     - DynamoDB (for persistent carts)
     - PostgreSQL/MySQL (for relational storage)
+    
+    Every change to a cart's items bumps its version. Writes may pass
+    `expected_version` to apply only if nobody else wrote in between
+    (VersionConflict otherwise), the in-process form of a conditional
+    write; `expected_quantity` does the same for one line (QuantityChanged).
+    Reads never lock; writes hold the lock only for the
+    compare-and-apply itself.
+    
+    Guest carts (owners starting with GUEST_PREFIX) expire `guest_ttl`
+    seconds after their last write. They are kept in last-write order, so
+    expiry only ever looks at the oldest ones. `on_guest_expired(owner)`
+    is called for each dropped cart once the lock is released (to give
+    back its stock holds).
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        guest_ttl: float = GUEST_CART_TTL,
+        clock: Callable[[], float] = time.monotonic,
+        on_guest_expired: Optional[Callable[[str], None]] = None
+    ):
         # Structure: {user_id: {product_id: CartItem}}
         self._carts: Dict[str, Dict[str, CartItem]] = {}
+        # Reverse index: {product_id: {user_id, ...}} for product change events
+        self._holders: Dict[str, Set[str]] = {}
+        # {user_id: version}; kept after a cart is emptied so old versions never match again
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.guest_ttl = guest_ttl
+        self._clock = clock
+        # {guest owner: last write time}, oldest first
+        self._guest_writes: "OrderedDict[str, float]" = OrderedDict()
+        self.on_guest_expired = on_guest_expired
+        # Guest owners expired under the lock, not yet passed to on_guest_expired
+        self._expired: List[str] = []
+    
+    @contextmanager
+    def _writing(self):
+        """Hold the lock for a write, then report guest carts it expired"""
+        try:
+            with self._lock:
+                yield
+        finally:
+            self._report_expired()
+    
+    def _report_expired(self) -> None:
+        if not self._expired:
+            return
+        with self._lock:
+            owners, self._expired = self._expired, []
+        if self.on_guest_expired is not None:
+            for owner in owners:
+                self.on_guest_expired(owner)
+    
+    def version(self, user_id: str) -> int:
+        """Current version of a user's cart (0 if it was never written)"""
+        if user_id.startswith(GUEST_PREFIX):
+            self.expire_guests()
+        return self._versions.get(user_id, 0)
+    
+    def _check_and_bump(self, user_id: str, expected_version: Optional[int]) -> int:
+        # Caller holds self._lock
+        now = self._clock()
+        self._expire_guests_locked(now)
+        current = self._versions.get(user_id, 0)
+        if expected_version is not None and expected_version != current:
+            raise VersionConflict(current)
+        self._versions[user_id] = current + 1
+        if user_id.startswith(GUEST_PREFIX):
+            self._guest_writes[user_id] = now
+            self._guest_writes.move_to_end(user_id)
+        return current + 1
+    
+    def _check_quantity(self, user_id: str, product_id: str, expected_quantity: Optional[int]) -> None:
+        # Caller holds self._lock
+        current = self._carts[user_id][product_id].quantity
+        if expected_quantity is not None and expected_quantity != current:
+            raise QuantityChanged(product_id, current)
+    
+    def expire_guests(self, now: Optional[float] = None) -> int:
+        """Drop guest carts idle for longer than guest_ttl; returns how many"""
+        now = self._clock() if now is None else now
+        # Unlocked peek keeps the common nothing-due case lock-free
+        try:
+            oldest = next(iter(self._guest_writes.values()), None)
+        except RuntimeError:
+            # A write reordered the dict mid-peek; look again under the lock
+            oldest = now - self.guest_ttl
+        if oldest is None or oldest + self.guest_ttl > now:
+            return 0
+        with self._writing():
+            return self._expire_guests_locked(now)
+    
+    def _expire_guests_locked(self, now: float) -> int:
+        expired = 0
+        while self._guest_writes:
+            owner, written = next(iter(self._guest_writes.items()))
+            if written + self.guest_ttl > now:
+                break
+            self._guest_writes.popitem(last=False)
+            self._versions.pop(owner, None)
+            for product_id in self._carts.pop(owner, ()):
+                self._forget_holder(product_id, owner)
+            self._expired.append(owner)
+            expired += 1
+        return expired
     
+    @traced("storage.get_cart")
     def get_cart(self, user_id: str) -> List[CartItem]:
         """Get all items in user's cart"""
+        if user_id.startswith(GUEST_PREFIX):
+            self.expire_guests()
         if user_id not in self._carts:
             return []
         
         return list(self._carts[user_id].values())
     
+    def get_item(self, user_id: str, product_id: str) -> Optional[CartItem]:
+        """One line of a user's cart, or None"""
+        return self._carts.get(user_id, {}).get(product_id)
+    
+    @traced("storage.add_item")
     def add_item(
         self,
         user_id: str,
         product_id: str,
         product_name: str,
         price: float,
-        quantity: int = 1
-    ) -> None:
+        quantity: int = 1,
+        expected_version: Optional[int] = None
+    ) -> int:
         """
         Add item to cart
         If item already exists, increase quantity
+        Returns the cart's new version
         """
-        if user_id not in self._carts:
-            self._carts[user_id] = {}
-        
-        if product_id in self._carts[user_id]:
-            # Item already in cart, increase quantity
-            self._carts[user_id][product_id].quantity += quantity
-        else:
-            # New item
-            self._carts[user_id][product_id] = CartItem(
-                product_id=product_id,
-                product_name=product_name,
-                price=price,
-                quantity=quantity
-            )
+        with self._writing():
+            version = self._check_and_bump(user_id, expected_version)
+            if user_id not in self._carts:
+                self._carts[user_id] = {}
+            
+            if product_id in self._carts[user_id]:
+                # Item already in cart, increase quantity
+                self._carts[user_id][product_id].quantity += quantity
+            else:
+                # New item
+                self._carts[user_id][product_id] = CartItem(
+                    product_id=product_id,
+                    product_name=product_name,
+                    price=price,
+                    quantity=quantity
+                )
+                self._holders.setdefault(product_id, set()).add(user_id)
+        return version
     
+    @traced("storage.update_quantity")
     def update_quantity(
         self,
         user_id: str,
         product_id: str,
-        quantity: int
-    ) -> None:
-        """Update quantity of an item in cart"""
-        if user_id not in self._carts or product_id not in self._carts[user_id]:
-            raise ValueError(f"Product {product_id} not found in cart")
-        
-        self._carts[user_id][product_id].quantity = quantity
+        quantity: int,
+        expected_version: Optional[int] = None,
+        expected_quantity: Optional[int] = None
+    ) -> int:
+        """Update quantity of an item in cart; returns the cart's new version"""
+        with self._writing():
+            if user_id not in self._carts or product_id not in self._carts[user_id]:
+                raise ValueError(f"Product {product_id} not found in cart")
+            
+            self._check_quantity(user_id, product_id, expected_quantity)
+            version = self._check_and_bump(user_id, expected_version)
+            self._carts[user_id][product_id].quantity = quantity
+        return version
     
-    def remove_item(self, user_id: str, product_id: str) -> None:
-        """Remove item from cart"""
-        if user_id not in self._carts or product_id not in self._carts[user_id]:
-            raise ValueError(f"Product {product_id} not found in cart")
-        
-        del self._carts[user_id][product_id]
-        
-        # Clean up empty cart
-        if not self._carts[user_id]:
-            del self._carts[user_id]
+    @traced("storage.remove_item")
+    def remove_item(
+        self,
+        user_id: str,
+        product_id: str,
+        expected_version: Optional[int] = None,
+        expected_quantity: Optional[int] = None
+    ) -> int:
+        """Remove item from cart; returns the cart's new version"""
+        with self._writing():
+            if user_id not in self._carts or product_id not in self._carts[user_id]:
+                raise ValueError(f"Product {product_id} not found in cart")
+            
+            self._check_quantity(user_id, product_id, expected_quantity)
+            version = self._check_and_bump(user_id, expected_version)
+            del self._carts[user_id][product_id]
+            self._forget_holder(product_id, user_id)
+            
+            # Clean up empty cart
+            if not self._carts[user_id]:
+                del self._carts[user_id]
+        return version
     
-    def clear_cart(self, user_id: str) -> None:
-        """Clear all items from cart"""
-        if user_id in self._carts:
-            del self._carts[user_id]
+    @traced("storage.clear_cart")
+    def clear_cart(self, user_id: str, expected_version: Optional[int] = None) -> int:
+        """Clear all items from cart; returns the cart's new version"""
+        with self._writing():
+            # Never call the public (locking) readers in here: the lock is not reentrant
+            self._expire_guests_locked(self._clock())
+            current = self._versions.get(user_id, 0)
+            if user_id not in self._carts:
+                # Nothing to clear: keep the version, but still honour the precondition
+                if expected_version is not None and expected_version != current:
+                    raise VersionConflict(current)
+                return current
+            version = self._check_and_bump(user_id, expected_version)
+            for product_id in self._carts.pop(user_id):
+                self._forget_holder(product_id, user_id)
+        return version
     
+    @traced("storage.merge_carts")
+    def merge_carts(
+        self,
+        source_id: str,
+        target_id: str,
+        expected_version: Optional[int] = None
+    ) -> Tuple[int, int]:
+        """
+        Move every item of one cart into another in a single write
+        (a guest cart into the user's cart at login)
+        
+        Quantities of products already in the target are added together;
+        the target's existing name and price are kept. The source cart is
+        emptied. `expected_version` applies to the target. Returns the
+        target's version and the number of lines moved; merging an empty
+        or expired cart changes nothing.
+        """
+        with self._writing():
+            self._expire_guests_locked(self._clock())
+            if source_id == target_id or not self._carts.get(source_id):
+                current = self._versions.get(target_id, 0)
+                if expected_version is not None and expected_version != current:
+                    raise VersionConflict(current)
+                return current, 0
+            
+            version = self._check_and_bump(target_id, expected_version)
+            self._check_and_bump(source_id, None)
+            source = self._carts.pop(source_id)
+            target = self._carts.setdefault(target_id, {})
+            for product_id, item in source.items():
+                existing = target.get(product_id)
+                if existing is None:
+                    target[product_id] = item
+                    self._holders.setdefault(product_id, set()).add(target_id)
+                else:
+                    existing.quantity += item.quantity
+                self._forget_holder(product_id, source_id)
+        return version, len(source)
+    
+    @traced("storage.get_item_count")
     def get_item_count(self, user_id: str) -> int:
         """Get total number of items in cart"""
+        if user_id.startswith(GUEST_PREFIX):
+            self.expire_guests()
         if user_id not in self._carts:
             return 0
         
-        return sum(item.quantity for item in self._carts[user_id].values())
\ No newline at end of file
+        return sum(item.quantity for item in self._carts[user_id].values())
+    
+    def _forget_holder(self, product_id: str, user_id: str) -> None:
+        holders = self._holders.get(product_id)
+        if holders is not None:
+            holders.discard(user_id)
+            if not holders:
+                del self._holders[product_id]
+    
+    def product_ids(self) -> List[str]:
+        """Products currently held in at least one cart"""
+        return list(self._holders)
+    
+    @traced("storage.apply_product_change")
+    def apply_product_change(self, change_type: str, product_id: str, changes: Dict) -> int:
+        """
+        Bring cart snapshots of a product up to date after a catalog change
+        Deleted products are removed from every cart; otherwise the stored
+        name and price are refreshed. Returns the number of carts touched.
+        Runs under the lock like any other write, so it never interleaves
+        with a merge or an add of the same line.
+        """
+        if change_type == "delete":
+            with self._writing():
+                holders = list(self._holders.get(product_id, ()))
+                for user_id in holders:
+                    cart = self._carts.get(user_id)
+                    if cart is None or product_id not in cart:
+                        continue
+                    self._check_and_bump(user_id, None)
+                    del cart[product_id]
+                    if not cart:
+                        del self._carts[user_id]
+                self._holders.pop(product_id, None)
+            return len(holders)
+        
+        # Refreshed names and prices leave versions alone: a catalog edit is not a
+        # conflicting write and must not fail the owner's next If-Match
+        name = changes.get("name")
+        price = changes.get("price")
+        if name is None and price is None:
+            return 0
+        with self._lock:
+            holders = list(self._holders.get(product_id, ()))
+            for user_id in holders:
+                item = self._carts.get(user_id, {}).get(product_id)
+                if item is None:
+                    continue
+                if name is not None:
+                    item.product_name = name
+                if price is not None:
+                    item.price = price
+        return len(holders)
\ No newline at end of file
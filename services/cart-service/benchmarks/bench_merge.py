@@ -0,0 +1,103 @@
+"""
+Guest cart merge benchmark
+Folding a guest cart into a user's cart at login: one merge_carts() call
+vs replaying every line through add_item(), and over HTTP one
+POST /cart/merge vs one POST /cart/add per line (what the frontend would
+otherwise do). Half of the guest's products are already in the user cart.
+
+Run from services/cart-service/:
+    python -m benchmarks.bench_merge --sizes 10,100,1000,10000
+"""
+import argparse
+import json
+import time
+from typing import List
+
+import jwt
+from fastapi.testclient import TestClient
+
+from app import main as service
+from app.guest import guest_owner
+from app.storage import CartStorage
+
+
+def fill(storage: CartStorage, guest: str, user: str, size: int) -> None:
+    for i in range(size):
+        storage.add_item(guest, f"prod_{i:06d}", "Guest item", 9.99, 2)
+    for i in range(0, size, 2):
+        storage.add_item(user, f"prod_{i:06d}", "User item", 9.99, 1)
+
+
+def storage_merge(size: int, repeat: int) -> dict:
+    merge_s = replay_s = 0.0
+    for _ in range(repeat):
+        storage = CartStorage()
+        fill(storage, "guest:g", "user_1", size)
+        started = time.perf_counter()
+        storage.merge_carts("guest:g", "user_1")
+        merge_s += time.perf_counter() - started
+
+        storage = CartStorage()
+        fill(storage, "guest:g", "user_1", size)
+        started = time.perf_counter()
+        for item in storage.get_cart("guest:g"):
+            storage.add_item("user_1", item.product_id, item.product_name, item.price, item.quantity)
+        storage.clear_cart("guest:g")
+        replay_s += time.perf_counter() - started
+    return {
+        "merge_ms": round(merge_s / repeat * 1000, 3),
+        "replay_adds_ms": round(replay_s / repeat * 1000, 3),
+    }
+
+
+def http_merge(size: int) -> dict:
+    client = TestClient(service.app)
+    token = jwt.encode({"user_id": "bench_user"}, service.JWT_SECRET, algorithm=service.JWT_ALGORITHM)
+    user = {"Authorization": f"Bearer {token}"}
+
+    def guest_cart() -> dict:
+        guest = {"X-Guest-Session": client.post("/cart/guest").json()["guest_session"]}
+        owner = guest_owner(guest["X-Guest-Session"], service.JWT_SECRET)
+        for i in range(size):
+            service.cart_storage.add_item(owner, f"prod_{i:06d}", "Guest item", 9.99, 2)
+        return guest
+
+    guest = guest_cart()
+    started = time.perf_counter()
+    client.post("/cart/merge", headers={**user, **guest})
+    merge_s = time.perf_counter() - started
+    service.cart_storage.clear_cart("bench_user")
+
+    guest = guest_cart()
+    started = time.perf_counter()
+    for item in client.get("/cart", headers=guest).json()["items"]:
+        client.post("/cart/add", json=item, headers=user)
+    client.delete("/cart/clear", headers=guest)
+    replay_s = time.perf_counter() - started
+    service.cart_storage.clear_cart("bench_user")
+    return {"merge_request_ms": round(merge_s * 1000, 2), "replay_requests_ms": round(replay_s * 1000, 2)}
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10,100,1000,10000", help="lines in the guest cart")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--http-max", type=int, default=1000, help="largest size also measured over HTTP")
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for size in (int(n) for n in args.sizes.split(",")):
+        results[str(size)] = storage_merge(size, args.repeat)
+        if size <= args.http_max:
+            results[str(size)].update(http_merge(size))
+
+    report = json.dumps({"benchmark": "cart_merge", "sizes": results}, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+CartStorage microbenchmark
+Measures add/update/get throughput with several threads hammering the
+same storage instance (and optionally the same few carts)
+
+Run from services/cart-service/:
+    python -m benchmarks.bench_storage --threads 1,4,16 --ops 20000
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from typing import List
+
+from app.storage import CartStorage
+
+
+def worker(storage: CartStorage, users: List[str], ops: int, seed: int, barrier: threading.Barrier) -> None:
+    rng = random.Random(seed)
+    products = [f"prod_{i:03d}" for i in range(1, 51)]
+    barrier.wait()
+    for _ in range(ops):
+        user_id = rng.choice(users)
+        product_id = rng.choice(products)
+        roll = rng.random()
+        if roll < 0.5:
+            storage.add_item(user_id, product_id, product_id, 9.99, 1)
+        elif roll < 0.7:
+            try:
+                storage.update_quantity(user_id, product_id, rng.randint(1, 5))
+            except ValueError:
+                pass
+        else:
+            storage.get_cart(user_id)
+
+
+def run(threads: int, ops_per_thread: int, hot_users: int) -> dict:
+    storage = CartStorage()
+    users = [f"user_{i}" for i in range(hot_users)]
+    barrier = threading.Barrier(threads + 1)
+    pool = [
+        threading.Thread(target=worker, args=(storage, users, ops_per_thread, seed, barrier))
+        for seed in range(threads)
+    ]
+    for thread in pool:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    total = threads * ops_per_thread
+    return {
+        "threads": threads,
+        "hot_users": hot_users,
+        "ops": total,
+        "ops_per_sec": round(total / elapsed),
+        "us_per_op": round(elapsed / total * 1e6, 3),
+    }
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", default="1,4,16")
+    parser.add_argument("--ops", type=int, default=20000, help="operations per thread")
+    parser.add_argument("--hot-users", default="1,1000", help="number of carts the threads contend on")
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    results = [
+        run(int(threads), args.ops, int(users))
+        for users in args.hot_users.split(",")
+        for threads in args.threads.split(",")
+    ]
+    report = json.dumps({"benchmark": "cart_storage", "results": results}, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import threading
+
+import httpx
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.main import JWT_ALGORITHM, JWT_SECRET, app
+from app.stock_client import StockClient
+from app.storage import CartStorage
+from tests.test_stock_reservations import FakeStockService
+
+
+def item(product_id, quantity=1, price=10.0):
+    return {"product_id": product_id, "product_name": product_id.title(), "price": price, "quantity": quantity}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "cart_storage", CartStorage())
+    return TestClient(app)
+
+
+def user_headers(user_id="merge_user"):
+    token = jwt.encode({"user_id": user_id}, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    return {"Authorization": f"Bearer {token}"}
+
+
+def guest_headers(client):
+    return {"X-Guest-Session": client.post("/cart/guest").json()["guest_session"]}
+
+
+def test_guest_can_build_a_cart(client):
+    guest = guest_headers(client)
+
+    client.post("/cart/add", json=item("prod_001", 2), headers=guest)
+    cart = client.get("/cart", headers=guest).json()
+
+    assert cart["user_id"].startswith("guest:")
+    assert cart["total_items"] == 2
+    assert client.get("/cart/count", headers=guest_headers(client)).json() == {"count": 0}
+
+
+def test_tampered_guest_session_is_rejected(client):
+    session = guest_headers(client)["X-Guest-Session"]
+    session_id, _, signature = session.partition(".")
+
+    assert client.get("/cart", headers={"X-Guest-Session": f"{session_id}x.{signature}"}).status_code == 401
+    assert client.get("/cart", headers={"X-Guest-Session": session_id}).status_code == 401
+    assert client.get("/cart").status_code == 401
+    # Non-ASCII bytes decode to latin-1 str, which compare_digest refuses
+    assert client.get("/cart", headers={"X-Guest-Session": f"{session_id}.\xe9".encode("latin-1")}).status_code == 401
+
+
+def test_merge_folds_guest_cart_into_user_cart(client):
+    guest = guest_headers(client)
+    client.post("/cart/add", json=item("prod_001", 2), headers=guest)
+    client.post("/cart/add", json=item("prod_002", 1), headers=guest)
+    client.post("/cart/add", json=item("prod_001", 1, price=12.0), headers=user_headers())
+
+    merged = client.post("/cart/merge", headers={**user_headers(), **guest})
+    again = client.post("/cart/merge", headers={**user_headers(), **guest})
+    cart = client.get("/cart", headers=user_headers()).json()
+
+    assert merged.json()["merged_items"] == 2
+    assert merged.headers["etag"] == f'"{cart["version"]}"'
+    assert again.json()["merged_items"] == 0
+    assert {line["product_id"]: (line["quantity"], line["price"]) for line in cart["items"]} == {
+        "prod_001": (3, 12.0),
+        "prod_002": (1, 10.0),
+    }
+    assert client.get("/cart", headers=guest).json()["items"] == []
+    assert main.cart_storage.product_ids() == ["prod_001", "prod_002"]
+
+
+def test_merge_requires_a_valid_guest_session_and_current_if_match(client):
+    guest = guest_headers(client)
+    client.post("/cart/add", json=item("prod_001"), headers=guest)
+
+    assert client.post("/cart/merge", headers=user_headers()).status_code == 400
+    assert client.post("/cart/merge", headers={**user_headers(), "X-Guest-Session": "x.y"}).status_code == 401
+    assert client.post("/cart/merge", headers=guest).status_code == 401
+
+    stale = client.post("/cart/merge", headers={**user_headers(), **guest, "If-Match": '"5"'})
+    assert stale.status_code == 412
+    assert client.get("/cart", headers=guest).json()["total_items"] == 1
+
+
+def test_merge_hands_stock_holds_to_the_user(client, monkeypatch):
+    fake = FakeStockService({"prod_001": 10})
+    monkeypatch.setattr(
+        main, "stock_client", StockClient("http://products", transport=httpx.MockTransport(fake.handler))
+    )
+    guest = guest_headers(client)
+    client.post("/cart/add", json=item("prod_001", 2), headers=guest)
+
+    merged = client.post("/cart/merge", headers={**user_headers(), **guest})
+
+    assert merged.json()["holds_transferred"] is True
+    assert fake.held == {"prod_001": 2}
+    assert fake.calls[-1] == (
+        "/stock/transfer",
+        {"from_owner": "guest:" + guest["X-Guest-Session"].partition(".")[0], "to_owner": "merge_user"},
+    )
+
+
+def test_merge_retries_the_transfer_then_reports_holds_left_behind(client, monkeypatch):
+    fake = FakeStockService({"prod_001": 10})
+    failures = []
+
+    def handler(request):
+        if request.url.path == "/stock/transfer":
+            failures.append(request)
+            return httpx.Response(503)
+        return fake.handler(request)
+
+    monkeypatch.setattr(main, "stock_client", StockClient("http://products", transport=httpx.MockTransport(handler)))
+    guest = guest_headers(client)
+    client.post("/cart/add", json=item("prod_001", 2), headers=guest)
+
+    merged = client.post("/cart/merge", headers={**user_headers(), **guest})
+
+    assert merged.status_code == 200
+    assert merged.json()["merged_items"] == 1
+    assert merged.json()["holds_transferred"] is False
+    assert len(failures) == main.TRANSFER_ATTEMPTS
+
+
+def test_guest_carts_expire_after_ttl():
+    now = [0.0]
+    storage = CartStorage(guest_ttl=60, clock=lambda: now[0])
+    storage.add_item("guest:a", "p1", "Item", 1.0)
+    now[0] = 30
+    storage.add_item("guest:b", "p1", "Item", 1.0)
+    storage.add_item("user_1", "p1", "Item", 1.0)
+
+    now[0] = 61
+    assert storage.get_cart("guest:a") == []
+    assert storage.get_item_count("guest:b") == 1
+    assert storage.merge_carts("guest:a", "user_1") == (1, 0)
+
+    now[0] = 200
+    assert storage.expire_guests() == 1
+    assert storage.get_item_count("user_1") == 1
+    assert storage.version("guest:b") == 0
+
+
+def test_expired_guest_carts_release_their_holds():
+    now = [0.0]
+    released = []
+    storage = CartStorage(guest_ttl=60, clock=lambda: now[0], on_guest_expired=released.append)
+    storage.add_item("guest:a", "p1", "Item", 1.0)
+    storage.add_item("guest:b", "p1", "Item", 1.0)
+    now[0] = 61
+
+    # Reported after the write that expired them, outside the lock
+    storage.add_item("user_1", "p1", "Item", 1.0)
+    assert released == ["guest:a", "guest:b"]
+    assert storage.expire_guests() == 0
+    assert released == ["guest:a", "guest:b"]
+
+
+def test_clearing_with_an_overdue_guest_cart_does_not_deadlock():
+    now = [0.0]
+    storage = CartStorage(guest_ttl=60, clock=lambda: now[0])
+    storage.add_item("guest:a", "p1", "Item", 1.0)
+    now[0] = 61
+    result = []
+
+    worker = threading.Thread(target=lambda: result.append(storage.clear_cart("guest:b")), daemon=True)
+    worker.start()
+    worker.join(timeout=2)
+
+    assert result == [0]
+    assert storage.get_cart("guest:a") == []
+    # The lock was released: later writes go through
+    assert storage.add_item("guest:b", "p1", "Item", 1.0) == 1
@@ -0,0 +1,147 @@
+import threading
+import time
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.main import JWT_ALGORITHM, JWT_SECRET, app
+from shared.idempotency import IdempotencyInProgress, IdempotencyKeyReused, IdempotencyStore
+
+
+ITEM = {"product_id": "prod_001", "product_name": "Headphones", "price": 10.0, "quantity": 2}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "idempotency", IdempotencyStore())
+    yield TestClient(app)
+    main.cart_storage.clear_cart("idem_user")
+
+
+def headers(key=None):
+    token = jwt.encode({"user_id": "idem_user"}, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    result = {"Authorization": f"Bearer {token}"}
+    if key is not None:
+        result["Idempotency-Key"] = key
+    return result
+
+
+def test_retried_add_is_applied_once(client):
+    first = client.post("/cart/add", json=ITEM, headers=headers("add-1"))
+    retry = client.post("/cart/add", json=ITEM, headers=headers("add-1"))
+    other = client.post("/cart/add", json=ITEM, headers=headers("add-2"))
+
+    assert first.json() == retry.json()
+    assert "idempotent-replayed" not in first.headers
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert other.status_code == 200
+    assert main.cart_storage.get_item_count("idem_user") == 4
+
+
+def test_replays_carry_the_cart_etag(client):
+    first = client.post("/cart/add", json=ITEM, headers=headers("add-1"))
+    retry = client.post("/cart/add", json=ITEM, headers=headers("add-1"))
+
+    assert first.headers["etag"] == f'"{first.json()["version"]}"'
+    assert retry.headers["etag"] == first.headers["etag"]
+
+
+def test_key_reused_with_another_if_match_is_rejected(client):
+    etag = client.get("/cart", headers=headers()).headers["etag"]
+    first = client.post("/cart/add", json=ITEM, headers={**headers("add-1"), "If-Match": etag})
+
+    response = client.post("/cart/add", json=ITEM, headers={**headers("add-1"), "If-Match": first.headers["etag"]})
+
+    assert response.status_code == 422
+    assert main.cart_storage.get_item_count("idem_user") == 2
+
+
+def test_key_reused_for_another_body_is_rejected(client):
+    client.post("/cart/add", json=ITEM, headers=headers("add-1"))
+
+    response = client.post("/cart/add", json=dict(ITEM, quantity=5), headers=headers("add-1"))
+
+    assert response.status_code == 422
+    assert main.cart_storage.get_item_count("idem_user") == 2
+
+
+def test_keys_are_scoped_per_user(client):
+    token = jwt.encode({"user_id": "other_user"}, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    client.post("/cart/add", json=ITEM, headers=headers("shared"))
+
+    response = client.post("/cart/add", json=ITEM, headers={"Authorization": f"Bearer {token}", "Idempotency-Key": "shared"})
+    main.cart_storage.clear_cart("other_user")
+
+    assert "idempotent-replayed" not in response.headers
+
+
+def test_concurrent_duplicates_are_coalesced():
+    store = IdempotencyStore()
+    calls = []
+
+    def operation():
+        calls.append(1)
+        time.sleep(0.1)
+        return 200, {"ok": len(calls)}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(store.execute("u", "k", "f", operation)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(replayed for _, _, replayed in results) == [False, True, True, True, True]
+    assert {body["ok"] for _, body, _ in results} == {1}
+
+
+def test_failures_are_not_remembered_and_duplicates_time_out():
+    store = IdempotencyStore(wait=0.05)
+
+    def boom():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        store.execute("u", "k", "f", boom)
+    assert store.execute("u", "k", "f", lambda: (200, "second try")) == (200, "second try", False)
+
+    with pytest.raises(IdempotencyKeyReused):
+        store.execute("u", "k", "different body", lambda: (200, None))
+
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait()
+        return 200, None
+
+    worker = threading.Thread(target=store.execute, args=("u", "slow", "f", slow))
+    worker.start()
+    started.wait()
+    with pytest.raises(IdempotencyInProgress):
+        store.execute("u", "slow", "f", slow)
+    release.set()
+    worker.join()
+
+
+def test_store_is_bounded_and_expires():
+    now = [0.0]
+    store = IdempotencyStore(ttl=10, keys_per_scope=2, max_scopes=2, clock=lambda: now[0])
+
+    for key in ("a", "b", "c"):
+        store.execute("u1", key, "f", lambda: (200, key))
+    store.execute("u2", "a", "f", lambda: (200, None))
+    store.execute("u3", "a", "f", lambda: (200, None))
+
+    # u1 kept only its two newest keys and was then evicted as the least recent user
+    assert len(store) == 2
+    now[0] = 11
+    assert store.execute("u3", "a", "f", lambda: (201, None)) == (201, None, False)
+
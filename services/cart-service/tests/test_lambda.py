@@ -0,0 +1,26 @@
+import json
+import sys
+from pathlib import Path
+
+from app import main
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from lambda_events import api_gateway_event  # noqa: E402
+
+
+def test_cart_survives_between_invocations(monkeypatch):
+    import jwt
+
+    monkeypatch.setattr(main, "_lambda_adapter", None)
+    token = jwt.encode({"user_id": "lambda_user"}, main.JWT_SECRET, algorithm=main.JWT_ALGORITHM)
+    headers = {"authorization": f"Bearer {token}"}
+    item = {"product_id": "prod_001", "product_name": "Headphones", "price": 10.0, "quantity": 2}
+
+    added = main.handler(api_gateway_event("POST", "/cart/add", item, headers), None)
+    adapter = main._lambda_adapter
+    counted = main.handler(api_gateway_event("GET", "/cart/count", headers=headers), None)
+    main.cart_storage.clear_cart("lambda_user")
+
+    assert added["statusCode"] == 200
+    assert json.loads(counted["body"]) == {"count": 2}
+    assert main._lambda_adapter is adapter
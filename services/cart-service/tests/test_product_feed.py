@@ -0,0 +1,150 @@
+import asyncio
+import json
+
+import httpx
+
+from app.storage import CartStorage
+from shared.product_feed import ProductFeedSubscriber
+
+
+def make_storage():
+    storage = CartStorage()
+    storage.add_item("alice", "prod_001", "Headphones", 299.99, 1)
+    storage.add_item("bob", "prod_001", "Headphones", 299.99, 2)
+    storage.add_item("bob", "prod_002", "Chair", 349.99, 1)
+    return storage
+
+
+def test_price_and_name_changes_update_every_holder():
+    storage = make_storage()
+
+    touched = storage.apply_product_change("upsert", "prod_001", {"name": "Headphones II", "price": 249.0})
+
+    assert touched == 2
+    for user_id in ("alice", "bob"):
+        item = next(i for i in storage.get_cart(user_id) if i.product_id == "prod_001")
+        assert (item.product_name, item.price) == ("Headphones II", 249.0)
+    assert storage.get_cart("bob")[1].price == 349.99
+
+
+def test_stock_only_changes_touch_nothing():
+    storage = make_storage()
+    assert storage.apply_product_change("stock", "prod_001", {"stock": 0}) == 0
+    assert storage.apply_product_change("price", "prod_404", {"price": 1.0}) == 0
+
+
+def test_deleted_products_leave_carts():
+    storage = make_storage()
+
+    storage.apply_product_change("delete", "prod_001", {})
+
+    assert storage.get_cart("alice") == []
+    assert [i.product_id for i in storage.get_cart("bob")] == ["prod_002"]
+    assert storage.product_ids() == ["prod_002"]
+
+
+def test_holder_index_follows_remove_and_clear():
+    storage = make_storage()
+    storage.remove_item("alice", "prod_001")
+    storage.clear_cart("bob")
+    assert storage.product_ids() == []
+
+
+def feed_transport(responses, seen):
+    def handler(request):
+        seen.append(dict(request.url.params))
+        return httpx.Response(200, json=responses.pop(0))
+    return httpx.MockTransport(handler)
+
+
+def test_subscriber_applies_events_and_advances():
+    seen, applied = [], []
+    events = [{"version": 1, "type": "price", "product_id": "prod_001", "changes": {"price": 5.0}}]
+    transport = feed_transport([
+        {"version": 1, "reset": False, "events": events},
+        {"version": 1, "reset": False, "events": []},
+    ], seen)
+    subscriber = ProductFeedSubscriber("http://products/", applied.extend, wait=2, transport=transport)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=transport) as client:
+            await subscriber.poll(client)
+            await subscriber.poll(client)
+
+    asyncio.run(scenario())
+
+    assert applied == events
+    assert [params["since"] for params in seen] == ["0", "1"]
+    assert seen[0]["wait"] == "2"
+
+
+def test_subscriber_reloads_on_reset():
+    seen, resets = [], []
+    transport = feed_transport([{"version": 40, "reset": True, "events": []}], seen)
+
+    async def on_reset(client):
+        resets.append(client)
+
+    subscriber = ProductFeedSubscriber("http://products", lambda events: None, on_reset, transport=transport)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=transport) as client:
+            await subscriber.poll(client)
+
+    asyncio.run(scenario())
+
+    assert len(resets) == 1
+    assert subscriber.version == 40
+
+
+def test_subscriber_follows_the_feed_epoch():
+    seen, resets = [], []
+    transport = feed_transport([
+        {"epoch": "a1", "version": 7, "reset": False, "events": []},
+        # The product service restarted: version 7 of epoch a1 means nothing to it
+        {"epoch": "b2", "version": 2, "reset": True, "events": []},
+    ], seen)
+
+    async def on_reset(client):
+        resets.append(client)
+
+    subscriber = ProductFeedSubscriber("http://products", lambda events: None, on_reset, transport=transport)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=transport) as client:
+            await subscriber.poll(client)
+            await subscriber.poll(client)
+
+    asyncio.run(scenario())
+
+    assert "epoch" not in seen[0]
+    assert (seen[1]["since"], seen[1]["epoch"]) == ("7", "a1")
+    assert len(resets) == 1
+    assert (subscriber.epoch, subscriber.version) == ("b2", 2)
+
+
+def test_reset_reloads_cart_products_in_one_batch_call(monkeypatch):
+    from app import main
+
+    storage = make_storage()
+    requests = []
+
+    def handler(request):
+        requests.append((request.url.path, json.loads(request.content)))
+        return httpx.Response(200, json={
+            "products": [{"id": "prod_001", "name": "Headphones II", "price": 249.0}],
+            "missing": ["prod_002"],
+        })
+
+    monkeypatch.setattr(main, "cart_storage", storage)
+    monkeypatch.setattr(main, "PRODUCT_SERVICE_URL", "http://products")
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            await main.refresh_cart_products(client)
+
+    asyncio.run(run())
+
+    assert requests == [("/products/batch", {"ids": ["prod_001", "prod_002"], "fields": ["id", "name", "price"]})]
+    assert storage.get_cart("alice")[0].price == 249.0
+    assert [i.product_id for i in storage.get_cart("bob")] == ["prod_001"]
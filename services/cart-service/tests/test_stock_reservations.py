@@ -0,0 +1,128 @@
+import json
+
+import httpx
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.main import JWT_ALGORITHM, JWT_SECRET, app
+from app.stock_client import StockClient
+
+
+class FakeStockService:
+    """Stand-in for the product service's /stock endpoints"""
+
+    def __init__(self, stock):
+        self.stock = dict(stock)
+        self.held = {}
+        self.calls = []
+
+    def handler(self, request):
+        payload = json.loads(request.content)
+        self.calls.append((request.url.path, payload))
+        if request.url.path == "/stock/reserve":
+            product_id, quantity = payload["product_id"], payload["quantity"]
+            if product_id not in self.stock:
+                return httpx.Response(404, json={"detail": "Product not found"})
+            if self.stock[product_id] - self.held.get(product_id, 0) < quantity:
+                return httpx.Response(409, json={"detail": f"Only so much {product_id}"})
+            self.held[product_id] = self.held.get(product_id, 0) + quantity
+            return httpx.Response(200, json={"product_id": product_id, "quantity": quantity})
+        if request.url.path == "/stock/transfer":
+            return httpx.Response(200, json={"transferred": sum(self.held.values())})
+        if payload["product_id"] is None:
+            released = sum(self.held.values())
+            self.held.clear()
+        else:
+            held = self.held.get(payload["product_id"], 0)
+            released = held if payload["quantity"] is None else min(held, payload["quantity"])
+            self.held[payload["product_id"]] = held - released
+        return httpx.Response(200, json={"released": released})
+
+
+@pytest.fixture
+def service(monkeypatch):
+    fake = FakeStockService({"prod_009": 3, "prod_001": 10})
+    client = StockClient("http://products", transport=httpx.MockTransport(fake.handler))
+    monkeypatch.setattr(main, "stock_client", client)
+    return fake
+
+
+def auth(user_id):
+    token = jwt.encode({"user_id": user_id}, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    return {"Authorization": f"Bearer {token}"}
+
+
+def add(client, user_id, product_id, quantity):
+    return client.post(
+        "/cart/add",
+        json={"product_id": product_id, "product_name": product_id, "price": 5.0, "quantity": quantity},
+        headers=auth(user_id),
+    )
+
+
+def test_add_reserves_and_refuses_when_sold_out(service):
+    client = TestClient(app)
+
+    assert add(client, "stock_a", "prod_009", 2).status_code == 200
+    refused = add(client, "stock_b", "prod_009", 2)
+
+    assert refused.status_code == 409
+    assert service.held == {"prod_009": 2}
+    assert client.get("/cart", headers=auth("stock_b")).json()["items"] == []
+    assert add(client, "stock_b", "unknown", 1).status_code == 404
+
+
+def test_quantity_changes_adjust_the_hold(service):
+    client = TestClient(app)
+    add(client, "stock_c", "prod_001", 2)
+
+    assert client.put("/cart/update/prod_001?quantity=5", headers=auth("stock_c")).status_code == 200
+    assert service.held["prod_001"] == 5
+    assert client.put("/cart/update/prod_001?quantity=1", headers=auth("stock_c")).status_code == 200
+    assert service.held["prod_001"] == 1
+    assert client.put("/cart/update/prod_001?quantity=20", headers=auth("stock_c")).status_code == 409
+    assert client.get("/cart", headers=auth("stock_c")).json()["total_items"] == 1
+
+
+def test_concurrent_quantity_changes_keep_the_hold_in_step(service, monkeypatch):
+    client = TestClient(app)
+    add(client, "stock_f", "prod_001", 2)
+    handle = service.handler
+    interleaved = []
+
+    def handler(request):
+        response = handle(request)
+        if request.url.path == "/stock/reserve" and not interleaved:
+            # Another request lowers the line while this one holds its extra units
+            interleaved.append(client.put("/cart/update/prod_001?quantity=1", headers=auth("stock_f")))
+        return response
+
+    monkeypatch.setattr(main, "stock_client", StockClient("http://products", transport=httpx.MockTransport(handler)))
+    updated = client.put("/cart/update/prod_001?quantity=5", headers=auth("stock_f"))
+
+    assert interleaved[0].status_code == 200 and updated.status_code == 200
+    assert client.get("/cart", headers=auth("stock_f")).json()["total_items"] == 5
+    assert service.held["prod_001"] == 5
+
+
+def test_remove_and_clear_release_holds(service):
+    client = TestClient(app)
+    add(client, "stock_d", "prod_001", 2)
+    add(client, "stock_d", "prod_009", 1)
+
+    client.delete("/cart/remove/prod_001", headers=auth("stock_d"))
+    assert service.held["prod_001"] == 0
+    client.delete("/cart/clear", headers=auth("stock_d"))
+    assert service.calls[-1] == ("/stock/release", {"owner": "stock_d", "product_id": None, "quantity": None})
+    assert sum(service.held.values()) == 0
+
+
+def test_unreachable_stock_service_fails_closed(monkeypatch):
+    def refuse(request):
+        raise httpx.ConnectError("connection refused")
+
+    monkeypatch.setattr(main, "stock_client", StockClient("http://products", transport=httpx.MockTransport(refuse)))
+
+    assert add(TestClient(app), "stock_e", "prod_001", 1).status_code == 503
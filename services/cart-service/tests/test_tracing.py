@@ -0,0 +1,31 @@
+import jwt
+from fastapi.testclient import TestClient
+
+from app.main import JWT_ALGORITHM, JWT_SECRET, app
+from shared.tracing import InMemoryExporter, format_traceparent, tracer
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+def test_cart_records_auth_and_storage_spans(monkeypatch):
+    exporter = InMemoryExporter()
+    monkeypatch.setattr(tracer, "exporter", exporter)
+    token = jwt.encode({"user_id": "trace_user"}, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+    response = TestClient(app).post(
+        "/cart/add",
+        json={"product_id": "prod_001", "product_name": "Headphones", "price": 10.0},
+        headers={
+            "Authorization": f"Bearer {token}",
+            "traceparent": format_traceparent(TRACE_ID, PARENT_ID, True),
+        },
+    )
+
+    assert response.status_code == 200
+    spans = {span.name: span for span in exporter.spans}
+    assert {"auth.verify_token", "storage.add_item", "POST /cart/add"} <= set(spans)
+    assert all(span.trace_id == TRACE_ID for span in exporter.spans)
+    root = spans["POST /cart/add"]
+    assert root.parent_id == PARENT_ID
+    assert spans["storage.add_item"].parent_id == root.span_id
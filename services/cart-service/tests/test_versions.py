@@ -0,0 +1,135 @@
+import threading
+
+import httpx
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.main import JWT_ALGORITHM, JWT_SECRET, app
+from app.stock_client import StockClient
+from app.storage import CartStorage, VersionConflict
+from tests.test_stock_reservations import FakeStockService
+
+
+ITEM = {"product_id": "prod_001", "product_name": "Headphones", "price": 10.0, "quantity": 1}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "cart_storage", CartStorage())
+    return TestClient(app)
+
+
+def headers(etag=None, user_id="version_user"):
+    token = jwt.encode({"user_id": user_id}, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    result = {"Authorization": f"Bearer {token}"}
+    if etag is not None:
+        result["If-Match"] = etag
+    return result
+
+
+def test_get_cart_returns_version_and_etag(client):
+    empty = client.get("/cart", headers=headers())
+    added = client.post("/cart/add", json=ITEM, headers=headers())
+    cart = client.get("/cart", headers=headers())
+
+    assert empty.json()["version"] == 0
+    assert empty.headers["etag"] == '"0"'
+    assert added.json()["version"] == 1
+    assert added.headers["etag"] == '"1"'
+    assert cart.json()["version"] == 1
+    assert cart.headers["etag"] == '"1"'
+
+
+def test_stale_if_match_fails_with_412(client):
+    client.post("/cart/add", json=ITEM, headers=headers())
+    etag = client.get("/cart", headers=headers()).headers["etag"]
+
+    # Another device writes first
+    first = client.put("/cart/update/prod_001?quantity=3", headers=headers(etag))
+    second = client.put("/cart/update/prod_001?quantity=5", headers=headers(etag))
+
+    assert first.status_code == 200
+    assert second.status_code == 412
+    assert second.headers["etag"] == first.headers["etag"]
+    assert second.json()["version"] == first.json()["version"]
+    assert main.cart_storage.get_item("version_user", "prod_001").quantity == 3
+
+
+def test_every_mutation_honours_if_match(client):
+    client.post("/cart/add", json=ITEM, headers=headers())
+    stale = '"0"'
+
+    assert client.post("/cart/add", json=ITEM, headers=headers(stale)).status_code == 412
+    assert client.delete("/cart/remove/prod_001", headers=headers(stale)).status_code == 412
+    assert client.delete("/cart/clear", headers=headers(stale)).status_code == 412
+    assert main.cart_storage.get_item_count("version_user") == 1
+
+    # "*" and any current tag in a list match
+    assert client.post("/cart/add", json=ITEM, headers=headers("*")).status_code == 200
+    assert client.delete("/cart/clear", headers=headers('"0", "2"')).json()["version"] == 3
+
+
+def test_writes_without_if_match_are_unconditional(client):
+    for _ in range(3):
+        assert client.post("/cart/add", json=ITEM, headers=headers()).status_code == 200
+
+    assert main.cart_storage.version("version_user") == 3
+
+
+def test_conflicting_add_releases_its_stock_hold(client, monkeypatch):
+    fake = FakeStockService({"prod_001": 10})
+    monkeypatch.setattr(
+        main, "stock_client", StockClient("http://products", transport=httpx.MockTransport(fake.handler))
+    )
+    client.post("/cart/add", json=ITEM, headers=headers())
+    storage = main.cart_storage
+    add_item = storage.add_item
+
+    def add_after_another_device(*args, **kwargs):
+        # The other device's write lands between the If-Match check and ours
+        add_item(user_id="version_user", product_id="prod_002", product_name="Mouse", price=5.0)
+        return add_item(*args, **kwargs)
+
+    monkeypatch.setattr(storage, "add_item", add_after_another_device)
+    response = client.post("/cart/add", json=ITEM, headers=headers('"1"'))
+
+    assert response.status_code == 412
+    assert fake.held["prod_001"] == 1
+
+
+def test_versions_survive_clearing_the_cart():
+    storage = CartStorage()
+    storage.add_item("u", "p1", "Item", 1.0)
+    storage.clear_cart("u")
+
+    # The empty cart is not version 0 again, so a tag from before the first add stays stale
+    with pytest.raises(VersionConflict):
+        storage.add_item("u", "p1", "Item", 1.0, expected_version=0)
+    assert storage.clear_cart("u", expected_version=2) == 2
+
+
+def test_concurrent_conditional_writes_have_one_winner():
+    storage = CartStorage()
+    storage.add_item("u", "p1", "Item", 1.0)
+    winners = []
+    barrier = threading.Barrier(8)
+
+    def write(quantity):
+        barrier.wait()
+        try:
+            storage.update_quantity("u", "p1", quantity, expected_version=1)
+            winners.append(quantity)
+        except VersionConflict:
+            pass
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(2, 10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(winners) == 1
+    assert storage.get_item("u", "p1").quantity == winners[0]
+    assert storage.version("u") == 2
@@ -0,0 +1,24 @@
+"""
+API Gateway events for the services' Lambda handler tests
+Each service's tests/test_lambda.py imports this one copy by path
+"""
+import json
+
+
+def api_gateway_event(method: str, path: str, body: dict = None, headers: dict = None) -> dict:
+    """A REST API (v1) proxy event as API Gateway sends it"""
+    return {
+        "resource": "/{proxy+}",
+        "path": path,
+        "httpMethod": method,
+        "headers": {"host": "localhost", "content-type": "application/json", **(headers or {})},
+        "multiValueHeaders": {},
+        "queryStringParameters": None,
+        "multiValueQueryStringParameters": None,
+        "pathParameters": None,
+        "stageVariables": None,
+        "requestContext": {"resourcePath": "/{proxy+}", "httpMethod": method, "path": path, "stage": "prod",
+                           "identity": {"sourceIp": "127.0.0.1"}},
+        "body": json.dumps(body) if body is not None else None,
+        "isBase64Encoded": False,
+    }
@@ -0,0 +1,154 @@
+"""
+Catalog change feed
+Monotonically versioned log of product changes so downstream caches can
+invalidate exactly the keys that changed
+"""
+import asyncio
+import secrets
+import threading
+from collections import deque
+from itertools import islice
+from typing import AsyncIterator, Deque, Iterable, List, Optional, Tuple
+
+from .serialization import dumps
+
+
+# upsert: new product or several fields changed; price/stock: only that field changed
+CHANGE_TYPES = ("upsert", "delete", "price", "stock")
+
+# Longest a long-poll or stream read may be held open
+MAX_WAIT_SECONDS = 30.0
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class ChangeFeed:
+    """
+    Bounded in-memory change log
+
+    Every event gets the next version number, so a consumer only has to
+    remember the last version it applied. If that version is no longer in
+    the log (the consumer fell too far behind), read() answers with
+    reset=True and the consumer must reload whatever it holds before
+    continuing from the returned version. Versions restart at 0 with the
+    process, so every feed has a random `epoch`: a consumer passes back the
+    epoch its version came from and gets a reset when it does not match.
+
+    Writers may be worker threads; waiters may be threads (wait) or
+    coroutines (wait_async) on any event loop.
+    """
+
+    def __init__(self, maxlen: int = 50_000):
+        self._events: Deque[dict] = deque(maxlen=maxlen)
+        self._condition = threading.Condition()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self.version = 0
+        self.epoch = secrets.token_hex(8)
+
+    def publish(self, changes: Iterable[Tuple[str, str, dict]]) -> int:
+        """Append (type, product_id, changed fields) events; returns the new version"""
+        with self._condition:
+            for change_type, product_id, fields in changes:
+                self.version += 1
+                self._events.append({
+                    "version": self.version,
+                    "type": change_type,
+                    "product_id": product_id,
+                    "changes": fields,
+                })
+            self._condition.notify_all()
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+        return self.version
+
+    def read(self, since: int, limit: int = 1000, epoch: Optional[str] = None) -> dict:
+        """
+        Events after version `since` of `epoch` (None: this feed's), oldest first
+
+        `version` and `epoch` in the result are what to pass next time.
+        """
+        with self._condition:
+            latest = self.version
+            oldest = self._events[0]["version"] if self._events else latest + 1
+            if (epoch is not None and epoch != self.epoch) or since > latest or since < oldest - 1:
+                return {"epoch": self.epoch, "version": latest, "reset": True, "events": []}
+            # Versions in the log are contiguous, so the offset is arithmetic
+            start = since - oldest + 1
+            events = list(islice(self._events, start, start + limit))
+        return {
+            "epoch": self.epoch,
+            "version": events[-1]["version"] if events else latest,
+            "reset": False,
+            "events": events,
+        }
+
+    def wait(self, since: int, timeout: float) -> bool:
+        """Block the calling thread until there is a change after `since`"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self.version != since, timeout)
+
+    async def wait_async(self, since: int, timeout: float) -> bool:
+        """Wait on the event loop (no thread held) until there is a change after `since`"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._condition:
+            if self.version != since:
+                return True
+            self._waiters.append((loop, future))
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._condition:
+                if (loop, future) in self._waiters:
+                    self._waiters.remove((loop, future))
+
+
+change_feed = ChangeFeed()
+
+
+def parse_last_event_id(value: Optional[str]) -> Optional[Tuple[Optional[str], int]]:
+    """(epoch, version) from an SSE Last-Event-ID header ('<epoch>:<version>' or a bare version), or None"""
+    if not value:
+        return None
+    epoch, _, version = value.rpartition(":")
+    try:
+        return epoch or None, int(version)
+    except ValueError:
+        return None
+
+
+async def sse_events(
+    feed: ChangeFeed,
+    since: int,
+    heartbeat: float = 15.0,
+    limit: int = 1000,
+    epoch: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    Server-sent events for every change after `since` (of `epoch`)
+
+    Each event's id is '<epoch>:<version>', so a reconnecting EventSource
+    resumes via Last-Event-ID, also across a restart of the service. A
+    `reset` event tells the consumer to reload. Comment lines are sent
+    while idle to keep proxies from closing the stream.
+    """
+    position = since
+    while True:
+        batch = feed.read(position, limit, epoch)
+        epoch = batch["epoch"]
+        if batch["reset"]:
+            yield f"id: {epoch}:{batch['version']}\nevent: reset\ndata: {{}}\n\n"
+        for event in batch["events"]:
+            yield f"id: {epoch}:{event['version']}\nevent: {event['type']}\ndata: {dumps(event).decode()}\n\n"
+        position = batch["version"]
+        if not batch["events"] and not batch["reset"]:
+            if not await feed.wait_async(position, heartbeat):
+                yield ": keepalive\n\n"
+
@@ -2,11 +2,26 @@
 Product data storage
 In production, this would be replaced with database queries
 """
+import random
 from datetime import datetime, timedelta
-from typing import List
+from typing import Iterator, List
 from .models import Product
 
 
+# Vocabulary for synthetic catalogs: category -> (weight, base price, nouns)
+SYNTHETIC_CATEGORIES = {
+    "Electronics": (0.45, 120.0, ["Headphones", "Webcam", "Keyboard", "Mouse", "Speaker", "Charger", "Monitor", "SSD"]),
+    "Furniture": (0.10, 250.0, ["Desk", "Chair", "Shelf", "Lamp", "Cabinet"]),
+    "Wearables": (0.10, 180.0, ["Watch", "Fitness Band", "Earbuds", "Smart Ring"]),
+    "Accessories": (0.20, 40.0, ["Backpack", "Sleeve", "Stand", "Cable", "Hub"]),
+    "Appliances": (0.15, 150.0, ["Coffee Maker", "Blender", "Kettle", "Air Purifier"]),
+}
+SYNTHETIC_ADJECTIVES = [
+    "Wireless", "Portable", "Premium", "Compact", "Ergonomic", "Smart",
+    "Ultra", "Pro", "Classic", "Adjustable", "Rechargeable", "Foldable"
+]
+
+
 def get_products_data() -> List[Product]:
     """
     Returns sample product data
@@ -213,4 +228,54 @@ def get_products_data() -> List[Product]:
         )
     ]
     
-    return products
\ No newline at end of file
+    return products
+
+
+def generate_products(count: int, seed: int = 42) -> List[Product]:
+    """
+    Build a catalog of `count` products for benchmarks and load tests
+    See iter_generated_products() for the distributions used.
+    """
+    return list(iter_generated_products(count, seed))
+
+
+def iter_generated_products(count: int, seed: int = 42) -> Iterator[Product]:
+    """
+    Yield `count` products one at a time (constant memory for huge catalogs)
+
+    Starts with the sample products from get_products_data() and pads with
+    synthetic ones drawn from skewed, realistic distributions:
+    log-normal prices around a per-category base, ratings clustered around
+    4.3, heavy-tailed (Pareto) sales correlated with popularity, a few
+    percent out of stock, and product ages weighted towards recent items.
+    The same seed always yields the same catalog.
+    """
+    sample = get_products_data()[:count]
+    yield from sample
+    rng = random.Random(seed)
+    now = datetime.now()
+    categories = list(SYNTHETIC_CATEGORIES)
+    weights = [SYNTHETIC_CATEGORIES[c][0] for c in categories]
+
+    for index in range(len(sample) + 1, count + 1):
+        category = rng.choices(categories, weights)[0]
+        _, base_price, nouns = SYNTHETIC_CATEGORIES[category]
+        adjective = rng.choice(SYNTHETIC_ADJECTIVES)
+        noun = rng.choice(nouns)
+        popularity = min(100, max(0, int(rng.betavariate(5, 2) * 100)))
+        sales = int(rng.paretovariate(1.2) * 20 * (1 + popularity / 25))
+        stock = 0 if rng.random() < 0.04 else int(rng.expovariate(1 / 80))
+
+        yield Product(
+            id=f"prod_{index:03d}",
+            name=f"{adjective} {noun} {index}",
+            description=f"{adjective} {noun.lower()} for everyday {category.lower()} use",
+            price=round(max(1.0, rng.lognormvariate(0, 0.6) * base_price), 2),
+            popularity=popularity,
+            rating=round(min(5.0, max(1.0, rng.gauss(4.3, 0.4))), 1),
+            sales_count=sales,
+            stock=stock,
+            category=category,
+            image_url=f"https://images.example.com/{category.lower()}/{index}.jpg",
+            created_at=now - timedelta(days=int(rng.expovariate(1 / 120)))
+        )
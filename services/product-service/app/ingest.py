@@ -0,0 +1,256 @@
+"""
+Bulk catalog ingestion
+Streams NDJSON or CSV product rows into the catalog in validated batches
+
+Usage (from services/product-service/):
+    python -m app.ingest products.ndjson --db catalog.db
+    python -m app.ingest products.csv.gz --batch-size 10000
+    cat products.ndjson | python -m app.ingest - --format ndjson
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+
+from shared.tracing import tracer
+
+from .models import Product
+from .repository import CatalogRepository, SQLiteCatalogRepository
+from .serialization import loads
+
+
+FORMATS = ("ndjson", "csv")
+DEFAULT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+
+# One validator call per batch instead of one Product(...) per row
+_batch_adapter = TypeAdapter(List[Product])
+
+
+@dataclass
+class IngestReport:
+    """Outcome of one import; rejected rows are listed up to MAX_REPORTED_ERRORS"""
+    format: str
+    rows_read: int = 0
+    rows_written: int = 0
+    rows_rejected: int = 0
+    batches: int = 0
+    elapsed_s: float = 0.0
+    errors: List[dict] = field(default_factory=list)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_read / self.elapsed_s if self.elapsed_s else 0.0
+
+    def reject(self, line: int, message: str) -> None:
+        self.rows_rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def to_dict(self) -> dict:
+        return {
+            "format": self.format,
+            "rows_read": self.rows_read,
+            "rows_written": self.rows_written,
+            "rows_rejected": self.rows_rejected,
+            "batches": self.batches,
+            "elapsed_s": round(self.elapsed_s, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+            "errors": self.errors,
+        }
+
+
+def _error_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}"
+        for error in exc.errors()
+    )
+
+
+# ============================================================================
+# Row readers
+# ============================================================================
+
+def read_ndjson(stream: TextIO) -> Iterator[Tuple[int, str]]:
+    """Yield (line number, raw JSON text) for each non-blank line"""
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if line:
+            yield line_number, line
+
+
+def read_csv(stream: TextIO) -> Iterator[Tuple[int, dict]]:
+    """
+    Yield (line number, row dict) using the header row for field names
+    Empty cells are dropped so optional fields fall back to their defaults.
+    """
+    reader = csv.DictReader(stream)
+    for row in reader:
+        row.pop(None, None)  # surplus cells beyond the header
+        yield reader.line_num, {key: value for key, value in row.items() if value != ""}
+
+
+READERS = {"ndjson": read_ndjson, "csv": read_csv}
+
+
+def batched(rows: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def validate_batch(fmt: str, batch: List[Tuple[int, object]], report: IngestReport) -> List[Product]:
+    """
+    Validate a batch in a single pydantic call
+
+    NDJSON lines are spliced into one JSON array and decoded in one go;
+    decoding with orjson and validating the Python objects is about twice
+    as fast as pydantic's own validate_json here. If anything in the batch
+    is invalid, the rows are re-validated one by one to find and skip the
+    bad ones.
+    """
+    items = [item for _, item in batch]
+    try:
+        if fmt == "ndjson":
+            items = loads("[" + ",".join(items) + "]")
+        products = _batch_adapter.validate_python(items)
+        # A line holding several comma-separated values would shift the array
+        if len(products) == len(batch):
+            return products
+    except (ValueError, ValidationError):
+        pass
+
+    products = []
+    for line_number, item in batch:
+        try:
+            products.append(Product.model_validate(loads(item) if fmt == "ndjson" else item))
+        except ValidationError as exc:
+            report.reject(line_number, _error_message(exc))
+        except ValueError as exc:
+            report.reject(line_number, f"invalid JSON: {exc}")
+    return products
+
+
+def ingest_stream(
+    stream: TextIO,
+    catalog: CatalogRepository,
+    fmt: str = "ndjson",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    on_batch: Optional[Callable[[IngestReport], None]] = None
+) -> IngestReport:
+    """
+    Import every row of `stream` into `catalog`
+
+    Only one batch is held in memory at a time, so memory use does not
+    depend on the file size. Each batch is a separate upsert: readers keep
+    serving the previous catalog version (SQLite WAL, or the dict swap in
+    the in-memory store) and the full-text index is updated by the
+    store's triggers as part of the same transaction.
+    """
+    if fmt not in READERS:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+    report = IngestReport(format=fmt)
+    started = time.perf_counter()
+    for batch in batched(READERS[fmt](stream), batch_size):
+        with tracer.span("catalog.ingest_batch", rows=len(batch)):
+            report.rows_read += len(batch)
+            products = validate_batch(fmt, batch, report)
+            if products:
+                report.rows_written += catalog.upsert_many(products)
+        report.batches += 1
+        report.elapsed_s = time.perf_counter() - started
+        if on_batch is not None:
+            on_batch(report)
+    report.elapsed_s = time.perf_counter() - started
+    return report
+
+
+def detect_format(name: str, content_type: Optional[str] = None) -> str:
+    """Pick the format from a content type or file name (defaults to NDJSON)"""
+    if content_type and "csv" in content_type:
+        return "csv"
+    base = name[:-3] if name.endswith(".gz") else name
+    return "csv" if base.endswith(".csv") else "ndjson"
+
+
+class ChunkReader(io.RawIOBase):
+    """Read-only binary file over an iterator of byte chunks (e.g. a request body)"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._pending = chunk
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def open_chunks(chunks: Iterable[bytes]) -> TextIO:
+    """Wrap byte chunks as a UTF-8 text stream suitable for the row readers"""
+    return io.TextIOWrapper(io.BufferedReader(ChunkReader(chunks)), encoding="utf-8", newline="")
+
+
+def _open_path(path: str) -> TextIO:
+    if path == "-":
+        return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import products from NDJSON or CSV into the SQLite catalog")
+    parser.add_argument("path", help="input file (.ndjson, .jsonl, .csv, optionally .gz) or - for stdin")
+    parser.add_argument("--format", choices=FORMATS, help="defaults to the file extension")
+    parser.add_argument("--db", default=os.getenv("CATALOG_DB_PATH", "catalog.db"))
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--quiet", action="store_true", help="no progress lines on stderr")
+    args = parser.parse_args(argv)
+
+    def progress(report: IngestReport) -> None:
+        if report.batches % 100 == 0:
+            print(f"{report.rows_read} rows, {report.rows_per_second:.0f} rows/s", file=sys.stderr)
+
+    catalog = SQLiteCatalogRepository(args.db)
+    try:
+        with _open_path(args.path) as stream:
+            report = ingest_stream(
+                stream,
+                catalog,
+                fmt=args.format or detect_format(args.path),
+                batch_size=args.batch_size,
+                on_batch=None if args.quiet else progress
+            )
+    finally:
+        catalog.close()
+
+    print(json.dumps(report.to_dict(), indent=2))
+    return 1 if report.rows_rejected else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,21 +2,76 @@
 Product Ranking Service
 Handles product listing with intelligent ranking algorithm
 """
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
-import uvicorn
+import anyio
+import heapq
+import os
+import time
 
-from .models import Product, ProductResponse
+from shared.metrics import MetricsMiddleware, metrics_response
+from shared.tracing import TracingMiddleware, tracer
+
+from .models import (
+    BATCH_FIELDS,
+    Product,
+    ProductBatchRequest,
+    ProductResponse,
+    ProductUpdate,
+    StockCommitRequest,
+    StockReleaseRequest,
+    StockReserveRequest,
+    StockTransferRequest,
+    WeightProfile,
+)
 from .ranking import ProductRanker
-from .data import get_products_data
+from .parallel_ranking import RANK_WORKERS, ParallelRanker
+from .profiles import DEFAULT_PROFILE, ProfileRanker, load_profiles_from_env
+from .repository import get_catalog
+from .changefeed import MAX_WAIT_SECONDS, change_feed, parse_last_event_id, sse_events
+from .stock import InsufficientStock, StockLedger
+from .sales import SALES_CHECKPOINT_PATH, SALES_HALF_LIFE_DAYS, SalesVelocity, parse_events
+from .ingest import DEFAULT_BATCH_SIZE, FORMATS, detect_format, ingest_stream, open_chunks
+from .serialization import FastJSONResponse, product_row
+from .snapshot import ReadOnlyCatalog
+
+# Set in the worker processes of multi-worker mode (app.workers): the writer
+# process behind this socket owns catalog writes, stock holds, sales and the change feed
+WRITER_SOCKET = os.getenv("PRODUCT_WRITER_SOCKET")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Restore and checkpoint sales velocity; stop the ranking worker pool on shutdown"""
+    # Only the process that records sales checkpoints them
+    checkpoints = sales_velocity is not None and live_state is None
+    if checkpoints:
+        sales_velocity.start(SALES_CHECKPOINT_PATH)
+    yield
+    if checkpoints:
+        sales_velocity.stop(SALES_CHECKPOINT_PATH)
+    parallel_ranker.close()
+
 
 app = FastAPI(
     title="Product Ranking Service",
     description="E-commerce product service with intelligent ranking",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
 )
 
+if WRITER_SOCKET:
+    from .writer import LiveStateMirror, WriterProxy
+    # Innermost, so metrics and tracing still cover forwarded requests
+    app.add_middleware(WriterProxy, socket_path=WRITER_SOCKET)
+
 # CORS configuration for local development
 app.add_middleware(
     CORSMiddleware,
@@ -26,9 +81,61 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize ranker and load data
-ranker = ProductRanker()
-products_db = get_products_data()
+# Per-route request counts and latency histograms, exposed at /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Continues traces started by the gateway (W3C traceparent)
+app.add_middleware(TracingMiddleware, service_name="product-service")
+
+
+@app.exception_handler(ReadOnlyCatalog)
+async def read_only_catalog(request: Request, exc: ReadOnlyCatalog):
+    """Writes against a published snapshot with no writable store behind it"""
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
+if WRITER_SOCKET:
+    # Workers rank with a copy of the writer's holds and sales counters
+    live_state = LiveStateMirror.over_socket(WRITER_SOCKET, get_catalog, sales=SALES_HALF_LIFE_DAYS > 0)
+    stock_ledger = live_state.stock
+    sales_velocity = live_state.sales
+else:
+    live_state = None
+    # Reservations on top of catalog stock; the ranker's stock penalty uses live stock
+    stock_ledger = StockLedger(get_catalog)
+    # Decayed recent sales from order events (SALES_HALF_LIFE_DAYS=0 keeps lifetime sales_count)
+    sales_velocity = SalesVelocity(get_catalog) if SALES_HALF_LIFE_DAYS > 0 else None
+
+# Initialize ranker; the catalog is loaded lazily on first request
+ranker = ProductRanker(
+    stock_source=stock_ledger.live_stock,
+    sales_source=sales_velocity.velocity if sales_velocity is not None else None
+)
+
+# Large re-ranks fan out to RANK_WORKERS processes (0 keeps ranking in-process)
+parallel_ranker = ParallelRanker(ranker, workers=RANK_WORKERS)
+
+
+def live_ranking_state() -> tuple:
+    """Versions of the live score inputs: stock holds and sales velocity"""
+    if sales_velocity is None:
+        return (stock_ledger.version,)
+    # Sales decay continuously; the minute bucket bounds how stale a cached page gets
+    return stock_ledger.version, sales_velocity.version, int(time.time() // 60)
+
+
+def ranking_state() -> tuple:
+    """Everything a ranked page depends on besides the query"""
+    catalog = get_catalog()
+    return (catalog, catalog.version) + live_ranking_state()
+
+
+# Named weight profiles; ranked pages are cached until the catalog, live stock or sales change
+profile_ranker = ProfileRanker(
+    ranker,
+    parallel=parallel_ranker,
+    state=ranking_state,
+    profiles=load_profiles_from_env()
+)
 
 
 @app.get("/")
@@ -37,12 +144,51 @@ def health_check():
     return {"status": "healthy", "service": "product-ranking"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics endpoint"""
+    return metrics_response()
+
+
+# sort_by options that order by a single field: (key, highest first)
+SORT_KEYS = {
+    "price": (lambda p: p.price, False),
+    "popularity": (lambda p: p.popularity, True),
+    "rating": (lambda p: p.rating, True),
+}
+
+
+def check_page(limit: Optional[int], offset: int) -> None:
+    if offset < 0 or (limit is not None and limit <= 0):
+        raise HTTPException(status_code=400, detail="limit must be positive and offset non-negative")
+
+
+def check_profile(profile: str) -> None:
+    try:
+        profile_ranker.weights_for(profile)
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Unknown ranking profile: {profile}")
+
+
+def sort_page(products: List[Product], sort_by: str, limit: Optional[int], offset: int) -> List[Product]:
+    key, reverse = SORT_KEYS[sort_by]
+    if limit is None:
+        return sorted(products, key=key, reverse=reverse)[offset:]
+    # nlargest/nsmallest are stable, i.e. equal to sorted(...)[:n]
+    select = heapq.nlargest if reverse else heapq.nsmallest
+    return select(offset + limit, products, key=key)[offset:]
+
+
 @app.get("/products", response_model=List[ProductResponse])
 def get_products(
     sort_by: Optional[str] = "ranking",
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
-    min_rating: Optional[float] = None
+    min_rating: Optional[float] = None,
+    category: Optional[str] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    profile: str = DEFAULT_PROFILE
 ):
     """
     Get all products with ranking applied
@@ -52,50 +198,94 @@ def get_products(
     - min_price: Filter by minimum price
     - max_price: Filter by maximum price
     - min_rating: Filter by minimum rating
+    - category: Filter by exact category
+    - limit: Page size (default: everything)
+    - offset: Products to skip before the page
+    - profile: Ranking weight profile (see /ranking/profiles)
     """
-    # Apply filters
-    filtered_products = products_db.copy()
-    
-    if min_price is not None:
-        filtered_products = [p for p in filtered_products if p.price >= min_price]
-    
-    if max_price is not None:
-        filtered_products = [p for p in filtered_products if p.price <= max_price]
+    check_page(limit, offset)
+    check_profile(profile)
     
-    if min_rating is not None:
-        filtered_products = [p for p in filtered_products if p.rating >= min_rating]
+    # Filters are pushed down to the catalog backend (indexed in SQLite)
+    def load():
+        return get_catalog().list(
+            min_price=min_price,
+            max_price=max_price,
+            min_rating=min_rating,
+            category=category
+        )
     
-    # Apply ranking
-    if sort_by == "ranking":
-        ranked_products = ranker.rank_products(filtered_products)
-    elif sort_by == "price":
-        ranked_products = sorted(filtered_products, key=lambda x: x.price)
-    elif sort_by == "popularity":
-        ranked_products = sorted(filtered_products, key=lambda x: x.popularity, reverse=True)
-    elif sort_by == "rating":
-        ranked_products = sorted(filtered_products, key=lambda x: x.rating, reverse=True)
+    # Apply ranking (drop expired holds first so live stock is current)
+    stock_ledger.expire()
+    unfiltered = min_price is None and max_price is None and min_rating is None and category is None
+    published = None
+    if sort_by == "ranking" and profile == DEFAULT_PROFILE and unfiltered:
+        # Snapshot catalogs ship the default ranking precomputed, identical in every
+        # worker; it is only used while the holds and sales it was scored with are current
+        published = get_catalog().published_ranking(limit, offset, live_ranking_state())
+    if published is not None:
+        ranked = published
+    elif sort_by in SORT_KEYS:
+        ranked = [(p, None) for p in sort_page(load(), sort_by, limit, offset)]
     else:
-        ranked_products = ranker.rank_products(filtered_products)
-    
-    # Convert to response format with ranking scores
-    response = []
-    for idx, product in enumerate(ranked_products):
-        score = ranker.calculate_score(product) if sort_by == "ranking" else None
-        response.append(
-            ProductResponse(
-                **product.dict(),
-                rank=idx + 1,
-                ranking_score=score
-            )
-        )
+        key = ("list", min_price, max_price, min_rating, category)
+        ranked = profile_ranker.rank_page(load, profile, limit, offset, key=key)
+        if sort_by != "ranking":
+            ranked = [(p, None) for p, score in ranked]
     
-    return response
+    # Rows are built from the already validated products and encoded directly,
+    # skipping per-item ProductResponse construction and response_model checks
+    return FastJSONResponse([
+        product_row(product, rank=offset + idx + 1, ranking_score=score)
+        for idx, (product, score) in enumerate(ranked)
+    ])
+
+
+# Declared before /products/{product_id} so "changes" is not taken as an id
+@app.get("/products/changes")
+async def get_changes(since: int = 0, limit: int = 1000, wait: float = 0, epoch: Optional[str] = None):
+    """
+    Catalog changes after version `since` (long-poll)
+
+    Query Parameters:
+    - since: last version the caller has applied
+    - epoch: the feed epoch that version came from (omit on the first call)
+    - limit: maximum events returned
+    - wait: seconds to hold the request open when there is nothing new (max 30)
+
+    Returns {"epoch", "version", "reset", "events"}; pass `version` and
+    `epoch` back on the next call. reset=true means `since` is no longer
+    in the log (or the service restarted) and the caller should drop or
+    reload everything it caches.
+    """
+    limit = max(1, min(limit, 10_000))
+    batch = change_feed.read(since, limit, epoch)
+    if wait > 0 and not batch["events"] and not batch["reset"]:
+        if await change_feed.wait_async(since, min(wait, MAX_WAIT_SECONDS)):
+            batch = change_feed.read(since, limit, epoch)
+    return batch
+
+
+@app.get("/products/changes/stream")
+async def stream_changes(since: Optional[int] = None, last_event_id: Optional[str] = Header(None)):
+    """Server-sent event stream of catalog changes; resumes from Last-Event-ID"""
+    resume = parse_last_event_id(last_event_id)
+    if resume is not None:
+        epoch, start = resume
+    else:
+        epoch, start = None, since if since is not None else change_feed.version
+    return StreamingResponse(
+        sse_events(change_feed, start, epoch=epoch),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
 
 
 @app.get("/products/{product_id}", response_model=ProductResponse)
 def get_product(product_id: str):
     """Get a specific product by ID"""
-    product = next((p for p in products_db if p.id == product_id), None)
+    with tracer.span("catalog.lookup", product_id=product_id):
+        product = get_catalog().get(product_id)
     
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
@@ -103,50 +293,368 @@ def get_product(product_id: str):
     # Calculate ranking score for this product
     score = ranker.calculate_score(product)
     
-    return ProductResponse(
-        **product.dict(),
-        rank=None,  # Single product doesn't have a rank
-        ranking_score=score
-    )
+    # Single product doesn't have a rank
+    return FastJSONResponse(product_row(product, rank=None, ranking_score=score))
+
+
+@app.post("/products/batch")
+def get_products_batch(request: ProductBatchRequest):
+    """
+    Look up to MAX_BATCH_IDS products by id in one call
+    Resolved through the catalog's id index; rows come back in request
+    order with only the requested fields, unknown ids under "missing".
+    "available" is stock net of live reservations.
+    """
+    ids = list(dict.fromkeys(request.ids))
+    fields = request.fields or BATCH_FIELDS
+    with tracer.span("catalog.lookup_many", count=len(ids)):
+        products = get_catalog().get_many(ids)
+
+    stock_ledger.expire()
+    live_stock = stock_ledger.live_stock
+    rows = []
+    for product in products:
+        values = product.__dict__
+        rows.append({
+            field: live_stock(product) if field == "available" else values[field]
+            for field in fields
+        })
+    found = {product.id for product in products}
+    return {"products": rows, "missing": [pid for pid in ids if pid not in found]}
+
+
+@app.put("/products/{product_id}", response_model=ProductResponse)
+def put_product(product_id: str, product: Product):
+    """Create or replace a product"""
+    if product.id != product_id:
+        raise HTTPException(status_code=400, detail="Product id does not match the URL")
+    get_catalog().upsert_many([product])
+    return FastJSONResponse(product_row(product, rank=None, ranking_score=ranker.calculate_score(product)))
+
+
+@app.patch("/products/{product_id}", response_model=ProductResponse)
+def patch_product(product_id: str, update: ProductUpdate):
+    """Change some fields of a product (e.g. price or stock)"""
+    catalog = get_catalog()
+    # Under the ledger's lock, so a checkout's stock decrement is not overwritten with the old stock
+    with stock_ledger.locked(product_id):
+        product = catalog.get(product_id)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        
+        try:
+            product = Product.model_validate({**product.__dict__, **update.model_dump(exclude_unset=True)})
+        except ValidationError as exc:
+            # e.g. {"name": null} for a required field
+            raise RequestValidationError(exc.errors())
+        catalog.upsert_many([product])
+    return FastJSONResponse(product_row(product, rank=None, ranking_score=ranker.calculate_score(product)))
+
+
+@app.delete("/products/{product_id}")
+def delete_product(product_id: str):
+    """Remove a product from the catalog"""
+    if not get_catalog().delete(product_id):
+        raise HTTPException(status_code=404, detail="Product not found")
+    if sales_velocity is not None:
+        sales_velocity.forget([product_id])
+    return {"message": "Product deleted", "product_id": product_id}
 
 
-@app.get("/products/search/{query}")
-def search_products(query: str):
-    """Search products by name or description"""
-    query_lower = query.lower()
-    results = [
-        p for p in products_db 
-        if query_lower in p.name.lower() or 
-           (p.description and query_lower in p.description.lower())
-    ]
+@app.get("/products/search/{query}", response_model=List[ProductResponse])
+def search_products(
+    query: str,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    profile: str = DEFAULT_PROFILE
+):
+    """Search products by name or description (optionally one page: limit/offset)"""
+    check_page(limit, offset)
+    check_profile(profile)
+    
+    def load():
+        with tracer.span("catalog.search", query=query):
+            return get_catalog().search(query)
     
     # Rank the search results
-    ranked_results = ranker.rank_products(results)
-    
-    response = []
-    for idx, product in enumerate(ranked_results):
-        score = ranker.calculate_score(product)
-        response.append(
-            ProductResponse(
-                **product.dict(),
-                rank=idx + 1,
-                ranking_score=score
-            )
+    stock_ledger.expire()
+    ranked_results = profile_ranker.rank_page(load, profile, limit, offset, key=("search", query))
+    
+    return FastJSONResponse([
+        product_row(product, rank=offset + idx + 1, ranking_score=score)
+        for idx, (product, score) in enumerate(ranked_results)
+    ])
+
+
+@app.get("/products/ranking/explain")
+def explain_ranking_page(
+    ids: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_rating: Optional[float] = None,
+    category: Optional[str] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    profile: str = DEFAULT_PROFILE
+):
+    """
+    Score breakdowns for a ranked page of products, in rank order
+    
+    Takes the same filters and paging as GET /products; with `ids`
+    (comma-separated) explains exactly those products instead.
+    Factor scores come from the stored factor vectors.
+    """
+    check_page(limit, offset)
+    check_profile(profile)
+    stock_ledger.expire()
+    if ids is not None:
+        products = get_catalog().get_many(i for i in ids.split(",") if i)
+        return FastJSONResponse([profile_ranker.explain(product, profile) for product in products])
+    
+    def load():
+        return get_catalog().list(
+            min_price=min_price,
+            max_price=max_price,
+            min_rating=min_rating,
+            category=category
         )
     
-    return response
+    key = ("list", min_price, max_price, min_rating, category)
+    return FastJSONResponse(profile_ranker.explain_page(load, profile, limit, offset, key=key))
 
 
-# Lambda handler for AWS deployment
-def lambda_handler(event, context):
+@app.get("/products/{product_id}/ranking/explain")
+def explain_product_ranking(product_id: str, profile: str = DEFAULT_PROFILE):
+    """Score breakdown (factor scores, weights, contributions) for one product"""
+    check_profile(profile)
+    product = get_catalog().get(product_id)
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    stock_ledger.expire()
+    return FastJSONResponse(profile_ranker.explain(product, profile))
+
+
+@app.get("/ranking/profiles")
+def list_ranking_profiles():
+    """Weight profiles that can be passed as ?profile= to listings and search"""
+    return profile_ranker.profiles()
+
+
+@app.put("/ranking/profiles/{name}")
+def put_ranking_profile(name: str, weights: WeightProfile):
+    """
+    Create or replace a weight profile (takes effect on the next request)
+    Unset factors weigh 0; weights are scaled to sum to 1.
+    """
+    try:
+        return {"profile": name, "weights": profile_ranker.set_profile(name, weights)}
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.delete("/ranking/profiles/{name}")
+def delete_ranking_profile(name: str):
+    try:
+        profile_ranker.delete_profile(name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"message": "Profile deleted", "profile": name}
+
+
+@app.post("/products/import")
+async def import_products(
+    request: Request,
+    format: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE
+):
+    """
+    Bulk import products from an NDJSON or CSV request body
+
+    The body is streamed: rows are validated and upserted in batches by a
+    worker thread that pulls chunks from the request as it needs them, so
+    neither the event loop nor concurrent reads wait for the import.
+    
+    Query Parameters:
+    - format: ndjson or csv (default: from Content-Type, else ndjson)
+    - batch_size: rows per validated batch / catalog transaction
+    """
+    fmt = format or detect_format("", request.headers.get("content-type"))
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {fmt}")
+    if batch_size < 1:
+        raise HTTPException(status_code=400, detail="batch_size must be positive")
+
+    chunks = request.stream()
+
+    async def next_chunk() -> Optional[bytes]:
+        try:
+            return await chunks.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    def body():
+        # Runs in the worker thread; each chunk is awaited on the event loop
+        while True:
+            chunk = anyio.from_thread.run(next_chunk)
+            if chunk is None:
+                return
+            yield chunk
+
+    def run():
+        with open_chunks(body()) as stream:
+            return ingest_stream(stream, get_catalog(), fmt=fmt, batch_size=batch_size)
+
+    try:
+        report = await run_in_threadpool(run)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Request body is not valid UTF-8")
+    return report.to_dict()
+
+
+@app.get("/stock/{product_id}")
+def get_stock(product_id: str):
+    """On-hand, reserved and available stock for a product"""
+    stock_ledger.expire()
+    product = get_catalog().get(product_id)
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return {
+        "product_id": product_id,
+        "on_hand": product.stock,
+        "reserved": stock_ledger.reserved(product_id),
+        "available": stock_ledger.live_stock(product)
+    }
+
+
+@app.post("/stock/reserve")
+def reserve_stock(request: StockReserveRequest):
+    """
+    Atomically hold stock for an owner
+    Returns 409 when not enough stock is available; holds expire after the TTL.
+    """
+    try:
+        hold = stock_ledger.reserve(
+            request.product_id, request.quantity, request.owner, ttl=request.ttl_seconds
+        )
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Product not found")
+    except InsufficientStock as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return {
+        "product_id": hold.product_id,
+        "owner": hold.owner,
+        "quantity": hold.quantity,
+        "available": stock_ledger.available(hold.product_id)
+    }
+
+
+@app.post("/stock/release")
+def release_stock(request: StockReleaseRequest):
+    """Release an owner's hold on one product, or all of their holds"""
+    if request.product_id is None:
+        released = stock_ledger.release_all(request.owner)
+    else:
+        released = stock_ledger.release(request.product_id, request.owner, request.quantity)
+    return {"owner": request.owner, "released": released}
+
+
+@app.post("/stock/transfer")
+def transfer_stock(request: StockTransferRequest):
+    """Hand all of one owner's holds to another (a guest cart merged into a user's)"""
+    moved = stock_ledger.transfer(request.from_owner, request.to_owner)
+    return {"from_owner": request.from_owner, "to_owner": request.to_owner, "transferred": moved}
+
+
+@app.post("/stock/commit")
+def commit_stock(request: StockCommitRequest):
+    """Turn an owner's holds into sales, decrementing catalog stock"""
+    committed = stock_ledger.commit(request.owner, request.product_ids)
+    if sales_velocity is not None and committed:
+        sales_velocity.record_many([(product_id, quantity, None) for product_id, quantity in committed.items()])
+    return {"owner": request.owner, "committed": committed}
+
+
+@app.get("/internal/live-state", include_in_schema=False)
+def get_live_state(stock_version: int = -1, sales_epoch: Optional[str] = None, sales_version: int = 0):
+    """Reserved stock and sales counters for the worker mirrors of multi-worker mode (app.writer)"""
+    stock_ledger.expire()
+    stock = None
+    if stock_version != stock_ledger.version:
+        version, reserved = stock_ledger.reserved_totals()
+        stock = {"version": version, "reserved": reserved}
+    sales = None
+    if sales_velocity is not None:
+        sales = sales_velocity.export_state(sales_epoch, sales_version)
+    return {"stock": stock, "sales": sales}
+
+
+def require_sales_velocity() -> SalesVelocity:
+    if sales_velocity is None:
+        raise HTTPException(status_code=404, detail="Sales velocity is disabled (SALES_HALF_LIFE_DAYS=0)")
+    return sales_velocity
+
+
+@app.post("/sales/events")
+async def record_sales_events(request: Request):
     """
-    AWS Lambda handler
-    This allows the same code to run as a Lambda function
+    Record order events for the sales velocity factor
+    
+    Body: a JSON array (or NDJSON) of {"product_id", "quantity", "timestamp"};
+    quantity defaults to 1 and timestamp (unix seconds) to now. Malformed
+    events and events for unknown products are skipped and counted as rejected.
     """
-    from mangum import Mangum
-    handler = Mangum(app)
-    return handler(event, context)
+    velocity = require_sales_velocity()
+    try:
+        events, rejected = parse_events(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON of sale events")
+    recorded = await run_in_threadpool(velocity.record_many, events)
+    # Events for products not in the catalog are not recorded either
+    return {"recorded": recorded, "rejected": rejected + len(events) - recorded}
+
+
+@app.get("/sales/velocity/{product_id}")
+def get_sales_velocity(product_id: str):
+    """Decayed recent sales of a product next to its lifetime sales_count"""
+    velocity = require_sales_velocity()
+    product = get_catalog().get(product_id)
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return {
+        "product_id": product_id,
+        "velocity": round(velocity.velocity(product), 3),
+        "window_days": round(velocity.window_days, 2),
+        "lifetime_sales": product.sales_count,
+    }
+
+
+# Lambda entry point: the adapter is built on the first invocation and reused, so
+# module-level state (the catalog, rankings and page caches) stays warm for the container's lifetime
+_lambda_adapter = None
+
+
+def lambda_handler(event, context):
+    """AWS Lambda handler"""
+    global _lambda_adapter
+    if _lambda_adapter is None:
+        from mangum import Mangum
+        # Mangum would otherwise run startup and shutdown around every invocation
+        _lambda_adapter = Mangum(app, lifespan="off")
+    return _lambda_adapter(event, context)
+
+
+# Handler name configured in infrastructure/terraform/lambda.tf
+handler = lambda_handler
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    # uvicorn is only needed here, not on Lambda
+    import uvicorn
+    from .workers import PRODUCT_WORKERS, serve
+    if PRODUCT_WORKERS > 1:
+        serve(PRODUCT_WORKERS, host="0.0.0.0", port=8001)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
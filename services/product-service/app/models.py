@@ -1,9 +1,9 @@
 """
 Data models for Product Service
 """
-from pydantic import BaseModel, Field
-from typing import Optional
-from datetime import datetime
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import Dict, List, Optional
+from datetime import datetime, timezone
 
 
 class Product(BaseModel):
@@ -20,6 +20,14 @@ class Product(BaseModel):
     image_url: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.now)
     
+    @field_validator("created_at")
+    @classmethod
+    def naive_created_at(cls, value: datetime) -> datetime:
+        """Timestamps are naive, like datetime.now(); "...Z" and offsets become naive UTC"""
+        if value.tzinfo is None:
+            return value
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+
     class Config:
         json_schema_extra = {
             "example": {
@@ -40,4 +48,95 @@ class Product(BaseModel):
 class ProductResponse(Product):
     """Product response with ranking information"""
     rank: Optional[int] = Field(None, description="Product rank in the list")
-    ranking_score: Optional[float] = Field(None, description="Calculated ranking score")
\ No newline at end of file
+    ranking_score: Optional[float] = Field(None, description="Calculated ranking score")
+
+
+class ProductUpdate(BaseModel):
+    """Partial product update; only the fields sent are changed"""
+    name: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[float] = Field(None, gt=0)
+    popularity: Optional[int] = Field(None, ge=0, le=100)
+    rating: Optional[float] = Field(None, ge=0, le=5)
+    sales_count: Optional[int] = Field(None, ge=0)
+    stock: Optional[int] = Field(None, ge=0)
+    category: Optional[str] = None
+    image_url: Optional[str] = None
+
+
+class StockReserveRequest(BaseModel):
+    """Hold stock for an owner (usually a cart's user id)"""
+    product_id: str
+    owner: str
+    quantity: int = Field(default=1, gt=0)
+    ttl_seconds: Optional[float] = Field(None, gt=0, description="Hold lifetime; defaults to STOCK_RESERVATION_TTL")
+
+
+class StockReleaseRequest(BaseModel):
+    """Give back held stock; omit product_id to release every hold of the owner"""
+    owner: str
+    product_id: Optional[str] = None
+    quantity: Optional[int] = Field(None, gt=0, description="Units to release; all when omitted")
+
+
+class StockTransferRequest(BaseModel):
+    """Move every hold of one owner to another"""
+    from_owner: str
+    to_owner: str
+
+
+class StockCommitRequest(BaseModel):
+    """Convert an owner's holds into sales"""
+    owner: str
+    product_ids: Optional[List[str]] = None
+
+
+class WeightProfile(BaseModel):
+    """Ranking factor weights; scaled to sum to 1 when saved as a profile"""
+    popularity: float = Field(default=0, ge=0)
+    price: float = Field(default=0, ge=0)
+    rating: float = Field(default=0, ge=0)
+    sales: float = Field(default=0, ge=0)
+    recency: float = Field(default=0, ge=0)
+
+    class Config:
+        extra = "forbid"
+
+    @model_validator(mode="after")
+    def check_total(self) -> "WeightProfile":
+        if sum(self.model_dump().values()) <= 0:
+            raise ValueError("at least one weight must be positive")
+        return self
+
+    def normalized(self) -> Dict[str, float]:
+        weights = self.model_dump()
+        total = sum(weights.values())
+        if abs(total - 1) < 1e-9:
+            return weights
+        return {factor: weight / total for factor, weight in weights.items()}
+
+
+# Largest id list POST /products/batch accepts
+MAX_BATCH_IDS = 500
+
+# Projection returned when a batch request names no fields (what a cart line needs)
+BATCH_FIELDS = ("id", "name", "price", "image_url", "available")
+
+# Product fields plus "available" (stock minus live reservations)
+BATCH_FIELD_NAMES = frozenset(Product.model_fields) | {"available"}
+
+
+class ProductBatchRequest(BaseModel):
+    """Several products by id in one call, projected to the requested fields"""
+    ids: List[str] = Field(min_length=1, max_length=MAX_BATCH_IDS)
+    fields: Optional[List[str]] = Field(None, description="Fields to return; defaults to BATCH_FIELDS")
+
+    class Config:
+        extra = "forbid"
+
+    @model_validator(mode="after")
+    def check_fields(self) -> "ProductBatchRequest":
+        unknown = set(self.fields or ()) - BATCH_FIELD_NAMES
+        if unknown:
+            raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}")
+        return self
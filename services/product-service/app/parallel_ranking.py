@@ -0,0 +1,249 @@
+"""
+Parallel ranking
+Scores large catalogs across a process pool, sharing numeric columns
+through shared memory and k-way merging the sorted shards
+"""
+import heapq
+import itertools
+import multiprocessing
+import os
+import threading
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from shared.tracing import tracer
+
+from .models import Product
+from .ranking import ProductRanker
+
+
+# Columns copied into shared memory, in ProductRanker.score_values order
+COLUMNS = ("popularity", "price", "rating", "sales_count", "age_days", "stock")
+
+# Block layout: len(COLUMNS) input columns + 1 score column (float64),
+# then one int64 column of shard-sorted indices
+_FLOAT_COLUMNS = len(COLUMNS) + 1
+_ITEM_BYTES = 8 * (_FLOAT_COLUMNS + 1)
+
+RANK_WORKERS = int(os.getenv("RANK_WORKERS", "0"))
+RANK_PARALLEL_MIN = int(os.getenv("RANK_PARALLEL_MIN", "50000"))
+
+# ProductRanker per settings tuple, built once per worker process
+_worker_rankers: Dict[tuple, ProductRanker] = {}
+
+
+def _ranker_settings(ranker: ProductRanker, weights: Optional[Dict[str, float]]) -> tuple:
+    return (
+        tuple(sorted((weights or ranker.weights).items())),
+        ranker.avg_price,
+        ranker.recency_window_days,
+    )
+
+
+def _ranker_from_settings(settings: tuple) -> ProductRanker:
+    ranker = _worker_rankers.get(settings)
+    if ranker is None:
+        weights, avg_price, recency_window_days = settings
+        ranker = ProductRanker()
+        ranker.weights = dict(weights)
+        ranker.avg_price = avg_price
+        ranker.recency_window_days = recency_window_days
+        _worker_rankers[settings] = ranker
+    return ranker
+
+
+def score_shard(
+    block_name: str,
+    size: int,
+    start: int,
+    stop: int,
+    settings: tuple,
+    limit: Optional[int] = None
+) -> int:
+    """
+    Worker entry point: score rows [start, stop) of a shared block
+
+    Writes the scores into the score column and the shard's row indices,
+    sorted by score (highest first, ties in row order), into the index
+    column; with `limit` only the shard's best `limit` rows are selected.
+    Only the block name and bounds cross the process boundary. Returns
+    the number of indices written.
+    """
+    ranker = _ranker_from_settings(settings)
+    block = SharedMemory(name=block_name)
+    floats = block.buf[:_FLOAT_COLUMNS * size * 8].cast("d")
+    indices = block.buf[_FLOAT_COLUMNS * size * 8:_ITEM_BYTES * size].cast("q")
+    columns = []
+    try:
+        columns = [floats[c * size + start:c * size + stop] for c in range(len(COLUMNS))]
+        scores = [ranker.score_values(*row) for row in zip(*columns)]
+        score_column = len(COLUMNS) * size
+        floats[score_column + start:score_column + stop] = array("d", scores)
+        # Both are stable with reverse=True, matching rank_with_scores
+        rows = range(start, stop)
+        key = lambda i: scores[i - start]
+        if limit is None:
+            order = sorted(rows, key=key, reverse=True)
+        else:
+            order = heapq.nlargest(limit, rows, key=key)
+        indices[start:start + len(order)] = array("q", order)
+        return len(order)
+    finally:
+        # Views into the block must go before it can close, also when scoring raised
+        for column in columns:
+            column.release()
+        floats.release()
+        indices.release()
+        block.close()
+
+
+class ParallelRanker:
+    """
+    Process-pool front end for ProductRanker.rank_with_scores
+
+    The parent copies the numeric inputs of every product (with live stock,
+    sales and age in days already resolved) into one shared-memory block; each
+    worker scores a contiguous shard in place and sorts it, and the parent
+    merges the shards with heapq.merge. Products never leave the parent,
+    so nothing proportional to the catalog is pickled.
+
+    Jobs smaller than `min_parallel` (or with workers=0) are ranked
+    in-process, where pool overhead would dominate. Results, including
+    tie order, match the serial ranker exactly.
+    """
+
+    def __init__(
+        self,
+        ranker: ProductRanker,
+        workers: Optional[int] = None,
+        min_parallel: int = RANK_PARALLEL_MIN,
+        shards: Optional[int] = None
+    ):
+        self.ranker = ranker
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.min_parallel = min_parallel
+        self.shards = shards or max(1, self.workers)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn: forking a threaded server process is not safe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def _serial_ranker(self, weights: Optional[Dict[str, float]]) -> ProductRanker:
+        if weights is None:
+            return self.ranker
+        ranker = ProductRanker(stock_source=self.ranker.stock_source)
+        ranker.weights = dict(weights)
+        ranker.avg_price = self.ranker.avg_price
+        ranker.recency_window_days = self.ranker.recency_window_days
+        return ranker
+
+    def rank_with_scores(
+        self,
+        products: List[Product],
+        weights: Optional[Dict[str, float]] = None
+    ) -> List[Tuple[Product, float]]:
+        """Same contract as ProductRanker.rank_with_scores, optionally with other weights"""
+        if not self.use_pool(products):
+            return self._serial_ranker(weights).rank_with_scores(products)
+        return list(self._rank_in_pool(products, weights, None))
+
+    def rank_top_k(
+        self,
+        products: List[Product],
+        k: int,
+        offset: int = 0,
+        weights: Optional[Dict[str, float]] = None
+    ) -> List[Tuple[Product, float]]:
+        """Same contract as ProductRanker.rank_top_k; shards only select their best offset + k"""
+        if k <= 0:
+            return []
+        if not self.use_pool(products):
+            return self._serial_ranker(weights).rank_top_k(products, k, offset)
+        ranked = self._rank_in_pool(products, weights, offset + k)
+        return list(itertools.islice(ranked, offset, offset + k))
+
+    def use_pool(self, products: List[Product]) -> bool:
+        """Whether ranking these products goes to the process pool"""
+        return self.workers > 0 and len(products) >= max(1, self.min_parallel)
+
+    def _rank_in_pool(
+        self,
+        products: List[Product],
+        weights: Optional[Dict[str, float]],
+        limit: Optional[int]
+    ) -> Iterator[Tuple[Product, float]]:
+        size = len(products)
+        with tracer.span("ranking.parallel_rank", size=size, shards=self.shards, limit=limit):
+            block = SharedMemory(create=True, size=_ITEM_BYTES * size)
+            try:
+                self._write_columns(block, products)
+                bounds = self._shard_bounds(size)
+                settings = _ranker_settings(self.ranker, weights)
+                pool = self._get_pool()
+                futures = [
+                    pool.submit(score_shard, block.name, size, start, stop, settings, limit)
+                    for start, stop in bounds
+                ]
+                selected = [future.result() for future in futures]
+                scores, order = self._read_results(block, size)
+            finally:
+                block.close()
+                block.unlink()
+
+        shards = [order[start:start + count] for (start, _), count in zip(bounds, selected)]
+        merged = heapq.merge(*shards, key=scores.__getitem__, reverse=True)
+        return ((products[i], scores[i]) for i in merged)
+
+    def rank_products(self, products: List[Product], weights: Optional[Dict[str, float]] = None) -> List[Product]:
+        return [product for product, score in self.rank_with_scores(products, weights)]
+
+    def _shard_bounds(self, size: int) -> List[Tuple[int, int]]:
+        step = -(-size // self.shards)
+        return [(start, min(start + step, size)) for start in range(0, size, step)]
+
+    def _write_columns(self, block: SharedMemory, products: List[Product]) -> None:
+        size = len(products)
+        now = datetime.now()
+        current_stock = self.ranker.current_stock
+        current_sales = self.ranker.current_sales
+        values = (
+            (p.popularity for p in products),
+            (p.price for p in products),
+            (p.rating for p in products),
+            (current_sales(p) for p in products),
+            ((now - p.created_at).days for p in products),
+            (current_stock(p) for p in products),
+        )
+        floats = block.buf[:_FLOAT_COLUMNS * size * 8].cast("d")
+        try:
+            for c, column in enumerate(values):
+                floats[c * size:(c + 1) * size] = array("d", column)
+        finally:
+            floats.release()
+
+    def _read_results(self, block: SharedMemory, size: int) -> Tuple[List[float], List[int]]:
+        floats = block.buf[:_FLOAT_COLUMNS * size * 8].cast("d")
+        indices = block.buf[_FLOAT_COLUMNS * size * 8:_ITEM_BYTES * size].cast("q")
+        try:
+            score_column = len(COLUMNS) * size
+            return floats[score_column:score_column + size].tolist(), indices.tolist()
+        finally:
+            floats.release()
+            indices.release()
+
+    def close(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
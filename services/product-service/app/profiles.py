@@ -0,0 +1,259 @@
+"""
+Ranking weight profiles
+Named factor weightings selectable per request, scored from stored factor
+vectors, with ranked pages cached per catalog and stock state
+"""
+import heapq
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from operator import itemgetter
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from shared.tracing import traced
+
+from .models import Product, WeightProfile
+from .parallel_ranking import ParallelRanker
+from .ranking import ProductRanker
+
+
+DEFAULT_PROFILE = "default"
+
+# Shipped alongside "default" (the ranker's own weights)
+BUILTIN_PROFILES: Dict[str, Dict[str, float]] = {
+    "deals": {"popularity": 0.15, "price": 0.50, "rating": 0.15, "sales": 0.10, "recency": 0.10},
+    "new_arrivals": {"popularity": 0.15, "price": 0.10, "rating": 0.15, "sales": 0.10, "recency": 0.50},
+    "top_rated": {"popularity": 0.15, "price": 0.10, "rating": 0.55, "sales": 0.10, "recency": 0.10},
+}
+
+RANKING_CACHE_SIZE = int(os.getenv("RANKING_CACHE_SIZE", "256"))
+
+# Longer results (unpaged listings of a big catalog) are not cached
+MAX_CACHED_PAGE = 10_000
+
+
+def load_profiles_from_env() -> Dict[str, Dict[str, float]]:
+    """
+    Built-in profiles plus RANKING_PROFILES, a JSON object of name -> weights
+    e.g. RANKING_PROFILES='{"clearance": {"price": 0.7, "sales": 0.3}}'
+    """
+    profiles = dict(BUILTIN_PROFILES)
+    raw = os.getenv("RANKING_PROFILES")
+    if raw:
+        profiles.update(json.loads(raw))
+    return profiles
+
+
+class ProfileRanker:
+    """
+    Ranks products under named weight profiles
+
+    The score is a weighted sum of five factor scores that do not depend
+    on the weights, so each product's factor vector is computed once and
+    kept (keyed by id, valid while the same Product object is stored and
+    until its recency day rolls over); any profile is then a five-term
+    dot product plus the live stock penalty.
+
+    Ranked pages are cached per (profile weights, query, page) in an LRU
+    that is dropped whenever `state()` changes - typically the catalog
+    object, its version and the stock ledger version. Large jobs still go
+    to the parallel ranker when its pool is enabled.
+    """
+
+    def __init__(
+        self,
+        ranker: ProductRanker,
+        parallel: Optional[ParallelRanker] = None,
+        state: Optional[Callable[[], object]] = None,
+        profiles: Optional[Dict[str, Dict[str, float]]] = None,
+        cache_size: int = RANKING_CACHE_SIZE
+    ):
+        self.ranker = ranker
+        self.parallel = parallel
+        self._state = state or (lambda: None)
+        self._profiles: Dict[str, Dict[str, float]] = {DEFAULT_PROFILE: ranker.weights}
+        for name, weights in (profiles or {}).items():
+            self.set_profile(name, weights)
+        self._factors: Dict[str, Tuple[Product, tuple, datetime]] = {}
+        self.cache_size = cache_size
+        self._pages: "OrderedDict[tuple, List[Tuple[Product, float]]]" = OrderedDict()
+        self._pages_state: object = None
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Profiles
+    # ------------------------------------------------------------------
+
+    def profiles(self) -> Dict[str, Dict[str, float]]:
+        return {name: dict(weights) for name, weights in self._profiles.items()}
+
+    def weights_for(self, profile: str) -> Dict[str, float]:
+        """Weights of a profile; KeyError if there is no such profile"""
+        return self._profiles[profile]
+
+    def set_profile(self, name: str, weights: Union[WeightProfile, Dict[str, float]]) -> Dict[str, float]:
+        """Create or replace a profile; weights are validated and scaled to sum to 1"""
+        if name == DEFAULT_PROFILE:
+            raise ValueError("The default profile cannot be changed")
+        if not isinstance(weights, WeightProfile):
+            weights = WeightProfile(**weights)
+        self._profiles[name] = weights.normalized()
+        return dict(self._profiles[name])
+
+    def delete_profile(self, name: str) -> None:
+        if name == DEFAULT_PROFILE:
+            raise ValueError("The default profile cannot be deleted")
+        del self._profiles[name]
+
+    # ------------------------------------------------------------------
+    # Scoring
+    # ------------------------------------------------------------------
+
+    def factors(self, product: Product, now: datetime) -> tuple:
+        """
+        Stored factor vector for a product, recomputed if stale
+        With a live sales source the sales factor is never stored: it is
+        re-read on every call, the other four come from the store.
+        """
+        entry = self._factors.get(product.id)
+        if entry is None or entry[0] is not product or now >= entry[2]:
+            entry = self._store_factors(product, now)
+        if self.ranker.sales_source is None:
+            return entry[1]
+        popularity, price, rating, _, recency = entry[1]
+        sales = self.ranker._calculate_sales_score(self.ranker.sales_source(product))
+        return popularity, price, rating, sales, recency
+
+    def _store_factors(self, product: Product, now: datetime) -> Tuple[Product, tuple, datetime]:
+        age_days = (now - product.created_at).days
+        factors = self.ranker.factor_values(
+            product.popularity, product.price, product.rating, product.sales_count, age_days
+        )
+        # Recency only changes when the age in whole days does
+        if age_days >= self.ranker.recency_window_days:
+            valid_until = datetime.max
+        else:
+            valid_until = product.created_at + timedelta(days=age_days + 1)
+        entry = (product, factors, valid_until)
+        self._factors[product.id] = entry
+        return entry
+
+    def _scored(self, products: List[Product], weights: Dict[str, float]) -> Iterator[Tuple[Product, float]]:
+        now = datetime.now()
+        combine = self.ranker.combine
+        current_stock = self.ranker.current_stock
+        factors = self.factors
+        return ((p, combine(factors(p, now), current_stock(p), weights)) for p in products)
+
+    def _use_pool(self, products: List[Product]) -> bool:
+        return self.parallel is not None and self.parallel.use_pool(products)
+
+    @traced("ranking.rank_profile")
+    def rank_with_scores(self, products: List[Product], profile: str = DEFAULT_PROFILE) -> List[Tuple[Product, float]]:
+        weights = self.weights_for(profile)
+        if self._use_pool(products):
+            return self.parallel.rank_with_scores(products, weights)
+        scored = list(self._scored(products, weights))
+        scored.sort(key=itemgetter(1), reverse=True)
+        return scored
+
+    @traced("ranking.rank_profile_top_k")
+    def rank_top_k(
+        self,
+        products: List[Product],
+        k: int,
+        offset: int = 0,
+        profile: str = DEFAULT_PROFILE
+    ) -> List[Tuple[Product, float]]:
+        weights = self.weights_for(profile)
+        if k <= 0:
+            return []
+        if self._use_pool(products):
+            return self.parallel.rank_top_k(products, k, offset, weights)
+        return heapq.nlargest(offset + k, self._scored(products, weights), key=itemgetter(1))[offset:]
+
+    # ------------------------------------------------------------------
+    # Cached pages
+    # ------------------------------------------------------------------
+
+    def rank_page(
+        self,
+        load: Callable[[], List[Product]],
+        profile: str = DEFAULT_PROFILE,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        key: Optional[tuple] = None
+    ) -> List[Tuple[Product, float]]:
+        """
+        Ranked (product, score) pairs for one page of load()
+
+        `key` identifies the query behind load(); with a key the page is
+        cached and, on a hit, load() is not called at all. A page is
+        heap-selected, only limit=None ranks everything.
+        """
+        weights = self.weights_for(profile)
+        cache_key = None
+        if key is not None and self.cache_size > 0:
+            # The weights are part of the key, so redefining a profile misses
+            cache_key = (profile, tuple(weights.items()), key, limit, offset)
+            state = self._state()
+            with self._lock:
+                if self._pages_state != state:
+                    self._pages.clear()
+                    self._pages_state = state
+                page = self._pages.get(cache_key)
+                if page is not None:
+                    self._pages.move_to_end(cache_key)
+                    return page
+
+        products = load()
+        if limit is None:
+            page = self.rank_with_scores(products, profile)[offset:]
+        else:
+            page = self.rank_top_k(products, limit, offset, profile)
+
+        if cache_key is not None and len(page) <= MAX_CACHED_PAGE:
+            with self._lock:
+                # Skip filing if another request has already moved the cache to a newer state
+                if self._pages_state == state:
+                    self._pages[cache_key] = page
+                    if len(self._pages) > self.cache_size:
+                        self._pages.popitem(last=False)
+        return page
+
+    # ------------------------------------------------------------------
+    # Explanations
+    # ------------------------------------------------------------------
+
+    def explain(self, product: Product, profile: str = DEFAULT_PROFILE, now: Optional[datetime] = None) -> dict:
+        """Score breakdown from the stored factor vector (computed at most once)"""
+        weights = self.weights_for(profile)
+        factors = self.factors(product, now or datetime.now())
+        explanation = self.ranker.explain_ranking(product, factors, weights)
+        explanation["profile"] = profile
+        return explanation
+
+    def explain_page(
+        self,
+        load: Callable[[], List[Product]],
+        profile: str = DEFAULT_PROFILE,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        key: Optional[tuple] = None
+    ) -> List[dict]:
+        """Explanations for one ranked page (same paging and cache as rank_page)"""
+        now = datetime.now()
+        explanations = []
+        for position, (product, _) in enumerate(self.rank_page(load, profile, limit, offset, key), offset + 1):
+            explanation = self.explain(product, profile, now)
+            explanation["rank"] = position
+            explanations.append(explanation)
+        return explanations
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pages.clear()
+            self._pages_state = None
+        self._factors.clear()
@@ -2,12 +2,21 @@
 Product Ranking Algorithm
 Implements sophisticated multi-factor ranking for e-commerce products
 """
+import heapq
 import math
 from datetime import datetime, timedelta
-from typing import List
+from operator import itemgetter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from shared.tracing import traced
+
 from .models import Product
 
 
+# Ranking factors, in the order of ProductRanker.factor_values
+FACTORS = ('popularity', 'price', 'rating', 'sales', 'recency')
+
+
 class ProductRanker:
     """
     Intelligent product ranking system
@@ -20,7 +29,16 @@ class ProductRanker:
     5. Recency (10%) - Boost for newer products
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        stock_source: Optional[Callable[[Product], int]] = None,
+        sales_source: Optional[Callable[[Product], float]] = None
+    ):
+        # Live stock (e.g. StockLedger.live_stock); defaults to the catalog value
+        self.stock_source = stock_source
+        # Recent sales (e.g. SalesVelocity.velocity); defaults to lifetime sales_count
+        self.sales_source = sales_source
+        
         # Configurable weights for different ranking factors
         self.weights = {
             'popularity': 0.30,
@@ -40,40 +58,102 @@ class ProductRanker:
         
         Returns a score between 0 and 100
         """
+        return self.score_values(
+            product.popularity,
+            product.price,
+            product.rating,
+            self.current_sales(product),
+            (datetime.now() - product.created_at).days,
+            self.current_stock(product)
+        )
+    
+    def score_values(
+        self,
+        popularity: float,
+        price: float,
+        rating: float,
+        sales_count: float,
+        age_days: float,
+        stock: float
+    ) -> float:
+        """
+        Score from raw column values rather than a Product
+        Lets the parallel ranker score numeric columns held in shared memory
+        """
+        factors = self.factor_values(popularity, price, rating, sales_count, age_days)
+        return self.combine(factors, stock)
+    
+    def factor_values(
+        self,
+        popularity: float,
+        price: float,
+        rating: float,
+        sales_count: float,
+        age_days: float
+    ) -> Tuple[float, float, float, float, float]:
+        """
+        The five 0-100 factor scores, in FACTORS order
+        They do not depend on the weights, so they can be stored and
+        re-combined under any weight profile
+        """
         # 1. Popularity Score (0-100, already normalized)
-        popularity_score = product.popularity
+        popularity_score = popularity
         
         # 2. Price Score (inverse - cheaper products score higher)
         # Using logarithmic scale to handle wide price ranges
-        price_score = self._calculate_price_score(product.price)
+        price_score = self._calculate_price_score(price)
         
         # 3. Rating Score (0-5 scale, normalize to 0-100)
-        rating_score = (product.rating / 5.0) * 100
+        rating_score = (rating / 5.0) * 100
         
         # 4. Sales Velocity Score
         # Use logarithmic scale to handle outliers
-        sales_score = self._calculate_sales_score(product.sales_count)
+        sales_score = self._calculate_sales_score(sales_count)
         
         # 5. Recency Score (boost for new products)
-        recency_score = self._calculate_recency_score(product.created_at)
+        recency_score = self._recency_score_for_age(age_days)
+        
+        return popularity_score, price_score, rating_score, sales_score, recency_score
+    
+    def combine(
+        self,
+        factors: Tuple[float, float, float, float, float],
+        stock: float,
+        weights: Optional[Dict[str, float]] = None
+    ) -> float:
+        """Weighted sum of factor scores with the stock penalty applied"""
+        weights = self.weights if weights is None else weights
+        popularity_score, price_score, rating_score, sales_score, recency_score = factors
         
         # Calculate weighted average
         total_score = (
-            popularity_score * self.weights['popularity'] +
-            price_score * self.weights['price'] +
-            rating_score * self.weights['rating'] +
-            sales_score * self.weights['sales'] +
-            recency_score * self.weights['recency']
+            popularity_score * weights['popularity'] +
+            price_score * weights['price'] +
+            rating_score * weights['rating'] +
+            sales_score * weights['sales'] +
+            recency_score * weights['recency']
         )
         
         # Apply stock penalty (out of stock products ranked lower)
-        if product.stock == 0:
+        if stock == 0:
             total_score *= 0.5
-        elif product.stock < 5:
+        elif stock < 5:
             total_score *= 0.8
         
         return round(total_score, 2)
     
+    def current_stock(self, product: Product) -> int:
+        """Stock the score uses: stock_source (live stock) if set, else the catalog's"""
+        if self.stock_source is None:
+            return product.stock
+        return self.stock_source(product)
+    
+    def current_sales(self, product: Product) -> float:
+        """Sales the score uses: sales_source (recent velocity) if set, else lifetime sales_count"""
+        if self.sales_source is None:
+            return product.sales_count
+        return self.sales_source(product)
+    
     def _calculate_price_score(self, price: float) -> float:
         """
         Calculate price score using inverse logarithmic normalization
@@ -96,10 +176,11 @@ class ProductRanker:
         
         return min(100, max(0, score))
     
-    def _calculate_sales_score(self, sales_count: int) -> float:
+    def _calculate_sales_score(self, sales_count: float) -> float:
         """
         Calculate sales score using logarithmic scale
-        Handles wide range of sales numbers gracefully
+        Handles wide range of sales numbers gracefully; takes lifetime
+        counts or decayed recent sales (see sales_source) alike
         """
         if sales_count <= 0:
             return 0
@@ -115,8 +196,9 @@ class ProductRanker:
         Calculate recency boost for new products
         Products added within the recency window get a boost
         """
-        days_since_creation = (datetime.now() - created_at).days
-        
+        return self._recency_score_for_age((datetime.now() - created_at).days)
+    
+    def _recency_score_for_age(self, days_since_creation: float) -> float:
         if days_since_creation < 0:
             # Future date (data error), no boost
             return 0
@@ -130,12 +212,12 @@ class ProductRanker:
         
         return max(50, boost)
     
-    def rank_products(self, products: List[Product]) -> List[Product]:
+    @traced("ranking.rank_products")
+    def rank_with_scores(self, products: List[Product]) -> List[Tuple[Product, float]]:
         """
-        Rank a list of products by calculated scores
-        Returns products sorted by ranking score (highest first)
+        Rank a list of products and keep their scores
+        Returns (product, score) pairs sorted by score (highest first)
         """
-        # Calculate scores for all products
         scored_products = [
             (product, self.calculate_score(product))
             for product in products
@@ -144,50 +226,64 @@ class ProductRanker:
         # Sort by score (descending)
         scored_products.sort(key=lambda x: x[1], reverse=True)
         
-        # Return sorted products
-        return [product for product, score in scored_products]
+        return scored_products
+    
+    @traced("ranking.rank_top_k")
+    def rank_top_k(self, products: List[Product], k: int, offset: int = 0) -> List[Tuple[Product, float]]:
+        """
+        One page of rank_with_scores: positions offset .. offset + k - 1
+        
+        Keeps only the best offset + k products in a heap instead of
+        sorting everything, O(n log(offset + k)) rather than O(n log n).
+        heapq.nlargest is stable, so ties come out in the same order.
+        """
+        if k <= 0:
+            return []
+        scored = ((product, self.calculate_score(product)) for product in products)
+        return heapq.nlargest(offset + k, scored, key=itemgetter(1))[offset:]
     
-    def explain_ranking(self, product: Product) -> dict:
+    def rank_products(self, products: List[Product]) -> List[Product]:
+        """
+        Rank a list of products by calculated scores
+        Returns products sorted by ranking score (highest first)
+        """
+        return [product for product, score in self.rank_with_scores(products)]
+    
+    def explain_ranking(
+        self,
+        product: Product,
+        factors: Optional[Tuple[float, float, float, float, float]] = None,
+        weights: Optional[Dict[str, float]] = None
+    ) -> dict:
         """
         Explain the ranking score breakdown for a product
         Useful for debugging and transparency
+        
+        Pass stored `factors` (see factor_values) to skip recomputing them,
+        and `weights` to explain a score under another weight profile.
         """
-        popularity_score = product.popularity
-        price_score = self._calculate_price_score(product.price)
-        rating_score = (product.rating / 5.0) * 100
-        sales_score = self._calculate_sales_score(product.sales_count)
-        recency_score = self._calculate_recency_score(product.created_at)
+        if factors is None:
+            factors = self.factor_values(
+                product.popularity,
+                product.price,
+                product.rating,
+                self.current_sales(product),
+                (datetime.now() - product.created_at).days
+            )
+        weights = self.weights if weights is None else weights
+        stock = self.current_stock(product)
         
         return {
             'product_id': product.id,
             'product_name': product.name,
-            'final_score': self.calculate_score(product),
+            'final_score': self.combine(factors, stock, weights),
             'breakdown': {
-                'popularity': {
-                    'score': popularity_score,
-                    'weight': self.weights['popularity'],
-                    'contribution': popularity_score * self.weights['popularity']
-                },
-                'price': {
-                    'score': price_score,
-                    'weight': self.weights['price'],
-                    'contribution': price_score * self.weights['price']
-                },
-                'rating': {
-                    'score': rating_score,
-                    'weight': self.weights['rating'],
-                    'contribution': rating_score * self.weights['rating']
-                },
-                'sales': {
-                    'score': sales_score,
-                    'weight': self.weights['sales'],
-                    'contribution': sales_score * self.weights['sales']
-                },
-                'recency': {
-                    'score': recency_score,
-                    'weight': self.weights['recency'],
-                    'contribution': recency_score * self.weights['recency']
+                factor: {
+                    'score': score,
+                    'weight': weights[factor],
+                    'contribution': score * weights[factor]
                 }
+                for factor, score in zip(FACTORS, factors)
             },
-            'stock_status': 'in_stock' if product.stock > 0 else 'out_of_stock'
-        }
\ No newline at end of file
+            'stock_status': 'in_stock' if stock > 0 else 'out_of_stock'
+        }
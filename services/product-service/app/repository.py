@@ -0,0 +1,695 @@
+"""
+Catalog repository
+Storage-agnostic access to products with in-memory and SQLite backends
+and a read-through cache layer
+"""
+import os
+import queue
+import sqlite3
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .changefeed import ChangeFeed, change_feed
+from .models import Product
+
+
+PRODUCT_COLUMNS = (
+    "id", "name", "description", "price", "popularity", "rating",
+    "sales_count", "stock", "category", "image_url", "created_at"
+)
+
+
+def _matches_query(product: Product, query_lower: str) -> bool:
+    return query_lower in product.name.lower() or (
+        product.description is not None and query_lower in product.description.lower()
+    )
+
+
+class CatalogRepository(ABC):
+    """
+    Read/write access to the product catalog
+
+    `version` increases on every write so callers can cache derived data
+    (rankings, responses) and detect when it goes stale.
+    """
+
+    version: int = 0
+
+    @abstractmethod
+    def get(self, product_id: str) -> Optional[Product]:
+        """Look up one product by id"""
+
+    def get_many(self, product_ids: Iterable[str]) -> List[Product]:
+        """Look up several products; unknown ids are skipped"""
+        products = (self.get(product_id) for product_id in product_ids)
+        return [product for product in products if product is not None]
+
+    @abstractmethod
+    def list(
+        self,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_rating: Optional[float] = None,
+        category: Optional[str] = None
+    ) -> List[Product]:
+        """All products matching the filters, in no particular order"""
+
+    @abstractmethod
+    def search(self, query: str) -> List[Product]:
+        """Products whose name or description contains `query` (case-insensitive)"""
+
+    @abstractmethod
+    def upsert_many(self, products: Iterable[Product]) -> int:
+        """Insert or replace products; returns the number written"""
+
+    @abstractmethod
+    def delete(self, product_id: str) -> bool:
+        """Delete a product; returns False if it did not exist"""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of products in the catalog"""
+
+    @abstractmethod
+    def adjust_stock(self, product_id: str, delta: int) -> Optional[Tuple[int, Product]]:
+        """
+        Atomically add `delta` to one product's stock (floored at 0), leaving other fields alone
+        Returns (stock before, product after), or None for an unknown product.
+        """
+
+    def published_ranking(
+        self, limit: Optional[int], offset: int = 0, state: Optional[tuple] = None
+    ) -> Optional[List[Tuple[Product, float]]]:
+        """
+        A page of the default ranking precomputed by the store, or None to rank on request
+        `state` identifies the live score inputs (holds, sales) the caller ranks with.
+        """
+        return None
+
+
+class InMemoryCatalogRepository(CatalogRepository):
+    """
+    Dict-backed catalog (the original behaviour)
+    Writes swap in new dict entries so concurrent readers never see a partial product.
+    """
+
+    def __init__(self, products: Iterable[Product] = ()):
+        self._products: Dict[str, Product] = {p.id: p for p in products}
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def get(self, product_id: str) -> Optional[Product]:
+        return self._products.get(product_id)
+
+    def get_many(self, product_ids: Iterable[str]) -> List[Product]:
+        products = self._products
+        return [products[pid] for pid in product_ids if pid in products]
+
+    def list(self, min_price=None, max_price=None, min_rating=None, category=None) -> List[Product]:
+        products = list(self._products.values())
+        if min_price is not None:
+            products = [p for p in products if p.price >= min_price]
+        if max_price is not None:
+            products = [p for p in products if p.price <= max_price]
+        if min_rating is not None:
+            products = [p for p in products if p.rating >= min_rating]
+        if category is not None:
+            products = [p for p in products if p.category == category]
+        return products
+
+    def search(self, query: str) -> List[Product]:
+        query_lower = query.lower()
+        return [p for p in list(self._products.values()) if _matches_query(p, query_lower)]
+
+    def upsert_many(self, products: Iterable[Product]) -> int:
+        written = 0
+        with self._lock:
+            for product in products:
+                self._products[product.id] = product
+                written += 1
+            if written:
+                self.version += 1
+        return written
+
+    def delete(self, product_id: str) -> bool:
+        with self._lock:
+            if self._products.pop(product_id, None) is None:
+                return False
+            self.version += 1
+            return True
+
+    def adjust_stock(self, product_id: str, delta: int) -> Optional[Tuple[int, Product]]:
+        with self._lock:
+            product = self._products.get(product_id)
+            if product is None:
+                return None
+            updated = product.model_copy(update={"stock": max(0, product.stock + delta)})
+            self._products[product_id] = updated
+            if updated.stock != product.stock:
+                self.version += 1
+        return product.stock, updated
+
+    def count(self) -> int:
+        return len(self._products)
+
+
+class SQLiteCatalogRepository(CatalogRepository):
+    """
+    Embedded SQLite catalog
+
+    - B-tree indexes on price, rating and category so listing filters are
+      answered by the index instead of a scan
+    - FTS5 trigram index for substring search (queries under 3 characters
+      fall back to LIKE)
+    - a fixed pool of connections in WAL mode; each connection keeps its
+      own compiled-statement cache, and all SQL below is constant text so
+      every statement is prepared once per connection
+    """
+
+    def __init__(self, path: str = "catalog.db", pool_size: int = 4):
+        if path == ":memory:":
+            # Shared-cache URI so every pooled connection sees the same database
+            self._uri = f"file:catalog-{uuid.uuid4().hex}?mode=memory&cache=shared"
+        else:
+            self._uri = f"file:{path}"
+        self.path = path
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        self._write_lock = threading.Lock()
+        with self._connection() as conn:
+            self._has_fts = self._create_schema(conn)
+            self.version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self._uri,
+            uri=True,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=256
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def _create_schema(self, conn: sqlite3.Connection) -> bool:
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS products (
+                id TEXT NOT NULL UNIQUE,
+                name TEXT NOT NULL,
+                description TEXT,
+                price REAL NOT NULL,
+                popularity INTEGER NOT NULL,
+                rating REAL NOT NULL,
+                sales_count INTEGER NOT NULL,
+                stock INTEGER NOT NULL,
+                category TEXT NOT NULL,
+                image_url TEXT,
+                created_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_products_price ON products(price);
+            CREATE INDEX IF NOT EXISTS idx_products_rating ON products(rating);
+            CREATE INDEX IF NOT EXISTS idx_products_category ON products(category, price);
+        """)
+        try:
+            conn.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+                    name, description, content='products', content_rowid='rowid', tokenize='trigram'
+                );
+                CREATE TRIGGER IF NOT EXISTS products_ai AFTER INSERT ON products BEGIN
+                    INSERT INTO products_fts(rowid, name, description)
+                    VALUES (new.rowid, new.name, new.description);
+                END;
+                CREATE TRIGGER IF NOT EXISTS products_ad AFTER DELETE ON products BEGIN
+                    INSERT INTO products_fts(products_fts, rowid, name, description)
+                    VALUES ('delete', old.rowid, old.name, old.description);
+                END;
+                CREATE TRIGGER IF NOT EXISTS products_au AFTER UPDATE ON products BEGIN
+                    INSERT INTO products_fts(products_fts, rowid, name, description)
+                    VALUES ('delete', old.rowid, old.name, old.description);
+                    INSERT INTO products_fts(rowid, name, description)
+                    VALUES (new.rowid, new.name, new.description);
+                END;
+            """)
+            return True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5 (or without the trigram tokenizer)
+            return False
+
+    @staticmethod
+    def _to_product(row) -> Product:
+        # model_validate (Rust core, parses the ISO timestamp) is faster than
+        # model_construct in pydantic 2.x, so there is nothing to gain by skipping it
+        return Product.model_validate(dict(zip(PRODUCT_COLUMNS, row)))
+
+    def get(self, product_id: str) -> Optional[Product]:
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT id, name, description, price, popularity, rating, sales_count, "
+                "stock, category, image_url, created_at FROM products WHERE id = ?",
+                (product_id,)
+            ).fetchone()
+        return self._to_product(row) if row else None
+
+    def get_many(self, product_ids: Iterable[str]) -> List[Product]:
+        ids = list(dict.fromkeys(product_ids))
+        if not ids:
+            return []
+        found: Dict[str, Product] = {}
+        with self._connection() as conn:
+            # Fixed-size chunks keep the statement text (and its cache slot) stable
+            for start in range(0, len(ids), 64):
+                chunk = ids[start:start + 64]
+                chunk += [None] * (64 - len(chunk))
+                for row in conn.execute(
+                    "SELECT id, name, description, price, popularity, rating, sales_count, "
+                    "stock, category, image_url, created_at FROM products "
+                    f"WHERE id IN ({','.join('?' * 64)})",
+                    chunk
+                ):
+                    found[row[0]] = self._to_product(row)
+        return [found[pid] for pid in ids if pid in found]
+
+    def list(self, min_price=None, max_price=None, min_rating=None, category=None) -> List[Product]:
+        clauses, params = [], []
+        if category is not None:
+            clauses.append("category = ?")
+            params.append(category)
+        if min_price is not None:
+            clauses.append("price >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            clauses.append("price <= ?")
+            params.append(max_price)
+        if min_rating is not None:
+            clauses.append("rating >= ?")
+            params.append(min_rating)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT id, name, description, price, popularity, rating, sales_count, "
+                f"stock, category, image_url, created_at FROM products{where}",
+                params
+            ).fetchall()
+        return [self._to_product(row) for row in rows]
+
+    def search(self, query: str) -> List[Product]:
+        with self._connection() as conn:
+            if self._has_fts and len(query) >= 3:
+                rows = conn.execute(
+                    "SELECT p.id, p.name, p.description, p.price, p.popularity, p.rating, "
+                    "p.sales_count, p.stock, p.category, p.image_url, p.created_at "
+                    "FROM products_fts JOIN products p ON p.rowid = products_fts.rowid "
+                    "WHERE products_fts MATCH ?",
+                    ('"' + query.replace('"', '""') + '"',)
+                ).fetchall()
+            else:
+                pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                rows = conn.execute(
+                    "SELECT id, name, description, price, popularity, rating, sales_count, "
+                    "stock, category, image_url, created_at FROM products "
+                    "WHERE name LIKE ? ESCAPE '\\' OR description LIKE ? ESCAPE '\\'",
+                    (pattern, pattern)
+                ).fetchall()
+        # FTS/LIKE case folding is ASCII-only; confirm with Python's rules
+        query_lower = query.lower()
+        products = (self._to_product(row) for row in rows)
+        return [p for p in products if _matches_query(p, query_lower)]
+
+    def upsert_many(self, products: Iterable[Product]) -> int:
+        rows = [
+            (
+                p.id, p.name, p.description, p.price, p.popularity, p.rating,
+                p.sales_count, p.stock, p.category, p.image_url, p.created_at.isoformat()
+            )
+            for p in products
+        ]
+        if not rows:
+            return 0
+        with self._write_lock, self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT INTO products (id, name, description, price, popularity, rating, "
+                    "sales_count, stock, category, image_url, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET name = excluded.name, "
+                    "description = excluded.description, price = excluded.price, "
+                    "popularity = excluded.popularity, rating = excluded.rating, "
+                    "sales_count = excluded.sales_count, stock = excluded.stock, "
+                    "category = excluded.category, image_url = excluded.image_url, "
+                    "created_at = excluded.created_at",
+                    rows
+                )
+                self._bump_version(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def delete(self, product_id: str) -> bool:
+        with self._write_lock, self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                deleted = conn.execute("DELETE FROM products WHERE id = ?", (product_id,)).rowcount
+                if deleted:
+                    self._bump_version(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return bool(deleted)
+
+    def adjust_stock(self, product_id: str, delta: int) -> Optional[Tuple[int, Product]]:
+        # One transaction under BEGIN IMMEDIATE: no other connection, in any process, writes in between
+        with self._write_lock, self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT stock FROM products WHERE id = ?", (product_id,)).fetchone()
+                if row is None:
+                    conn.execute("ROLLBACK")
+                    return None
+                if max(0, row[0] + delta) != row[0]:
+                    conn.execute(
+                        "UPDATE products SET stock = MAX(0, stock + ?) WHERE id = ?", (delta, product_id)
+                    )
+                    self._bump_version(conn)
+                product = self._to_product(conn.execute(
+                    "SELECT id, name, description, price, popularity, rating, sales_count, "
+                    "stock, category, image_url, created_at FROM products WHERE id = ?",
+                    (product_id,)
+                ).fetchone())
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return row[0], product
+
+    def _bump_version(self, conn: sqlite3.Connection) -> None:
+        # Persist the version so caches stay valid across restarts; read it back
+        # inside the write transaction so processes sharing the file never reuse one
+        self.version = conn.execute("PRAGMA user_version").fetchone()[0] + 1
+        conn.execute(f"PRAGMA user_version = {int(self.version)}")
+
+    def stored_version(self) -> int:
+        """The version on disk, including writes made by other processes"""
+        with self._connection() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def count(self) -> int:
+        with self._connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    def close(self) -> None:
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+class CachedCatalogRepository(CatalogRepository):
+    """
+    Read-through cache in front of another repository
+
+    Point lookups go through a bounded LRU; list/search results are cached
+    per arguments and dropped whenever the backend version changes. Writes
+    go to the backend and invalidate the affected entries. A load is only
+    stored if neither the backend version nor the invalidation count moved
+    while it ran, so a read racing a write cannot put the old row back
+    after the invalidation.
+    """
+
+    def __init__(self, backend: CatalogRepository, maxsize: int = 10_000, max_queries: int = 256):
+        self.backend = backend
+        self.maxsize = maxsize
+        self.max_queries = max_queries
+        self._items: "OrderedDict[str, Optional[Product]]" = OrderedDict()
+        self._queries: "OrderedDict[tuple, List[Product]]" = OrderedDict()
+        self._queries_version = backend.version
+        self._invalidations = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        return self.backend.version
+
+    def _stamp(self) -> Tuple[int, int]:
+        return self.backend.version, self._invalidations
+
+    def _remember(self, product_id: str, product: Optional[Product], stamp: Tuple[int, int]) -> None:
+        with self._lock:
+            if self._stamp() != stamp:
+                return
+            self._items[product_id] = product
+            self._items.move_to_end(product_id)
+            if len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def get(self, product_id: str) -> Optional[Product]:
+        try:
+            with self._lock:
+                product = self._items[product_id]
+                self._items.move_to_end(product_id)
+            return product
+        except KeyError:
+            stamp = self._stamp()
+            product = self.backend.get(product_id)
+            self._remember(product_id, product, stamp)
+            return product
+
+    def get_many(self, product_ids: Iterable[str]) -> List[Product]:
+        ids = list(product_ids)
+        with self._lock:
+            cached = {pid: self._items[pid] for pid in ids if pid in self._items}
+        missing = [pid for pid in ids if pid not in cached]
+        if missing:
+            stamp = self._stamp()
+            fetched = {p.id: p for p in self.backend.get_many(missing)}
+            for pid in missing:
+                cached[pid] = fetched.get(pid)
+                self._remember(pid, cached[pid], stamp)
+        return [cached[pid] for pid in ids if cached.get(pid) is not None]
+
+    def _cached_query(self, key: tuple, load) -> List[Product]:
+        with self._lock:
+            stamp = self._stamp()
+            if self._queries_version != stamp[0]:
+                self._queries.clear()
+                self._queries_version = stamp[0]
+            if key in self._queries:
+                self._queries.move_to_end(key)
+                return self._queries[key]
+        result = load()
+        with self._lock:
+            if self._stamp() != stamp:
+                return result
+            self._queries[key] = result
+            if len(self._queries) > self.max_queries:
+                self._queries.popitem(last=False)
+        return result
+
+    def list(self, min_price=None, max_price=None, min_rating=None, category=None) -> List[Product]:
+        key = ("list", min_price, max_price, min_rating, category)
+        return list(self._cached_query(
+            key, lambda: self.backend.list(min_price, max_price, min_rating, category)
+        ))
+
+    def search(self, query: str) -> List[Product]:
+        key = ("search", query.lower())
+        return list(self._cached_query(key, lambda: self.backend.search(query)))
+
+    def invalidate(self, product_ids: Iterable[str] = ()) -> None:
+        with self._lock:
+            self._invalidations += 1
+            for product_id in product_ids:
+                self._items.pop(product_id, None)
+            self._queries.clear()
+
+    def upsert_many(self, products: Iterable[Product]) -> int:
+        products = list(products)
+        written = self.backend.upsert_many(products)
+        self.invalidate(p.id for p in products)
+        return written
+
+    def delete(self, product_id: str) -> bool:
+        deleted = self.backend.delete(product_id)
+        self.invalidate([product_id])
+        return deleted
+
+    def adjust_stock(self, product_id: str, delta: int) -> Optional[Tuple[int, Product]]:
+        result = self.backend.adjust_stock(product_id, delta)
+        self.invalidate([product_id])
+        return result
+
+    def count(self) -> int:
+        return self.backend.count()
+
+
+def diff_product(old: Product, new: Product) -> Dict[str, object]:
+    """Fields of `new` whose values differ from `old`"""
+    old_fields = old.__dict__
+    return {key: value for key, value in new.__dict__.items() if old_fields.get(key) != value}
+
+
+def classify_change(changes: Dict[str, object]) -> str:
+    if changes.keys() == {"price"}:
+        return "price"
+    if changes.keys() == {"stock"}:
+        return "stock"
+    return "upsert"
+
+
+class PublishingCatalogRepository(CatalogRepository):
+    """
+    Publishes every effective write to a change feed
+
+    Upserts are diffed against the stored rows so consumers get the
+    changed fields (and unchanged rows produce no event). New products are
+    published as an upsert with no fields; consumers that hold nothing for
+    that id can ignore them. Each write runs its diff read, the write and
+    the publish under one lock, so concurrent writes to a product diff
+    against each other's results and publish in the order they applied.
+    """
+
+    def __init__(self, backend: CatalogRepository, feed: ChangeFeed):
+        self.backend = backend
+        self.feed = feed
+        self._write_lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        return self.backend.version
+
+    def get(self, product_id: str) -> Optional[Product]:
+        return self.backend.get(product_id)
+
+    def get_many(self, product_ids: Iterable[str]) -> List[Product]:
+        return self.backend.get_many(product_ids)
+
+    def list(self, min_price=None, max_price=None, min_rating=None, category=None) -> List[Product]:
+        return self.backend.list(min_price, max_price, min_rating, category)
+
+    def search(self, query: str) -> List[Product]:
+        return self.backend.search(query)
+
+    def count(self) -> int:
+        return self.backend.count()
+
+    def published_ranking(
+        self, limit: Optional[int], offset: int = 0, state: Optional[tuple] = None
+    ) -> Optional[List[Tuple[Product, float]]]:
+        return self.backend.published_ranking(limit, offset, state)
+
+    def upsert_many(self, products: Iterable[Product]) -> int:
+        products = list(products)
+        with self._write_lock:
+            current = {p.id: p for p in self.backend.get_many(p.id for p in products)}
+            written = self.backend.upsert_many(products)
+
+            changes = []
+            for product in products:
+                previous = current.get(product.id)
+                current[product.id] = product
+                if previous is None:
+                    changes.append(("upsert", product.id, {}))
+                    continue
+                fields = diff_product(previous, product)
+                if fields:
+                    changes.append((classify_change(fields), product.id, fields))
+            if changes:
+                self.feed.publish(changes)
+        return written
+
+    def delete(self, product_id: str) -> bool:
+        with self._write_lock:
+            deleted = self.backend.delete(product_id)
+            if deleted:
+                self.feed.publish([("delete", product_id, {})])
+        return deleted
+
+    def adjust_stock(self, product_id: str, delta: int) -> Optional[Tuple[int, Product]]:
+        with self._write_lock:
+            result = self.backend.adjust_stock(product_id, delta)
+            if result is not None and result[0] != result[1].stock:
+                self.feed.publish([("stock", product_id, {"stock": result[1].stock})])
+        return result
+
+
+def create_catalog_from_env() -> CatalogRepository:
+    """
+    Build the catalog configured by the environment
+
+    CATALOG_BACKEND     memory (default) or sqlite
+    CATALOG_DB_PATH     SQLite file (default catalog.db)
+    CATALOG_CACHE_SIZE  read-through cache entries for sqlite (default 10000, 0 disables)
+    CATALOG_SNAPSHOT_DIR  serve reads from the snapshot published there
+                        (set by the multi-worker mode, see app.workers)
+    CATALOG_SNAPSHOT_PATH serve reads from a prebuilt snapshot file
+                        (python -m app.snapshot; opened lazily, e.g. on Lambda)
+    An empty store is seeded with the sample products. Writes after that
+    are published to the change feed.
+    """
+    from .data import get_products_data
+
+    backend = os.getenv("CATALOG_BACKEND", "memory").lower()
+    snapshot_dir = os.getenv("CATALOG_SNAPSHOT_DIR")
+    snapshot_path = os.getenv("CATALOG_SNAPSHOT_PATH")
+    if snapshot_dir or snapshot_path:
+        from .snapshot import CatalogSnapshot, SharedCatalog, SnapshotCatalogRepository
+
+        if snapshot_dir:
+            # Multi-worker mode forwards every write to the writer process (app.writer)
+            return SnapshotCatalogRepository(SharedCatalog(snapshot_dir).current)
+        # The snapshot build step owns seeding; writes go through to a shared SQLite file
+        writer = None
+        if backend == "sqlite":
+            writer = PublishingCatalogRepository(
+                SQLiteCatalogRepository(os.getenv("CATALOG_DB_PATH", "catalog.db")), change_feed
+            )
+        snapshot = CatalogSnapshot(snapshot_path)
+        return SnapshotCatalogRepository(lambda: snapshot, writer)
+    if backend == "memory":
+        return PublishingCatalogRepository(InMemoryCatalogRepository(get_products_data()), change_feed)
+    if backend != "sqlite":
+        raise ValueError(f"Unknown CATALOG_BACKEND: {backend}")
+
+    repository: CatalogRepository = SQLiteCatalogRepository(os.getenv("CATALOG_DB_PATH", "catalog.db"))
+    if repository.count() == 0:
+        repository.upsert_many(get_products_data())
+    cache_size = int(os.getenv("CATALOG_CACHE_SIZE", "10000"))
+    if cache_size > 0:
+        repository = CachedCatalogRepository(repository, maxsize=cache_size)
+    return PublishingCatalogRepository(repository, change_feed)
+
+
+_catalog: Optional[CatalogRepository] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> CatalogRepository:
+    """The process-wide catalog, created on first use rather than at import"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = create_catalog_from_env()
+    return _catalog
+
+
+def set_catalog(repository: Optional[CatalogRepository]) -> None:
+    """Replace the process-wide catalog (tests, benchmarks, bulk loads)"""
+    global _catalog
+    _catalog = repository
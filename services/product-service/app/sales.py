@@ -0,0 +1,307 @@
+"""
+Sales velocity
+Exponentially decayed per-product sales counters fed by order events,
+checkpointed to disk so a restart keeps recent sales
+"""
+import itertools
+import math
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .models import Product
+from .repository import CatalogRepository
+from .serialization import dumps, loads
+
+
+SALES_HALF_LIFE_DAYS = float(os.getenv("SALES_HALF_LIFE_DAYS", "7"))
+SALES_CHECKPOINT_PATH = os.getenv("SALES_CHECKPOINT_PATH", "sales_velocity.json")
+SALES_CHECKPOINT_INTERVAL = float(os.getenv("SALES_CHECKPOINT_INTERVAL", "60"))
+
+# Recorded batches remembered for incremental export_state() calls
+SALES_CHANGE_LOG = 1024
+
+# Counters are rescaled before e^(rate * (t - landmark)) gets near float overflow
+_MAX_EXPONENT = 500.0
+
+# (product_id, quantity, unix timestamp or None for now)
+SaleEvent = Tuple[str, float, Optional[float]]
+
+
+def parse_events(body: bytes) -> Tuple[List[SaleEvent], int]:
+    """
+    Decode a JSON array (or NDJSON) of {"product_id", "quantity", "timestamp"}
+    Returns (events, rejected); quantity defaults to 1, timestamp to now.
+    Raises ValueError if the body is not JSON at all.
+    """
+    body = body.strip()
+    if not body:
+        return [], 0
+    if body.startswith(b"["):
+        items = loads(body)
+    else:
+        items = loads(b"[" + b",".join(line for line in body.splitlines() if line.strip()) + b"]")
+
+    events: List[SaleEvent] = []
+    rejected = 0
+    for item in items:
+        try:
+            product_id = item["product_id"]
+            quantity = item.get("quantity", 1)
+            timestamp = item.get("timestamp")
+            if not isinstance(product_id, str) or not quantity > 0:
+                raise ValueError(product_id)
+            events.append((product_id, float(quantity), None if timestamp is None else float(timestamp)))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            rejected += 1
+    return events, rejected
+
+
+class SalesVelocity:
+    """
+    Decayed count of each product's recent sales
+
+    Uses forward decay: a sale of `quantity` at time t adds
+    quantity * e^(rate * (t - landmark)) to the product's counter, and the
+    value now is counter * e^(-rate * (now - landmark)). Recording is one
+    add per event, needs no per-product timestamp (events may arrive out
+    of order) and each product costs a single float. With
+    rate = ln 2 / half-life a sale counts half after one half-life, so the
+    value approximates units sold over the last half_life / ln 2 days.
+
+    Products are seeded from the catalog the first time they are read or
+    sold: their lifetime sales_count spread evenly over their age, i.e.
+    the expected count had they always sold at their average rate. Sales
+    of products not in the catalog are skipped, and forget() drops the
+    counters of deleted ones. `version` changes on every recorded batch; `epoch` changes whenever
+    every counter does (restore, rebase), so a mirror in another process
+    (export_state / load_state) knows when a delta is not enough.
+    """
+
+    def __init__(
+        self,
+        catalog: Callable[[], CatalogRepository],
+        half_life_days: float = SALES_HALF_LIFE_DAYS,
+        clock: Callable[[], float] = time.time
+    ):
+        self._catalog = catalog
+        self.half_life_days = half_life_days
+        self._rate = math.log(2) / (half_life_days * 86400)
+        self._clock = clock
+        self._landmark = clock()
+        self._counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._versions = itertools.count(1)
+        self.version = 0
+        self.epoch = uuid.uuid4().hex
+        self._changes: deque = deque(maxlen=SALES_CHANGE_LOG)
+        self._checkpointed_version = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def window_days(self) -> float:
+        """Mean lifetime of a sale in the counter (half-life / ln 2)"""
+        return self.half_life_days / math.log(2)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def velocity(self, product: Product) -> float:
+        """Decayed recent sales of a product (usable as ProductRanker.sales_source)"""
+        counter = self._counters.get(product.id)
+        if counter is None:
+            with self._lock:
+                self._seed([product], self._clock())
+                counter = self._counters[product.id]
+        return counter * math.exp(-self._rate * (self._clock() - self._landmark))
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def _seed(self, products: Iterable[Product], now: float) -> None:
+        # Caller holds the lock
+        weight = math.exp(self._rate * (now - self._landmark))
+        today = datetime.now()
+        for product in products:
+            if product.id in self._counters:
+                continue
+            age_days = max((today - product.created_at).total_seconds() / 86400, 1.0)
+            estimate = product.sales_count * min(1.0, self.window_days / age_days)
+            self._counters[product.id] = estimate * weight
+
+    def _rebase(self, now: float) -> None:
+        # Caller holds the lock
+        scale = math.exp(-self._rate * (now - self._landmark))
+        self._counters = {pid: counter * scale for pid, counter in self._counters.items()}
+        self._landmark = now
+        self._new_epoch()
+
+    def _new_epoch(self) -> None:
+        # Caller holds the lock
+        self.epoch = uuid.uuid4().hex
+        self._changes.clear()
+
+    def record_many(self, events: Iterable[SaleEvent]) -> int:
+        """Apply a batch of sale events; returns how many were applied (unknown products are not)"""
+        events = events if isinstance(events, list) else list(events)
+        now = self._clock()
+        missing = {product_id for product_id, _, _ in events if product_id not in self._counters}
+        products = self._catalog().get_many(missing) if missing else []
+        if len(products) < len(missing):
+            unknown = missing - {product.id for product in products}
+            events = [event for event in events if event[0] not in unknown]
+
+        with self._lock:
+            if self._rate * (now - self._landmark) > _MAX_EXPONENT:
+                self._rebase(now)
+            self._seed(products, now)
+            counters = self._counters
+            rate, landmark = self._rate, self._landmark
+            exp = math.exp
+            now_weight = exp(rate * (now - landmark))
+            for product_id, quantity, timestamp in events:
+                if timestamp is None or timestamp >= now:
+                    weight = now_weight
+                else:
+                    weight = exp(rate * (timestamp - landmark))
+                counters[product_id] = counters.get(product_id, 0.0) + quantity * weight
+            if events:
+                self.version = next(self._versions)
+                self._changes.append((self.version, [product_id for product_id, _, _ in events]))
+        return len(events)
+
+    def record(self, product_id: str, quantity: float = 1, timestamp: Optional[float] = None) -> None:
+        self.record_many([(product_id, quantity, timestamp)])
+
+    def forget(self, product_ids: Iterable[str]) -> int:
+        """Drop the counters of deleted products; returns how many were dropped"""
+        with self._lock:
+            removed = [pid for pid in product_ids if self._counters.pop(pid, None) is not None]
+            if removed:
+                self.version = next(self._versions)
+                self._changes.append((self.version, removed))
+        return len(removed)
+
+    # ------------------------------------------------------------------
+    # Mirrors
+    # ------------------------------------------------------------------
+
+    def export_state(self, epoch: Optional[str] = None, since: int = 0) -> Optional[dict]:
+        """
+        Counters recorded after version `since` of `epoch`, for load_state() elsewhere
+        None when the caller is current; every counter when `since` belongs
+        to another epoch or is older than the change log. A delta lists the
+        products forgotten since under "removed".
+        """
+        with self._lock:
+            if epoch == self.epoch and since == self.version:
+                return None
+            if epoch == self.epoch and self._changes and since >= self._changes[0][0] - 1:
+                changed = {pid for version, batch in self._changes if version > since for pid in batch}
+                counters = {pid: self._counters[pid] for pid in changed if pid in self._counters}
+                removed = [pid for pid in changed if pid not in self._counters]
+                full = False
+            else:
+                counters = dict(self._counters)
+                removed = []
+                full = True
+            return {
+                "epoch": self.epoch,
+                "version": self.version,
+                "half_life_days": self.half_life_days,
+                "landmark": self._landmark,
+                "full": full,
+                "counters": counters,
+                "removed": removed,
+            }
+
+    def load_state(self, state: dict) -> None:
+        """
+        Apply an export_state() result from the process that records sales
+        Products missing from a full export keep their local seed.
+        """
+        with self._lock:
+            if state["full"]:
+                scale = math.exp(-self._rate * (state["landmark"] - self._landmark))
+                counters = {pid: counter * scale for pid, counter in self._counters.items()}
+                counters.update(state["counters"])
+                self._counters = counters
+                self._landmark = state["landmark"]
+            else:
+                self._counters.update(state["counters"])
+                for pid in state.get("removed", ()):
+                    self._counters.pop(pid, None)
+            self.epoch = state["epoch"]
+            self.version = state["version"]
+
+    # ------------------------------------------------------------------
+    # Checkpoints
+    # ------------------------------------------------------------------
+
+    def checkpoint(self, path: str) -> None:
+        """Write the counters atomically (temp file + rename)"""
+        with self._lock:
+            version = self.version
+            state = {
+                "half_life_days": self.half_life_days,
+                "landmark": self._landmark,
+                "counters": dict(self._counters),
+            }
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "wb") as handle:
+            handle.write(dumps(state))
+        os.replace(tmp_path, path)
+        self._checkpointed_version = version
+
+    def restore(self, path: str) -> bool:
+        """
+        Load counters saved by checkpoint(); returns False if there is no file
+        Values are decayed through the downtime and re-expressed against a
+        fresh landmark, so a changed half-life applies from now on.
+        """
+        if not os.path.exists(path):
+            return False
+        with open(path, "rb") as handle:
+            state = loads(handle.read())
+        now = self._clock()
+        saved_rate = math.log(2) / (state["half_life_days"] * 86400)
+        scale = math.exp(-saved_rate * (now - state["landmark"]))
+        with self._lock:
+            self._landmark = now
+            self._counters = {pid: counter * scale for pid, counter in state["counters"].items()}
+            self.version = next(self._versions)
+            self._checkpointed_version = self.version
+            self._new_epoch()
+        return True
+
+    def start(self, path: str, interval: float = SALES_CHECKPOINT_INTERVAL) -> None:
+        """Restore from `path`, then checkpoint there every `interval` seconds"""
+        self.restore(path)
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run_checkpoints, args=(path, interval), name="sales-checkpoint", daemon=True
+        )
+        self._thread.start()
+
+    def _run_checkpoints(self, path: str, interval: float) -> None:
+        while not self._stop.wait(interval):
+            if self.version != self._checkpointed_version:
+                self.checkpoint(path)
+
+    def stop(self, path: str) -> None:
+        """Stop periodic checkpoints and write a final one"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.checkpoint(path)
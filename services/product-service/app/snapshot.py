@@ -0,0 +1,611 @@
+"""
+Catalog snapshots
+Immutable columnar catalog files mapped read-only with mmap, so every
+worker process on a host shares one copy of the catalog and its
+precomputed ranking through the page cache
+"""
+import argparse
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .models import Product
+from .ranking import ProductRanker
+from .repository import CatalogRepository
+
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CATSNAP1"
+
+# magic, length of the JSON section table that follows
+_PREFIX = struct.Struct("<8sQ")
+
+FLOAT_COLUMNS = ("price", "rating", "score")
+INT_COLUMNS = ("popularity", "sales_count", "stock", "created_at")
+STRING_COLUMNS = ("id", "name", "description", "category", "image_url")
+
+# Bit per nullable string column in the "nulls" section
+_NULL_BITS = {"description": 1, "image_url": 2}
+
+# created_at is stored as whole microseconds from this (naive) epoch
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# Materialized rows kept per mapped snapshot (hot pages skip model construction)
+SNAPSHOT_ROW_CACHE = int(os.getenv("SNAPSHOT_ROW_CACHE", "4096"))
+
+# Posting lists intersected per search before candidates are verified directly
+SEARCH_INTERSECT = 4
+
+SNAPSHOT_CHECK_INTERVAL = float(os.getenv("SNAPSHOT_CHECK_INTERVAL", "1.0"))
+SNAPSHOT_PUBLISH_INTERVAL = float(os.getenv("SNAPSHOT_PUBLISH_INTERVAL", "1.0"))
+# Superseded snapshot files stay this long for workers that just read CURRENT
+SNAPSHOT_RETIRE_SECONDS = float(os.getenv("SNAPSHOT_RETIRE_SECONDS", "10"))
+
+CURRENT_FILE = "CURRENT"
+
+
+class ReadOnlyCatalog(Exception):
+    """The catalog is a published snapshot with no writable store behind it"""
+
+
+# ----------------------------------------------------------------------
+# Writing
+# ----------------------------------------------------------------------
+
+def _string_sections(values: Sequence[Optional[str]]) -> Tuple[array, bytes]:
+    offsets = array("q", [0])
+    chunks = []
+    position = 0
+    for value in values:
+        encoded = value.encode("utf-8") if value else b""
+        chunks.append(encoded)
+        position += len(encoded)
+        offsets.append(position)
+    return offsets, b"".join(chunks)
+
+
+def _trigrams(text: str) -> set:
+    data = text.lower().encode("utf-8")
+    return {data[i:i + 3] for i in range(len(data) - 2)}
+
+
+def build_search_sections(products: Sequence[Product]) -> Dict[str, Tuple[str, bytes]]:
+    """
+    Trigram postings over lower-cased name and description
+
+    search.keys holds the sorted trigrams (3 UTF-8 bytes as an int), and
+    search.rows[search.offsets[k]:search.offsets[k + 1]] the ascending rows
+    containing trigram k. A substring query must contain every trigram of
+    itself, so intersecting their postings leaves only candidates to verify.
+    """
+    postings: Dict[bytes, array] = {}
+    for row, product in enumerate(products):
+        grams = _trigrams(product.name)
+        if product.description:
+            grams |= _trigrams(product.description)
+        for gram in grams:
+            rows = postings.get(gram)
+            if rows is None:
+                rows = postings[gram] = array("i")
+            rows.append(row)
+
+    keys, offsets, rows = array("i"), array("q", [0]), array("i")
+    for gram in sorted(postings):
+        keys.append(int.from_bytes(gram, "big"))
+        rows.extend(postings[gram])
+        offsets.append(len(rows))
+    return {
+        "search.keys": ("i", keys.tobytes()),
+        "search.offsets": ("q", offsets.tobytes()),
+        "search.rows": ("i", rows.tobytes()),
+    }
+
+
+def build_sections(
+    products: Sequence[Product],
+    ranker: ProductRanker,
+    search_index: bool = True
+) -> Dict[str, Tuple[str, bytes]]:
+    """Section name -> (array typecode, raw bytes) for a list of products"""
+    sections: Dict[str, Tuple[str, bytes]] = {}
+    scores = [ranker.calculate_score(p) for p in products]
+
+    sections["price"] = ("d", array("d", (p.price for p in products)).tobytes())
+    sections["rating"] = ("d", array("d", (p.rating for p in products)).tobytes())
+    sections["score"] = ("d", array("d", scores).tobytes())
+    for name in ("popularity", "sales_count", "stock"):
+        sections[name] = ("q", array("q", (getattr(p, name) for p in products)).tobytes())
+    sections["created_at"] = ("q", array("q", ((p.created_at - _EPOCH) // _MICROSECOND for p in products)).tobytes())
+
+    nulls = array("B", bytes(len(products)))
+    for name in STRING_COLUMNS:
+        values = [getattr(p, name) for p in products]
+        if name in _NULL_BITS:
+            for row, value in enumerate(values):
+                if value is None:
+                    nulls[row] |= _NULL_BITS[name]
+        offsets, data = _string_sections(values)
+        sections[f"{name}.offsets"] = ("q", offsets.tobytes())
+        sections[f"{name}.data"] = ("B", data)
+    sections["nulls"] = ("B", nulls.tobytes())
+
+    if search_index:
+        sections.update(build_search_sections(products))
+
+    ids = [p.id.encode("utf-8") for p in products]
+    sections["by_id"] = ("q", array("q", sorted(range(len(products)), key=ids.__getitem__)).tobytes())
+    # Stable, so ties keep catalog order exactly like ProductRanker.rank_with_scores
+    sections["ranked"] = ("q", array("q", sorted(range(len(products)), key=scores.__getitem__, reverse=True)).tobytes())
+    return sections
+
+
+def write_snapshot(
+    products: Sequence[Product],
+    path: str,
+    version: int = 0,
+    ranker: Optional[ProductRanker] = None,
+    search_index: bool = True,
+    ranking_state: Optional[list] = None
+) -> int:
+    """
+    Write products (plus their default ranking) as a snapshot file
+
+    The file is written next to `path` and renamed into place, so a reader
+    never maps a half-written snapshot. Scores use the catalog's own stock
+    and sales_count unless `ranker` has live sources; `ranking_state` then
+    records the versions of those sources the scores belong to. Returns
+    the file size in bytes.
+    """
+    products = list(products)
+    sections = build_sections(products, ranker or ProductRanker(), search_index)
+
+    # Section table first, then every section 8-byte aligned for memoryview casts
+    table: Dict[str, list] = {}
+    names = list(sections)
+    for _ in range(2):
+        header = json.dumps({
+            "version": version, "count": len(products), "created": time.time(),
+            "ranking_state": ranking_state, "sections": table
+        }).encode()
+        offset = _align(_PREFIX.size + len(header) + 64)
+        for name in names:
+            typecode, data = sections[name]
+            table[name] = [offset, len(data), typecode]
+            offset = _align(offset + len(data))
+    header = json.dumps({
+        "version": version, "count": len(products), "created": time.time(),
+        "ranking_state": ranking_state, "sections": table
+    }).encode()
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as handle:
+        handle.write(_PREFIX.pack(MAGIC, len(header)))
+        handle.write(header)
+        for name in names:
+            position = table[name][0]
+            handle.write(b"\0" * (position - handle.tell()))
+            handle.write(sections[name][1])
+        size = handle.tell()
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
+    return size
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _contains(rows: Sequence[int], row: int) -> bool:
+    index = bisect_left(rows, row)
+    return index < len(rows) and rows[index] == row
+
+
+# ----------------------------------------------------------------------
+# Reading
+# ----------------------------------------------------------------------
+
+class CatalogSnapshot:
+    """
+    A snapshot file mapped read-only
+
+    Columns are memoryviews straight over the mapping: nothing is copied
+    or decoded until a row is asked for, and pages are faulted in on
+    first touch. Processes mapping the same file share its pages.
+    """
+
+    def __init__(self, path: str, row_cache: int = SNAPSHOT_ROW_CACHE):
+        self.path = path
+        self._rows: "OrderedDict[int, Product]" = OrderedDict()
+        self._row_cache = row_cache
+        self._rows_lock = threading.Lock()
+        with open(path, "rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_length = _PREFIX.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        header = json.loads(self._map[_PREFIX.size:_PREFIX.size + header_length])
+        self.version: int = header["version"]
+        self.count: int = header["count"]
+        self.created: float = header["created"]
+        self.ranking_state: Optional[list] = header.get("ranking_state")
+        view = memoryview(self._map)
+        self.sections: Dict[str, memoryview] = {
+            name: view[offset:offset + length].cast(typecode)
+            for name, (offset, length, typecode) in header["sections"].items()
+        }
+        s = self.sections
+        self._columns = {name: s[name] for name in FLOAT_COLUMNS + INT_COLUMNS}
+        self._strings = {name: (s[f"{name}.offsets"], s[f"{name}.data"]) for name in STRING_COLUMNS}
+        self._nulls = s["nulls"]
+        self._by_id = s["by_id"]
+        self.ranked = s["ranked"]
+        self._search = (s["search.keys"], s["search.offsets"], s["search.rows"]) if "search.keys" in s else None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def column(self, name: str) -> memoryview:
+        return self._columns[name]
+
+    def raw_string(self, name: str, row: int) -> bytes:
+        offsets, data = self._strings[name]
+        return bytes(data[offsets[row]:offsets[row + 1]])
+
+    def string(self, name: str, row: int) -> Optional[str]:
+        bit = _NULL_BITS.get(name)
+        if bit is not None and self._nulls[row] & bit:
+            return None
+        offsets, data = self._strings[name]
+        return str(data[offsets[row]:offsets[row + 1]], "utf-8")
+
+    def find(self, product_id: str) -> Optional[int]:
+        """Row of a product id (binary search over the id-sorted permutation)"""
+        target = product_id.encode("utf-8")
+        by_id = self._by_id
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.raw_string("id", by_id[mid]) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self.raw_string("id", by_id[lo]) == target:
+            return by_id[lo]
+        return None
+
+    def search(self, query: str) -> List[int]:
+        """
+        Rows whose name or description contains `query` (case-insensitive), in row order
+
+        With postings, only rows holding every trigram of the query are
+        checked; shorter queries and snapshots written without an index scan.
+        """
+        query_lower = query.lower()
+        candidates: Iterable[int] = range(self.count)
+        grams = _trigrams(query)
+        if grams and self._search is not None:
+            lists = [self._postings(gram) for gram in grams]
+            lists.sort(key=len)
+            candidates = lists[0]
+            # The rarest few lists cut the candidates down; verifying beats more bisecting
+            for other in lists[1:SEARCH_INTERSECT]:
+                candidates = [row for row in candidates if _contains(other, row)]
+        matches = []
+        for row in candidates:
+            description = self.string("description", row)
+            if query_lower in self.string("name", row).lower() or (
+                description is not None and query_lower in description.lower()
+            ):
+                matches.append(row)
+        return matches
+
+    def _postings(self, gram: bytes) -> Sequence[int]:
+        keys, offsets, rows = self._search
+        key = int.from_bytes(gram, "big")
+        index = bisect_left(keys, key)
+        if index == len(keys) or keys[index] != key:
+            return ()
+        return rows[offsets[index]:offsets[index + 1]]
+
+    def product(self, row: int) -> Product:
+        """One row as a Product; recently materialized rows are reused (products are never mutated)"""
+        product = self._rows.get(row)
+        if product is not None:
+            return product
+        product = self._materialize(row)
+        if self._row_cache > 0:
+            with self._rows_lock:
+                self._rows[row] = product
+                if len(self._rows) > self._row_cache:
+                    self._rows.popitem(last=False)
+        return product
+
+    def _materialize(self, row: int) -> Product:
+        # Already validated when the snapshot was written
+        columns = self._columns
+        return Product.model_construct(
+            id=self.string("id", row),
+            name=self.string("name", row),
+            description=self.string("description", row),
+            price=columns["price"][row],
+            popularity=columns["popularity"][row],
+            rating=columns["rating"][row],
+            sales_count=columns["sales_count"][row],
+            stock=columns["stock"][row],
+            category=self.string("category", row),
+            image_url=self.string("image_url", row),
+            created_at=_EPOCH + columns["created_at"][row] * _MICROSECOND,
+        )
+
+    def products(self, rows: Iterable[int]) -> List[Product]:
+        return [self.product(row) for row in rows]
+
+    def close(self) -> None:
+        for view in self.sections.values():
+            view.release()
+        self._map.close()
+
+
+class SharedCatalog:
+    """
+    The newest snapshot published in a directory
+
+    The CURRENT pointer is re-read at most every `check_interval` seconds;
+    when it names a new file that file is mapped and swapped in. The old
+    mapping is not closed - requests may still be reading it - and is
+    unmapped once the last reference goes. Publishers unlink superseded
+    files after a grace period, so the kernel frees their pages after that.
+    """
+
+    def __init__(self, directory: str, check_interval: float = SNAPSHOT_CHECK_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.directory = directory
+        self.check_interval = check_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._name: Optional[str] = None
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._next_check = 0.0
+
+    def current(self) -> CatalogSnapshot:
+        now = self._clock()
+        if now >= self._next_check or self._snapshot is None:
+            with self._lock:
+                if now >= self._next_check or self._snapshot is None:
+                    self._refresh()
+                    self._next_check = now + self.check_interval
+        return self._snapshot
+
+    def _refresh(self) -> None:
+        with open(os.path.join(self.directory, CURRENT_FILE)) as handle:
+            name = handle.read().strip()
+        if name != self._name:
+            self._snapshot = CatalogSnapshot(os.path.join(self.directory, name))
+            self._name = name
+
+
+class SnapshotPublisher:
+    """
+    Single writer of a snapshot directory
+
+    publish() writes catalog-<version>.snap, then atomically repoints
+    CURRENT at it (write + rename). Superseded files are unlinked once they
+    have been retired for `retire_after` seconds, so a worker that read
+    CURRENT just before the swap can still open the file it names. start()
+    republishes from a source catalog whenever its version changes.
+
+    With `ranking_state`, the default ranking is scored by `ranker` (live
+    stock and sales) and the state it returns is recorded in the snapshot;
+    readers only use the ranking while their own state matches.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        ranker: Optional[ProductRanker] = None,
+        ranking_state: Optional[Callable[[], tuple]] = None,
+        retire_after: float = SNAPSHOT_RETIRE_SECONDS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.directory = directory
+        self.ranker = ranker or ProductRanker()
+        self.ranking_state = ranking_state
+        self.retire_after = retire_after
+        self._clock = clock
+        self.version: Optional[int] = None
+        self._name: Optional[str] = None
+        self._retired: List[Tuple[float, str]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def publish(self, products: Sequence[Product], version: int, **kwargs) -> str:
+        name = f"catalog-{version:012d}.snap"
+        # Taken before scoring: a page is never labelled newer than its scores
+        state = None if self.ranking_state is None else list(self.ranking_state())
+        write_snapshot(
+            products, os.path.join(self.directory, name), version, self.ranker, ranking_state=state, **kwargs
+        )
+        pointer = os.path.join(self.directory, CURRENT_FILE)
+        with open(f"{pointer}.tmp", "w") as handle:
+            handle.write(name)
+        os.replace(f"{pointer}.tmp", pointer)
+        if self._name is not None and self._name != name:
+            self._retired.append((self._clock(), self._name))
+        self._name = name
+        self.version = version
+        self.unlink_retired()
+        return name
+
+    def unlink_retired(self) -> None:
+        """Remove snapshot files superseded more than retire_after seconds ago"""
+        now = self._clock()
+        self._retired = [(at, name) for at, name in self._retired if now - at < self.retire_after]
+        keep = {self._name}.union(name for _, name in self._retired)
+        for other in os.listdir(self.directory):
+            if other.startswith("catalog-") and other.endswith(".snap") and other not in keep:
+                os.unlink(os.path.join(self.directory, other))
+
+    def publish_catalog(self, catalog: CatalogRepository, version: Optional[int] = None) -> str:
+        return self.publish(catalog.list(), catalog.version if version is None else version)
+
+    def start(self, catalog: CatalogRepository, version: Callable[[], int],
+              interval: float = SNAPSHOT_PUBLISH_INTERVAL) -> None:
+        """Poll version() every `interval` seconds and republish on change"""
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(catalog, version, interval), name="snapshot-publisher", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, catalog: CatalogRepository, version: Callable[[], int], interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                current = version()
+                if current != self.version:
+                    self.publish_catalog(catalog, current)
+                elif self._retired:
+                    self.unlink_retired()
+            except Exception as exc:
+                logger.warning("snapshot publish failed: %s", exc)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+# ----------------------------------------------------------------------
+# Repository
+# ----------------------------------------------------------------------
+
+class SnapshotCatalogRepository(CatalogRepository):
+    """
+    Catalog reads served from the current shared snapshot
+
+    Filters scan the mapped columns and only matching rows are
+    materialized. Writes go to `writer` and show up once the publisher has
+    republished; with no writer the catalog is read-only.
+    """
+
+    def __init__(self, snapshot: Callable[[], CatalogSnapshot], writer: Optional[CatalogRepository] = None):
+        self._snapshot = snapshot
+        self.writer = writer
+
+    @property
+    def version(self) -> int:
+        return self._snapshot().version
+
+    def get(self, product_id: str) -> Optional[Product]:
+        snapshot = self._snapshot()
+        row = snapshot.find(product_id)
+        return None if row is None else snapshot.product(row)
+
+    def get_many(self, product_ids: Iterable[str]) -> List[Product]:
+        snapshot = self._snapshot()
+        rows = (snapshot.find(product_id) for product_id in product_ids)
+        return [snapshot.product(row) for row in rows if row is not None]
+
+    def list(self, min_price=None, max_price=None, min_rating=None, category=None) -> List[Product]:
+        snapshot = self._snapshot()
+        rows: Iterable[int] = range(len(snapshot))
+        price, rating = snapshot.column("price"), snapshot.column("rating")
+        if min_price is not None:
+            rows = [r for r in rows if price[r] >= min_price]
+        if max_price is not None:
+            rows = [r for r in rows if price[r] <= max_price]
+        if min_rating is not None:
+            rows = [r for r in rows if rating[r] >= min_rating]
+        if category is not None:
+            encoded = category.encode("utf-8")
+            rows = [r for r in rows if snapshot.raw_string("category", r) == encoded]
+        return snapshot.products(rows)
+
+    def search(self, query: str) -> List[Product]:
+        snapshot = self._snapshot()
+        return snapshot.products(snapshot.search(query))
+
+    def published_ranking(
+        self, limit: Optional[int], offset: int = 0, state: Optional[tuple] = None
+    ) -> Optional[List[Tuple[Product, float]]]:
+        """
+        A page of the default ranking as scored at publish time; only the page is materialized
+        None unless `state` (the live score inputs) is what the snapshot was scored with.
+        """
+        snapshot = self._snapshot()
+        if snapshot.ranking_state != (None if state is None else list(state)):
+            return None
+        stop = len(snapshot) if limit is None else min(len(snapshot), offset + limit)
+        scores = snapshot.column("score")
+        return [(snapshot.product(row), scores[row]) for row in snapshot.ranked[offset:stop]]
+
+    def count(self) -> int:
+        return len(self._snapshot())
+
+    def _require_writer(self) -> CatalogRepository:
+        if self.writer is None:
+            raise ReadOnlyCatalog("The catalog is a read-only snapshot")
+        return self.writer
+
+    def upsert_many(self, products: Iterable[Product]) -> int:
+        return self._require_writer().upsert_many(products)
+
+    def delete(self, product_id: str) -> bool:
+        return self._require_writer().delete(product_id)
+
+    def adjust_stock(self, product_id: str, delta: int) -> Optional[Tuple[int, Product]]:
+        return self._require_writer().adjust_stock(product_id, delta)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build a catalog snapshot (e.g. for CATALOG_SNAPSHOT_PATH)")
+    parser.add_argument("output", help="snapshot file to write")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--db", help="SQLite catalog to read (default: the sample products)")
+    source.add_argument("--generate", type=int, metavar="N", help="N synthetic products (benchmarks)")
+    parser.add_argument("--no-search-index", action="store_true", help="skip the search postings")
+    args = parser.parse_args(argv)
+
+    from .data import generate_products, get_products_data
+    from .repository import SQLiteCatalogRepository
+
+    started = time.perf_counter()
+    version = 0
+    if args.db:
+        catalog = SQLiteCatalogRepository(args.db)
+        products, version = catalog.list(), catalog.stored_version()
+        catalog.close()
+    elif args.generate:
+        products = generate_products(args.generate)
+    else:
+        products = get_products_data()
+    loaded = time.perf_counter()
+    size = write_snapshot(products, args.output, version, search_index=not args.no_search_index)
+
+    print(json.dumps({
+        "path": args.output,
+        "products": len(products),
+        "version": version,
+        "bytes": size,
+        "load_seconds": round(loaded - started, 2),
+        "write_seconds": round(time.perf_counter() - loaded, 2),
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""
+Stock ledger
+Atomic reserve/release/commit of product stock with expiring holds
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from .models import Product
+from .repository import CatalogRepository
+
+
+DEFAULT_RESERVATION_TTL = float(os.getenv("STOCK_RESERVATION_TTL", "900"))
+
+
+class InsufficientStock(Exception):
+    """Raised when a reservation asks for more than is available"""
+
+    def __init__(self, product_id: str, requested: int, available: int):
+        super().__init__(f"Only {available} of {product_id} available, {requested} requested")
+        self.product_id = product_id
+        self.requested = requested
+        self.available = available
+
+
+@dataclass
+class Reservation:
+    """Stock held for one owner (e.g. a cart) on one product"""
+    product_id: str
+    owner: str
+    quantity: int
+    expires_at: float
+
+
+class StockLedger:
+    """
+    Tracks reserved stock on top of the catalog's on-hand `stock`
+
+    available = catalog stock - active reservations. Each product is
+    guarded by one of `stripes` locks (picked by hash), so requests for a
+    hot SKU queue only behind each other while the rest of the catalog
+    proceeds. An owner has at most one hold per product; reserving again
+    adds to it and pushes its expiry out.
+
+    Expired holds are released lazily: every mutating call first pops due
+    entries from an expiry heap, which is O(1) when nothing is due.
+    Committing a hold decrements the catalog stock in one atomic step
+    (adjust_stock), which publishes a stock change on the change feed;
+    other read-modify-writes of a product hold locked(product_id).
+    `version` changes whenever reserved quantities do, so rankings that
+    use live stock can be cached.
+    """
+
+    def __init__(
+        self,
+        catalog: Callable[[], CatalogRepository],
+        stripes: int = 64,
+        ttl: float = DEFAULT_RESERVATION_TTL,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self._catalog = catalog
+        self.ttl = ttl
+        self._clock = clock
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        self._holds: Dict[Tuple[str, str], Reservation] = {}
+        self._reserved: Dict[str, int] = {}
+        self._by_owner: Dict[str, Set[str]] = {}
+        self._owners_lock = threading.Lock()
+        self._expiry: List[Tuple[float, str, str]] = []
+        self._expiry_lock = threading.Lock()
+        # next() on a count is atomic, unlike += across stripe locks
+        self._versions = itertools.count(1)
+        self.version = 0
+
+    def _lock_for(self, product_id: str) -> threading.Lock:
+        return self._stripes[hash(product_id) % len(self._stripes)]
+
+    def locked(self, product_id: str) -> threading.Lock:
+        """The lock reservations and commits of a product run under (not reentrant)"""
+        return self._lock_for(product_id)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def reserved(self, product_id: str) -> int:
+        return self._reserved.get(product_id, 0)
+
+    def live_stock(self, product: Product) -> int:
+        """Stock left for new buyers; cheap enough to call per ranked product"""
+        return max(0, product.stock - self._reserved.get(product.id, 0))
+
+    def reserved_totals(self) -> Tuple[int, Dict[str, int]]:
+        """(version, reserved units per product); the copy is at least as new as the version"""
+        version = self.version
+        return version, dict(self._reserved)
+
+    def available(self, product_id: str) -> Optional[int]:
+        """Available quantity, or None for an unknown product"""
+        self.expire()
+        product = self._catalog().get(product_id)
+        return None if product is None else self.live_stock(product)
+
+    def holds(self, owner: str) -> List[Reservation]:
+        with self._owners_lock:
+            product_ids = list(self._by_owner.get(owner, ()))
+        holds = (self._holds.get((product_id, owner)) for product_id in product_ids)
+        return [hold for hold in holds if hold is not None]
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def reserve(self, product_id: str, quantity: int, owner: str, ttl: Optional[float] = None) -> Reservation:
+        """
+        Hold `quantity` more units for `owner`
+
+        Raises KeyError for an unknown product and InsufficientStock if
+        fewer than `quantity` units are available.
+        """
+        if quantity <= 0:
+            raise ValueError("quantity must be positive")
+        self.expire()
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+
+        with self._lock_for(product_id):
+            product = self._catalog().get(product_id)
+            if product is None:
+                raise KeyError(product_id)
+            available = self.live_stock(product)
+            if quantity > available:
+                raise InsufficientStock(product_id, quantity, available)
+
+            hold = self._holds.get((product_id, owner))
+            if hold is None:
+                hold = self._holds[(product_id, owner)] = Reservation(product_id, owner, 0, expires_at)
+                with self._owners_lock:
+                    self._by_owner.setdefault(owner, set()).add(product_id)
+            hold.quantity += quantity
+            hold.expires_at = expires_at
+            self._reserved[product_id] = self._reserved.get(product_id, 0) + quantity
+            self.version = next(self._versions)
+
+        with self._expiry_lock:
+            heapq.heappush(self._expiry, (expires_at, product_id, owner))
+        return hold
+
+    def release(self, product_id: str, owner: str, quantity: Optional[int] = None) -> int:
+        """Give back some (or all) of an owner's hold; returns the units released"""
+        self.expire()
+        with self._lock_for(product_id):
+            return self._release_locked(product_id, owner, quantity)
+
+    def release_all(self, owner: str) -> int:
+        self.expire()
+        released = 0
+        for hold in self.holds(owner):
+            with self._lock_for(hold.product_id):
+                released += self._release_locked(hold.product_id, owner, None)
+        return released
+
+    def _release_locked(self, product_id: str, owner: str, quantity: Optional[int]) -> int:
+        hold = self._holds.get((product_id, owner))
+        if hold is None:
+            return 0
+        released = hold.quantity if quantity is None else min(quantity, hold.quantity)
+        hold.quantity -= released
+        remaining = self._reserved.get(product_id, 0) - released
+        if remaining > 0:
+            self._reserved[product_id] = remaining
+        else:
+            self._reserved.pop(product_id, None)
+        if released:
+            self.version = next(self._versions)
+        if hold.quantity == 0:
+            del self._holds[(product_id, owner)]
+            with self._owners_lock:
+                products = self._by_owner.get(owner)
+                if products is not None:
+                    products.discard(product_id)
+                    if not products:
+                        del self._by_owner[owner]
+        return released
+
+    def transfer(self, from_owner: str, to_owner: str) -> int:
+        """
+        Hand every hold of `from_owner` to `to_owner` (e.g. a guest cart merged at login)
+        Quantities add up with any hold `to_owner` already has and the later
+        expiry wins; available stock does not change. Returns units moved.
+        """
+        self.expire()
+        moved = 0
+        pushed = []
+        for hold in self.holds(from_owner):
+            product_id = hold.product_id
+            with self._lock_for(product_id):
+                source = self._holds.pop((product_id, from_owner), None)
+                if source is None:
+                    continue
+                target = self._holds.get((product_id, to_owner))
+                if target is None:
+                    target = self._holds[(product_id, to_owner)] = Reservation(
+                        product_id, to_owner, 0, source.expires_at
+                    )
+                target.quantity += source.quantity
+                if source.expires_at > target.expires_at:
+                    target.expires_at = source.expires_at
+                pushed.append((target.expires_at, product_id, to_owner))
+                with self._owners_lock:
+                    products = self._by_owner.get(from_owner)
+                    if products is not None:
+                        products.discard(product_id)
+                        if not products:
+                            del self._by_owner[from_owner]
+                    self._by_owner.setdefault(to_owner, set()).add(product_id)
+                moved += source.quantity
+        with self._expiry_lock:
+            for entry in pushed:
+                heapq.heappush(self._expiry, entry)
+        return moved
+
+    def commit(self, owner: str, product_ids: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        Turn an owner's holds into sales (e.g. at checkout)
+        Returns {product_id: units committed}; products without a hold are skipped.
+        """
+        self.expire()
+        wanted = None if product_ids is None else set(product_ids)
+        committed: Dict[str, int] = {}
+        for hold in self.holds(owner):
+            if wanted is not None and hold.product_id not in wanted:
+                continue
+            with self._lock_for(hold.product_id):
+                current = self._holds.get((hold.product_id, owner))
+                if current is None or current.quantity == 0:
+                    continue
+                quantity = current.quantity
+                # Decrement first: a catalog that refuses the write leaves the hold in place
+                adjusted = self._catalog().adjust_stock(hold.product_id, -quantity)
+                self._release_locked(hold.product_id, owner, None)
+                if adjusted is None:
+                    continue
+                committed[hold.product_id] = quantity
+        return committed
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Release holds whose expiry has passed; returns how many were released"""
+        now = self._clock() if now is None else now
+        try:
+            # Unlocked peek keeps the common nothing-due case lock-free
+            if self._expiry[0][0] > now:
+                return 0
+        except IndexError:
+            return 0
+        due = []
+        with self._expiry_lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                due.append(heapq.heappop(self._expiry))
+        expired = 0
+        for _, product_id, owner in due:
+            with self._lock_for(product_id):
+                hold = self._holds.get((product_id, owner))
+                # Extended holds leave stale heap entries behind; skip those
+                if hold is not None and hold.expires_at <= now:
+                    self._release_locked(product_id, owner, None)
+                    expired += 1
+        return expired
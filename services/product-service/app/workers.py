@@ -0,0 +1,106 @@
+"""
+Multi-worker mode
+The parent process is the single writer: it owns the catalog, stock holds,
+sales velocity and the change feed, serves the requests that touch them on
+a Unix socket, and publishes the catalog as an mmap snapshot on every
+change. uvicorn workers map the current snapshot read-only instead of each
+holding their own copy and forward writes to the parent (see app.writer).
+"""
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import uvicorn
+
+from .changefeed import change_feed
+from .data import get_products_data
+from .repository import (
+    CachedCatalogRepository,
+    CatalogRepository,
+    InMemoryCatalogRepository,
+    PublishingCatalogRepository,
+    SQLiteCatalogRepository,
+    set_catalog,
+)
+from .snapshot import SNAPSHOT_PUBLISH_INTERVAL, SnapshotPublisher
+
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_WORKERS = int(os.getenv("PRODUCT_WORKERS", "1"))
+
+
+def default_snapshot_dir() -> str:
+    # tmpfs keeps the snapshot in RAM; the page cache shares it either way
+    root = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(root, f"product-catalog-{os.getpid()}")
+
+
+def source_catalog() -> CatalogRepository:
+    """The writer's catalog: the shared SQLite file, or the sample data for CATALOG_BACKEND=memory"""
+    backend = os.getenv("CATALOG_BACKEND", "memory").lower()
+    if backend == "memory":
+        return InMemoryCatalogRepository(get_products_data())
+    if backend != "sqlite":
+        raise ValueError(f"Unknown CATALOG_BACKEND: {backend}")
+    catalog = SQLiteCatalogRepository(os.getenv("CATALOG_DB_PATH", "catalog.db"))
+    if catalog.count() == 0:
+        catalog.upsert_many(get_products_data())
+    return catalog
+
+
+def serve(workers: int = PRODUCT_WORKERS, host: str = "0.0.0.0", port: int = 8001) -> None:
+    """
+    Start the writer, publish the catalog, then run `workers` uvicorn processes over it
+
+    Workers forward catalog writes, /stock, /sales and the change feed to
+    the writer's socket, so holds, sales counters and feed versions exist
+    once however many workers run; every write is republished within
+    SNAPSHOT_PUBLISH_INTERVAL.
+    """
+    directory = os.getenv("CATALOG_SNAPSHOT_DIR")
+    owned = directory is None
+    if owned:
+        directory = default_snapshot_dir()
+        os.environ["CATALOG_SNAPSHOT_DIR"] = directory
+
+    source = source_catalog()
+    catalog: CatalogRepository = source
+    if isinstance(source, SQLiteCatalogRepository):
+        catalog = CachedCatalogRepository(source, maxsize=int(os.getenv("CATALOG_CACHE_SIZE", "10000")))
+    set_catalog(PublishingCatalogRepository(catalog, change_feed))
+
+    # Imported before PRODUCT_WRITER_SOCKET is set, so this process keeps the real ledger and sales
+    from . import main as service
+
+    os.makedirs(directory, exist_ok=True)
+    socket_path = os.path.join(directory, "writer.sock")
+    writer = uvicorn.Server(uvicorn.Config(service.app, uds=socket_path, log_level="warning"))
+    thread = threading.Thread(target=writer.run, name="catalog-writer", daemon=True)
+    thread.start()
+    while not writer.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"catalog writer failed to start on {socket_path}")
+        time.sleep(0.01)
+
+    # Scored with live holds and sales; workers use the page while theirs match
+    publisher = SnapshotPublisher(directory, ranker=service.ranker, ranking_state=service.live_ranking_state)
+    publisher.publish_catalog(source)
+    # SQLite's stored version also moves on writes from other processes (bulk loads)
+    version = source.stored_version if isinstance(source, SQLiteCatalogRepository) else lambda: source.version
+    publisher.start(source, version, SNAPSHOT_PUBLISH_INTERVAL)
+    logger.info("published catalog v%s to %s for %d workers", publisher.version, directory, workers)
+
+    try:
+        # Workers are spawned and inherit the snapshot directory and writer socket from this process
+        os.environ["PRODUCT_WRITER_SOCKET"] = socket_path
+        uvicorn.run("app.main:app", host=host, port=port, workers=workers)
+    finally:
+        publisher.stop()
+        writer.should_exit = True
+        thread.join()
+        if owned:
+            shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,202 @@
+"""
+Catalog writer
+In multi-worker mode one process owns all mutable state: catalog writes,
+stock holds, sales velocity and the change feed. Workers forward the
+requests that touch it over a Unix socket and mirror the live inputs to
+ranking (reserved stock, sales counters) for their own reads.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+from urllib.parse import quote
+
+import anyio
+import httpx
+from fastapi.responses import JSONResponse
+
+from shared.tracing import tracer
+
+from .models import Product
+from .repository import CatalogRepository
+from .sales import SalesVelocity
+
+
+logger = logging.getLogger(__name__)
+
+# Longest a worker ranks with holds and sales it has not re-read from the writer
+LIVE_STATE_INTERVAL = float(os.getenv("LIVE_STATE_INTERVAL", "0.5"))
+
+# Everything under these paths reads or changes writer-owned state
+WRITER_PREFIXES = ("/stock/", "/sales/", "/products/changes", "/internal/")
+
+_READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def owned_by_writer(method: str, path: str) -> bool:
+    """Whether a request must be served by the writer process rather than a worker"""
+    if path.startswith(WRITER_PREFIXES):
+        return True
+    # POST /products/batch is a lookup; every other non-GET under /products writes
+    return method not in _READ_METHODS and path.startswith("/products/") and path != "/products/batch"
+
+
+class WriterProxy:
+    """
+    ASGI middleware forwarding writer-owned requests to the writer process
+
+    Request and response bodies are streamed (bulk imports, the SSE change
+    stream), and a forwarded stream stops when the client disconnects.
+    Answers 503 when the writer cannot be reached.
+    """
+
+    def __init__(self, app, socket_path: Optional[str] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.app = app
+        self._transport = transport or httpx.AsyncHTTPTransport(uds=socket_path)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(transport=self._transport, timeout=None)
+        return self._client
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not owned_by_writer(scope["method"], scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        headers.pop("host", None)
+        tracer.inject(headers)
+        url = "http://writer" + quote(scope["path"])
+        if scope.get("query_string"):
+            url += "?" + scope["query_string"].decode("latin-1")
+
+        async def body():
+            while True:
+                message = await receive()
+                if message["type"] != "http.request":
+                    return
+                yield message.get("body", b"")
+                if not message.get("more_body"):
+                    return
+
+        has_body = "content-length" in headers or "transfer-encoding" in headers
+        request = self.client.build_request(
+            scope["method"], url, headers=headers, content=body() if has_body else None
+        )
+        try:
+            response = await self.client.send(request, stream=True)
+        except httpx.TransportError as exc:
+            logger.warning("catalog writer unavailable: %s", exc)
+            unavailable = JSONResponse(status_code=503, content={"detail": "Catalog writer unavailable"})
+            await unavailable(scope, receive, send)
+            return
+
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": [(k, v) for k, v in response.headers.raw if k.lower() != b"transfer-encoding"],
+            })
+            async with anyio.create_task_group() as group:
+
+                async def cancel_on_disconnect():
+                    while (await receive())["type"] != "http.disconnect":
+                        pass
+                    group.cancel_scope.cancel()
+
+                group.start_soon(cancel_on_disconnect)
+                async for chunk in response.aiter_raw():
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                await send({"type": "http.response.body", "body": b""})
+                group.cancel_scope.cancel()
+        finally:
+            await response.aclose()
+
+
+class MirroredStock:
+    """The read side of StockLedger, over reserved totals copied from the writer"""
+
+    def __init__(self, refresh: Callable[[], None]):
+        self._refresh = refresh
+        self._reserved: Dict[str, int] = {}
+        self.version = 0
+
+    def load(self, version: int, reserved: Dict[str, int]) -> None:
+        self._reserved = reserved
+        self.version = version
+
+    def expire(self) -> int:
+        """Bring live stock up to date (the writer expires the holds themselves)"""
+        self._refresh()
+        return 0
+
+    def reserved(self, product_id: str) -> int:
+        return self._reserved.get(product_id, 0)
+
+    def live_stock(self, product: Product) -> int:
+        return max(0, product.stock - self._reserved.get(product.id, 0))
+
+
+class LiveStateMirror:
+    """
+    A worker's copy of the writer's reserved stock and sales counters
+
+    Refreshed from the writer's /internal/live-state at most every
+    `interval` seconds, whenever a read calls stock.expire(). Versions are
+    the writer's, so ranking caches keyed on them agree across workers;
+    sales counters arrive as deltas after the first full copy.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[dict], dict],
+        catalog: Callable[[], CatalogRepository],
+        sales: bool = True,
+        interval: float = LIVE_STATE_INTERVAL,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self._fetch = fetch
+        self.stock = MirroredStock(self.refresh)
+        self.sales = SalesVelocity(catalog) if sales else None
+        self.interval = interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._next_refresh = 0.0
+
+    @classmethod
+    def over_socket(cls, socket_path: str, catalog: Callable[[], CatalogRepository], **kwargs) -> "LiveStateMirror":
+        client = httpx.Client(transport=httpx.HTTPTransport(uds=socket_path), base_url="http://writer", timeout=5.0)
+
+        def fetch(params: dict) -> dict:
+            response = client.get("/internal/live-state", params=params)
+            response.raise_for_status()
+            return response.json()
+
+        return cls(fetch, catalog, **kwargs)
+
+    def refresh(self, force: bool = False) -> None:
+        if not force and self._clock() < self._next_refresh:
+            return
+        with self._lock:
+            if not force and self._clock() < self._next_refresh:
+                return
+            params = {"stock_version": self.stock.version}
+            if self.sales is not None:
+                params.update(sales_epoch=self.sales.epoch, sales_version=self.sales.version)
+            try:
+                state = self._fetch(params)
+            except Exception as exc:
+                # Keep ranking with the last copy; the next read tries again
+                logger.warning("live state refresh failed: %s", exc)
+                return
+            finally:
+                self._next_refresh = self._clock() + self.interval
+            if state["stock"] is not None:
+                self.stock.load(state["stock"]["version"], state["stock"]["reserved"])
+            if state.get("sales") is not None and self.sales is not None:
+                self.sales.load_state(state["sales"])
@@ -0,0 +1,63 @@
+"""
+Batch lookup benchmark
+Enriching a cart: one GET /products/{id} per line vs one POST /products/batch,
+through the ASGI app in-process (no network, so real savings are larger)
+
+Run from services/product-service/:
+    python -m benchmarks.bench_batch --size 100000 --cart-sizes 1,10,50,200
+"""
+import argparse
+import json
+import random
+import time
+from typing import List
+
+from fastapi.testclient import TestClient
+
+from app.data import generate_products
+from app.main import app
+from app.repository import InMemoryCatalogRepository, set_catalog
+
+
+def best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--cart-sizes", default="1,10,50,200")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    products = generate_products(args.size)
+    set_catalog(InMemoryCatalogRepository(products))
+    client = TestClient(app)
+    rng = random.Random(3)
+
+    results = {}
+    for cart_size in (int(size) for size in args.cart_sizes.split(",")):
+        ids = [rng.choice(products).id for _ in range(cart_size)]
+        per_item = best_of(lambda: [client.get(f"/products/{pid}") for pid in ids], args.repeat)
+        batch = best_of(lambda: client.post("/products/batch", json={"ids": ids}), args.repeat)
+        results[str(cart_size)] = {
+            "per_item_gets_ms": round(per_item * 1000, 2),
+            "one_batch_ms": round(batch * 1000, 2),
+            "round_trips_saved": cart_size - 1,
+        }
+
+    report = json.dumps({"benchmark": "batch", "size": args.size, "cart_sizes": results}, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
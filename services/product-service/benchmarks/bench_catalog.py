@@ -0,0 +1,103 @@
+"""
+Catalog backend benchmark
+Cold-start time and steady-state latency of the in-memory, SQLite and
+cached SQLite catalog repositories
+
+Run from services/product-service/:
+    python -m benchmarks.bench_catalog --size 100000
+    python -m benchmarks.bench_catalog --size 1000000 --db /tmp/catalog-1m.db
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from typing import List
+
+from app.data import generate_products
+from app.models import Product
+from app.repository import (
+    CachedCatalogRepository,
+    InMemoryCatalogRepository,
+    SQLiteCatalogRepository,
+)
+
+
+def per_op_us(func, args_list, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for args in args_list:
+            func(*args)
+        best = min(best, time.perf_counter() - started)
+    return round(best / len(args_list) * 1e6, 2)
+
+
+def steady_state(repository, ids: List[str]) -> dict:
+    rng = random.Random(1)
+    lookups = [(rng.choice(ids),) for _ in range(2000)]
+    # Narrow price bands return ~0.1% of the catalog
+    bands = [(price, price + 0.5) for price in (rng.uniform(20, 200) for _ in range(50))]
+    return {
+        "get_us": per_op_us(repository.get, lookups),
+        "get_many_24_us": per_op_us(repository.get_many, [([pid for (pid,) in lookups[i:i + 24]],) for i in range(0, 480, 24)]),
+        "list_price_band_us": per_op_us(lambda lo, hi: repository.list(min_price=lo, max_price=hi), bands),
+        "search_us": per_op_us(repository.search, [("Ergonomic Chair 12",), ("Smart Ring 99",), ("zz-no-match",)], repeat=2),
+    }
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--db", help="reuse/create this SQLite file instead of a temp file")
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    source = generate_products(args.size)
+    raw_rows = [p.model_dump() for p in source]
+    ids = [p.id for p in source]
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), "catalog.db")
+    load_s = None
+    if not os.path.exists(path):
+        started = time.perf_counter()
+        loader = SQLiteCatalogRepository(path)
+        for start in range(0, len(source), 10_000):
+            loader.upsert_many(source[start:start + 10_000])
+        loader.close()
+        load_s = round(time.perf_counter() - started, 3)
+    del source
+
+    # Cold start: rebuild validated models from source rows vs open the database
+    started = time.perf_counter()
+    memory = InMemoryCatalogRepository(Product(**row) for row in raw_rows)
+    memory.get(ids[0])
+    memory_cold_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    sqlite = SQLiteCatalogRepository(path)
+    sqlite.get(ids[0])
+    sqlite_cold_s = time.perf_counter() - started
+
+    cached = CachedCatalogRepository(sqlite, maxsize=50_000)
+
+    report = json.dumps({
+        "benchmark": "catalog",
+        "size": args.size,
+        "sqlite_load_s": load_s,
+        "cold_start_s": {"memory": round(memory_cold_s, 3), "sqlite": round(sqlite_cold_s, 4)},
+        "steady_state": {
+            "memory": steady_state(memory, ids),
+            "sqlite": steady_state(sqlite, ids),
+            "cached_sqlite": steady_state(cached, ids),
+        },
+    }, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Bulk ingestion benchmark
+Writes a synthetic NDJSON/CSV catalog file, imports it into SQLite and
+reports rows/sec and peak memory, plus batch vs per-row validation cost
+
+Run from services/product-service/:
+    python -m benchmarks.bench_ingest --rows 200000
+    python -m benchmarks.bench_ingest --rows 5000000 --formats ndjson
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import resource
+import tempfile
+import time
+from typing import List
+
+from app.data import iter_generated_products
+from app.ingest import ingest_stream, read_ndjson, validate_batch, IngestReport
+from app.models import Product
+from app.repository import PRODUCT_COLUMNS, SQLiteCatalogRepository
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def write_source(path: str, fmt: str, rows: int) -> float:
+    started = time.perf_counter()
+    with open(path, "w", encoding="utf-8", newline="") as handle:
+        if fmt == "ndjson":
+            for product in iter_generated_products(rows):
+                handle.write(product.model_dump_json())
+                handle.write("\n")
+        else:
+            writer = csv.writer(handle)
+            writer.writerow(PRODUCT_COLUMNS)
+            for product in iter_generated_products(rows):
+                row = product.model_dump(mode="json")
+                writer.writerow(["" if row[c] is None else row[c] for c in PRODUCT_COLUMNS])
+    return time.perf_counter() - started
+
+
+def validation_cost(rows: int = 20_000, batch_size: int = 5000) -> dict:
+    """Microseconds per row for batch validation vs one model_validate_json per line"""
+    text = "".join(p.model_dump_json() + "\n" for p in iter_generated_products(rows))
+    lines = list(read_ndjson(io.StringIO(text)))
+
+    started = time.perf_counter()
+    for start in range(0, len(lines), batch_size):
+        validate_batch("ndjson", lines[start:start + batch_size], IngestReport("ndjson"))
+    batch_us = (time.perf_counter() - started) / rows * 1e6
+
+    started = time.perf_counter()
+    for _, line in lines:
+        Product(**json.loads(line))
+    per_row_us = (time.perf_counter() - started) / rows * 1e6
+    return {"batch_us_per_row": round(batch_us, 2), "per_row_us_per_row": round(per_row_us, 2)}
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--formats", default="ndjson,csv")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--dir", help="working directory (default: a temp dir)")
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    workdir = args.dir or tempfile.mkdtemp()
+    results = {"validation": validation_cost()}
+    for fmt in args.formats.split(","):
+        source = os.path.join(workdir, f"products.{fmt}")
+        write_s = write_source(source, fmt, args.rows)
+        db = os.path.join(workdir, f"ingest-{fmt}.db")
+        if os.path.exists(db):
+            os.remove(db)
+
+        rss_before = peak_rss_mb()
+        catalog = SQLiteCatalogRepository(db)
+        with open(source, encoding="utf-8", newline="") as stream:
+            report = ingest_stream(stream, catalog, fmt=fmt, batch_size=args.batch_size)
+        catalog.close()
+
+        results[fmt] = {
+            "file_mb": round(os.path.getsize(source) / 1e6, 1),
+            "write_source_s": round(write_s, 1),
+            "rows_written": report.rows_written,
+            "ingest_s": round(report.elapsed_s, 1),
+            "rows_per_second": round(report.rows_per_second),
+            "peak_rss_mb_before": rss_before,
+            "peak_rss_mb_after": peak_rss_mb(),
+        }
+
+    report = json.dumps({"benchmark": "ingest", "rows": args.rows, "batch_size": args.batch_size, **results}, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Parallel ranking benchmark
+Full-catalog re-rank time of ProductRanker vs ParallelRanker at several
+worker counts, plus the serial share (column copy + shard merge) that
+bounds the speedup
+
+Run from services/product-service/:
+    python -m benchmarks.bench_parallel_ranking --size 1000000 --workers 1,2,4,8
+"""
+import argparse
+import json
+import os
+import time
+from multiprocessing.shared_memory import SharedMemory
+from typing import List
+
+from app.data import generate_products
+from app.parallel_ranking import _ITEM_BYTES, ParallelRanker
+from app.ranking import ProductRanker
+
+
+def timed(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def column_copy_s(parallel: ParallelRanker, products, repeat: int) -> float:
+    block = SharedMemory(create=True, size=_ITEM_BYTES * len(products))
+    try:
+        return timed(lambda: parallel._write_columns(block, products), repeat)
+    finally:
+        block.close()
+        block.unlink()
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=500_000)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    products = generate_products(args.size)
+    ranker = ProductRanker()
+    serial_s = timed(lambda: ranker.rank_with_scores(products), args.repeat)
+
+    runs = []
+    for workers in (int(w) for w in args.workers.split(",")):
+        parallel = ParallelRanker(ranker, workers=workers, min_parallel=0)
+        try:
+            parallel.rank_with_scores(products[:1000])  # start the pool outside the timing
+            elapsed = timed(lambda: parallel.rank_with_scores(products), args.repeat)
+            runs.append({
+                "workers": workers,
+                "rank_ms": round(elapsed * 1000, 1),
+                "speedup": round(serial_s / elapsed, 2),
+                "column_copy_ms": round(column_copy_s(parallel, products, args.repeat) * 1000, 1),
+            })
+        finally:
+            parallel.close()
+
+    report = json.dumps({
+        "benchmark": "parallel_ranking",
+        "size": args.size,
+        "cpu_count": os.cpu_count(),
+        "serial_rank_ms": round(serial_s * 1000, 1),
+        "parallel": runs,
+    }, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Weight profile benchmark
+Ranking a catalog under each weight profile: recomputing every factor
+(ProductRanker with swapped weights) vs stored factor vectors vs a cached page,
+and explanation cost with and without stored factors
+
+Run from services/product-service/:
+    python -m benchmarks.bench_profiles --size 200000
+"""
+import argparse
+import json
+import time
+from typing import List
+
+from app.data import generate_products
+from app.profiles import BUILTIN_PROFILES, ProfileRanker
+from app.ranking import ProductRanker
+
+
+def timed(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    products = generate_products(args.size)
+    profiles = ProfileRanker(ProductRanker(), profiles=BUILTIN_PROFILES)
+
+    started = time.perf_counter()
+    profiles.rank_with_scores(products)
+    first_rank_s = time.perf_counter() - started
+
+    results = {}
+    for name in profiles.profiles():
+        recompute = ProductRanker()
+        recompute.weights = profiles.weights_for(name)
+        results[name] = {
+            "recompute_ms": round(timed(lambda: recompute.rank_with_scores(products), args.repeat) * 1000, 1),
+            "stored_factors_ms": round(timed(lambda: profiles.rank_with_scores(products, name), args.repeat) * 1000, 1),
+            "stored_factors_top24_ms": round(timed(lambda: profiles.rank_top_k(products, 24, 0, name), args.repeat) * 1000, 1),
+        }
+        profiles.rank_page(lambda: products, name, limit=24, key=("bench",))
+        results[name]["cached_page_us"] = round(
+            timed(lambda: profiles.rank_page(lambda: products, name, limit=24, key=("bench",)), args.repeat) * 1e6, 1
+        )
+
+    sample = products[:5000]
+    ranker = profiles.ranker
+    explain = {
+        # What explain_ranking used to cost: every factor, then calculate_score again
+        "recompute_twice_us": round(timed(
+            lambda: [(ranker.explain_ranking(p), ranker.calculate_score(p)) for p in sample], args.repeat
+        ) / len(sample) * 1e6, 2),
+        "recompute_once_us": round(timed(lambda: [ranker.explain_ranking(p) for p in sample], args.repeat) / len(sample) * 1e6, 2),
+        "stored_factors_us": round(timed(lambda: [profiles.explain(p) for p in sample], args.repeat) / len(sample) * 1e6, 2),
+        "full_catalog_page_ms": round(timed(lambda: profiles.explain_page(lambda: products), 1) * 1000, 1),
+    }
+
+    report = json.dumps({
+        "benchmark": "profiles",
+        "size": args.size,
+        "first_rank_with_factor_fill_ms": round(first_rank_s * 1000, 1),
+        "profiles": results,
+        "explain": explain,
+    }, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
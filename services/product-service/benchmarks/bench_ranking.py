@@ -0,0 +1,90 @@
+"""
+Ranking and search microbenchmarks
+Times ProductRanker.calculate_score / rank_products / rank_top_k and
+search_products over synthetic catalogs built with generate_products()
+
+Run from services/product-service/:
+    python -m benchmarks.bench_ranking
+    python -m benchmarks.bench_ranking --sizes 10,1000,100000 --output ranking.json
+    python -m benchmarks.bench_ranking --sizes 1000000 --top-k 24
+"""
+import argparse
+import heapq
+import json
+import time
+from operator import itemgetter
+from typing import Callable, List
+
+from app import main as service
+from app.data import generate_products
+from app.ranking import ProductRanker
+from app.repository import InMemoryCatalogRepository, set_catalog
+
+
+SEARCH_QUERIES = ["wireless", "desk", "pro", "zzz-no-match"]
+
+
+def best_of(func: Callable[[], object], repeat: int) -> float:
+    """Fastest wall time of `repeat` runs, in seconds"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def bench_size(size: int, repeat: int, top_k: int) -> dict:
+    started = time.perf_counter()
+    catalog = generate_products(size)
+    build_s = time.perf_counter() - started
+
+    ranker = ProductRanker()
+    sample = catalog[: min(size, 1000)]
+    score_s = best_of(lambda: [ranker.calculate_score(p) for p in sample], repeat)
+    rank_s = best_of(lambda: ranker.rank_products(catalog), repeat)
+    top_k_s = best_of(lambda: ranker.rank_top_k(catalog, top_k), repeat)
+
+    # Selection alone, on pre-scored pairs: full sort vs bounded heap
+    scored = [(p, ranker.calculate_score(p)) for p in catalog]
+    sort_s = best_of(lambda: sorted(scored, key=itemgetter(1), reverse=True), repeat)
+    heap_s = best_of(lambda: heapq.nlargest(top_k, scored, key=itemgetter(1)), repeat)
+
+    # search_products reads the process-wide catalog
+    set_catalog(InMemoryCatalogRepository(catalog))
+    search = {
+        query: round(best_of(lambda: service.search_products(query), repeat) * 1000, 3)
+        for query in SEARCH_QUERIES
+    }
+
+    return {
+        "size": size,
+        "generate_s": round(build_s, 3),
+        "calculate_score_us": round(score_s / len(sample) * 1e6, 3),
+        "rank_products_ms": round(rank_s * 1000, 3),
+        "rank_products_us_per_item": round(rank_s / size * 1e6, 3),
+        "rank_top_k_ms": round(top_k_s * 1000, 3),
+        "select_full_sort_ms": round(sort_s * 1000, 3),
+        "select_heap_top_k_ms": round(heap_s * 1000, 3),
+        "search_ms": search,
+    }
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10,1000,10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top-k", type=int, default=24, help="page size for rank_top_k")
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    results = [bench_size(int(size), args.repeat, args.top_k) for size in args.sizes.split(",")]
+    report = json.dumps({"benchmark": "ranking", "top_k": args.top_k, "results": results}, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
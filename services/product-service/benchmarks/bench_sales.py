@@ -0,0 +1,88 @@
+"""
+Sales velocity benchmark
+Event ingestion throughput (JSON decode + decayed counter updates),
+velocity reads and checkpoint cost
+
+Run from services/product-service/:
+    python -m benchmarks.bench_sales --events 1000000 --products 100000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from typing import List
+
+from app.data import generate_products
+from app.repository import InMemoryCatalogRepository
+from app.sales import SalesVelocity, parse_events
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=10_000, help="events per POST /sales/events body")
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    products = generate_products(args.products)
+    catalog = InMemoryCatalogRepository(products)
+    velocity = SalesVelocity(lambda: catalog)
+
+    rng = random.Random(7)
+    now = time.time()
+    ids = [p.id for p in products]
+    bodies = []
+    for start in range(0, args.events, args.batch):
+        batch = [
+            {"product_id": rng.choice(ids), "quantity": rng.randint(1, 3), "timestamp": now - rng.uniform(0, 86400)}
+            for _ in range(min(args.batch, args.events - start))
+        ]
+        bodies.append(json.dumps(batch).encode())
+
+    parse_s = record_s = 0.0
+    for body in bodies:
+        started = time.perf_counter()
+        events, _ = parse_events(body)
+        parse_s += time.perf_counter() - started
+        started = time.perf_counter()
+        velocity.record_many(events)
+        record_s += time.perf_counter() - started
+
+    sample = products[:100_000]
+    started = time.perf_counter()
+    for product in sample:
+        velocity.velocity(product)
+    read_s = time.perf_counter() - started
+
+    path = os.path.join(tempfile.mkdtemp(), "sales.json")
+    started = time.perf_counter()
+    velocity.checkpoint(path)
+    checkpoint_s = time.perf_counter() - started
+    started = time.perf_counter()
+    SalesVelocity(lambda: catalog).restore(path)
+    restore_s = time.perf_counter() - started
+
+    report = json.dumps({
+        "benchmark": "sales",
+        "events": args.events,
+        "products": args.products,
+        "events_per_second": {
+            "parse_and_record": round(args.events / (parse_s + record_s)),
+            "record_only": round(args.events / record_s),
+        },
+        "velocity_read_us": round(read_s / len(sample) * 1e6, 3),
+        "checkpoint_ms": round(checkpoint_s * 1000, 1),
+        "restore_ms": round(restore_s * 1000, 1),
+        "checkpoint_bytes": os.path.getsize(path),
+    }, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Listing serialization benchmark
+Compares the previous response path (ProductResponse per item, response_model
+validation, stdlib JSON) with the product_row + FastJSONResponse fast path
+
+Run from services/product-service/:
+    python -m benchmarks.bench_serialization --sizes 1000,10000
+"""
+import argparse
+import json
+import time
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.data import generate_products
+from app.models import ProductResponse
+from app.ranking import ProductRanker
+from app.serialization import FastJSONResponse, product_row
+
+
+RESPONSE_ADAPTER = TypeAdapter(List[ProductResponse])
+
+
+def legacy_listing(ranked) -> bytes:
+    """What GET /products used to do for each listing"""
+    response = [
+        ProductResponse(**product.model_dump(), rank=idx + 1, ranking_score=score)
+        for idx, (product, score) in enumerate(ranked)
+    ]
+    validated = RESPONSE_ADAPTER.validate_python(response, from_attributes=True)
+    content = jsonable_encoder(RESPONSE_ADAPTER.dump_python(validated, mode="json"))
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def fast_listing(ranked) -> bytes:
+    return FastJSONResponse([
+        product_row(product, rank=idx + 1, ranking_score=score)
+        for idx, (product, score) in enumerate(ranked)
+    ]).body
+
+
+def best_ms(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,10000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        ranked = ProductRanker().rank_with_scores(generate_products(size))
+        assert json.loads(legacy_listing(ranked)) == json.loads(fast_listing(ranked))
+        legacy = best_ms(lambda: legacy_listing(ranked), args.repeat)
+        fast = best_ms(lambda: fast_listing(ranked), args.repeat)
+        results.append({
+            "size": size,
+            "legacy_ms": round(legacy, 3),
+            "fast_ms": round(fast, 3),
+            "speedup": round(legacy / fast, 1),
+        })
+
+    report = json.dumps({"benchmark": "serialization", "results": results}, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
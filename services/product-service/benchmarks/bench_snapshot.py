@@ -0,0 +1,113 @@
+"""
+Cold-start benchmark
+Time from a fresh interpreter to the first ranked page, product lookup and
+search: rebuilding Product objects from NDJSON source data vs opening a
+prebuilt mmap snapshot. Each run is a new process (with a warm page cache,
+which is what a second Lambda cold start on the same host sees).
+
+Run from services/product-service/:
+    python -m benchmarks.bench_snapshot --sizes 100000,1000000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+from app.data import iter_generated_products
+from app.snapshot import write_snapshot
+
+REBUILD = """
+import json, sys, time
+started = time.perf_counter()
+from app.models import Product
+from app.ranking import ProductRanker
+from app.repository import InMemoryCatalogRepository
+imported = time.perf_counter()
+with open(sys.argv[1], "rb") as handle:
+    catalog = InMemoryCatalogRepository(Product.model_validate_json(line) for line in handle)
+loaded = time.perf_counter()
+page = ProductRanker().rank_top_k(catalog.list(), 24)
+catalog.get("prod_001"); catalog.search("ergonomic chair")
+"""
+
+OPEN_SNAPSHOT = """
+import json, sys, time
+started = time.perf_counter()
+from app.snapshot import CatalogSnapshot, SnapshotCatalogRepository
+imported = time.perf_counter()
+snapshot = CatalogSnapshot(sys.argv[1])
+catalog = SnapshotCatalogRepository(lambda: snapshot)
+loaded = time.perf_counter()
+page = catalog.published_ranking(24)
+catalog.get("prod_001"); catalog.search("ergonomic chair")
+"""
+
+REPORT = """
+done = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - started,
+    "load_s": loaded - imported,
+    "first_requests_s": done - loaded,
+    "peak_rss_mib": [int(line.split()[1]) for line in open("/proc/self/status") if line.startswith("VmHWM")][0] / 1024,
+}))
+"""
+
+
+def cold_start(script: str, path: str) -> dict:
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", script + REPORT, path], capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_s"] = time.perf_counter() - started
+    return {key: round(value, 4) for key, value in result.items()}
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="100000,1000000")
+    parser.add_argument("--dir", help="where to write the source data and snapshots (default: a temp dir)")
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    directory = args.dir or tempfile.mkdtemp(prefix="snapshot-bench-")
+    results = {}
+    for size in (int(n) for n in args.sizes.split(",")):
+        source = os.path.join(directory, f"products-{size}.ndjson")
+        snapshot = os.path.join(directory, f"catalog-{size}.snap")
+        products = list(iter_generated_products(size))
+        with open(source, "w") as handle:
+            for product in products:
+                handle.write(product.model_dump_json() + "\n")
+        started = time.perf_counter()
+        snapshot_bytes = write_snapshot(products, snapshot)
+        build_s = time.perf_counter() - started
+        del products
+
+        results[str(size)] = {
+            "source_mib": round(os.path.getsize(source) / 2**20, 1),
+            "snapshot_mib": round(snapshot_bytes / 2**20, 1),
+            "snapshot_build_s": round(build_s, 2),
+            "rebuild": cold_start(REBUILD, source),
+            "snapshot": cold_start(OPEN_SNAPSHOT, snapshot),
+        }
+        if not args.dir:
+            os.unlink(source)
+            os.unlink(snapshot)
+
+    if not args.dir:
+        os.rmdir(directory)
+
+    report = json.dumps({"benchmark": "snapshot", "sizes": results}, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
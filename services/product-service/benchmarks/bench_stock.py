@@ -0,0 +1,98 @@
+"""
+Stock ledger benchmark
+Concurrent reservations against one hot SKU (checking for oversell) and
+throughput across many SKUs with one lock vs striped locks
+
+Run from services/product-service/:
+    python -m benchmarks.bench_stock --threads 16 --attempts 2000
+"""
+import argparse
+import json
+import threading
+import time
+from typing import List
+
+from app.data import generate_products
+from app.repository import InMemoryCatalogRepository
+from app.stock import InsufficientStock, StockLedger
+
+
+def run_threads(threads: int, target) -> float:
+    workers = [threading.Thread(target=target, args=(index,)) for index in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - started
+
+
+def hot_sku(catalog, threads: int, attempts: int) -> dict:
+    """Every thread hammers the same product; successes must equal the stock"""
+    product = catalog.list()[0]
+    ledger = StockLedger(lambda: catalog)
+    granted = [0] * threads
+    refused = [0] * threads
+
+    def buyer(index):
+        for _ in range(attempts):
+            try:
+                ledger.reserve(product.id, 1, f"cart{index}")
+                granted[index] += 1
+            except InsufficientStock:
+                refused[index] += 1
+
+    elapsed = run_threads(threads, buyer)
+    total = threads * attempts
+    return {
+        "stock": product.stock,
+        "attempts": total,
+        "granted": sum(granted),
+        "refused": sum(refused),
+        "oversold": max(0, sum(granted) - product.stock),
+        "reservations_per_second": round(total / elapsed),
+    }
+
+
+def many_skus(catalog, threads: int, attempts: int, stripes: int) -> dict:
+    """Each thread reserves and releases across its own slice of the catalog"""
+    ids = [product.id for product in catalog.list()]
+    ledger = StockLedger(lambda: catalog, stripes=stripes)
+
+    def buyer(index):
+        owner = f"cart{index}"
+        for step in range(attempts):
+            product_id = ids[(index * attempts + step) % len(ids)]
+            try:
+                ledger.reserve(product_id, 1, owner)
+            except InsufficientStock:
+                pass
+            ledger.release(product_id, owner)
+
+    elapsed = run_threads(threads, buyer)
+    return {"stripes": stripes, "ops_per_second": round(threads * attempts * 2 / elapsed)}
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--attempts", type=int, default=2000, help="reservations per thread")
+    parser.add_argument("--size", type=int, default=10_000, help="catalog size for the many-SKU run")
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    catalog = InMemoryCatalogRepository(generate_products(args.size))
+    report = json.dumps({
+        "benchmark": "stock",
+        "threads": args.threads,
+        "hot_sku": hot_sku(catalog, args.threads, args.attempts),
+        "many_skus": [many_skus(catalog, args.threads, args.attempts, stripes) for stripes in (1, 64)],
+    }, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Multi-worker memory benchmark
+N worker processes each serving the catalog from their own in-memory copy
+vs all of them mapping one published snapshot. Reports total PSS (shared
+pages split between the processes that map them, from
+/proc/<pid>/smaps_rollup, Linux only) and aggregate ranked-page throughput.
+
+Run from services/product-service/:
+    python -m benchmarks.bench_workers --size 200000 --workers 1,2,4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from typing import List
+
+from app.data import generate_products
+from app.profiles import ProfileRanker
+from app.ranking import ProductRanker
+from app.repository import InMemoryCatalogRepository
+from app.snapshot import SharedCatalog, SnapshotCatalogRepository, SnapshotPublisher
+
+
+def pss_kib(pid: int) -> int:
+    with open(f"/proc/{pid}/smaps_rollup") as handle:
+        for line in handle:
+            if line.startswith("Pss:"):
+                return int(line.split()[1])
+    return 0
+
+
+def worker(mode: str, size: int, directory: str, seconds: float, ready, start, results) -> None:
+    """Load the catalog like a uvicorn worker would, then serve first pages of the default ranking"""
+    if mode == "snapshot":
+        catalog = SnapshotCatalogRepository(SharedCatalog(directory).current)
+
+        def page():
+            return catalog.published_ranking(24, 0)
+    else:
+        catalog = InMemoryCatalogRepository(generate_products(size))
+        profiles = ProfileRanker(ProductRanker(), state=lambda: catalog.version)
+
+        def page():
+            return profiles.rank_page(catalog.list, limit=24, key=("list",))
+    page()
+    ready.release()
+    start.wait()
+    deadline = time.perf_counter() + seconds
+    served = 0
+    while time.perf_counter() < deadline:
+        page()
+        served += 1
+    results.put(served)
+    # Stay alive until the parent has read our memory
+    start.wait()
+
+
+def run(mode: str, workers: int, size: int, directory: str, seconds: float) -> dict:
+    context = multiprocessing.get_context("spawn")
+    ready, start, results = context.Semaphore(0), context.Event(), context.Queue()
+    processes = [
+        context.Process(target=worker, args=(mode, size, directory, seconds, ready, start, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.acquire()
+    pss = sum(pss_kib(process.pid) for process in processes)
+    start.set()
+    served = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return {"total_pss_mib": round(pss / 1024, 1), "pages_per_s": round(served / seconds)}
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix="catalog-bench-", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    publisher = SnapshotPublisher(directory)
+    started = time.perf_counter()
+    name = publisher.publish(generate_products(args.size), version=1)
+    publish_s = time.perf_counter() - started
+
+    results = {}
+    for count in (int(n) for n in args.workers.split(",")):
+        results[str(count)] = {
+            mode: run(mode, count, args.size, directory, args.seconds) for mode in ("in_memory", "snapshot")
+        }
+
+    report = json.dumps({
+        "benchmark": "workers",
+        "size": args.size,
+        "cpus": os.cpu_count(),
+        "snapshot_mib": round(os.path.getsize(os.path.join(directory, name)) / 2**20, 1),
+        "publish_s": round(publish_s, 2),
+        "workers": results,
+    }, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(report + "\n")
+    publisher.stop()
+    for entry in os.listdir(directory):
+        os.unlink(os.path.join(directory, entry))
+    os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    main()
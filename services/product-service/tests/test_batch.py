@@ -0,0 +1,36 @@
+from fastapi.testclient import TestClient
+
+from app.data import get_products_data
+from app.main import app
+from app.models import MAX_BATCH_IDS
+from app.repository import InMemoryCatalogRepository, set_catalog
+
+
+def test_batch_returns_projected_rows_in_request_order():
+    set_catalog(InMemoryCatalogRepository(get_products_data()))
+    try:
+        client = TestClient(app)
+        client.post("/stock/reserve", json={"product_id": "prod_009", "owner": "batch-test", "quantity": 3})
+
+        response = client.post("/products/batch", json={"ids": ["prod_009", "nope", "prod_001", "prod_009"]})
+
+        assert response.status_code == 200
+        body = response.json()
+        assert [row["id"] for row in body["products"]] == ["prod_009", "prod_001"]
+        assert set(body["products"][0]) == {"id", "name", "price", "image_url", "available"}
+        assert body["products"][0]["available"] == 5
+        assert body["missing"] == ["nope"]
+
+        projected = client.post("/products/batch", json={"ids": ["prod_001"], "fields": ["id", "stock"]})
+        assert projected.json()["products"] == [{"id": "prod_001", "stock": 34}]
+    finally:
+        client.post("/stock/release", json={"owner": "batch-test"})
+        set_catalog(None)
+
+
+def test_batch_rejects_bad_requests():
+    client = TestClient(app)
+
+    assert client.post("/products/batch", json={"ids": []}).status_code == 422
+    assert client.post("/products/batch", json={"ids": ["p"] * (MAX_BATCH_IDS + 1)}).status_code == 422
+    assert client.post("/products/batch", json={"ids": ["prod_001"], "fields": ["secret"]}).status_code == 422
@@ -0,0 +1,176 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.changefeed import ChangeFeed, change_feed, parse_last_event_id, sse_events
+from app.data import get_products_data
+from app.main import app
+from app.repository import InMemoryCatalogRepository, PublishingCatalogRepository, set_catalog
+
+
+@pytest.fixture
+def feed():
+    return ChangeFeed(maxlen=5)
+
+
+@pytest.fixture
+def catalog(feed):
+    return PublishingCatalogRepository(InMemoryCatalogRepository(get_products_data()), feed)
+
+
+@pytest.fixture
+def client():
+    set_catalog(PublishingCatalogRepository(InMemoryCatalogRepository(get_products_data()), change_feed))
+    try:
+        yield TestClient(app)
+    finally:
+        set_catalog(None)
+
+
+def test_read_pages_through_versions(feed):
+    feed.publish([("stock", f"p{i}", {"stock": i}) for i in range(3)])
+
+    first = feed.read(0, limit=2)
+    second = feed.read(first["version"])
+
+    assert [e["product_id"] for e in first["events"]] == ["p0", "p1"]
+    assert first["version"] == 2 and not first["reset"]
+    assert [e["version"] for e in second["events"]] == [3]
+    assert feed.read(3) == {"epoch": feed.epoch, "version": 3, "reset": False, "events": []}
+
+
+def test_read_resets_when_position_is_gone(feed):
+    feed.publish([("upsert", f"p{i}", {}) for i in range(8)])
+
+    assert feed.read(0)["reset"]  # versions 1-3 were dropped (maxlen 5)
+    assert not feed.read(3)["reset"]
+    assert feed.read(42) == {"epoch": feed.epoch, "version": 8, "reset": True, "events": []}
+
+
+def test_read_resets_for_another_epoch(feed):
+    feed.publish([("upsert", "p1", {})])
+    # A restarted service numbers from 0 again under a new epoch
+    restarted = ChangeFeed()
+    restarted.publish([("upsert", f"p{i}", {}) for i in range(3)])
+
+    assert not feed.read(0, epoch=feed.epoch)["reset"]
+    assert restarted.read(1, epoch=feed.epoch) == {
+        "epoch": restarted.epoch, "version": 3, "reset": True, "events": []
+    }
+    assert [e["version"] for e in restarted.read(1)["events"]] == [2, 3]
+
+
+def test_upserts_publish_only_changed_fields(catalog, feed):
+    keyboard = catalog.get("prod_004")
+    new = keyboard.model_copy(update={"id": "prod_999"})
+
+    catalog.upsert_many([
+        keyboard.model_copy(update={"price": 99.0}),
+        catalog.get("prod_001").model_copy(update={"stock": 0}),
+        catalog.get("prod_002").model_copy(update={"price": 1.0, "name": "Chair"}),
+        catalog.get("prod_003"),  # unchanged: no event
+        new,
+    ])
+    catalog.delete("prod_005")
+    catalog.delete("missing")
+
+    events = [(e["type"], e["product_id"], e["changes"]) for e in feed.read(0)["events"]]
+    assert events == [
+        ("price", "prod_004", {"price": 99.0}),
+        ("stock", "prod_001", {"stock": 0}),
+        ("upsert", "prod_002", {"name": "Chair", "price": 1.0}),
+        ("upsert", "prod_999", {}),
+        ("delete", "prod_005", {}),
+    ]
+
+
+def test_concurrent_writes_publish_a_replayable_history():
+    feed = ChangeFeed(maxlen=1000)
+    catalog = PublishingCatalogRepository(InMemoryCatalogRepository(get_products_data()), feed)
+    original = catalog.get("prod_001")
+
+    def write(offset):
+        for i in range(50):
+            catalog.upsert_many([original.model_copy(update={"price": offset + i})])
+
+    threads = [threading.Thread(target=write, args=(offset,)) for offset in (1000, 2000)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Applying the events in feed order ends on the stored price
+    price = original.price
+    for event in feed.read(0)["events"]:
+        price = event["changes"].get("price", price)
+    assert price == catalog.get("prod_001").price
+
+
+def test_wait_async_wakes_on_publish_from_thread(feed):
+    async def scenario():
+        threading.Timer(0.05, feed.publish, [[("stock", "p", {"stock": 1})]]).start()
+        woke = await feed.wait_async(0, timeout=5)
+        timed_out = await feed.wait_async(feed.version, timeout=0.01)
+        return woke, timed_out
+
+    assert asyncio.run(scenario()) == (True, False)
+
+
+def test_sse_events_format_and_heartbeat(feed):
+    feed.publish([("price", "p1", {"price": 2.5})])
+
+    async def take(count):
+        stream = sse_events(feed, 0, heartbeat=0.01)
+        return [await stream.__anext__() for _ in range(count)]
+
+    first, heartbeat = asyncio.run(take(2))
+    assert first.startswith(f"id: {feed.epoch}:1\nevent: price\ndata: ")
+    assert '"product_id":"p1"' in first
+    assert heartbeat == ": keepalive\n\n"
+
+
+def test_sse_resets_a_last_event_id_from_another_epoch(feed):
+    feed.publish([("price", "p1", {"price": 2.5})])
+
+    async def first_event(epoch):
+        return await sse_events(feed, 1, epoch=epoch).__anext__()
+
+    assert asyncio.run(first_event("gone")) == f"id: {feed.epoch}:1\nevent: reset\ndata: {{}}\n\n"
+    assert parse_last_event_id(f"{feed.epoch}:7") == (feed.epoch, 7)
+    assert parse_last_event_id("7") == (None, 7)
+    assert parse_last_event_id("x:y") is None
+
+
+def test_patch_put_delete_publish_changes(client):
+    since = change_feed.version
+
+    assert client.patch("/products/prod_004", json={"price": 149.99}).json()["price"] == 149.99
+    assert client.patch("/products/prod_004", json={"name": None}).status_code == 422
+    assert client.patch("/products/missing", json={"stock": 1}).status_code == 404
+
+    product = client.get("/products/prod_001").json()
+    product.update(id="prod_500", name="Spare Headphones")
+    for key in ("rank", "ranking_score"):
+        product.pop(key)
+    assert client.put("/products/prod_500", json=product).status_code == 200
+    assert client.put("/products/other", json=product).status_code == 400
+    assert client.delete("/products/prod_500").status_code == 200
+    assert client.delete("/products/prod_500").status_code == 404
+
+    changes = client.get(f"/products/changes?since={since}").json()
+    assert [(e["type"], e["product_id"]) for e in changes["events"]] == [
+        ("price", "prod_004"), ("upsert", "prod_500"), ("delete", "prod_500")
+    ]
+    assert changes["version"] == change_feed.version
+
+
+def test_changes_long_poll_returns_when_a_change_arrives(client):
+    since = change_feed.version
+    threading.Timer(0.1, lambda: client.patch("/products/prod_003", json={"stock": 3})).start()
+
+    response = client.get(f"/products/changes?since={since}&wait=5")
+
+    assert response.elapsed.total_seconds() < 4
+    assert [(e["type"], e["changes"]) for e in response.json()["events"]] == [("stock", {"stock": 3})]
@@ -0,0 +1,34 @@
+from app.data import generate_products, get_products_data
+
+
+def test_generate_products_extends_sample_catalog():
+    sample = get_products_data()
+    products = generate_products(500)
+
+    assert len(products) == 500
+    assert [p.id for p in products[: len(sample)]] == [p.id for p in sample]
+    assert len({p.id for p in products}) == 500
+
+
+def test_generate_products_is_deterministic():
+    first = generate_products(200, seed=7)
+    second = generate_products(200, seed=7)
+
+    assert [(p.id, p.price, p.sales_count) for p in first] == [
+        (p.id, p.price, p.sales_count) for p in second
+    ]
+
+
+def test_generate_products_small_catalog_uses_sample_only():
+    assert [p.id for p in generate_products(3)] == ["prod_001", "prod_002", "prod_003"]
+
+
+def test_generated_distributions_are_realistic():
+    products = generate_products(5000)
+
+    out_of_stock = sum(1 for p in products if p.stock == 0) / len(products)
+    mean_rating = sum(p.rating for p in products) / len(products)
+
+    assert 0.01 < out_of_stock < 0.10
+    assert 4.0 < mean_rating < 4.6
+    assert max(p.sales_count for p in products) > 10 * sorted(p.sales_count for p in products)[len(products) // 2]
@@ -0,0 +1,61 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.data import get_products_data
+from app.main import app, profile_ranker
+from app.profiles import BUILTIN_PROFILES, ProfileRanker
+from app.ranking import ProductRanker
+from app.repository import InMemoryCatalogRepository, set_catalog
+
+
+def test_explanation_adds_up_to_the_score():
+    ranker = ProductRanker()
+    product = get_products_data()[0]  # well stocked, so no stock penalty
+
+    explanation = ranker.explain_ranking(product)
+    contributions = sum(part["contribution"] for part in explanation["breakdown"].values())
+
+    assert explanation["final_score"] == ranker.calculate_score(product)
+    assert list(explanation["breakdown"]) == ["popularity", "price", "rating", "sales", "recency"]
+    assert round(contributions, 2) == explanation["final_score"]
+
+
+def test_explain_uses_stored_factors(monkeypatch):
+    profiles = ProfileRanker(ProductRanker(), profiles=BUILTIN_PROFILES)
+    product = get_products_data()[1]
+    expected = profiles.explain(product, "deals")
+
+    calls = []
+    original = profiles.ranker.factor_values
+    monkeypatch.setattr(profiles.ranker, "factor_values", lambda *args: calls.append(args) or original(*args))
+
+    assert profiles.explain(product, "deals") == expected
+    assert calls == []
+    assert expected["profile"] == "deals"
+    assert expected["breakdown"]["price"]["weight"] == 0.5
+
+
+@pytest.fixture
+def client():
+    set_catalog(InMemoryCatalogRepository(get_products_data()))
+    yield TestClient(app)
+    set_catalog(None)
+
+
+def test_explain_endpoints(client):
+    single = client.get("/products/prod_001/ranking/explain", params={"profile": "top_rated"})
+    assert single.status_code == 200
+    assert single.json()["final_score"] == profile_ranker.rank_with_scores(
+        [p for p in get_products_data() if p.id == "prod_001"], "top_rated"
+    )[0][1]
+    assert client.get("/products/missing/ranking/explain").status_code == 404
+    assert client.get("/products/prod_001/ranking/explain", params={"profile": "x"}).status_code == 400
+
+    listing = client.get("/products", params={"limit": 3, "offset": 1}).json()
+    page = client.get("/products/ranking/explain", params={"limit": 3, "offset": 1}).json()
+    assert [(e["product_id"], e["rank"], e["final_score"]) for e in page] == [
+        (p["id"], p["rank"], p["ranking_score"]) for p in listing
+    ]
+
+    chosen = client.get("/products/ranking/explain", params={"ids": "prod_003,prod_001,missing"}).json()
+    assert [e["product_id"] for e in chosen] == ["prod_003", "prod_001"]
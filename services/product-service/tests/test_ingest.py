@@ -0,0 +1,153 @@
+import io
+import json
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.data import generate_products
+from app.ingest import ingest_stream, main as ingest_main, open_chunks, read_csv
+from app.main import app
+from app.repository import InMemoryCatalogRepository, SQLiteCatalogRepository, set_catalog
+
+
+CSV_HEADER = "id,name,description,price,popularity,rating,sales_count,stock,category,image_url,created_at\n"
+
+
+def ndjson_lines(products):
+    return "".join(product.model_dump_json() + "\n" for product in products)
+
+
+@pytest.fixture
+def sqlite_catalog(tmp_path):
+    catalog = SQLiteCatalogRepository(str(tmp_path / "catalog.db"))
+    yield catalog
+    catalog.close()
+
+
+def test_ndjson_import_writes_in_batches(sqlite_catalog):
+    products = generate_products(250)
+    seen = []
+
+    report = ingest_stream(
+        io.StringIO(ndjson_lines(products)), sqlite_catalog, fmt="ndjson", batch_size=100,
+        on_batch=lambda r: seen.append(r.rows_read)
+    )
+
+    assert (report.rows_read, report.rows_written, report.rows_rejected) == (250, 250, 0)
+    assert seen == [100, 200, 250]
+    assert sqlite_catalog.count() == 250
+    assert sqlite_catalog.get("prod_200").name == products[199].name
+    assert sqlite_catalog.version == 3
+
+
+def test_invalid_rows_are_skipped_and_reported(sqlite_catalog):
+    good = generate_products(3)
+    text = "\n".join([
+        good[0].model_dump_json(),
+        '{"id": "bad_price", "name": "x", "price": -1, "popularity": 1, "rating": 1, '
+        '"sales_count": 0, "stock": 0, "category": "c"}',
+        "not json",
+        "",
+        good[1].model_dump_json() + "," + good[2].model_dump_json(),
+        good[2].model_dump_json(),
+    ])
+
+    report = ingest_stream(io.StringIO(text), sqlite_catalog, batch_size=10)
+
+    assert report.rows_read == 5
+    assert report.rows_written == 2
+    assert [error["line"] for error in report.errors] == [2, 3, 5]
+    assert "price" in report.errors[0]["error"]
+    assert {p.id for p in sqlite_catalog.list()} == {good[0].id, good[2].id}
+
+
+def test_csv_import_coerces_strings_and_defaults_empty_cells():
+    catalog = InMemoryCatalogRepository()
+    text = CSV_HEADER + (
+        "csv_1,Desk Lamp,,39.5,60,4.2,10,3,Furniture,,2024-01-02T03:04:05\n"
+        'csv_2,"Cable, braided","USB-C ""fast"" cable",9.99,40,3.9,0,100,Accessories,,\n'
+    )
+
+    report = ingest_stream(io.StringIO(text), catalog, fmt="csv")
+
+    assert report.rows_written == 2
+    lamp, cable = catalog.get("csv_1"), catalog.get("csv_2")
+    assert lamp.price == 39.5 and lamp.description is None and lamp.created_at.year == 2024
+    assert cable.name == "Cable, braided" and cable.description == 'USB-C "fast" cable'
+
+
+def test_csv_reader_reports_physical_line_numbers():
+    text = CSV_HEADER + 'a,"multi\nline",,1,1,1,0,0,c,,\nb,n,,1,1,1,0,0,c,,\n'
+    assert [line for line, _ in read_csv(io.StringIO(text))] == [3, 4]
+
+
+def test_open_chunks_reassembles_split_utf8():
+    data = '{"name": "Café"}\n'.encode("utf-8")
+    chunks = [data[:13], data[13:14], b"", data[14:]]
+    assert open_chunks(chunks).read() == '{"name": "Café"}\n'
+
+
+def test_cli_imports_file(tmp_path, capsys):
+    source = tmp_path / "products.ndjson"
+    source.write_text(ndjson_lines(generate_products(40)))
+    db = tmp_path / "cli.db"
+
+    assert ingest_main([str(source), "--db", str(db), "--quiet"]) == 0
+
+    assert json.loads(capsys.readouterr().out)["rows_written"] == 40
+    assert SQLiteCatalogRepository(str(db)).count() == 40
+
+
+def test_import_endpoint_streams_into_catalog(sqlite_catalog):
+    set_catalog(sqlite_catalog)
+    try:
+        client = TestClient(app)
+        products = generate_products(120)[15:]
+        response = client.post(
+            "/products/import?batch_size=50",
+            content=ndjson_lines(products).encode(),
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+        assert response.status_code == 200
+        assert response.json()["rows_written"] == 105
+        assert response.json()["batches"] == 3
+
+        csv_response = client.post(
+            "/products/import",
+            content=(CSV_HEADER + "csv_9,Quiet Keyboard 9,,59,70,4.6,5,5,Electronics,,\n").encode(),
+            headers={"Content-Type": "text/csv"}
+        )
+        assert csv_response.json()["rows_written"] == 1
+
+        assert client.get(f"/products/{products[0].id}").json()["name"] == products[0].name
+        assert [p["id"] for p in client.get("/products/search/Quiet Keyboard").json()] == ["csv_9"]
+    finally:
+        set_catalog(None)
+
+
+def test_aware_timestamps_are_stored_as_naive_utc(sqlite_catalog):
+    set_catalog(sqlite_catalog)
+    try:
+        client = TestClient(app)
+        row = generate_products(1)[0].model_dump(mode="json")
+        row.update(id="aware_1", created_at="2024-01-01T02:00:00+02:00")
+        response = client.post(
+            "/products/import",
+            content=json.dumps(row).encode(),
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+
+        assert response.json()["rows_written"] == 1
+        assert sqlite_catalog.get("aware_1").created_at == datetime(2024, 1, 1)
+        assert client.get("/products").status_code == 200
+        put = client.put("/products/aware_1", json={**row, "created_at": "2024-01-01T00:00:00Z"})
+        assert put.status_code == 200
+        assert client.get("/products/aware_1").json()["created_at"] == "2024-01-01T00:00:00"
+    finally:
+        set_catalog(None)
+
+
+def test_import_endpoint_rejects_unknown_format():
+    client = TestClient(app)
+    assert client.post("/products/import?format=xml", content=b"<a/>").status_code == 400
@@ -0,0 +1,21 @@
+import json
+import sys
+from pathlib import Path
+
+from app import main
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from lambda_events import api_gateway_event  # noqa: E402
+
+
+def test_adapter_and_catalog_are_reused_across_invocations(monkeypatch):
+    monkeypatch.setattr(main, "_lambda_adapter", None)
+
+    first = main.handler(api_gateway_event("GET", "/products/prod_001"), None)
+    adapter, catalog = main._lambda_adapter, main.get_catalog()
+    second = main.handler(api_gateway_event("GET", "/products/prod_002"), None)
+
+    assert (first["statusCode"], second["statusCode"]) == (200, 200)
+    assert json.loads(second["body"])["id"] == "prod_002"
+    assert main._lambda_adapter is adapter
+    assert main.get_catalog() is catalog
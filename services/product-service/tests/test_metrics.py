@@ -0,0 +1,23 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from shared.metrics import REQUEST_LATENCY, REQUESTS_TOTAL
+
+ROUTE = "/products/{product_id}"
+
+
+def test_metrics_endpoint_counts_requests_per_route():
+    client = TestClient(app)
+    before = REQUESTS_TOTAL.value("GET", ROUTE, "200")
+    observed = REQUEST_LATENCY.count("GET", ROUTE)
+
+    client.get("/products/prod_001")
+    client.get("/products/prod_002")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert REQUESTS_TOTAL.value("GET", ROUTE, "200") == before + 2
+    assert REQUEST_LATENCY.count("GET", ROUTE) == observed + 2
+    expected = f'http_requests_total{{method="GET",route="{ROUTE}",status="200"}} {int(before) + 2}'
+    assert expected in response.text
+    assert f'http_request_duration_seconds_bucket{{method="GET",route="{ROUTE}",le="+Inf"}}' in response.text
@@ -0,0 +1,74 @@
+from multiprocessing.shared_memory import SharedMemory
+
+import pytest
+
+from app.data import generate_products
+from app.parallel_ranking import _ITEM_BYTES, ParallelRanker, score_shard
+from app.ranking import ProductRanker
+
+
+@pytest.fixture(scope="module")
+def products():
+    catalog = generate_products(3000)
+    # Duplicate a slice so the merge has to keep ties in input order
+    return catalog + catalog[:200]
+
+
+@pytest.fixture(scope="module")
+def parallel():
+    ranker = ParallelRanker(ProductRanker(), workers=2, min_parallel=0, shards=3)
+    yield ranker
+    ranker.close()
+
+
+def test_matches_serial_ranking_including_ties(products, parallel):
+    expected = ProductRanker().rank_with_scores(products)
+
+    assert parallel.rank_with_scores(products) == expected
+
+
+@pytest.mark.parametrize("k,offset", [(24, 0), (24, 1500), (10, 3190)])
+def test_top_k_matches_serial_page(products, parallel, k, offset):
+    assert parallel.rank_top_k(products, k, offset) == ProductRanker().rank_top_k(products, k, offset)
+
+
+def test_custom_weights(products, parallel):
+    weights = {"popularity": 0.0, "price": 1.0, "rating": 0.0, "sales": 0.0, "recency": 0.0}
+    serial = ProductRanker()
+    serial.weights = weights
+
+    ranked = parallel.rank_products(products, weights=weights)
+
+    assert ranked == serial.rank_products(products)
+    assert parallel.ranker.weights != weights
+
+
+def test_live_stock_is_resolved_in_the_parent(products):
+    ranker = ParallelRanker(ProductRanker(stock_source=lambda p: 0), workers=1, min_parallel=0)
+    try:
+        ranked = ranker.rank_with_scores(products[:50])
+    finally:
+        ranker.close()
+
+    assert ranked == ProductRanker(stock_source=lambda p: 0).rank_with_scores(products[:50])
+
+
+def test_small_jobs_stay_in_process(products):
+    ranker = ParallelRanker(ProductRanker(), workers=2, min_parallel=10_000)
+
+    assert ranker.rank_with_scores(products) == ProductRanker().rank_with_scores(products)
+    assert ranker._pool is None
+
+
+def test_failed_shard_releases_its_views(products):
+    ranker = ParallelRanker(ProductRanker(), workers=1, min_parallel=0)
+    block = SharedMemory(create=True, size=_ITEM_BYTES * 10)
+    try:
+        ranker._write_columns(block, products[:10])
+        # Weights without "sales" fail mid-scoring; the error is not masked by a BufferError
+        broken = ((("popularity", 1.0),), 500.0, 30)
+        with pytest.raises(KeyError):
+            score_shard(block.name, 10, 0, 10, broken)
+    finally:
+        block.close()
+        block.unlink()
@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.data import generate_products, get_products_data
+from app.main import app, profile_ranker
+from app.profiles import BUILTIN_PROFILES, ProfileRanker
+from app.ranking import ProductRanker
+from app.repository import InMemoryCatalogRepository, set_catalog
+
+
+@pytest.fixture(scope="module")
+def products():
+    return generate_products(1500)
+
+
+def ranker_with(weights):
+    ranker = ProductRanker()
+    ranker.weights = weights
+    return ranker
+
+
+@pytest.mark.parametrize("profile", ["default", *BUILTIN_PROFILES])
+def test_profile_scores_match_the_ranker(products, profile):
+    profiles = ProfileRanker(ProductRanker(), profiles=BUILTIN_PROFILES)
+    expected = ranker_with(profiles.weights_for(profile)).rank_with_scores(products)
+
+    assert profiles.rank_with_scores(products, profile) == expected
+    # Second pass is served from stored factor vectors
+    assert profiles.rank_top_k(products, 24, 10, profile) == expected[10:34]
+
+
+def test_weights_are_validated_and_normalized():
+    profiles = ProfileRanker(ProductRanker())
+
+    assert profiles.set_profile("cheap", {"price": 3, "rating": 1}) == {
+        "popularity": 0.0, "price": 0.75, "rating": 0.25, "sales": 0.0, "recency": 0.0
+    }
+    with pytest.raises(ValueError):
+        profiles.set_profile("bad", {"price": -1})
+    with pytest.raises(ValueError):
+        profiles.set_profile("bad", {"colour": 1})
+    with pytest.raises(ValueError):
+        profiles.set_profile("bad", {})
+    with pytest.raises(ValueError):
+        profiles.set_profile("default", {"price": 1})
+    with pytest.raises(KeyError):
+        profiles.weights_for("bad")
+
+
+def test_factors_are_recomputed_for_new_objects_and_day_rollover(products):
+    profiles = ProfileRanker(ProductRanker())
+    product = products[0].model_copy(update={"created_at": datetime.now() - timedelta(days=3, hours=1)})
+    now = datetime.now()
+    first = profiles.factors(product, now)
+
+    assert profiles.factors(product, now) is first
+    assert profiles.factors(product, now + timedelta(days=1)) != first
+    cheaper = product.model_copy(update={"price": product.price / 2})
+    assert profiles.factors(cheaper, now)[1] > first[1]
+
+
+def test_pages_are_cached_until_state_changes(products):
+    state = {"version": 0}
+    loads = []
+    profiles = ProfileRanker(ProductRanker(), state=lambda: state["version"])
+
+    def load():
+        loads.append(1)
+        return products
+
+    first = profiles.rank_page(load, limit=5, key=("all",))
+    assert profiles.rank_page(load, limit=5, key=("all",)) is first
+    assert len(loads) == 1
+
+    profiles.set_profile("deals", BUILTIN_PROFILES["deals"])
+    profiles.rank_page(load, "deals", limit=5, key=("all",))
+    state["version"] += 1
+    assert profiles.rank_page(load, limit=5, key=("all",)) == first
+    assert len(loads) == 3
+
+
+@pytest.fixture
+def client():
+    set_catalog(InMemoryCatalogRepository(get_products_data()))
+    yield TestClient(app)
+    set_catalog(None)
+
+
+def test_profile_endpoints(client):
+    deals = client.get("/products", params={"profile": "deals"}).json()
+    expected = ProductRanker(sales_source=profile_ranker.ranker.sales_source)
+    expected.weights = profile_ranker.weights_for("deals")
+    by_price = expected.rank_products(get_products_data())
+
+    assert [p["id"] for p in deals] == [p.id for p in by_price]
+    assert client.get("/products", params={"profile": "nope"}).status_code == 400
+    assert "new_arrivals" in client.get("/ranking/profiles").json()
+
+    saved = client.put("/ranking/profiles/rated", json={"rating": 2, "popularity": 2})
+    assert saved.json()["weights"]["rating"] == 0.5
+    assert client.get("/products/search/a", params={"profile": "rated"}).status_code == 200
+    assert client.put("/ranking/profiles/rated", json={"rating": -1}).status_code == 422
+    assert client.put("/ranking/profiles/default", json={"rating": 1}).status_code == 400
+    assert client.delete("/ranking/profiles/rated").status_code == 200
+    assert client.delete("/ranking/profiles/rated").status_code == 404
+
+
+def test_listing_cache_sees_catalog_and_stock_changes(client):
+    before = client.get("/products", params={"limit": 3}).json()
+    top = before[0]["id"]
+
+    client.patch(f"/products/{top}", json={"popularity": 0, "rating": 0, "sales_count": 0})
+    after_write = client.get("/products", params={"limit": 3}).json()
+    assert after_write[0]["id"] != top
+
+    second = after_write[0]
+    client.post("/stock/reserve", json={"product_id": second["id"], "owner": "u", "quantity": second["stock"]})
+    after_reserve = client.get("/products", params={"limit": 3}).json()
+    assert after_reserve[0]["id"] != second["id"]
@@ -0,0 +1,162 @@
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.data import get_products_data
+from app.main import app
+from app.repository import (
+    CachedCatalogRepository,
+    CatalogRepository,
+    InMemoryCatalogRepository,
+    SQLiteCatalogRepository,
+    set_catalog,
+)
+
+
+def make_memory(tmp_path):
+    return InMemoryCatalogRepository(get_products_data())
+
+
+def make_sqlite(tmp_path):
+    repository = SQLiteCatalogRepository(str(tmp_path / "catalog.db"))
+    repository.upsert_many(get_products_data())
+    return repository
+
+
+def make_cached(tmp_path):
+    return CachedCatalogRepository(make_sqlite(tmp_path), maxsize=4)
+
+
+@pytest.fixture(params=[make_memory, make_sqlite, make_cached], ids=["memory", "sqlite", "cached"])
+def catalog(request, tmp_path):
+    return request.param(tmp_path)
+
+
+def test_get_and_get_many(catalog):
+    assert catalog.get("prod_004").name == "Mechanical Gaming Keyboard"
+    assert catalog.get("missing") is None
+    assert [p.id for p in catalog.get_many(["prod_002", "missing", "prod_001"])] == ["prod_002", "prod_001"]
+    assert catalog.count() == 15
+
+
+def test_list_filters(catalog):
+    expected = {
+        p.id for p in get_products_data()
+        if 50 <= p.price <= 200 and p.rating >= 4.3 and p.category == "Electronics"
+    }
+
+    result = catalog.list(min_price=50, max_price=200, min_rating=4.3, category="Electronics")
+
+    assert {p.id for p in result} == expected
+    assert len(catalog.list()) == 15
+
+
+@pytest.mark.parametrize("query", ["webcam", "WIRELESS", "usb-c", "4k", "zz-none", "%", "o"])
+def test_search_matches_substring_semantics(catalog, query):
+    expected = {
+        p.id for p in get_products_data()
+        if query.lower() in p.name.lower() or query.lower() in (p.description or "").lower()
+    }
+
+    assert {p.id for p in catalog.search(query)} == expected
+
+
+def test_writes_bump_version_and_refresh_indexes(catalog):
+    version = catalog.version
+    catalog.get("prod_001")
+    catalog.search("headphones")
+    updated = catalog.get("prod_001").model_copy(
+        update={"name": "Studio Monitor Speakers", "description": "Nearfield pair", "price": 10.0}
+    )
+
+    catalog.upsert_many([updated])
+
+    assert catalog.version > version
+    assert catalog.get("prod_001").price == 10.0
+    assert [p.id for p in catalog.search("studio monitor")] == ["prod_001"]
+    assert "prod_001" not in {p.id for p in catalog.search("headphones")}
+    assert catalog.delete("prod_001") is True
+    assert catalog.delete("prod_001") is False
+    assert catalog.get("prod_001") is None
+
+
+def test_cache_drops_loads_that_raced_a_write():
+    class WriteDuringRead(InMemoryCatalogRepository):
+        # A write lands after the read but before the cache stores its result
+        write = None
+
+        def get(self, product_id):
+            product = super().get(product_id)
+            self.write, write = None, self.write
+            if write:
+                write()
+            return product
+
+        def search(self, query):
+            products = super().search(query)
+            self.write, write = None, self.write
+            if write:
+                write()
+            return products
+
+    backend = WriteDuringRead(get_products_data())
+    cached = CachedCatalogRepository(backend)
+    product = backend.get("prod_001")
+
+    backend.write = lambda: cached.upsert_many([product.model_copy(update={"price": 1.0})])
+    assert cached.get("prod_001").price == product.price
+    assert cached.get("prod_001").price == 1.0
+
+    backend.write = lambda: cached.upsert_many([product.model_copy(update={"price": 2.0})])
+    assert cached.search("headphones")[0].price == 1.0
+    assert cached.search("headphones")[0].price == 2.0
+
+
+def test_sqlite_persists_across_instances(tmp_path):
+    path = str(tmp_path / "catalog.db")
+    first = SQLiteCatalogRepository(path)
+    first.upsert_many(get_products_data())
+    first.close()
+
+    second = SQLiteCatalogRepository(path)
+
+    assert second.count() == 15
+    assert second.version == first.version
+    assert second.get("prod_005").name == "Smart Watch Series X"
+
+
+def test_failed_sqlite_delete_rolls_back(tmp_path):
+    catalog = make_sqlite(tmp_path)
+    with catalog._connection() as conn:
+        conn.execute(
+            "CREATE TRIGGER keep_prod_001 BEFORE DELETE ON products WHEN old.id = 'prod_001' "
+            "BEGIN SELECT RAISE(ABORT, 'kept'); END"
+        )
+
+    with pytest.raises(sqlite3.IntegrityError):
+        catalog.delete("prod_001")
+
+    # No transaction is left open on the connection
+    assert catalog.delete("prod_002")
+    assert catalog.get("prod_001") is not None and catalog.count() == 14
+
+
+def test_incomplete_repository_fails_at_construction():
+    class NoStock(CatalogRepository):
+        get = list = search = upsert_many = delete = count = lambda self, *args: None
+
+    with pytest.raises(TypeError, match="adjust_stock"):
+        NoStock()
+
+
+def test_endpoints_use_configured_catalog(tmp_path):
+    set_catalog(make_cached(tmp_path))
+    try:
+        client = TestClient(app)
+        listing = client.get("/products", params={"category": "Furniture"}).json()
+        assert {p["id"] for p in listing} == {"prod_002", "prod_009"}
+        assert client.get("/products/prod_009").json()["name"] == "Standing Desk Converter"
+        assert {p["id"] for p in client.get("/products/search/desk").json()} == {"prod_009", "prod_011"}
+    finally:
+        set_catalog(None)
@@ -0,0 +1,165 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.data import get_products_data
+from app.main import app, ranker, sales_velocity
+from app.ranking import ProductRanker
+from app.repository import InMemoryCatalogRepository, set_catalog
+from app.sales import SalesVelocity, parse_events
+
+
+DAY = 86400
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def catalog():
+    return InMemoryCatalogRepository(get_products_data())
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def velocity(catalog, clock):
+    return SalesVelocity(lambda: catalog, half_life_days=7, clock=clock)
+
+
+def product(catalog, product_id, **changes):
+    return catalog.get(product_id).model_copy(update=changes)
+
+
+def test_sales_decay_by_half_life(catalog, velocity, clock):
+    fresh = product(catalog, "prod_001", sales_count=0, created_at=datetime.now())
+    catalog.upsert_many([fresh])
+
+    velocity.record_many([("prod_001", 10, None), ("prod_001", 6, clock.now - 7 * DAY)])
+    assert velocity.velocity(fresh) == pytest.approx(13)
+
+    clock.now += 7 * DAY
+    assert velocity.velocity(fresh) == pytest.approx(6.5)
+    clock.now += 70 * DAY
+    assert velocity.velocity(fresh) < 0.02
+
+
+def test_seed_spreads_lifetime_sales_over_age(catalog, velocity):
+    old_bestseller = product(catalog, "prod_007", sales_count=4500, created_at=datetime.now() - timedelta(days=300))
+    newcomer = product(catalog, "prod_005", sales_count=900, created_at=datetime.now() - timedelta(days=3))
+
+    assert velocity.velocity(old_bestseller) == pytest.approx(4500 * velocity.window_days / 300, rel=1e-3)
+    assert velocity.velocity(newcomer) == pytest.approx(900)
+
+    # The first sale of an unseen product seeds it from the catalog before adding
+    velocity.record("prod_002", 5)
+    assert velocity.velocity(catalog.get("prod_002")) > 5
+
+
+def test_recent_seller_outranks_old_bestseller(catalog, velocity):
+    old_bestseller = product(catalog, "prod_007", sales_count=4500, created_at=datetime.now() - timedelta(days=400))
+    trending = product(catalog, "prod_002", sales_count=40, created_at=datetime.now() - timedelta(days=400))
+    velocity.record_many([("prod_002", 1, None)] * 400)
+    lifetime, recent = ProductRanker(), ProductRanker(sales_source=velocity.velocity)
+
+    assert lifetime.explain_ranking(old_bestseller)["breakdown"]["sales"]["score"] > \
+        lifetime.explain_ranking(trending)["breakdown"]["sales"]["score"]
+    assert recent.explain_ranking(trending)["breakdown"]["sales"]["score"] > \
+        recent.explain_ranking(old_bestseller)["breakdown"]["sales"]["score"]
+
+
+def test_checkpoint_round_trip_decays_through_downtime(catalog, velocity, clock, tmp_path):
+    path = str(tmp_path / "sales.json")
+    velocity.record("prod_001", 100)
+    expected = velocity.velocity(catalog.get("prod_001"))
+    velocity.checkpoint(path)
+
+    clock.now += 7 * DAY
+    restarted = SalesVelocity(lambda: catalog, half_life_days=7, clock=clock)
+    assert restarted.restore(path)
+    assert restarted.velocity(catalog.get("prod_001")) == pytest.approx(expected / 2)
+    assert not restarted.restore(str(tmp_path / "missing.json"))
+
+
+def test_mirror_gets_a_full_copy_then_deltas(catalog, velocity, clock):
+    mirror = SalesVelocity(lambda: catalog, half_life_days=7, clock=clock)
+    velocity.record_many([("prod_001", 10, None), ("prod_002", 3, None)])
+
+    first = velocity.export_state(mirror.epoch, mirror.version)
+    mirror.load_state(first)
+    velocity.record("prod_002", 4)
+    delta = velocity.export_state(mirror.epoch, mirror.version)
+    mirror.load_state(delta)
+
+    assert first["full"] and not delta["full"]
+    assert list(delta["counters"]) == ["prod_002"]
+    assert velocity.export_state(mirror.epoch, mirror.version) is None
+    for product_id in ("prod_001", "prod_002"):
+        assert mirror.velocity(catalog.get(product_id)) == pytest.approx(velocity.velocity(catalog.get(product_id)))
+
+    # A rebase (like a restore) rewrites every counter: the next export is a full copy again
+    clock.now += DAY
+    velocity._rebase(clock.now)
+    assert velocity.export_state(mirror.epoch, mirror.version)["full"]
+
+
+def test_unknown_and_deleted_products_are_not_counted(catalog, velocity, clock):
+    mirror = SalesVelocity(lambda: catalog, half_life_days=7, clock=clock)
+    assert velocity.record_many([("prod_001", 2, None), ("prod_404", 5, None)]) == 1
+    assert len(velocity) == 1
+    mirror.load_state(velocity.export_state(mirror.epoch, mirror.version))
+
+    catalog.delete("prod_001")
+    assert velocity.forget(["prod_001", "prod_404"]) == 1
+    assert velocity.record("prod_001") is None and len(velocity) == 0
+
+    delta = velocity.export_state(mirror.epoch, mirror.version)
+    mirror.load_state(delta)
+    assert delta["removed"] == ["prod_001"] and len(mirror) == 0
+
+
+def test_parse_events():
+    array = json.dumps([
+        {"product_id": "a", "quantity": 2, "timestamp": 1.5},
+        {"product_id": "b"},
+        {"product_id": 3},
+        {"quantity": 1},
+        {"product_id": "c", "quantity": 0},
+    ]).encode()
+    assert parse_events(array) == ([("a", 2.0, 1.5), ("b", 1.0, None)], 3)
+    assert parse_events(b'{"product_id": "a"}\n\n{"product_id": "b", "quantity": 3}\n') == (
+        [("a", 1.0, None), ("b", 3.0, None)], 0
+    )
+    with pytest.raises(ValueError):
+        parse_events(b"not json")
+
+
+def test_sales_endpoints():
+    set_catalog(InMemoryCatalogRepository(get_products_data()))
+    try:
+        client = TestClient(app)
+        before = client.get("/sales/velocity/prod_009").json()["velocity"]
+
+        response = client.post("/sales/events", content=json.dumps(
+            [{"product_id": "prod_009", "quantity": 50}, {}, {"product_id": "prod_404"}]
+        ))
+        assert response.json() == {"recorded": 1, "rejected": 2}
+        assert client.get("/sales/velocity/prod_009").json()["velocity"] == pytest.approx(before + 50, abs=0.01)
+        assert client.post("/sales/events", content=b"{oops").status_code == 400
+
+        client.post("/stock/reserve", json={"product_id": "prod_009", "owner": "buyer", "quantity": 2})
+        client.post("/stock/commit", json={"owner": "buyer"})
+        assert client.get("/sales/velocity/prod_009").json()["velocity"] == pytest.approx(before + 52, abs=0.01)
+        assert ranker.sales_source == sales_velocity.velocity
+    finally:
+        set_catalog(None)
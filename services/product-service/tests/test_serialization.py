@@ -0,0 +1,41 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from app.data import get_products_data
+from app.main import app
+from app.models import ProductResponse
+from app.serialization import dumps, product_row
+
+
+def test_product_row_matches_pydantic_json():
+    product = get_products_data()[0]
+
+    fast = json.loads(dumps(product_row(product, rank=1, ranking_score=71.25)))
+    expected = json.loads(
+        ProductResponse(**product.model_dump(), rank=1, ranking_score=71.25).model_dump_json()
+    )
+
+    assert fast == expected
+
+
+def test_listing_endpoints_keep_response_shape():
+    client = TestClient(app)
+
+    listing = client.get("/products").json()
+    single = client.get("/products/prod_001").json()
+    search = client.get("/products/search/webcam").json()
+
+    assert [p["rank"] for p in listing] == list(range(1, len(listing) + 1))
+    assert all(p["ranking_score"] is not None for p in listing)
+    assert listing == sorted(listing, key=lambda p: p["ranking_score"], reverse=True)
+    assert single["rank"] is None and single["ranking_score"] is not None
+    assert {p["id"] for p in search} == {"prod_003", "prod_015"}
+    ProductResponse(**listing[0])
+
+
+def test_non_ranking_sort_has_no_scores():
+    prices = TestClient(app).get("/products", params={"sort_by": "price"}).json()
+
+    assert [p["price"] for p in prices] == sorted(p["price"] for p in prices)
+    assert all(p["ranking_score"] is None for p in prices)
@@ -0,0 +1,193 @@
+import os
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import snapshot as snapshot_module
+from app.data import generate_products, get_products_data
+from app import main
+from app.main import app
+from app.models import Product
+from app.ranking import ProductRanker
+from app.repository import (
+    InMemoryCatalogRepository,
+    SQLiteCatalogRepository,
+    create_catalog_from_env,
+    set_catalog,
+)
+from app.snapshot import (
+    CatalogSnapshot,
+    ReadOnlyCatalog,
+    SharedCatalog,
+    SnapshotCatalogRepository,
+    SnapshotPublisher,
+    write_snapshot,
+)
+
+
+@pytest.fixture
+def products():
+    products = get_products_data()
+    products[0] = products[0].model_copy(update={"description": None, "image_url": None, "name": "Café ☕"})
+    return products
+
+
+def test_snapshot_round_trips_every_product(products, tmp_path):
+    path = str(tmp_path / "catalog.snap")
+    write_snapshot(products, path, version=7)
+
+    snapshot = CatalogSnapshot(path)
+
+    assert snapshot.version == 7
+    assert len(snapshot) == len(products)
+    for product in products:
+        assert snapshot.product(snapshot.find(product.id)) == product
+    assert snapshot.find("nope") is None
+
+
+def test_snapshot_stores_aware_timestamps_as_naive_utc(products, tmp_path):
+    path = str(tmp_path / "catalog.snap")
+    aware = Product.model_validate({**products[1].model_dump(), "created_at": "2024-01-01T00:00:00Z"})
+    write_snapshot([products[0], aware], path)
+
+    snapshot = CatalogSnapshot(path)
+
+    assert snapshot.product(snapshot.find(aware.id)).created_at == datetime(2024, 1, 1)
+
+
+def test_snapshot_ranking_matches_ranker(products, tmp_path):
+    path = str(tmp_path / "catalog.snap")
+    write_snapshot(products, path)
+    expected = ProductRanker().rank_with_scores(products)
+
+    repository = SnapshotCatalogRepository(lambda: CatalogSnapshot(path))
+
+    page = repository.published_ranking(limit=5, offset=2)
+    assert [(p.id, score) for p, score in page] == [(p.id, score) for p, score in expected[2:7]]
+    assert len(repository.published_ranking(limit=None)) == len(products)
+
+
+def test_reads_match_in_memory_catalog(products, tmp_path):
+    path = str(tmp_path / "catalog.snap")
+    write_snapshot(products, path)
+    snapshot = SnapshotCatalogRepository(lambda: CatalogSnapshot(path))
+    memory = InMemoryCatalogRepository(products)
+
+    def ids(found):
+        return sorted(p.id for p in found)
+
+    assert [p.id for p in snapshot.get_many(["prod_003", "nope", "prod_001"])] == ["prod_003", "prod_001"]
+    assert ids(snapshot.list(min_price=20, max_price=200, min_rating=4.0)) == ids(
+        memory.list(min_price=20, max_price=200, min_rating=4.0)
+    )
+    assert ids(snapshot.list(category="Electronics")) == ids(memory.list(category="Electronics"))
+    assert ids(snapshot.search("CAF")) == ids(memory.search("CAF"))
+    assert snapshot.count() == memory.count()
+
+
+@pytest.mark.parametrize("query", ["keyboard", "ERGONOMIC CH", "café", "y", "no such thing", "123"])
+def test_search_postings_match_a_scan(query, tmp_path):
+    products = generate_products(2000)
+    products[5] = products[5].model_copy(update={"name": "Café ☕ Keyboard"})
+    write_snapshot(products, str(tmp_path / "indexed.snap"))
+    write_snapshot(products, str(tmp_path / "plain.snap"), search_index=False)
+    indexed, plain = CatalogSnapshot(str(tmp_path / "indexed.snap")), CatalogSnapshot(str(tmp_path / "plain.snap"))
+
+    expected = [p.id for p in InMemoryCatalogRepository(products).search(query)]
+
+    assert [indexed.string("id", row) for row in indexed.search(query)] == expected
+    assert [plain.string("id", row) for row in plain.search(query)] == expected
+
+
+def test_build_step_feeds_catalog_snapshot_path(products, tmp_path, monkeypatch):
+    database = str(tmp_path / "catalog.db")
+    SQLiteCatalogRepository(database).upsert_many(products)
+    path = str(tmp_path / "catalog.snap")
+
+    assert snapshot_module.main([path, "--db", database]) == 0
+
+    monkeypatch.setenv("CATALOG_SNAPSHOT_PATH", path)
+    catalog = create_catalog_from_env()
+    assert catalog.version == 1
+    assert catalog.get("prod_002") == products[1]
+    with pytest.raises(ReadOnlyCatalog):
+        catalog.delete("prod_002")
+
+
+def test_publisher_swaps_snapshots_atomically(products, tmp_path):
+    now = [0.0]
+    publisher = SnapshotPublisher(str(tmp_path), retire_after=10, clock=lambda: now[0])
+    publisher.publish(products, version=1)
+    shared = SharedCatalog(str(tmp_path), check_interval=0)
+    first = shared.current()
+
+    renamed = products[1].model_copy(update={"name": "Renamed"})
+    publisher.publish([renamed], version=2)
+    second = shared.current()
+
+    assert (second.version, len(second)) == (2, 1)
+    assert second.product(0).name == "Renamed"
+    # A worker that read CURRENT just before the swap can still open the old file
+    assert sorted(os.listdir(tmp_path)) == ["CURRENT", "catalog-000000000001.snap", "catalog-000000000002.snap"]
+    assert CatalogSnapshot(str(tmp_path / "catalog-000000000001.snap")).version == 1
+
+    now[0] = 11
+    publisher.unlink_retired()
+    # The superseded file is gone but a reader still holding it keeps working
+    assert sorted(os.listdir(tmp_path)) == ["CURRENT", "catalog-000000000002.snap"]
+    assert first.product(first.find(products[1].id)) == products[1]
+
+
+def test_writes_go_to_shared_database(products, tmp_path):
+    database = str(tmp_path / "catalog.db")
+    source = SQLiteCatalogRepository(database)
+    source.upsert_many(products)
+    publisher = SnapshotPublisher(str(tmp_path / "snapshots"))
+    publisher.publish_catalog(source)
+    shared = SharedCatalog(str(tmp_path / "snapshots"), check_interval=0)
+    worker = SnapshotCatalogRepository(shared.current, writer=SQLiteCatalogRepository(database))
+
+    worker.upsert_many([products[2].model_copy(update={"price": 1.0})])
+
+    # Another process's write moves the stored version on; the publisher republishes from it
+    assert source.stored_version() == publisher.version + 1
+    publisher.publish_catalog(source, source.stored_version())
+    assert worker.get(products[2].id).price == 1.0
+
+
+def test_read_only_snapshot_rejects_writes(products, tmp_path):
+    path = str(tmp_path / "catalog.snap")
+    write_snapshot(products, path)
+    set_catalog(SnapshotCatalogRepository(lambda: CatalogSnapshot(path)))
+    try:
+        client = TestClient(app)
+
+        ranked = client.get("/products?limit=3").json()
+        response = client.patch("/products/prod_001", json={"price": 1.0})
+        client.post("/stock/reserve", json={"product_id": "prod_002", "owner": "lambda-cart", "quantity": 2})
+        commit = client.post("/stock/commit", json={"owner": "lambda-cart"})
+        # A refused sale keeps the hold; the cart can retry against a writable deployment
+        held = main.stock_ledger.reserved("prod_002")
+    finally:
+        main.stock_ledger.release_all("lambda-cart")
+        set_catalog(None)
+
+    # The snapshot was scored without live holds and sales, so the page is ranked on request
+    expected = main.ranker.rank_with_scores(products)[:3]
+    assert [row["id"] for row in ranked] == [p.id for p, _ in expected]
+    assert response.status_code == 409
+    assert commit.status_code == 409 and held == 2
+    with pytest.raises(ReadOnlyCatalog):
+        SnapshotCatalogRepository(lambda: CatalogSnapshot(path)).delete("prod_001")
+
+
+def test_published_ranking_requires_matching_live_state(products, tmp_path):
+    publisher = SnapshotPublisher(str(tmp_path), ranking_state=lambda: (4, 2))
+    publisher.publish(products, version=1)
+    repository = SnapshotCatalogRepository(SharedCatalog(str(tmp_path)).current)
+
+    assert len(repository.published_ranking(3, 0, (4, 2))) == 3
+    # Holds or sales moved on since publishing (or the caller has none): rank on request
+    assert repository.published_ranking(3, 0, (5, 2)) is None
+    assert repository.published_ranking(3, 0) is None
@@ -0,0 +1,225 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.changefeed import ChangeFeed
+from app.data import get_products_data
+from app.main import app
+from app.ranking import ProductRanker
+from app.repository import (
+    InMemoryCatalogRepository,
+    PublishingCatalogRepository,
+    SQLiteCatalogRepository,
+    set_catalog,
+)
+from app.stock import InsufficientStock, StockLedger
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def feed():
+    return ChangeFeed()
+
+
+@pytest.fixture
+def catalog(feed):
+    return PublishingCatalogRepository(InMemoryCatalogRepository(get_products_data()), feed)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def ledger(catalog, clock):
+    return StockLedger(lambda: catalog, ttl=60, clock=clock)
+
+
+def test_reserve_holds_stock_per_owner(ledger):
+    # prod_009 has 8 in stock
+    ledger.reserve("prod_009", 3, "alice")
+    ledger.reserve("prod_009", 2, "alice")
+    ledger.reserve("prod_009", 1, "bob")
+
+    assert ledger.available("prod_009") == 2
+    assert [(h.product_id, h.quantity) for h in ledger.holds("alice")] == [("prod_009", 5)]
+    with pytest.raises(InsufficientStock) as excinfo:
+        ledger.reserve("prod_009", 3, "carol")
+    assert excinfo.value.available == 2
+    with pytest.raises(KeyError):
+        ledger.reserve("missing", 1, "alice")
+
+
+def test_release_partial_and_all(ledger):
+    ledger.reserve("prod_009", 4, "alice")
+    ledger.reserve("prod_001", 2, "alice")
+
+    assert ledger.release("prod_009", "alice", 1) == 1
+    assert ledger.reserved("prod_009") == 3
+    assert ledger.release_all("alice") == 5
+    assert ledger.holds("alice") == []
+    assert ledger.release("prod_009", "alice") == 0
+    assert ledger.available("prod_009") == 8
+
+
+def test_holds_expire_and_reserving_again_extends(ledger, clock):
+    ledger.reserve("prod_009", 2, "alice")
+    ledger.reserve("prod_009", 3, "bob")
+    clock.now += 50
+    ledger.reserve("prod_009", 1, "bob")  # bob's hold now expires at +110
+
+    clock.now += 20
+    assert ledger.available("prod_009") == 4  # alice expired, bob still holds 4
+    clock.now += 60
+    assert ledger.available("prod_009") == 8
+    assert ledger.holds("bob") == []
+
+
+def test_transfer_moves_holds_to_another_owner(ledger, clock):
+    ledger.reserve("prod_001", 2, "guest:g1")
+    ledger.reserve("prod_002", 1, "guest:g1")
+    ledger.reserve("prod_001", 1, "user_1", ttl=10)
+    available = ledger.available("prod_001")
+
+    assert ledger.transfer("guest:g1", "user_1") == 3
+    assert ledger.holds("guest:g1") == []
+    assert {hold.product_id: hold.quantity for hold in ledger.holds("user_1")} == {"prod_001": 3, "prod_002": 1}
+    assert ledger.available("prod_001") == available
+
+    # The merged hold keeps the guest's later expiry
+    clock.now += 30
+    assert ledger.reserved("prod_001") == 3
+    clock.now += 31
+    ledger.expire()
+    assert ledger.reserved("prod_001") == 0
+
+
+def test_commit_decrements_catalog_stock_and_publishes(ledger, catalog, feed):
+    ledger.reserve("prod_009", 3, "alice")
+    ledger.reserve("prod_001", 1, "alice")
+
+    assert ledger.commit("alice", ["prod_009"]) == {"prod_009": 3}
+
+    assert catalog.get("prod_009").stock == 5
+    assert ledger.available("prod_009") == 5
+    assert ledger.reserved("prod_001") == 1
+    assert [(e["type"], e["changes"]) for e in feed.read(0)["events"]] == [("stock", {"stock": 5})]
+
+
+def test_concurrent_reservations_never_oversell(ledger):
+    successes = []
+
+    def buyer(index):
+        for _ in range(20):
+            try:
+                ledger.reserve("prod_002", 1, f"user{index}")  # 12 in stock
+                successes.append(index)
+            except InsufficientStock:
+                pass
+
+    threads = [threading.Thread(target=buyer, args=(i,)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(successes) == 12
+    assert ledger.available("prod_002") == 0
+
+
+def test_ranker_uses_live_stock(ledger, catalog):
+    ranker = ProductRanker(stock_source=ledger.live_stock)
+    product = catalog.get("prod_009")
+    before = ranker.calculate_score(product)
+
+    ledger.reserve("prod_009", 8, "alice")
+
+    # 8 in stock carries no penalty; fully reserved gets the out-of-stock halving
+    assert ranker.calculate_score(product) == pytest.approx(before * 0.5, abs=0.01)
+    assert ranker.explain_ranking(product)["stock_status"] == "out_of_stock"
+
+
+def test_stock_endpoints(catalog):
+    set_catalog(catalog)
+    try:
+        client = TestClient(app)
+        reserved = client.post("/stock/reserve", json={"product_id": "prod_009", "owner": "u1", "quantity": 6})
+        assert reserved.status_code == 200
+        assert reserved.json()["available"] == 2
+
+        assert client.post("/stock/reserve", json={"product_id": "prod_009", "owner": "u2", "quantity": 3}).status_code == 409
+        assert client.post("/stock/reserve", json={"product_id": "nope", "owner": "u2"}).status_code == 404
+        assert client.get("/stock/prod_009").json() == {
+            "product_id": "prod_009", "on_hand": 8, "reserved": 6, "available": 2
+        }
+
+        assert client.post("/stock/release", json={"owner": "u1", "product_id": "prod_009", "quantity": 2}).json()["released"] == 2
+        assert client.post("/stock/commit", json={"owner": "u1"}).json()["committed"] == {"prod_009": 4}
+        assert client.get("/stock/prod_009").json()["on_hand"] == 4
+        assert client.get("/products/prod_009").json()["stock"] == 4
+    finally:
+        set_catalog(None)
+
+
+def test_commit_only_touches_stock(ledger, catalog):
+    ledger.reserve("prod_009", 3, "alice")
+    # A restock and price change land between the reservation and checkout
+    catalog.upsert_many([catalog.get("prod_009").model_copy(update={"stock": 20, "price": 5.0})])
+
+    ledger.commit("alice")
+
+    assert (catalog.get("prod_009").stock, catalog.get("prod_009").price) == (17, 5.0)
+
+
+def test_commit_keeps_the_hold_when_the_catalog_refuses_the_write(ledger, catalog, monkeypatch):
+    ledger.reserve("prod_009", 3, "alice")
+
+    def refuse(product_id, delta):
+        raise RuntimeError("read-only")
+
+    monkeypatch.setattr(catalog, "adjust_stock", refuse)
+    with pytest.raises(RuntimeError):
+        ledger.commit("alice")
+
+    assert ledger.reserved("prod_009") == 3
+
+
+def test_concurrent_commits_lose_no_decrements(catalog, tmp_path):
+    backend = SQLiteCatalogRepository(str(tmp_path / "catalog.db"))
+    backend.upsert_many(get_products_data())
+    ledgers = [StockLedger(lambda: backend) for _ in range(4)]
+    for index, ledger in enumerate(ledgers):
+        ledger.reserve("prod_001", 2, f"buyer{index}")
+
+    threads = [threading.Thread(target=ledger.commit, args=(f"buyer{index}",)) for index, ledger in enumerate(ledgers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert backend.get("prod_001").stock == catalog.get("prod_001").stock - 8
+
+
+def test_on_hand_is_catalog_stock_even_when_overreserved(catalog):
+    set_catalog(catalog)
+    try:
+        client = TestClient(app)
+        client.post("/stock/reserve", json={"product_id": "prod_009", "owner": "u1", "quantity": 6})
+        # Stock corrected below what is already held
+        client.patch("/products/prod_009", json={"stock": 4})
+
+        assert client.get("/stock/prod_009").json() == {
+            "product_id": "prod_009", "on_hand": 4, "reserved": 6, "available": 0
+        }
+        client.post("/stock/release", json={"owner": "u1"})
+    finally:
+        set_catalog(None)
@@ -0,0 +1,50 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.data import generate_products, get_products_data
+from app.main import app
+from app.ranking import ProductRanker
+from app.repository import InMemoryCatalogRepository, set_catalog
+
+
+@pytest.fixture(scope="module")
+def products():
+    catalog = generate_products(2000)
+    return catalog + catalog[:100]  # duplicates produce tied scores
+
+
+@pytest.mark.parametrize("k,offset", [(1, 0), (24, 0), (24, 48), (50, 2090), (10, 5000)])
+def test_rank_top_k_is_a_page_of_the_full_ranking(products, k, offset):
+    ranker = ProductRanker()
+
+    assert ranker.rank_top_k(products, k, offset) == ranker.rank_with_scores(products)[offset:offset + k]
+
+
+def test_rank_top_k_empty_page(products):
+    assert ProductRanker().rank_top_k(products, 0) == []
+
+
+@pytest.fixture
+def client():
+    set_catalog(InMemoryCatalogRepository(get_products_data()))
+    yield TestClient(app)
+    set_catalog(None)
+
+
+def test_paginated_listing_matches_full_listing(client):
+    for sort_by in ("ranking", "price", "popularity", "rating"):
+        everything = client.get("/products", params={"sort_by": sort_by}).json()
+        page = client.get("/products", params={"sort_by": sort_by, "limit": 3, "offset": 2}).json()
+
+        assert [p["id"] for p in page] == [p["id"] for p in everything[2:5]]
+        if sort_by == "ranking":
+            assert [p["rank"] for p in page] == [3, 4, 5]
+
+
+def test_paginated_search_and_bad_page(client):
+    everything = client.get("/products/search/a").json()
+    page = client.get("/products/search/a", params={"limit": 2, "offset": 1}).json()
+
+    assert page == everything[1:3]
+    assert client.get("/products", params={"limit": 0}).status_code == 400
+    assert client.get("/products/search/a", params={"offset": -1}).status_code == 400
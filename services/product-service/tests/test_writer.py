@@ -0,0 +1,110 @@
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app import main
+from app.data import get_products_data
+from app.repository import InMemoryCatalogRepository, set_catalog
+from app.writer import LiveStateMirror, WriterProxy, owned_by_writer
+
+
+@pytest.fixture
+def proxied():
+    writer = FastAPI()
+    worker = FastAPI()
+
+    @writer.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+    async def served_by_writer(path: str, request: Request):
+        return {"served_by": "writer", "path": path, "query": str(request.query_params),
+                "body": (await request.body()).decode()}
+
+    @worker.api_route("/{path:path}", methods=["GET", "POST"])
+    def served_by_worker(path: str):
+        return {"served_by": "worker", "path": path}
+
+    return TestClient(WriterProxy(worker, transport=httpx.ASGITransport(app=writer)))
+
+
+def test_routes_owned_by_the_writer():
+    assert owned_by_writer("PUT", "/products/prod_001")
+    assert owned_by_writer("POST", "/products/import")
+    assert owned_by_writer("GET", "/products/changes")
+    assert owned_by_writer("GET", "/stock/prod_001")
+    assert owned_by_writer("POST", "/sales/events")
+    assert not owned_by_writer("GET", "/products/prod_001")
+    assert not owned_by_writer("POST", "/products/batch")
+    assert not owned_by_writer("GET", "/products")
+
+
+def test_proxy_forwards_writer_routes_with_body_and_query(proxied):
+    reserved = proxied.post("/stock/reserve?ttl=5", json={"product_id": "prod_001"})
+    patched = proxied.patch("/products/prod_001", json={"price": 1.0})
+    listed = proxied.get("/products")
+
+    assert reserved.json() == {
+        "served_by": "writer", "path": "stock/reserve", "query": "ttl=5", "body": '{"product_id": "prod_001"}'
+    }
+    assert patched.json()["served_by"] == "writer"
+    assert listed.json() == {"served_by": "worker", "path": "products"}
+
+
+def test_proxy_answers_503_without_a_writer():
+    def refuse(request):
+        raise httpx.ConnectError("no socket", request=request)
+
+    async def worker(scope, receive, send):
+        raise AssertionError("writer routes never reach the worker")
+
+    client = TestClient(WriterProxy(worker, transport=httpx.MockTransport(refuse)))
+
+    assert client.post("/stock/commit", json={"owner": "u"}).status_code == 503
+
+
+@pytest.fixture
+def writer_client():
+    set_catalog(InMemoryCatalogRepository(get_products_data()))
+    try:
+        yield TestClient(main.app)
+    finally:
+        set_catalog(None)
+
+
+def test_mirror_follows_the_writers_holds_and_sales(writer_client):
+    def fetch(params):
+        return writer_client.get("/internal/live-state", params=params).json()
+
+    mirror = LiveStateMirror(fetch, main.get_catalog, interval=0)
+    product = main.get_catalog().get("prod_001")
+
+    writer_client.post("/stock/reserve", json={"product_id": "prod_001", "quantity": 2, "owner": "mirror"})
+    main.sales_velocity.record("prod_001", 5)
+    mirror.stock.expire()
+
+    assert mirror.stock.version == main.stock_ledger.version
+    assert mirror.stock.live_stock(product) == main.stock_ledger.live_stock(product)
+    assert (mirror.sales.epoch, mirror.sales.version) == (main.sales_velocity.epoch, main.sales_velocity.version)
+    assert mirror.sales.velocity(product) == pytest.approx(main.sales_velocity.velocity(product))
+
+    writer_client.post("/stock/release", json={"owner": "mirror"})
+    main.sales_velocity.record("prod_001", 1)
+    mirror.stock.expire()
+
+    assert mirror.stock.live_stock(product) == product.stock
+    assert mirror.sales.velocity(product) == pytest.approx(main.sales_velocity.velocity(product))
+
+
+def test_mirror_keeps_its_copy_when_the_writer_is_down():
+    state = {"stock": {"version": 3, "reserved": {"prod_001": 4}}, "sales": None}
+    responses = [state]
+
+    def fetch(params):
+        if not responses:
+            raise httpx.ConnectError("writer restarting")
+        return responses.pop()
+
+    mirror = LiveStateMirror(fetch, main.get_catalog, sales=False, interval=0)
+    mirror.stock.expire()
+    mirror.stock.expire()
+
+    assert (mirror.stock.version, mirror.stock.reserved("prod_001")) == (3, 4)
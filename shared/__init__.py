@@ -0,0 +1,5 @@
+"""
+Modules shared by the gateway and the services
+Copied next to each service's app/ package in its image and Lambda bundle;
+in a checkout, app/__init__.py puts the repository root on sys.path
+"""
@@ -0,0 +1,201 @@
+"""
+Idempotency keys
+Remembers the response to each (scope, Idempotency-Key) for a while so a
+retried request is answered from memory instead of being applied twice;
+a duplicate that arrives while the original is still running waits for it
+Used by the cart service (scoped per user) and the auth service (scoped
+per login email)
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_KEYS_PER_USER = int(os.getenv("IDEMPOTENCY_KEYS_PER_USER", "100"))
+IDEMPOTENCY_MAX_USERS = int(os.getenv("IDEMPOTENCY_MAX_USERS", "10000"))
+# How long a duplicate waits for the in-flight original before giving up with 409
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT", "10"))
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used for a different request body"""
+
+
+class IdempotencyInProgress(Exception):
+    """The original request is still running after the wait"""
+
+
+# Keyed per process: bodies may hold secrets (passwords) and only need comparing here
+_FINGERPRINT_KEY = os.urandom(32)
+
+
+def fingerprint(payload: Any) -> str:
+    """Digest of a JSON-able request body, to spot a key reused for a different request"""
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(encoded.encode(), key=_FINGERPRINT_KEY, digest_size=16).hexdigest()
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "expires", "done", "status", "body")
+
+    def __init__(self, fingerprint: str, expires: float):
+        self.fingerprint = fingerprint
+        self.expires = expires
+        self.done = threading.Event()
+        self.status = 0
+        self.body: Any = None
+
+
+class IdempotencyStore:
+    """
+    Bounded, TTL-expiring responses keyed by (scope, key)
+
+    Each scope keeps at most `keys_per_scope` keys and the
+    least recently used scopes are dropped beyond `max_scopes`, so memory
+    stays bounded whatever clients send. Entries are created in time
+    order with one TTL, so expiry only ever looks at the oldest keys.
+    """
+
+    def __init__(
+        self,
+        ttl: float = IDEMPOTENCY_TTL,
+        keys_per_scope: int = IDEMPOTENCY_KEYS_PER_USER,
+        max_scopes: int = IDEMPOTENCY_MAX_USERS,
+        wait: float = IDEMPOTENCY_WAIT,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.ttl = ttl
+        self.keys_per_scope = keys_per_scope
+        self.max_scopes = max_scopes
+        self.wait = wait
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._scopes: "OrderedDict[str, OrderedDict[str, _Entry]]" = OrderedDict()
+        self.replays = 0
+
+    def execute(
+        self,
+        scope: str,
+        key: str,
+        request_fingerprint: str,
+        operation: Callable[[], Tuple[int, Any]]
+    ) -> Tuple[int, Any, bool]:
+        """
+        Run operation() at most once per (scope, key); returns (status, body, replayed)
+
+        operation returns the (status, body) to remember. If it raises,
+        nothing is remembered and the exception propagates, so a retry runs
+        it again (waiting duplicates then take over in turn).
+        """
+        while True:
+            with self._lock:
+                entry = self._lookup(scope, key)
+                owner = entry is None
+                if owner:
+                    entry = self._insert(scope, key, request_fingerprint)
+            if owner:
+                break
+            if entry.fingerprint != request_fingerprint:
+                raise IdempotencyKeyReused(key)
+            if not entry.done.wait(self.wait):
+                raise IdempotencyInProgress(key)
+            if entry.status:
+                self.replays += 1
+                return entry.status, entry.body, True
+            # The original failed without a response to remember; try it ourselves
+
+        try:
+            entry.status, entry.body = operation()
+        except BaseException:
+            with self._lock:
+                keys = self._scopes.get(scope)
+                if keys is not None and keys.get(key) is entry:
+                    del keys[key]
+            raise
+        finally:
+            entry.done.set()
+        return entry.status, entry.body, False
+
+    def respond(
+        self,
+        scope: str,
+        key: Optional[str],
+        payload: Any,
+        operation: Callable[[], Tuple[Any, Dict[str, str]]],
+        response_class=JSONResponse
+    ):
+        """
+        Run operation() once per (scope, Idempotency-Key) and answer with its response
+
+        operation returns the response body and headers; both are
+        remembered. Duplicates get the remembered response (4xx included)
+        with an Idempotent-Replayed header. `payload` (the request body and
+        anything else that must match) is fingerprinted, so a replay needs
+        the same credentials as the original. 5xx failures are not
+        remembered, so the client can retry them with the same key.
+        """
+        if key is None:
+            body, headers = operation()
+            return response_class(body, headers=headers)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+
+        def attempt():
+            try:
+                return 200, operation()
+            except HTTPException as e:
+                if e.status_code >= 500:
+                    raise
+                return e.status_code, ({"detail": e.detail}, dict(e.headers or {}))
+
+        try:
+            status, (body, headers), replayed = self.execute(scope, key, fingerprint(payload), attempt)
+        except IdempotencyKeyReused:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        except IdempotencyInProgress:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+        if replayed:
+            headers = {**headers, "Idempotent-Replayed": "true"}
+        return response_class(body, status_code=status, headers=headers)
+
+    def _lookup(self, scope: str, key: str) -> Optional[_Entry]:
+        keys = self._scopes.get(scope)
+        if keys is None:
+            return None
+        self._scopes.move_to_end(scope)
+        now = self._clock()
+        while keys:
+            oldest = next(iter(keys.values()))
+            if oldest.expires > now:
+                break
+            keys.popitem(last=False)
+        return keys.get(key)
+
+    def _insert(self, scope: str, key: str, request_fingerprint: str) -> _Entry:
+        keys = self._scopes.get(scope)
+        if keys is None:
+            keys = self._scopes[scope] = OrderedDict()
+            if len(self._scopes) > self.max_scopes:
+                self._scopes.popitem(last=False)
+        entry = keys[key] = _Entry(request_fingerprint, self._clock() + self.ttl)
+        if len(keys) > self.keys_per_scope:
+            keys.popitem(last=False)
+        return entry
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(keys) for keys in self._scopes.values())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._scopes.clear()
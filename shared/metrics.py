@@ -0,0 +1,192 @@
+"""
+Prometheus-style metrics
+Per-route request counters and fixed-bucket latency histograms
+"""
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from starlette.responses import Response
+
+
+# Fixed latency buckets in seconds (Prometheus client defaults)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter keyed by label values"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class Histogram:
+    """
+    Latency histogram with fixed buckets
+    observe() is a bisect plus two additions; cumulative counts are only
+    built when the registry is rendered.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = self._series[labelvalues] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, *labelvalues: str) -> int:
+        series = self._series.get(labelvalues)
+        return int(sum(series[:-1])) if series else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {int(cumulative)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {int(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-1]!r}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._metrics.get(name) or self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._metrics.get(name) or self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+REQUESTS_TOTAL = REGISTRY.counter(
+    "http_requests_total",
+    "Total HTTP requests by route and status code",
+    ("method", "route", "status")
+)
+REQUEST_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("method", "route")
+)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request counts and latency per route
+
+    Routes are labelled by their path template (e.g. /products/{product_id})
+    so label cardinality stays bounded. All updates happen on the event loop,
+    so the counters need no locking.
+    """
+
+    def __init__(self, app, registry: Optional[MetricsRegistry] = None, exclude: Iterable[str] = ("/metrics",)):
+        self.app = app
+        self.exclude = frozenset(exclude)
+        registry = registry or REGISTRY
+        self.requests = registry.counter(
+            REQUESTS_TOTAL.name, REQUESTS_TOTAL.documentation, REQUESTS_TOTAL.labelnames
+        )
+        self.latency = registry.histogram(
+            REQUEST_LATENCY.name, REQUEST_LATENCY.documentation, REQUEST_LATENCY.labelnames
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            self.requests.inc(method, path, str(status_code))
+            self.latency.observe(elapsed, method, path)
+
+
+def metrics_response(registry: Optional[MetricsRegistry] = None) -> Response:
+    """Render the registry for a /metrics endpoint"""
+    return Response((registry or REGISTRY).render(), media_type=CONTENT_TYPE_LATEST)
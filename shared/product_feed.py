@@ -0,0 +1,89 @@
+"""
+Product change feed consumer
+Long-polls the product service's change log and hands each batch of
+events to a callback, so cached product data (the gateway's responses, the
+cart's names and prices) is refreshed per product instead of by TTL
+"""
+import asyncio
+import logging
+import random
+from typing import Awaitable, Callable, List, Optional
+
+import httpx
+
+
+logger = logging.getLogger(__name__)
+
+
+class ProductFeedSubscriber:
+    """
+    Follows GET /products/changes on the product service
+
+    on_events receives every batch of events in version order. When the
+    product service says our position is gone (reset), on_reset is awaited
+    with the HTTP client so the consumer can reload what it holds. The
+    feed's epoch is kept with our version, so a restarted product service
+    (which numbers from 0 again) answers with a reset too.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        on_events: Callable[[List[dict]], None],
+        on_reset: Optional[Callable[[httpx.AsyncClient], Awaitable[None]]] = None,
+        wait: float = 25.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.on_events = on_events
+        self.on_reset = on_reset
+        self.wait = wait
+        self.transport = transport
+        self.version = 0
+        self.epoch: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def poll(self, client: httpx.AsyncClient) -> dict:
+        """Fetch and apply one batch; returns the decoded response"""
+        params = {"since": self.version, "wait": self.wait}
+        if self.epoch is not None:
+            params["epoch"] = self.epoch
+        response = await client.get(f"{self.base_url}/products/changes", params=params, timeout=self.wait + 10)
+        response.raise_for_status()
+        batch = response.json()
+        if batch["reset"]:
+            if self.on_reset is not None:
+                await self.on_reset(client)
+        elif batch["events"]:
+            self.on_events(batch["events"])
+        self.version = batch["version"]
+        self.epoch = batch.get("epoch")
+        return batch
+
+    async def run(self) -> None:
+        delay = 1.0
+        async with httpx.AsyncClient(transport=self.transport) as client:
+            while True:
+                try:
+                    await self.poll(client)
+                    delay = 1.0
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exc:
+                    # Product service down or restarting: back off and retry
+                    logger.warning("product change feed poll failed: %s", exc)
+                    await asyncio.sleep(random.uniform(0, delay))
+                    delay = min(30.0, delay * 2)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
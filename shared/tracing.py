@@ -0,0 +1,315 @@
+"""
+Distributed tracing
+W3C traceparent propagation with head-sampled spans exported to a file or collector stand-in
+"""
+import atexit
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Deque, Dict, List, Optional
+
+
+TRACEPARENT_HEADER = "traceparent"
+
+
+def _new_trace_id() -> str:
+    return "%032x" % random.getrandbits(128)
+
+
+def _new_span_id() -> str:
+    return "%016x" % random.getrandbits(64)
+
+
+def parse_traceparent(value: Optional[str]):
+    """
+    Parse a W3C traceparent header
+
+    Returns (trace_id, parent_span_id, sampled) or None if the header is
+    missing or malformed.
+    """
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) < 4 or len(parts[0]) != 2 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    version, trace_id, span_id, flags = parts[:4]
+    if version == "ff" or trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    try:
+        int(trace_id, 16)
+        int(span_id, 16)
+        sampled = bool(int(flags[:2], 16) & 0x01)
+    except ValueError:
+        return None
+    return trace_id.lower(), span_id.lower(), sampled
+
+
+def format_traceparent(trace_id: str, span_id: str, sampled: bool) -> str:
+    return f"00-{trace_id}-{span_id}-{'01' if sampled else '00'}"
+
+
+class Span:
+    """A timed operation within a trace"""
+
+    __slots__ = (
+        "trace_id", "span_id", "parent_id", "name", "service",
+        "start", "end", "attributes", "events", "sampled"
+    )
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, service: str):
+        self.trace_id = trace_id
+        self.span_id = _new_span_id()
+        self.parent_id = parent_id
+        self.name = name
+        self.service = service
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.attributes: Dict[str, object] = {}
+        self.events: List[dict] = []
+        self.sampled = True
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes) -> None:
+        self.events.append({"name": name, "time": time.time(), **attributes})
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return None if self.end is None else (self.end - self.start) * 1000
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "service": self.service,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "events": self.events,
+        }
+
+
+class UnsampledSpan:
+    """
+    Placeholder for traces that were not sampled
+    Carries ids for propagation only; recording calls are no-ops.
+    """
+
+    __slots__ = ("trace_id", "span_id")
+    sampled = False
+
+    def __init__(self, trace_id: str, span_id: str):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+    def set_attribute(self, key: str, value) -> None:
+        pass
+
+    def add_event(self, name: str, **attributes) -> None:
+        pass
+
+
+class InMemoryExporter:
+    """Bounded in-process collector stand-in (also used by tests)"""
+
+    def __init__(self, maxlen: int = 10_000):
+        self._spans: Deque[Span] = deque(maxlen=maxlen)
+
+    def export(self, span: Span) -> None:
+        self._spans.append(span)
+
+    @property
+    def spans(self) -> List[Span]:
+        return list(self._spans)
+
+    def clear(self) -> None:
+        self._spans.clear()
+
+    def flush(self) -> None:
+        pass
+
+
+class FileExporter:
+    """
+    Appends finished spans to a newline-delimited JSON file
+    Spans are buffered and written in batches to keep file I/O off the hot path.
+    """
+
+    def __init__(self, path: str, batch_size: int = 256):
+        self.path = path
+        self.batch_size = batch_size
+        self._buffer: List[dict] = []
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._buffer.append(span.to_dict())
+            if len(self._buffer) < self.batch_size:
+                return
+            batch, self._buffer = self._buffer, []
+        self._write(batch)
+
+    def flush(self) -> None:
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch: List[dict]) -> None:
+        with open(self.path, "a") as handle:
+            handle.write("".join(json.dumps(item) + "\n" for item in batch))
+
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+def current_span():
+    """The active span (sampled or not) for this request, or None"""
+    return _current_span.get()
+
+
+class Tracer:
+    """
+    Creates spans and decides sampling
+
+    The sampling decision is made once per trace at the entry point and
+    inherited from the incoming traceparent, so an unsampled request costs
+    a context-variable lookup per instrumented call.
+    """
+
+    def __init__(self, service_name: str = "unknown", exporter=None, sample_rate: float = 0.01):
+        self.service_name = service_name
+        self.exporter = exporter or InMemoryExporter()
+        self.sample_rate = sample_rate
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        export_file = os.getenv("TRACE_EXPORT_FILE")
+        return cls(
+            service_name=os.getenv("SERVICE_NAME", "unknown"),
+            exporter=FileExporter(export_file) if export_file else None,
+            sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "0.01")),
+        )
+
+    def start_trace(self, traceparent: Optional[str], name: str):
+        """Start the entry span for a request, continuing the caller's trace if any"""
+        parent = parse_traceparent(traceparent)
+        if parent is None:
+            trace_id, parent_id = _new_trace_id(), None
+            sampled = random.random() < self.sample_rate
+        else:
+            trace_id, parent_id, sampled = parent
+        if not sampled:
+            return UnsampledSpan(trace_id, parent_id or _new_span_id())
+        return Span(trace_id, parent_id, name, self.service_name)
+
+    def finish(self, span) -> None:
+        if span.sampled:
+            span.end = time.time()
+            self.exporter.export(span)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Record a child of the current span; a no-op when the trace is unsampled"""
+        parent = _current_span.get()
+        if parent is None or not parent.sampled:
+            yield parent or _NOOP_SPAN
+            return
+        span = Span(parent.trace_id, parent.span_id, name, self.service_name)
+        span.attributes.update(attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as exc:
+            span.set_attribute("error", type(exc).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            self.finish(span)
+
+    def inject(self, headers: Dict[str, str]) -> Dict[str, str]:
+        """Add a traceparent for the current span to outgoing headers"""
+        span = _current_span.get()
+        if span is not None:
+            headers[TRACEPARENT_HEADER] = format_traceparent(span.trace_id, span.span_id, span.sampled)
+        return headers
+
+
+_NOOP_SPAN = UnsampledSpan("0" * 32, "0" * 16)
+
+tracer = Tracer.from_env()
+
+
+def traced(name: str):
+    """Decorator recording a span around a sync function when the trace is sampled"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            parent = _current_span.get()
+            if parent is None or not parent.sampled:
+                return func(*args, **kwargs)
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TracingMiddleware:
+    """
+    Pure ASGI middleware that starts a span per request
+
+    Reads the incoming traceparent header (or makes a sampling decision for
+    new traces) and names the span after the matched route template.
+    """
+
+    def __init__(self, app, service_name: Optional[str] = None):
+        self.app = app
+        if service_name:
+            tracer.service_name = service_name
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+
+        span = tracer.start_trace(traceparent, scope["method"])
+        token = _current_span.set(span)
+        if not span.sampled:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _current_span.reset(token)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_span.reset(token)
+            route = scope.get("route")
+            span.name = f"{scope['method']} {getattr(route, 'path', scope['path'])}"
+            span.set_attribute("http.status_code", status_code)
+            tracer.finish(span)